@@ -95,6 +95,8 @@ config.JobStateMachine.couchurl = couchURL
 config.JobStateMachine.couchDBName = jobDumpDBName
 config.JobStateMachine.jobSummaryDBName = jobSummaryDBName
 config.JobStateMachine.summaryStatsDBName = summaryStatsDBName
+config.JobStateMachine.bulkTransitions = False
+config.JobStateMachine.specCacheDir = config.General.workDir + "/SpecCache"
 
 config.section_("ACDC")
 config.ACDC.couchurl = "https://cmsweb.cern.ch/couchdb"
@@ -111,6 +113,7 @@ config.BossAir.nCondorProcesses = 1
 config.BossAir.submitWMSMode = True
 config.BossAir.acctGroup = glideInAcctGroup
 config.BossAir.acctGroupUser = glideInAcctGroupUser
+config.BossAir.incrementalTrack = False
 
 config.section_("CoreDatabase")
 config.CoreDatabase.connectUrl = databaseUrl
@@ -191,6 +194,12 @@ config.JobCreator.pollInterval = 120
 config.JobCreator.jobCacheDir = config.General.workDir + "/JobCache"
 config.JobCreator.defaultJobType = "Processing"
 config.JobCreator.workerThreads = 1
+# save the jobs of each JobCollection in a single packed file instead of one job.pkl per job
+config.JobCreator.packedJobCache = False
+# number of processes creating the job work areas, WMBS is still updated by the component
+config.JobCreator.nProcesses = 1
+# maximum time in seconds to wait for the processes to create the job groups of a cycle
+config.JobCreator.poolTimeout = 3600
 # glidein restrictions used for resource estimation (per core)
 config.JobCreator.GlideInRestriction = {"MinWallTimeSecs": 1 * 3600,  # 1h
                                         "MaxWallTimeSecs": 45 * 3600,  # pilot lifetime is usually 48h
@@ -10,6 +10,9 @@ class Add(DBFormatter):
     sql = """INSERT IGNORE dbsbuffer_file(lfn, filesize, events, dataset_algo, status, workflow, in_phedex)
                 values (:lfn, :filesize, :events, :dataset_algo, :status, :workflow, :in_phedex)"""
 
+    # order of the values in the rows inserted for a list of files
+    columns = ("lfn", "filesize", "events", "dataset_algo", "status", "workflow", "in_phedex")
+
     def getBinds(self, files, size, events, cksum, dataset_algo, status, workflowID, inPhedex):
         # Can't use self.dbi.buildbinds here...
         binds = []
@@ -34,12 +37,24 @@ class Add(DBFormatter):
                               'in_phedex': f[6]})
         return binds
 
+    def getRows(self, files):
+        """
+        _getRows_
+
+        Pack the values of a list of tuples containing lfn, size, events,
+        dataset algo, status, workflow and phedex flag in the order of columns
+        """
+        return [tuple(f[:7]) for f in files]
+
     def execute(self, files=None, size=0, events=0, cksum=0,
                 datasetAlgo=0, status="NOTUPLOADED", workflowID=None,
                 inPhedex=0, conn=None, transaction=False):
-        binds = self.getBinds(files, size, events, cksum, datasetAlgo, status,
-                              workflowID, inPhedex)
-
-        self.dbi.processData(self.sql, binds, conn=conn, transaction=transaction)
+        if isinstance(files, (list, set)):
+            self.dbi.insertRows(self.sql, self.columns, self.getRows(files),
+                                conn=conn, transaction=transaction)
+        else:
+            binds = self.getBinds(files, size, events, cksum, datasetAlgo, status,
+                                  workflowID, inPhedex)
+            self.dbi.processData(self.sql, binds, conn=conn, transaction=transaction)
 
         return
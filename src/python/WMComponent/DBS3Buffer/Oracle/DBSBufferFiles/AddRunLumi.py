@@ -10,5 +10,4 @@ from WMComponent.DBS3Buffer.MySQL.DBSBufferFiles.AddRunLumi import AddRunLumi as
 class AddRunLumi(MySQLAddRunLumi):
 
     sql = """INSERT INTO dbsbuffer_file_runlumi_map (filename, run, lumi, num_events)
-            select id, :run, :lumi, :num_events from dbsbuffer_file
-            where lfn = :lfn"""
+               VALUES (:filename, :run, :lumi, :num_events)"""
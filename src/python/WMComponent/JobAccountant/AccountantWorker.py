@@ -300,6 +300,10 @@ class AccountantWorker(WMConnectionBase):
 
         self.commitTransaction(existingTransaction)
 
+        for table, (rows, insertTime) in sorted(self.dbi.popInsertMetrics().items()):
+            logging.info("Inserted %d rows into %s in %.2f secs (%.0f rows/s)", rows, table,
+                         insertTime, rows / max(insertTime, 1e-6))
+
         return returnList
 
     def outputFilesetsForJob(self, outputMap, merged, moduleLabel, datatier):
@@ -8,9 +8,11 @@ import os.path
 import shutil
 import tarfile
 import threading
+from io import BytesIO
 
 from Utils.IteratorTools import grouper
 from Utils.Timers import timeFunction
+from WMComponent.JobCreator.JobCacheStore import JobCacheReader, STORE_NAME, LEGACY_NAME, SUBMIT_INDEX_NAME
 from WMCore.DAOFactory import DAOFactory
 from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMCore.Services.ReqMgrAux.ReqMgrAux import isDrainMode
@@ -207,18 +209,21 @@ class JobArchiverPoller(BaseWorkerThread):
         regarding those jobs is cleaned up.
         """
 
-        for job in doneList:
-            # print "About to clean cache for job %i" % (job['id'])
-            self.cleanJobCache(job)
+        with JobCacheReader() as jobCacheReader:
+            for job in doneList:
+                # print "About to clean cache for job %i" % (job['id'])
+                self.cleanJobCache(job, jobCacheReader)
 
         return
 
-    def cleanJobCache(self, job):
+    def cleanJobCache(self, job, jobCacheReader=None):
         """
         _cleanJobCache_
 
         Clears out any files still sticking around in the jobCache,
-        tars up the contents and sends them off
+        tars up the contents and sends them off.
+        If the job was saved in a packed JobCacheStore, it's added to
+        the tarball as a job.pkl file.
         """
 
         cacheDir = job['cache_dir']
@@ -230,8 +235,15 @@ class JobArchiverPoller(BaseWorkerThread):
 
         cacheDirList = os.listdir(cacheDir)
 
-        if cacheDirList == []:
+        jobStore = None
+        if jobCacheReader is not None and LEGACY_NAME not in cacheDirList:
+            jobStore = jobCacheReader.getStore(cacheDir)
+            if jobStore is not None and job['id'] not in jobStore:
+                jobStore = None
+
+        if cacheDirList == [] and jobStore is None:
             os.rmdir(cacheDir)
+            self.cleanJobCacheStore(cacheDir, jobCacheReader)
             return
 
         # Now we need to set up a final destination
@@ -263,6 +275,11 @@ class JobArchiverPoller(BaseWorkerThread):
                         tarball.add(name=fullFile, arcname='Job_%i/%s' % (job['id'], fileName))
                     except IOError:
                         logging.error('Cannot read %s, skipping', fullFile)
+                if jobStore is not None:
+                    jobRecord = jobStore.loadRecord(job['id'])
+                    tarInfo = tarfile.TarInfo(name='Job_%i/%s' % (job['id'], LEGACY_NAME))
+                    tarInfo.size = len(jobRecord)
+                    tarball.addfile(tarInfo, BytesIO(jobRecord))
         except Exception as ex:
             msg = "Exception while opening and adding to a tarfile\n"
             msg += "Tarfile: %s\n" % os.path.join(logDir, tarName)
@@ -280,6 +297,30 @@ class JobArchiverPoller(BaseWorkerThread):
             logging.error(msg)
             raise JobArchiverPollerException(msg)
 
+        self.cleanJobCacheStore(cacheDir, jobCacheReader)
+
+        return
+
+    def cleanJobCacheStore(self, cacheDir, jobCacheReader=None):
+        """
+        _cleanJobCacheStore_
+
+        Remove the packed JobCacheStore and the JobSubmitIndex of the
+        JobCollection directory once all the job cache directories in it
+        have been archived.
+        """
+        collectionDir = os.path.dirname(os.path.normpath(cacheDir))
+        try:
+            collectionFiles = os.listdir(collectionDir)
+            if not collectionFiles or set(collectionFiles) - set([STORE_NAME, SUBMIT_INDEX_NAME]):
+                return
+            if jobCacheReader is not None:
+                jobCacheReader.close()
+            for fileName in collectionFiles:
+                os.remove(os.path.join(collectionDir, fileName))
+        except OSError as ex:
+            logging.error("Error while removing the job cache store in %s: %s", collectionDir, str(ex))
+
         return
 
     def markInjected(self):
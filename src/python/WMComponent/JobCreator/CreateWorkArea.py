@@ -65,10 +65,10 @@ def makedirs(directory):
             raise CreateWorkAreaException(msg)
         # Else: the directory exists.  Don't complain, but do mention it
         else:
-            msg = "Hit error in creating directory %s; ignoring. \n" % (msg)
+            msg = "Hit error in creating directory %s; ignoring. \n" % (directory)
             msg += str(traceback.format_exc())
-            msg = "This looks like an error but everything seems to be in place"
-            logging.error(msg)
+            msg += "This looks like an error but everything seems to be in place"
+            logging.warning(msg)
 
     return
 
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+"""
+_JobCacheStore_
+
+Packed storage for the pickled job objects created by the JobCreator.
+
+Instead of writing one job.pkl file in each job cache directory, the jobs of
+a JobCollection directory (all belonging to the same job group) are appended
+to a single indexed file living in that JobCollection directory. The file is
+append-only and made of:
+
+  * a header: the magic string and the format version
+  * one record per job: job id (8 bytes), payload length (4 bytes), pickled job
+
+If a job is saved more than once, the last record wins. A truncated record
+at the end of the file (e.g. an interrupted write) is ignored.
+
+Readers memory map the file and build the job id index from the record
+headers only, which gives random access to any job without unpickling the
+others. JobCacheReader falls back to the legacy job.pkl layout, so caches
+created before the store was enabled can still be read.
+
+Next to the jobs, a JobSubmitIndex can keep the few job fields the
+JobSubmitter needs to cache a job and choose its site, one JSON line per
+job, so that building the submitter cache doesn't require unpickling jobs.
+"""
+
+from __future__ import division
+
+import json
+import logging
+import mmap
+import os
+import os.path
+import struct
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from WMCore.WMException import WMException
+
+STORE_NAME = "JobCache.store"
+LEGACY_NAME = "job.pkl"
+STORE_MAGIC = b"WMJOBCACHE"
+STORE_VERSION = 1
+_FILE_HEADER = struct.Struct("!%dsB" % len(STORE_MAGIC))
+_RECORD_HEADER = struct.Struct("!QI")
+
+SUBMIT_INDEX_NAME = "JobSubmit.index"
+# job fields used by the JobSubmitter before a job gets submitted
+SUBMIT_FIELDS = ("possiblePSN", "fileLocations", "siteWhitelist", "siteBlacklist", "taskType",
+                 "sandbox", "ownerDN", "ownerGroup", "ownerRole", "scramArch", "swVersion",
+                 "proxyPath", "estimatedJobTime", "estimatedDiskUsage", "estimatedMemoryUsage",
+                 "numberOfCores", "inputDataset", "inputDatasetLocations", "inputPileup",
+                 "allowOpportunistic")
+
+
+class JobCacheStoreException(WMException):
+    """
+    _JobCacheStoreException_
+
+    Raised for corrupted or unknown job cache stores.
+    """
+
+
+def getStorePath(cacheDir, fileName=STORE_NAME):
+    """
+    _getStorePath_
+
+    Return the path of the store holding the job which uses cacheDir,
+    i.e. the store in its JobCollection directory.
+    """
+    return os.path.join(os.path.dirname(os.path.normpath(cacheDir)), fileName)
+
+
+def submitRecord(job):
+    """
+    _submitRecord_
+
+    Return the dictionary of the job fields used by the JobSubmitter,
+    with sets turned into sorted lists. The number of cores can be
+    overridden by the job baggage, which is resolved here.
+    """
+    record = {'id': job['id']}
+    for field in SUBMIT_FIELDS:
+        value = job.get(field, None)
+        if isinstance(value, (set, frozenset)):
+            value = sorted(value)
+        record[field] = value
+
+    numberOfCores = job.get('numberOfCores', 1)
+    if numberOfCores == 1 and hasattr(job, 'getBaggage'):
+        numberOfCores = getattr(job.getBaggage(), "numberOfCores", 1)
+    record['numberOfCores'] = numberOfCores
+    record['possiblePSN'] = record['possiblePSN'] or []
+    return record
+
+
+class JobCacheStore(object):
+    """
+    _JobCacheStore_
+
+    Append-only indexed file of pickled jobs, see the module docstring.
+    """
+
+    def __init__(self, storePath):
+        self.storePath = storePath
+        self._writer = None
+        self._mmap = None
+        self._index = {}
+        self._indexedSize = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __contains__(self, jobID):
+        return jobID in self._getIndex(jobID)
+
+    def append(self, job, jobID=None):
+        """
+        _append_
+
+        Append a job to the store. The file is kept open until close()
+        """
+        if self._writer is None:
+            self._writer = open(self.storePath, 'ab')
+            if self._writer.tell() == 0:
+                self._writer.write(_FILE_HEADER.pack(STORE_MAGIC, STORE_VERSION))
+        if jobID is None:
+            jobID = job['id']
+        payload = pickle.dumps(job, pickle.HIGHEST_PROTOCOL)
+        self._writer.write(_RECORD_HEADER.pack(jobID, len(payload)))
+        self._writer.write(payload)
+        return
+
+    def flush(self):
+        """
+        _flush_
+
+        Flush the pending appends to disk.
+        """
+        if self._writer is not None:
+            self._writer.flush()
+        return
+
+    def jobIDs(self):
+        """
+        _jobIDs_
+
+        Return the ids of all the jobs in the store.
+        """
+        return list(self._getIndex())
+
+    def loadRecord(self, jobID):
+        """
+        _loadRecord_
+
+        Return the pickled job as a string, without unpickling it.
+        Raise a KeyError if the job is not in the store.
+        """
+        offset, length = self._getIndex(jobID)[jobID]
+        return self._mmap[offset:offset + length]
+
+    def loadJob(self, jobID):
+        """
+        _loadJob_
+
+        Return the unpickled job.
+        Raise a KeyError if the job is not in the store.
+        """
+        return pickle.loads(self.loadRecord(jobID))
+
+    def iterJobs(self):
+        """
+        _iterJobs_
+
+        Yield the (job id, job) tuples of all the jobs in the store.
+        """
+        for jobID in self.jobIDs():
+            yield jobID, self.loadJob(jobID)
+
+    def close(self):
+        """
+        _close_
+
+        Close the write handle and the memory map, if opened.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._index = {}
+        self._indexedSize = 0
+        return
+
+    def _getIndex(self, jobID=None):
+        """
+        _getIndex_
+
+        Return the job id index, (re)building it if the file grew since it
+        was last read and jobID is not known yet.
+        """
+        if jobID is not None and jobID in self._index:
+            return self._index
+        self.flush()
+        if not os.path.exists(self.storePath) or os.path.getsize(self.storePath) == self._indexedSize:
+            return self._index
+
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        with open(self.storePath, 'rb') as storeFile:
+            self._mmap = mmap.mmap(storeFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        size = len(self._mmap)
+        if size < _FILE_HEADER.size:
+            raise JobCacheStoreException("Job cache store %s is too small: %d bytes" % (self.storePath, size))
+        magic, version = _FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise JobCacheStoreException("Unknown job cache store format in %s" % self.storePath)
+
+        offset = max(self._indexedSize, _FILE_HEADER.size)
+        while offset + _RECORD_HEADER.size <= size:
+            recordID, length = _RECORD_HEADER.unpack_from(self._mmap, offset)
+            start = offset + _RECORD_HEADER.size
+            if start + length > size:
+                logging.warning("Ignoring truncated record for job %s in %s", recordID, self.storePath)
+                break
+            self._index[recordID] = (start, length)
+            offset = start + length
+        self._indexedSize = offset
+        return self._index
+
+
+class JobSubmitIndex(object):
+    """
+    _JobSubmitIndex_
+
+    Append-only file of the submitRecord of jobs, one JSON document per
+    line. If a job is indexed more than once, the last record wins, and a
+    truncated line at the end of the file is ignored.
+    """
+
+    def __init__(self, indexPath):
+        self.indexPath = indexPath
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def append(self, job):
+        """
+        _append_
+
+        Append the submit record of a job. The file is kept open until close()
+        """
+        if self._writer is None:
+            self._writer = open(self.indexPath, 'a')
+        self._writer.write(json.dumps(submitRecord(job)) + "\n")
+        return
+
+    def load(self):
+        """
+        _load_
+
+        Return the dictionary of the submit records keyed by job id.
+        """
+        if self._writer is not None:
+            self._writer.flush()
+        records = {}
+        if not os.path.isfile(self.indexPath):
+            return records
+        with open(self.indexPath) as indexFile:
+            for line in indexFile:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning("Ignoring truncated job submit record in %s", self.indexPath)
+                    continue
+                records[record['id']] = record
+        return records
+
+    def close(self):
+        """
+        _close_
+
+        Close the write handle, if opened.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        return
+
+
+class JobCacheReader(object):
+    """
+    _JobCacheReader_
+
+    Load jobs out of the job cache, whatever the layout they were saved with:
+    the packed JobCacheStore of their JobCollection or the legacy per job
+    job.pkl file. Opened stores are kept around until close() so that the
+    index is only built once per store.
+    """
+
+    def __init__(self):
+        self.stores = {}
+        self.submitRecords = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def getStore(self, cacheDir):
+        """
+        _getStore_
+
+        Return the store for the job using cacheDir, None if there is none.
+        """
+        storePath = getStorePath(cacheDir)
+        if storePath not in self.stores:
+            self.stores[storePath] = JobCacheStore(storePath) if os.path.isfile(storePath) else None
+        return self.stores[storePath]
+
+    def hasJob(self, cacheDir, jobID):
+        """
+        _hasJob_
+
+        Check whether the job was saved in any of the layouts.
+        """
+        store = self.getStore(cacheDir)
+        if store is not None and jobID in store:
+            return True
+        return os.path.isfile(os.path.join(cacheDir, LEGACY_NAME))
+
+    def loadRecord(self, cacheDir, jobID):
+        """
+        _loadRecord_
+
+        Return the pickled job as a string. Raise an IOError if the job
+        can't be found.
+        """
+        store = self.getStore(cacheDir)
+        if store is not None and jobID in store:
+            return store.loadRecord(jobID)
+        with open(os.path.join(cacheDir, LEGACY_NAME), 'rb') as jobHandle:
+            return jobHandle.read()
+
+    def loadJob(self, cacheDir, jobID):
+        """
+        _loadJob_
+
+        Return the unpickled job. Raise an IOError if the job can't be found.
+        """
+        return pickle.loads(self.loadRecord(cacheDir, jobID))
+
+    def loadSubmitRecord(self, cacheDir, jobID):
+        """
+        _loadSubmitRecord_
+
+        Return the submit record of the job from the JobSubmitIndex of its
+        JobCollection, None if the job wasn't indexed.
+        """
+        indexPath = getStorePath(cacheDir, SUBMIT_INDEX_NAME)
+        if indexPath not in self.submitRecords:
+            self.submitRecords[indexPath] = JobSubmitIndex(indexPath).load()
+        return self.submitRecords[indexPath].get(jobID)
+
+    def close(self):
+        """
+        _close_
+
+        Close all the opened stores.
+        """
+        for store in self.stores.values():
+            if store is not None:
+                store.close()
+        self.stores = {}
+        self.submitRecords = {}
+        return
@@ -4,10 +4,14 @@ The JobCreator Poller for the JSM
 """
 __all__ = []
 
+import Queue
+import copy
 import logging
+import multiprocessing
 import os
 import os.path
 import threading
+import time
 
 try:
     import cPickle as pickle
@@ -17,6 +21,9 @@ except ImportError:
 from Utils.Timers import timeFunction
 from Utils.MathUtils import quantize
 from WMComponent.JobCreator.CreateWorkArea import CreateWorkArea
+from WMComponent.JobCreator.JobCacheStore import JobCacheStore, JobSubmitIndex, getStorePath, SUBMIT_INDEX_NAME
+from WMCore.DataStructs.JobGroup import JobGroup as DataStructsJobGroup
+from WMCore.DataStructs.Workflow import Workflow as DataStructsWorkflow
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 from WMCore.DAOFactory import DAOFactory
 from WMCore.WMException import WMException
@@ -25,6 +32,7 @@ from WMCore.JobStateMachine.ChangeState import ChangeState
 from WMCore.JobSplitting.SplitterFactory import SplitterFactory
 from WMCore.WMBS.Subscription import Subscription
 from WMCore.WMBS.Workflow import Workflow
+from WMCore.WMSpec.SpecMetadataCache import getSpecMetadataCache
 from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper
 from WMCore.FwkJobReport.Report import Report
 from WMCore.WMExceptions import WM_JOB_ERROR_CODES
@@ -49,33 +57,6 @@ def retrieveWMSpec(workflow=None, wmWorkloadURL=None):
     return wmWorkload
 
 
-def retrieveJobSplitParams(wmWorkload, task):
-    """
-    _retrieveJobSplitParams_
-
-    Retrieve job splitting parameters from the workflow.  The way this is
-    setup currently sucks, we have to know all the job splitting parameters
-    up front.  The following are currently supported:
-        files_per_job
-        min_merge_size
-        max_merge_size
-        max_merge_events
-    """
-
-    # This function has to find the WMSpec, and get the parameters from the spec
-    # I don't know where the spec is, but I'll have to find it.
-    # I don't want to save it in each workflow area, but I may have to
-
-    if not wmWorkload:
-        logging.error("Could not find wmWorkload for splitting")
-        return {"files_per_job": 5}
-    task = wmWorkload.getTaskByPath(task)
-    if not task:
-        return {"files_per_job": 5}
-    else:
-        return task.jobSplittingParameters()
-
-
 def runSplitter(jobFactory, splitParams):
     """
     _runSplitter_
@@ -121,48 +102,57 @@ def saveJob(job, workflow, sandbox, wmTask=None, jobNumber=0,
             owner=None, ownerDN=None, ownerGroup='', ownerRole='',
             scramArch=None, swVersion=None, agentNumber=0, numberOfCores=1,
             inputDataset=None, inputDatasetLocations=None, inputPileup=None,
-            allowOpportunistic=False, agentName=''):
+            allowOpportunistic=False, agentName='', jobStore=None):
     """
     _saveJob_
 
-    Actually do the mechanics of saving the job to a pickle file
+    Actually do the mechanics of saving the job to a pickle file,
+    or to the packed jobStore (JobCacheStore) if one is provided.
+    Return the fields set in the job.
     """
+    jobInfo = {}
     if wmTask:
         # If we managed to load the task,
         # so the url should be valid
-        job['spec'] = workflow.spec
-        job['task'] = wmTask
+        jobInfo['spec'] = workflow.spec
+        jobInfo['task'] = wmTask
         if job.get('sandbox', None) is None:
-            job['sandbox'] = sandbox
+            jobInfo['sandbox'] = sandbox
 
-    job['counter'] = jobNumber
-    job['agentNumber'] = agentNumber
-    job['agentName'] = agentName
+    jobInfo['counter'] = jobNumber
+    jobInfo['agentNumber'] = agentNumber
+    jobInfo['agentName'] = agentName
     cacheDir = job.getCache()
-    job['cache_dir'] = cacheDir
-    job['owner'] = owner
-    job['ownerDN'] = ownerDN
-    job['ownerGroup'] = ownerGroup
-    job['ownerRole'] = ownerRole
-    job['scramArch'] = scramArch
-    job['swVersion'] = swVersion
-    job['numberOfCores'] = numberOfCores
-    job['inputDataset'] = inputDataset
-    job['inputDatasetLocations'] = inputDatasetLocations
-    job['inputPileup'] = inputPileup
-    job['allowOpportunistic'] = allowOpportunistic
+    jobInfo['cache_dir'] = cacheDir
+    jobInfo['owner'] = owner
+    jobInfo['ownerDN'] = ownerDN
+    jobInfo['ownerGroup'] = ownerGroup
+    jobInfo['ownerRole'] = ownerRole
+    jobInfo['scramArch'] = scramArch
+    jobInfo['swVersion'] = swVersion
+    jobInfo['numberOfCores'] = numberOfCores
+    jobInfo['inputDataset'] = inputDataset
+    jobInfo['inputDatasetLocations'] = inputDatasetLocations
+    jobInfo['inputPileup'] = inputPileup
+    jobInfo['allowOpportunistic'] = allowOpportunistic
+    job.update(jobInfo)
+
+    if jobStore is not None:
+        jobStore.append(job)
+        return jobInfo
 
     with open(os.path.join(cacheDir, 'job.pkl'), 'w') as output:
         pickle.dump(job, output, pickle.HIGHEST_PROTOCOL)
 
-    return
+    return jobInfo
 
 
 def creatorProcess(work, jobCacheDir):
     """
     _creatorProcess_
 
-    Creator work areas and pickle job objects
+    Creator work areas and pickle job objects.
+    Return the fields set in each job, in the order of the job group jobs.
     """
     createWorkArea = CreateWorkArea()
 
@@ -185,6 +175,8 @@ def creatorProcess(work, jobCacheDir):
         inputPileup = work.get('inputPileup', None)
         allowOpportunistic = work.get('allowOpportunistic', False)
         agentName = work.get('agentName', '')
+        packedJobCache = work.get('packedJobCache', False)
+        submitIndex = work.get('submitIndex', False)
 
         if ownerDN is None:
             ownerDN = owner
@@ -200,6 +192,10 @@ def creatorProcess(work, jobCacheDir):
         logging.exception(msg)
         raise JobCreatorException(msg)
 
+    # one packed store and one submit index per JobCollection directory
+    jobStores = {}
+    submitIndexes = {}
+    jobInfos = []
     try:
         createWorkArea.processJobs(jobGroup=wmbsJobGroup,
                                    startDir=jobCacheDir,
@@ -209,125 +205,112 @@ def creatorProcess(work, jobCacheDir):
 
         for job in wmbsJobGroup.jobs:
             jobNumber += 1
-            saveJob(job=job, workflow=workflow,
-                    wmTask=wmTaskName,
-                    jobNumber=jobNumber,
-                    sandbox=sandbox,
-                    owner=owner,
-                    ownerDN=ownerDN,
-                    ownerGroup=ownerGroup,
-                    ownerRole=ownerRole,
-                    scramArch=scramArch,
-                    swVersion=swVersion,
-                    agentNumber=agentNumber,
-                    numberOfCores=numberOfCores,
-                    inputDataset=inputDataset,
-                    inputDatasetLocations=inputDatasetLocations,
-                    inputPileup=inputPileup,
-                    allowOpportunistic=allowOpportunistic,
-                    agentName=agentName)
+            jobStore = None
+            if packedJobCache:
+                storePath = getStorePath(job['cache_dir'])
+                jobStore = jobStores.setdefault(storePath, JobCacheStore(storePath))
+            jobInfo = saveJob(job=job, workflow=workflow,
+                            wmTask=wmTaskName,
+                            jobNumber=jobNumber,
+                            sandbox=sandbox,
+                            owner=owner,
+                            ownerDN=ownerDN,
+                            ownerGroup=ownerGroup,
+                            ownerRole=ownerRole,
+                            scramArch=scramArch,
+                            swVersion=swVersion,
+                            agentNumber=agentNumber,
+                            numberOfCores=numberOfCores,
+                            inputDataset=inputDataset,
+                            inputDatasetLocations=inputDatasetLocations,
+                            inputPileup=inputPileup,
+                            allowOpportunistic=allowOpportunistic,
+                            agentName=agentName,
+                            jobStore=jobStore)
+            jobInfos.append(jobInfo)
+            if submitIndex:
+                indexPath = getStorePath(job['cache_dir'], SUBMIT_INDEX_NAME)
+                submitIndexes.setdefault(indexPath, JobSubmitIndex(indexPath)).append(job)
 
     except Exception as ex:
         msg = "Exception in processing wmbsJobGroup %i\n. Error: %s" % (wmbsJobGroup.id, str(ex))
         logging.exception(msg)
         raise JobCreatorException(msg)
+    finally:
+        for jobStore in jobStores.values():
+            jobStore.close()
+        for jobIndex in submitIndexes.values():
+            jobIndex.close()
+
+    return jobInfos
+
 
-    return wmbsJobGroup
-
-
-# This is the code for the multiprocessing based creator
-# It's kept around so I can remember how I arranged the exception tree
-# Keep this until we make a decision about large-scale transactions
-# in the JobCreator.
-
-# def creatorProcess(input, result, jobCacheDir):
-#    """
-#    _creatorProcess_
-#
-#    Run the CreateWorkArea code
-#    """
-#
-#
-#    createWorkArea  = CreateWorkArea()
-#
-#
-#    while True:
-#
-#        try:
-#            work = input.get()
-#        except (EOFError, IOError):
-#            crashMessage =  "Hit EOF/IO in getting new work\n"
-#            crashMessage += "Assuming this is a graceful break attempt.\n"
-#            logging.error(crashMessage)
-#            break
-#
-#        if work == 'STOP':
-#            # Put the brakes on
-#            break
-#
-#        try:
-#            wmbsJobGroup = work.get('jobGroup')
-#            workflow     = work.get('workflow')
-#            wmWorkload   = work.get('wmWorkload')
-#            wmTaskName   = work.get('wmTaskName')
-#            sandbox      = work.get('sandbox')
-#            jobNumber    = work.get('jobNumber', 0)
-#            wmTaskPrio   = work.get('wmTaskPrio', None)
-#        except KeyError, ex:
-#            msg =  "Could not find critical key-value in work input.\n"
-#            msg += str(ex)
-#            logging.error(msg)
-#            result.put({status: 'Error', 'msg': msg})
-#            continue
-#        except Exception, ex:
-#            msg =  "Exception in opening work package.\n"
-#            msg += str(ex)
-#            msg += str(traceback.format_exc())
-#            logging.error(msg)
-#            result.put({'success': False, 'msg': msg})
-#            continue
-#
-#
-#        try:
-#            #print "Retrieved work in creatorProcess %i: %s" % (os.getpid(), [x['id'] for x in wmbsJobGroup.jobs])
-#            createWorkArea.processJobs(jobGroup = wmbsJobGroup,
-#                                       startDir = jobCacheDir,
-#                                       workflow = workflow,
-#                                       wmWorkload = wmWorkload,
-#                                       cache = False)
-#
-#            for job in wmbsJobGroup.jobs:
-#                jobNumber += 1
-#                saveJob(job = job, workflow = workflow,
-#                        wmTask = wmTaskName,
-#                        jobNumber = jobNumber,
-#                        wmTaskPrio = wmTaskPrio,
-#                        sandbox = sandbox)
-#
-#            # If we got this far, it should be a success
-#            result.put({'success': True, 'jobGroup': wmbsJobGroup})
-#
-#        except Exception, ex:
-#            # Register as failure; move on
-#            msg =  "Exception in processing wmbsJobGroup %i\n" % wmbsJobGroup.id
-#            msg += str(ex)
-#            msg += str(traceback.format_exc())
-#            logging.error(msg)
-#            result.put({'success': False, 'msg': msg})
-#
-#        #print "Finished work in creatorProcess %i" % os.getpid()
-#        #print [x['id'] for x in wmbsJobGroup.jobs]
-#
-#        # END while loop that does the work
-#
-#    return 0
+def makePoolWork(work):
+    """
+    _makePoolWork_
 
+    Make the work dictionary sent to a pool process. The workflow, workload
+    and job group are replaced by the names and ids creatorProcess needs, so
+    that only the jobs themselves get pickled.
+    """
+    poolWork = dict((key, value) for key, value in work.items()
+                    if key not in ['workflow', 'wmWorkload', 'jobGroup'])
+    poolWork['workflowSpec'] = work['workflow'].spec
+    poolWork['workflowTask'] = work['workflow'].task
+    poolWork['workloadName'] = work['wmWorkload'].name()
+    poolWork['jobGroupID'] = work['jobGroup'].id
+    poolWork['jobs'] = work['jobGroup'].jobs
+    return poolWork
 
 
+def loadPoolWork(poolWork):
+    """
+    _loadPoolWork_
+
+    Rebuild the work dictionary of creatorProcess from the one sent to a
+    pool process, with objects which don't need the database.
+    """
+    work = dict(poolWork)
+    work['workflow'] = DataStructsWorkflow(spec=work.pop('workflowSpec'), task=work.pop('workflowTask'))
+    work['wmWorkload'] = WMWorkloadHelper(WMWorkload(work.pop('workloadName')))
+    jobGroup = DataStructsJobGroup(jobs=work.pop('jobs'))
+    jobGroup.commit()
+    jobGroup.id = work.pop('jobGroupID')
+    work['jobGroup'] = jobGroup
+    return work
 
 
+def creatorWorker(workInput, results, jobCacheDir):
+    """
+    _creatorWorker_
+
+    Run creatorProcess for the work put in workInput, in a pool process.
+    The fields set in the jobs, such as their cache directories, are sent
+    back through results. No database access happens here, the parent
+    takes care of WMBS within its own transaction.
+    """
+    while True:
+        try:
+            work = workInput.get()
+        except (EOFError, IOError):
+            crashMessage = "Hit EOF/IO in getting new work\n"
+            crashMessage += "Assuming this is a graceful break attempt.\n"
+            logging.error(crashMessage)
+            break
+
+        if work == 'STOP':
+            # Put the brakes on
+            break
 
+        workIndex = work.pop('workIndex', None)
+        try:
+            jobInfos = creatorProcess(work=loadPoolWork(work), jobCacheDir=jobCacheDir)
+            results.put({'workIndex': workIndex, 'success': True, 'jobInfos': jobInfos})
+        except Exception as ex:
+            # Register as failure; move on
+            results.put({'workIndex': workIndex, 'success': False, 'msg': str(ex)})
 
+    return
 
 
 class JobCreatorException(WMException):
@@ -374,6 +357,18 @@ class JobCreatorPoller(BaseWorkerThread):
         self.agentNumber = int(getattr(config.Agent, 'agentNumber', 0))
         self.agentName = getattr(config.Agent, 'hostName', '')
         self.glideinLimits = getattr(config.JobCreator, 'GlideInRestriction', None)
+        # pack the jobs of each JobCollection in a single JobCacheStore file instead of one job.pkl per job
+        self.packedJobCache = getattr(config.JobCreator, 'packedJobCache', False)
+        # write the fields needed by the JobSubmitter to a JobSubmitIndex file per JobCollection
+        self.submitIndex = getattr(config.JobCreator, 'submitIndex', False)
+        # number of processes creating the job groups work areas, 1 means do it in this thread
+        self.nProc = getattr(config.JobCreator, 'nProcesses', 1)
+        self.wait = getattr(config.JobCreator, 'processWaitTime', 10)
+        # maximum time to wait for the pool to create the job groups of a splitting cycle
+        self.poolTimeout = getattr(config.JobCreator, 'poolTimeout', 3600)
+        self.pool = []
+        self.workInput = None
+        self.workResult = None
 
         try:
             self.jobCacheDir = getattr(config.JobCreator, 'jobCacheDir',
@@ -388,7 +383,72 @@ class JobCreatorPoller(BaseWorkerThread):
             raise JobCreatorException(msg)
 
         self.changeState = ChangeState(self.config)
+        # the splitting parameters come from the agent spec metadata cache,
+        # the whole spec is only loaded for the subscriptions creating jobs
+        self.specCache = getSpecMetadataCache(self.config)
+
+        # Set up the pool of worker processes
+        self.setupPool()
+
+        return
+
+    def setupPool(self):
+        """
+        _setupPool_
+
+        Set up the pool of processes creating the job groups, if configured
+        """
+        if self.pool or self.nProc <= 1:
+            return
+
+        self.workInput = multiprocessing.Queue()
+        self.workResult = multiprocessing.Queue()
+
+        for _ in range(self.nProc):
+            p = multiprocessing.Process(target=creatorWorker,
+                                        args=(self.workInput,
+                                              self.workResult,
+                                              self.jobCacheDir))
+            p.start()
+            self.pool.append(p)
+
+        return
 
+    def __del__(self):
+        """
+        __del__
+
+        Trigger a close of the pool if necessary
+        """
+        self.close()
+        return
+
+    def close(self, terminate=False):
+        """
+        _close_
+
+        Stop the pool processes, or terminate them right away
+        """
+        for _ in self.pool:
+            try:
+                self.workInput.put('STOP')
+            except Exception as ex:
+                logging.debug("Hit exception while stopping the pool: %s", str(ex))
+                terminate = True
+        if self.pool:
+            try:
+                self.workInput.close()
+                self.workResult.close()
+            except Exception:
+                pass
+        for proc in self.pool:
+            if terminate or not proc.is_alive():
+                proc.terminate()
+            else:
+                proc.join()
+        self.pool = []
+        self.workInput = None
+        self.workResult = None
         return
 
     def check(self):
@@ -443,6 +503,7 @@ class JobCreatorPoller(BaseWorkerThread):
         """
         logging.debug("terminating. doing one more pass before we die")
         self.algorithm(params)
+        self.close()
 
     def pollSubscriptions(self):
         """
@@ -452,6 +513,9 @@ class JobCreatorPoller(BaseWorkerThread):
         logging.info("Beginning JobCreator.pollSubscriptions() cycle.")
         myThread = threading.currentThread()
 
+        # Build the pool if it was closed
+        self.setupPool()
+
         # First, get list of Subscriptions
         subscriptions = self.subscriptionList.execute()
 
@@ -472,9 +536,9 @@ class JobCreatorPoller(BaseWorkerThread):
             workflow = Workflow(id=wmbsSubscription["workflow"].id)
             workflow.load()
             wmbsSubscription['workflow'] = workflow
-            wmWorkload = retrieveWMSpec(workflow=workflow)
+            specMetadata = self.specCache.getSpecMetadata(workflow.spec) if workflow.spec else None
 
-            if not workflow.task or not wmWorkload:
+            if not workflow.task or not specMetadata or workflow.task not in specMetadata['tasks']:
                 # Then we have a problem
                 # We NEED a sandbox
                 # Abort this subscription!
@@ -487,17 +551,20 @@ class JobCreatorPoller(BaseWorkerThread):
                 continue
 
             logging.debug("Have loaded subscription %i with workflow %i\n", subscriptionID, workflow.id)
+            taskMetadata = specMetadata['tasks'][workflow.task]
 
-            # retrieve information from the workload to propagate down to the job configuration
-            allowOpport = wmWorkload.getAllowOpportunistic()
-
-            # Set task object
-            wmTask = wmWorkload.getTaskByPath(workflow.task)
+            # The whole workload is loaded when the first job groups are created
+            wmWorkload = None
+            wmTask = None
+            allowOpport = None
 
             # Get generators
             # If you fail to load the generators, pass on the job
             try:
-                if hasattr(wmTask.data, 'generators'):
+                if taskMetadata['generators']:
+                    wmWorkload = retrieveWMSpec(workflow=workflow)
+                    allowOpport = wmWorkload.getAllowOpportunistic()
+                    wmTask = wmWorkload.getTaskByPath(workflow.task)
                     manager = GeneratorManager(wmTask)
                     seederList = manager.getGeneratorList()
                 else:
@@ -512,7 +579,8 @@ class JobCreatorPoller(BaseWorkerThread):
 
             logging.debug("Going to call wmbsJobFactory for sub %i with limit %i", subscriptionID, self.limit)
 
-            splitParams = retrieveJobSplitParams(wmWorkload, workflow.task)
+            # the cached parameters are shared, the splitting algorithms get a copy
+            splitParams = copy.deepcopy(taskMetadata['splitting'])
             logging.debug("Split Params: %s", splitParams)
 
             # Load the proper job splitting module
@@ -563,6 +631,16 @@ class JobCreatorPoller(BaseWorkerThread):
                     myThread.transaction.commit()
                     break
 
+                if wmWorkload is None:
+                    wmWorkload = retrieveWMSpec(workflow=workflow)
+                    if not wmWorkload:
+                        msg = "Workload spec %s of subscription %i disappeared" % (workflow.spec, subscriptionID)
+                        logging.error(msg)
+                        raise JobCreatorException(msg)
+                    # retrieve information from the workload to propagate down to the job configuration
+                    allowOpport = wmWorkload.getAllowOpportunistic()
+                    wmTask = wmWorkload.getTaskByPath(workflow.task)
+
                 # Assemble a dict of all the info
                 processDict = {'workflow': workflow,
                                'wmWorkload': wmWorkload, 'wmTaskName': wmTask.getPathName(),
@@ -590,7 +668,7 @@ class JobCreatorPoller(BaseWorkerThread):
                 if self.glideinLimits:
                     capResourceEstimates(wmbsJobGroups, self.glideinLimits)
 
-                nameDictList = []
+                workList = []
                 for wmbsJobGroup in wmbsJobGroups:
                     # For each jobGroup, put a dictionary
                     # together and run it with creatorProcess
@@ -606,11 +684,15 @@ class JobCreatorPoller(BaseWorkerThread):
                     tempDict['agentName'] = self.agentName
                     tempDict['inputDatasetLocations'] = wmbsJobGroup.getLocationsForJobs()
                     tempDict['allowOpportunistic'] = allowOpport
-
-                    jobGroup = creatorProcess(work=tempDict,
-                                              jobCacheDir=self.jobCacheDir)
+                    tempDict['packedJobCache'] = self.packedJobCache
+                    tempDict['submitIndex'] = self.submitIndex
+                    workList.append(tempDict)
                     jobNumber += jobsInGroup
 
+                self.createJobGroups(workList)
+
+                nameDictList = []
+                for jobGroup in wmbsJobGroups:
                     # Set jobCache for group
                     for job in jobGroup.jobs:
                         nameDictList.append({'jobid': job['id'],
@@ -647,58 +729,57 @@ class JobCreatorPoller(BaseWorkerThread):
 
         return
 
-    # This is the code for the multiprocessing based queue retrieval system
-    # I'm keeping this here because I hope to go back and re-instate this once
-    # I figure out how to deal with the transaction problems.
-    # Keep until we can assure ourselves that what we're doing now presents no problems.
-
-    #        while True:
-    #            try:
-    #                # Get stuff out of the queue with a ridiculously
-    #                # short wait time
-    #                startTime = time.time()
-    #                entry = self.result.get(timeout = self.wait)
-    #
-    #                if not entry.get('success', False):
-    #                    msg =  "Encountered exception processing jobGroup\n"
-    #                    msg += entry.get('msg', '')
-    #                    logging.error(msg)
-    #                    continue
-    #                else:
-    #                    wmbsJobGroup = entry.get('jobGroup')
-    #            except Queue.Empty:
-    #                # This means the queue has no current results
-    #                stopTime  = time.time()
-    #                logging.error("Found empty queue after %f seconds" % (stopTime - startTime))
-    #                break
-    #
-    #            # Set the cache dir
-    #            nameDictList = []
-    #            for job in wmbsJobGroup.jobs:
-    #                nameDictList.append({'jobid':job['id'], 'cacheDir':job['cache_dir']})
-    #
-    #
-    #            try:
-    #                myThread.transaction.begin()
-    #                self.setBulkCache.execute(jobDictList = nameDictList,
-    #                                          conn = myThread.transaction.conn,
-    #                                          transaction = True)
-    #                myThread.transaction.commit()
-    #            except Exception, ex:
-    #                msg =  "Unhandled exception while setting jobCache for jobGroup %i\n" % wmbsJobGroup.id
-    #                msg += str(ex)
-    #                logging.error(msg)
-    #                raise JobCreatorException(msg)
-    #
-    #            self.advanceJobGroup(wmbsJobGroup = wmbsJobGroup)
-    #
-    #            logging.debug("Finished call for jobGroup %i" \
-    #                          % (wmbsJobGroup.id))
-    #
-    #        #END: While loop over wmbsJob
-    #
-    #        return
+    def createJobGroups(self, workList):
+        """
+        _createJobGroups_
+
+        Create the work areas and save the jobs for each work dictionary,
+        in the process pool if there is one. The jobs of the job groups are
+        updated with the fields set by the pool processes.
+        """
+        if not self.pool:
+            for work in workList:
+                creatorProcess(work=work, jobCacheDir=self.jobCacheDir)
+            return
+
+        for workIndex, work in enumerate(workList):
+            poolWork = makePoolWork(work)
+            poolWork['workIndex'] = workIndex
+            self.workInput.put(poolWork)
+
+        # always drain all the results, so that none is left for the next cycle
+        results = {}
+        timeout = time.time() + self.poolTimeout
+        while len(results) < len(workList):
+            try:
+                result = self.workResult.get(timeout=self.wait)
+                results[result['workIndex']] = result
+                continue
+            except Queue.Empty:
+                if not all(proc.is_alive() for proc in self.pool):
+                    self.close(terminate=True)
+                    msg = "A JobCreator pool process died while creating job groups"
+                    logging.error(msg)
+                    raise JobCreatorException(msg)
+            if time.time() > timeout:
+                # a result may have been lost, the processes are restarted in the next cycle
+                self.close(terminate=True)
+                msg = "Timed out waiting for %i out of %i job groups from the JobCreator pool" % \
+                      (len(workList) - len(results), len(workList))
+                logging.error(msg)
+                raise JobCreatorException(msg)
+
+        failures = [results[x]['msg'] for x in sorted(results) if not results[x]['success']]
+        if failures:
+            msg = "Failed to create %i out of %i job groups:\n%s" % (len(failures), len(workList),
+                                                                    "\n".join(failures))
+            logging.error(msg)
+            raise JobCreatorException(msg)
 
+        for workIndex, work in enumerate(workList):
+            for job, jobInfo in zip(work['jobGroup'].jobs, results[workIndex]['jobInfos']):
+                job.update(jobInfo)
+        return
 
     def advanceJobGroup(self, wmbsJobGroup):
         """
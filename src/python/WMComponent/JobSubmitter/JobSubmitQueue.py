@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+_JobSubmitQueue_
+
+Priority queue of the jobs cached by the JobSubmitter, waiting to be
+assigned to a site.
+"""
+from __future__ import print_function, division
+
+import heapq
+from bisect import bisect_left, insort
+
+
+class JobSubmitQueue(object):
+    """
+    _JobSubmitQueue_
+
+    Keep the cached job ids pre-sorted per final job priority, task type and
+    set of possible sites (a bucket). Jobs of a bucket compete for the same
+    site/task slots, so once all the sites of a bucket are full the rest of
+    its jobs can be skipped at once instead of being checked one by one.
+    """
+
+    # above this many jobs to remove, a bucket is rebuilt instead of
+    # removing the jobs one by one
+    rebuildSize = 64
+
+    def __init__(self):
+        self._jobs = {}  # job id -> (job priority, bucket key)
+        self._buckets = {}  # job priority -> {(task type, possible sites): sorted list of job ids}
+        self._priorities = []  # sorted list of the job priorities
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def __contains__(self, jobId):
+        return jobId in self._jobs
+
+    def addJob(self, jobId, jobPrio, taskType, possibleSites):
+        """
+        _addJob_
+
+        Queue a job with its final priority, task type and the frozenset of
+        sites where it can run.
+        """
+        if jobId in self._jobs:
+            self.removeJobs([jobId])
+        if jobPrio not in self._buckets:
+            self._buckets[jobPrio] = {}
+            insort(self._priorities, jobPrio)
+        key = (taskType, possibleSites)
+        jobIds = self._buckets[jobPrio].setdefault(key, [])
+        if not jobIds or jobId > jobIds[-1]:
+            # new jobs usually come with increasing ids
+            jobIds.append(jobId)
+        else:
+            insort(jobIds, jobId)
+        self._jobs[jobId] = (jobPrio, key)
+        return
+
+    def removeJobs(self, jobIds):
+        """
+        _removeJobs_
+
+        Remove jobs from the queue, ignoring the ones not queued.
+        """
+        removeByBucket = {}
+        for jobId in jobIds:
+            bucket = self._jobs.pop(jobId, None)
+            if bucket is not None:
+                removeByBucket.setdefault(bucket, []).append(jobId)
+
+        for (jobPrio, key), removeIds in removeByBucket.items():
+            bucketIds = self._buckets[jobPrio][key]
+            if len(removeIds) > self.rebuildSize:
+                removeIds = set(removeIds)
+                bucketIds[:] = [jobId for jobId in bucketIds if jobId not in removeIds]
+            else:
+                for jobId in removeIds:
+                    del bucketIds[bisect_left(bucketIds, jobId)]
+            if not bucketIds:
+                del self._buckets[jobPrio][key]
+                if not self._buckets[jobPrio]:
+                    del self._buckets[jobPrio]
+                    del self._priorities[bisect_left(self._priorities, jobPrio)]
+        return
+
+    def clear(self):
+        """
+        _clear_
+
+        Remove all the jobs from the queue.
+        """
+        self._jobs = {}
+        self._buckets = {}
+        self._priorities = []
+
+    def priorities(self):
+        """
+        _priorities_
+
+        Return the job priorities with queued jobs, from the highest to the lowest.
+        """
+        return self._priorities[::-1]
+
+    def iterJobs(self, jobPrio, isSaturated):
+        """
+        _iterJobs_
+
+        Iterate over the jobs of a given priority in increasing job id order,
+        yielding (jobId, taskType, possibleSites, 0) tuples.
+
+        Before each job, isSaturated(taskType, possibleSites) tells whether
+        the job bucket can still get any job submitted. Once it cannot, the
+        remaining jobs of the bucket are skipped, which is reported with a
+        single (None, taskType, possibleSites, nSkipped) tuple.
+
+        Jobs must not be removed from the queue during the iteration.
+        """
+        heap = []
+        for key, jobIds in self._buckets.get(jobPrio, {}).items():
+            heap.append((jobIds[0], 0, key, jobIds))
+        heapq.heapify(heap)
+
+        while heap:
+            jobId, idx, key, jobIds = heap[0]
+            if isSaturated(*key):
+                heapq.heappop(heap)
+                yield None, key[0], key[1], len(jobIds) - idx
+                continue
+            if idx + 1 < len(jobIds):
+                heapq.heapreplace(heap, (jobIds[idx + 1], idx + 1, key, jobIds))
+            else:
+                heapq.heappop(heap)
+            yield jobId, key[0], key[1], 0
@@ -15,10 +15,6 @@ import threading
 import json
 import time
 from collections import defaultdict, Counter
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
 
 from Utils.Timers import timeFunction
 from WMCore.DAOFactory import DAOFactory
@@ -34,7 +30,9 @@ from WMCore.BossAir.BossAirAPI import BossAirAPI
 from WMCore.Services.ReqMgr.ReqMgr import ReqMgr
 from WMCore.Services.ReqMgrAux.ReqMgrAux import ReqMgrAux
 
+from WMComponent.JobCreator.JobCacheStore import JobCacheReader, submitRecord
 from WMComponent.JobSubmitter.JobSubmitAPI import availableScheddSlots
+from WMComponent.JobSubmitter.JobSubmitQueue import JobSubmitQueue
 
 
 def jobSubmitCondition(jobStats):
@@ -95,7 +93,7 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.enableAllSites = False
 
         # Additions for caching-based JobSubmitter
-        self.jobsByPrio = {}  # key'ed by the final job priority, which contains a set of job ids
+        self.jobSubmitQueue = JobSubmitQueue()  # job ids sorted by final job priority, task type and sites
         self.jobDataCache = {}  # key'ed by the job id, containing the whole job info dict
         self.jobsToPackage = {}
         self.locationDict = {}
@@ -103,6 +101,14 @@ class JobSubmitterPoller(BaseWorkerThread):
         self.drainSitesSet = set()
         self.abortSites = set()
         self.refreshPollingCount = 0
+        # once all the jobs in created state are cached, only look for jobs which entered that state
+        # since the previous refresh, with a full refresh every fullRefreshCount refreshes
+        # (0 means always do a full refresh)
+        self.fullRefreshCount = int(getattr(self.config.JobSubmitter, 'fullRefreshCount', 0))
+        self.stateTimeMark = None
+        self.incrementalRefreshes = 0
+        # job state changes can be committed a while after their state time
+        self.stateTimeOverlap = 5 * 60
 
         try:
             if not getattr(self.config.JobSubmitter, 'submitDir', None):
@@ -121,6 +127,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         # Now the DAOs
         self.listJobsAction = self.daoFactory(classname="Jobs.ListForSubmitter")
+        self.listJobsLeftStateAction = self.daoFactory(classname="Jobs.ListLeftState")
         self.setLocationAction = self.daoFactory(classname="Jobs.SetLocation")
         self.locationAction = self.daoFactory(classname="Locations.GetSiteInfo")
         self.setFWJRPathAction = self.daoFactory(classname="Jobs.SetFWJRPath")
@@ -258,8 +265,15 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         Query WMBS for all jobs in the 'created' state.  For all jobs returned
         from the query, check if they already exist in the cache.  If they
-        don't, unpickle them and combine their site white and black list with
-        the list of locations they can run at.  Add them to the cache.
+        don't, load their submit record (unpickling them only if the
+        JobCreator didn't index them) and combine their site white and black
+        list with the list of locations they can run at.  Add them to the cache.
+
+        When the previous refresh got all the jobs in 'created' state, only
+        the jobs which entered that state since then, new or coming back from
+        a cooloff or paused state, are queried, except every fullRefreshCount
+        refreshes. The cached jobs which changed state since then without
+        coming back to 'created' are dropped.
 
         Each entry in the cache is a tuple with five items:
           - WMBS Job ID
@@ -276,7 +290,25 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         logging.info("Refreshing priority cache with currently %i jobs", len(self.jobDataCache))
 
-        newJobs = self.listJobsAction.execute(limitRows=self.maxJobsToCache)
+        incremental = self.stateTimeMark is not None and self.incrementalRefreshes < self.fullRefreshCount
+        minStateTime = self.stateTimeMark
+        if incremental:
+            self.incrementalRefreshes += 1
+            limitRows = self.maxJobsToCache - len(self.jobDataCache)
+            logging.info("Looking for jobs which entered the created state since %d", self.stateTimeMark)
+            newJobs = []
+            if limitRows > 0:
+                newJobs = self.listJobsAction.execute(limitRows=limitRows, minStateTime=self.stateTimeMark)
+        else:
+            self.incrementalRefreshes = 0
+            limitRows = self.maxJobsToCache
+            newJobs = self.listJobsAction.execute(limitRows=limitRows)
+
+        if len(newJobs) >= limitRows:
+            # some jobs were left out, the next refresh has to be a full one
+            self.stateTimeMark = None
+        else:
+            self.stateTimeMark = timeNow - self.stateTimeOverlap
         if self.useReqMgrForCompletionCheck:
             # if reqmgr is used (not Tier0 Agent) get the aborted/forceCompleted record
             abortedAndForceCompleteRequests = self.abortedAndForceCompleteWorkflowCache.getData()
@@ -290,6 +322,8 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         logging.info("Determining possible sites for new jobs...")
         jobCount = 0
+        # reads job submit records, or jobs from either the packed job cache store or their job.pkl file
+        jobCacheReader = JobCacheReader()
         for newJob in newJobs:
             jobCount += 1
             if jobCount % 5000 == 0:
@@ -305,23 +339,22 @@ class JobSubmitterPoller(BaseWorkerThread):
             if jobID in self.jobDataCache:
                 continue
 
-            pickledJobPath = os.path.join(newJob["cache_dir"], "job.pkl")
-
-            if not os.path.isfile(pickledJobPath):
-                # Then we have a problem - there's no file
-                logging.warning("Could not find pickled jobObject %s", pickledJobPath)
-                badJobs[71104].append(newJob)
-                continue
-            try:
-                with open(pickledJobPath, 'r') as jobHandle:
-                    loadedJob = pickle.load(jobHandle)
-            except Exception as ex:
-                logging.warning("Failed to load job pickle object %s", pickledJobPath)
-                badJobs[71105].append(newJob)
-                continue
+            jobRecord = jobCacheReader.loadSubmitRecord(newJob["cache_dir"], jobID)
+            if jobRecord is None:
+                if not jobCacheReader.hasJob(newJob["cache_dir"], jobID):
+                    # Then we have a problem - there's no file
+                    logging.warning("Could not find pickled jobObject for job %s in %s", jobID, newJob["cache_dir"])
+                    badJobs[71104].append(newJob)
+                    continue
+                try:
+                    jobRecord = submitRecord(jobCacheReader.loadJob(newJob["cache_dir"], jobID))
+                except Exception as ex:
+                    logging.warning("Failed to load job pickle object for job %s in %s", jobID, newJob["cache_dir"])
+                    badJobs[71105].append(newJob)
+                    continue
 
             # figure out possible locations for job
-            possibleLocations = loadedJob["possiblePSN"]
+            possibleLocations = jobRecord["possiblePSN"]
 
             # Create another set of locations that may change when a site goes white/black listed
             # Does not care about the non_draining or aborted sites, they may change and that is the point
@@ -330,9 +363,9 @@ class JobSubmitterPoller(BaseWorkerThread):
 
             # check if there is at least one site left to run the job
             if len(possibleLocations) == 0:
-                newJob['fileLocations'] = loadedJob.get('fileLocations', [])
-                newJob['siteWhitelist'] = loadedJob.get('siteWhitelist', [])
-                newJob['siteBlacklist'] = loadedJob.get('siteBlacklist', [])
+                newJob['fileLocations'] = jobRecord.get('fileLocations', [])
+                newJob['siteWhitelist'] = jobRecord.get('siteWhitelist', [])
+                newJob['siteBlacklist'] = jobRecord.get('siteBlacklist', [])
                 logging.warning("Input data location doesn't pass the site restrictions for job id: %s", jobID)
                 badJobs[71101].append(newJob)
                 continue
@@ -365,51 +398,40 @@ class JobSubmitterPoller(BaseWorkerThread):
                         countDrainingJobs += 1
                         continue
 
-            # Sigh...make sure the job added to the package has the proper retry_count
-            loadedJob['retry_count'] = newJob['retry_count']
-            batchDir = self.addJobsToPackage(loadedJob)
-
             # calculate the final job priority such that we can order cached jobs by prio
             jobPrio = newJob['task_prio'] * self.maxTaskPriority + newJob['wf_priority']
-            self.jobsByPrio.setdefault(jobPrio, set())
-            self.jobsByPrio[jobPrio].add(jobID)
-
-            # allow job baggage to override numberOfCores
-            #       => used for repacking to get more slots/disk
-            numberOfCores = loadedJob.get('numberOfCores', 1)
-            if numberOfCores == 1:
-                baggage = loadedJob.getBaggage()
-                numberOfCores = getattr(baggage, "numberOfCores", 1)
-            loadedJob['numberOfCores'] = numberOfCores
+            self.jobSubmitQueue.addJob(jobID, jobPrio, newJob['task_type'], frozenset(possibleLocations))
 
             # Create a job dictionary object and put it in the cache (needs to be in sync with RunJob)
             jobInfo = {'taskPriority': newJob['task_prio'],
-                       'activity': loadedJob.get("taskType"),
+                       'activity': jobRecord.get("taskType"),
                        'custom': {'location': None},  # update later
-                       'packageDir': batchDir,
+                       'packageDir': None,  # set when the job gets a site
                        'retry_count': newJob["retry_count"],
-                       'sandbox': loadedJob["sandbox"],  # remove before submit
-                       'userdn': loadedJob.get("ownerDN", None),
-                       'usergroup': loadedJob.get("ownerGroup", ''),
-                       'userrole': loadedJob.get("ownerRole", ''),
+                       'sandbox': jobRecord["sandbox"],  # remove before submit
+                       'userdn': jobRecord.get("ownerDN", None),
+                       'usergroup': jobRecord.get("ownerGroup", ''),
+                       'userrole': jobRecord.get("ownerRole", ''),
                        'possibleSites': frozenset(possibleLocations),  # abort and drain sites filtered out
                        'potentialSites': frozenset(potentialLocations),  # original list of sites
-                       'scramArch': loadedJob.get("scramArch", None),
-                       'swVersion': loadedJob.get("swVersion", []),
-                       'proxyPath': loadedJob.get("proxyPath", None),
-                       'estimatedJobTime': loadedJob.get("estimatedJobTime", None),
-                       'estimatedDiskUsage': loadedJob.get("estimatedDiskUsage", None),
-                       'estimatedMemoryUsage': loadedJob.get("estimatedMemoryUsage", None),
-                       'numberOfCores': loadedJob.get("numberOfCores"),  # may update it later
-                       'inputDataset': loadedJob.get('inputDataset', None),
-                       'inputDatasetLocations': loadedJob.get('inputDatasetLocations', None),
-                       'inputPileup': loadedJob.get('inputPileup', None),
-                       'allowOpportunistic': loadedJob.get('allowOpportunistic', False)}
+                       'scramArch': jobRecord.get("scramArch", None),
+                       'swVersion': jobRecord.get("swVersion", []),
+                       'proxyPath': jobRecord.get("proxyPath", None),
+                       'estimatedJobTime': jobRecord.get("estimatedJobTime", None),
+                       'estimatedDiskUsage': jobRecord.get("estimatedDiskUsage", None),
+                       'estimatedMemoryUsage': jobRecord.get("estimatedMemoryUsage", None),
+                       'numberOfCores': jobRecord.get("numberOfCores"),  # includes the job baggage override
+                       'inputDataset': jobRecord.get('inputDataset', None),
+                       'inputDatasetLocations': jobRecord.get('inputDatasetLocations', None),
+                       'inputPileup': jobRecord.get('inputPileup', None),
+                       'allowOpportunistic': jobRecord.get('allowOpportunistic', False)}
             # then update it with the info retrieved from the database
             jobInfo.update(newJob)
 
             self.jobDataCache[jobID] = jobInfo
 
+        jobCacheReader.close()
+
         # Register failures in submission
         for errorCode in badJobs:
             if badJobs[errorCode] and errorCode in [71101, 71102, 71103]:
@@ -421,18 +443,32 @@ class JobSubmitterPoller(BaseWorkerThread):
                 logging.warning(msg, len(badJobs[errorCode]), errorCode)
                 self._handleSubmitFailedJobs(badJobs[errorCode], errorCode)
 
-        # Persist remaining job packages to disk
-        self.flushJobPackages()
-
         # We need to remove any jobs from the cache that were not returned in
-        # the last call to the database.
-        jobIDsToPurge = set(self.jobDataCache.keys()) - newJobIds
+        # the last call to the database, or which are no longer in created state.
+        if incremental:
+            leftJobIds = self.listJobsLeftStateAction.execute(state='created', minStateTime=minStateTime)
+            jobIDsToPurge = set(jobID for jobID in leftJobIds if jobID in self.jobDataCache)
+        else:
+            jobIDsToPurge = set(self.jobDataCache.keys()) - newJobIds
         self._purgeJobsFromCache(jobIDsToPurge)
 
         logging.info("Found %d jobs pending to sites in drain within the grace period", countDrainingJobs)
         logging.info("Done pruning killed jobs, moving on to submit.")
         return
 
+    def packageJob(self, cachedJob, jobCacheReader):
+        """
+        _packageJob_
+
+        Load a cached job about to be submitted and add it to a job package.
+        Return the package directory.
+        """
+        loadedJob = jobCacheReader.loadJob(cachedJob['cache_dir'], cachedJob['id'])
+        # Sigh...make sure the job added to the package has the proper retry_count
+        loadedJob['retry_count'] = cachedJob['retry_count']
+        loadedJob['numberOfCores'] = cachedJob['numberOfCores']
+        return self.addJobsToPackage(loadedJob)
+
     def failJobDrain(self, timeNow, possibleLocations):
         """
         Check whether sites are in drain for too long such that the job
@@ -466,11 +502,7 @@ class JobSubmitterPoller(BaseWorkerThread):
 
         for jobid in jobIDsToPurge:
             self.jobDataCache.pop(jobid, None)
-            for jobPrio in self.jobsByPrio:
-                if jobid in self.jobsByPrio[jobPrio]:
-                    # then the jobid was found, go to the next one
-                    self.jobsByPrio[jobPrio].discard(jobid)
-                    break
+        self.jobSubmitQueue.removeJobs(jobIDsToPurge)
         return
 
     def _handleSubmitFailedJobs(self, badJobs, exitCode):
@@ -542,8 +574,9 @@ class JobSubmitterPoller(BaseWorkerThread):
         # refresh is needed, for now it forces a full cache refresh
         if set(newDrainSites.keys()) != self.drainSitesSet or newAbortSites != self.abortSites:
             logging.info("Draining or Aborted sites have changed, the cache will be rebuilt.")
-            self.jobsByPrio = {}
+            self.jobSubmitQueue.clear()
             self.jobDataCache = {}
+            self.stateTimeMark = None
 
         self.currentRcThresholds = rcThresholds
         self.abortSites = newAbortSites
@@ -659,33 +692,70 @@ class JobSubmitterPoller(BaseWorkerThread):
         exitLoop = False
         jobSubmitLogBySites = defaultdict(lambda: defaultdict(Counter))
         jobSubmitLogByPriority = defaultdict(lambda: defaultdict(Counter))
+        # condition of the site/task pairs found full. With submissions going from the highest
+        # to the lowest priority and only increasing the pending jobs, a full site/task remains
+        # full for the rest of the cycle
+        fullSites = {}
+        # possible sites with non-zero task thresholds, per task type and possible sites
+        siteLists = {}
+        submittedIds = []
+        badJobs = []
+        # jobs are only unpickled once they get a site, to be put in a job package
+        jobCacheReader = JobCacheReader()
+
+        def getSiteList(jobType, possibleSites):
+            "possible sites with non-zero task thresholds"
+            if (jobType, possibleSites) not in siteLists:
+                siteLists[(jobType, possibleSites)] = self.checkZeroTaskThresholds(jobType, possibleSites)
+            return siteLists[(jobType, possibleSites)]
+
+        def isSaturated(jobType, possibleSites):
+            "whether all the sites of these jobs are full"
+            return all((siteName, jobType) in fullSites for siteName in getSiteList(jobType, possibleSites))
 
         # iterate over jobs from the highest to the lowest prio
-        for jobPrio in sorted(self.jobsByPrio, reverse=True):
+        for jobPrio in self.jobSubmitQueue.priorities():
 
             # then we're completely done and have our basket full of jobs to submit
             if exitLoop:
                 break
 
             # can we assume jobid=1 is older than jobid=3? I think so...
-            for jobid in sorted(self.jobsByPrio[jobPrio]):
-                jobType = self.jobDataCache[jobid]['task_type']
-                possibleSites = self.jobDataCache[jobid]['possibleSites']
+            for jobid, jobType, possibleSites, nSkipped in self.jobSubmitQueue.iterJobs(jobPrio, isSaturated):
                 # remove sites with 0 task thresholds
-                possibleSites = self.checkZeroTaskThresholds(jobType, possibleSites)
+                possibleSites = getSiteList(jobType, possibleSites)
+                if nSkipped:
+                    # none of these jobs can go anywhere, account for them at once
+                    jobSubmitLogByPriority[jobPrio][jobType]['Total'] += nSkipped
+                    for siteName in possibleSites:
+                        jobSubmitLogBySites[siteName][jobType][fullSites[(siteName, jobType)]] += nSkipped
+                    continue
+
                 jobSubmitLogByPriority[jobPrio][jobType]['Total'] += 1
                 # now look for sites with free pending slots
                 for siteName in possibleSites:
-                    condition = self._getJobSubmitCondition(jobPrio, siteName, jobType)
+                    condition = fullSites.get((siteName, jobType))
+                    if condition is None:
+                        condition = self._getJobSubmitCondition(jobPrio, siteName, jobType)
                     if condition != "JobSubmitReady":
+                        fullSites[(siteName, jobType)] = condition
                         jobSubmitLogBySites[siteName][jobType][condition] += 1
                         logging.debug("Found a job for %s : %s", siteName, condition)
                         continue
 
                     # pop the job dictionary object and update it
                     cachedJob = self.jobDataCache.pop(jobid)
+                    # jobs that will be submitted must leave the job data cache
+                    submittedIds.append(jobid)
+                    try:
+                        cachedJob['packageDir'] = self.packageJob(cachedJob, jobCacheReader)
+                    except Exception:
+                        logging.warning("Failed to load job pickle object for job %s in %s",
+                                        jobid, cachedJob['cache_dir'])
+                        badJobs.append(cachedJob)
+                        break
                     cachedJob['custom'] = {'location': siteName}
-                    cachedJob['possibleSites'] = possibleSites
+                    cachedJob['possibleSites'] = list(possibleSites)
 
                     # Sort jobs by jobPackage and get it in place to be submitted by the plugin
                     package = cachedJob['packageDir']
@@ -699,9 +769,6 @@ class JobSubmitterPoller(BaseWorkerThread):
                     jobSubmitLogBySites[siteName][jobType]["submitted"] += 1
                     jobSubmitLogByPriority[jobPrio][jobType]['submitted'] += 1
 
-                    # jobs that will be submitted must leave the job data cache
-                    self.jobsByPrio[jobPrio].discard(jobid)
-
                     # found a site to submit this job, so go to the next job
                     break
 
@@ -711,6 +778,17 @@ class JobSubmitterPoller(BaseWorkerThread):
                     exitLoop = True
                     break
 
+        self.jobSubmitQueue.removeJobs(submittedIds)
+        jobCacheReader.close()
+
+        # Persist remaining job packages to disk
+        self.flushJobPackages()
+
+        if badJobs:
+            msg = "%d jobs failed to be submitted with unrecoverable job pickle problems (error code: %s)"
+            logging.warning(msg, len(badJobs), 71105)
+            self._handleSubmitFailedJobs(badJobs, 71105)
+
         logging.info("Site submission report ...")
         for site in jobSubmitLogBySites:
             logging.info("    %s : %s", site, json.dumps(jobSubmitLogBySites[site]))
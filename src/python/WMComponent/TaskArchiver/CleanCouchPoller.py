@@ -13,7 +13,6 @@ import urllib2
 from contextlib import closing
 from Utils.Timers import timeFunction
 from WMComponent.JobCreator.CreateWorkArea import getMasterName
-from WMComponent.JobCreator.JobCreatorPoller import retrieveWMSpec
 from WMComponent.TaskArchiver.DataCache import DataCache
 from WMCore.Algorithms import MathAlgos
 from WMCore.DAOFactory import DAOFactory
@@ -29,6 +28,7 @@ from WMCore.Services.WMStats.WMStatsWriter import WMStatsWriter
 from WMCore.WMBS.Subscription import Subscription
 from WMCore.WMBS.Workflow import Workflow
 from WMCore.WMException import WMException
+from WMCore.WMSpec.SpecMetadataCache import getSpecMetadataCache
 from WMCore.WorkerThreads.BaseWorkerThread import BaseWorkerThread
 
 
@@ -88,6 +88,9 @@ class CleanCouchPoller(BaseWorkerThread):
         self.dashBoardUrl = getattr(config.TaskArchiver, "dashBoardUrl", None)
         self.DataKeepDays = getattr(config.TaskArchiver, "DataKeepDays", 0.125)  # 3 hours
 
+        # the summaries and the cleanup only need the spec metadata shared with the other components
+        self.specCache = getSpecMetadataCache(config)
+
     def setup(self, parameters=None):
         """
         Called at startup
@@ -204,17 +207,28 @@ class CleanCouchPoller(BaseWorkerThread):
         """
         # Upload summary to couch
         for workflow in finishedwfsWithLogCollectAndCleanUp:
-            spec = retrieveWMSpec(wmWorkloadURL=finishedwfsWithLogCollectAndCleanUp[workflow]["spec"])
-            if spec:
-                self.archiveWorkflowSummary(spec=spec)
+            specMetadata = self.getSpecMetadata(finishedwfsWithLogCollectAndCleanUp[workflow]["spec"])
+            if specMetadata:
+                self.archiveWorkflowSummary(specMetadata=specMetadata)
                 # Send Reconstruciton performance information to DashBoard
                 if self.dashBoardUrl is not None:
-                    self.publishRecoPerfToDashBoard(spec)
+                    self.publishRecoPerfToDashBoard(specMetadata)
             else:
                 logging.warn("Workflow spec was not found for %s", workflow)
 
         return
 
+    def getSpecMetadata(self, specPath):
+        """
+        _getSpecMetadata_
+
+        Return the cached metadata of a workflow spec, None if there is no spec
+        """
+        if not specPath:
+            logging.error("Workload spec path %s is empty", specPath)
+            return None
+        return self.specCache.getSpecMetadata(specPath)
+
     def cleanCouchDBAndChangeToArchiveStatus(self):
         # archiving only workflows that I own (same team)
         logging.info("Getting requests in '%s' state for team '%s'", self.deletableState,
@@ -384,13 +398,13 @@ class CleanCouchPoller(BaseWorkerThread):
         wfsToDelete = {}
         for workflow in deletablewfs:
             try:
-                spec = retrieveWMSpec(wmWorkloadURL=deletablewfs[workflow]["spec"])
-
                 # This is used both tier0 and normal agent case
                 result = self.centralRequestDBWriter.getStatusAndTypeByRequest(workflow)
                 wfStatus = result[workflow][0]
                 if wfStatus in safeStatesToDelete:
-                    wfsToDelete[workflow] = {"spec": spec, "workflows": deletablewfs[workflow]["workflows"]}
+                    wfsToDelete[workflow] = {"spec": self.getSpecMetadata(deletablewfs[workflow]["spec"]),
+                                             "specPath": deletablewfs[workflow]["spec"],
+                                             "workflows": deletablewfs[workflow]["workflows"]}
                 else:
                     logging.debug("%s is in %s, will be deleted later", workflow, wfStatus)
 
@@ -409,7 +423,7 @@ class CleanCouchPoller(BaseWorkerThread):
         Delete all the information in couch and WMBS about the given
         workflow, go through all subscriptions and delete one by
         one.
-        The input is a dictionary with workflow names as keys, fully loaded WMWorkloads and
+        The input is a dictionary with workflow names as keys, spec metadata, spec paths and
         subscriptions lists as values
         """
         logging.info("Deleting %s workflows by subscription (from disk)", len(workflows))
@@ -468,11 +482,9 @@ class CleanCouchPoller(BaseWorkerThread):
                     logging.warning("Workflow spec not found for %s", workflow)
                     continue
 
-                spec = workflows[workflow]["spec"]
-                topTask = spec.getTopLevelTask()[0]
-
                 # Now take care of the sandbox
-                sandbox = getattr(topTask.data.input, 'sandbox', None)
+                sandbox = workflows[workflow]["spec"]["sandbox"]
+                self.specCache.removeSpec(workflows[workflow]["specPath"])
                 if sandbox:
                     sandboxDir = os.path.dirname(sandbox)
                     if os.path.isdir(sandboxDir):
@@ -485,7 +497,7 @@ class CleanCouchPoller(BaseWorkerThread):
                 msg = "Critical error while deleting workflow %s\nError: %s" % (workflow, str(ex))
                 logging.exception(msg)
 
-    def archiveWorkflowSummary(self, spec):
+    def archiveWorkflowSummary(self, specMetadata):
         """
         _archiveWorkflowSummary_
 
@@ -496,7 +508,7 @@ class CleanCouchPoller(BaseWorkerThread):
         failedJobs = []
 
         workflowData = {'retryData': {}}
-        workflowName = spec.name()
+        workflowName = specMetadata['name']
 
         # First make sure that we didn't upload something already
         # Could be the that the WMBS deletion epic failed,
@@ -507,9 +519,9 @@ class CleanCouchPoller(BaseWorkerThread):
             return
 
         # Set campaign
-        workflowData['campaign'] = spec.getCampaign()
+        workflowData['campaign'] = specMetadata['campaign']
         # Set inputdataset
-        workflowData['inputdatasets'] = spec.listInputDatasets()
+        workflowData['inputdatasets'] = specMetadata['inputDatasets']
         # Set histograms
         histograms = {'workflowLevel': {'failuresBySite': DiscreteSummaryHistogram('Failed jobs by site', 'Site')},
                       'taskLevel': {},
@@ -517,7 +529,7 @@ class CleanCouchPoller(BaseWorkerThread):
 
         # Get a list of failed job IDs
         # Make sure you get it for ALL tasks in the spec
-        for taskName in spec.listAllTaskPathNames():
+        for taskName in sorted(specMetadata['tasks']):
             failedTmp = self.jobsdatabase.loadView("JobDump", "failedJobsByWorkflowName",
                                                    options={"startkey": [workflowName, taskName],
                                                             "endkey": [workflowName, taskName],
@@ -695,7 +707,7 @@ class CleanCouchPoller(BaseWorkerThread):
                         stepFailures[exitCode]['runs'] = runLumiObj.getCompactList()
 
         # Adding logArchives per task
-        logArchives = self.getLogArchives(spec)
+        logArchives = self.getLogArchives(specMetadata)
         workflowData['logArchives'] = logArchives
 
         jsonHistograms = {'workflowLevel': {},
@@ -733,7 +745,7 @@ class CleanCouchPoller(BaseWorkerThread):
 
         return
 
-    def getLogArchives(self, spec):
+    def getLogArchives(self, specMetadata):
         """
         _getLogArchives_
 
@@ -742,7 +754,7 @@ class CleanCouchPoller(BaseWorkerThread):
         try:
             logArchivesTaskStr = self.fwjrdatabase.loadList("FWJRDump", "logCollectsByTask",
                                                             "logArchivePerWorkflowTask", options={"reduce": False},
-                                                            keys=spec.listAllTaskPathNames())
+                                                            keys=sorted(specMetadata['tasks']))
             logArchivesTask = json.loads(logArchivesTaskStr)
             return logArchivesTask
         except Exception as ex:
@@ -895,14 +907,14 @@ class CleanCouchPoller(BaseWorkerThread):
 
         return failedJobs
 
-    def publishRecoPerfToDashBoard(self, workload):
+    def publishRecoPerfToDashBoard(self, specMetadata):
 
         listRunsWorkflow = self.dbsDaoFactory(classname="ListRunsWorkflow")
 
         interestingPDs = self.interestingPDs
         interestingDatasets = []
         # Are the datasets from this request interesting? Do they have DQM output? One might ask afterwards if they have harvest
-        for dataset in workload.listOutputDatasets():
+        for dataset in specMetadata['outputDatasets']:
             (dummy, PD, dummyProcDS, dataTier) = dataset.split('/')
             if PD in interestingPDs and dataTier == "DQM":
                 interestingDatasets.append(dataset)
@@ -912,16 +924,16 @@ class CleanCouchPoller(BaseWorkerThread):
             return
 
         # Request will be only interesting for performance if it's a ReReco or PromptReco
-        if workload.getRequestType() not in ['ReReco', 'PromptReco']:
+        if specMetadata['requestType'] not in ['ReReco', 'PromptReco']:
             return
 
-        logging.info("%s has interesting performance information, trying to publish to DashBoard", workload.name())
-        release = workload.getCMSSWVersions()[0]
+        logging.info("%s has interesting performance information, trying to publish to DashBoard", specMetadata['name'])
+        release = specMetadata['cmsswVersions'][0]
         if not release:
-            logging.info("no release for %s, bailing out", workload.name())
+            logging.info("no release for %s, bailing out", specMetadata['name'])
 
         # If all is true, get the run numbers processed by this worklfow
-        runList = listRunsWorkflow.execute(workflow=workload.name())
+        runList = listRunsWorkflow.execute(workflow=specMetadata['name'])
         # GO to DQM GUI, get what you want
         for dataset in interestingDatasets:
             (dummy, PD, dummyProcDS, dataTier) = dataset.split('/')
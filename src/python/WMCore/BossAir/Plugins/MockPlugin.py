@@ -8,6 +8,7 @@ Base class for BossAir plugins
 import os
 import logging
 from WMCore.BossAir.Plugins.BasePlugin import BasePlugin, BossAirPluginException
+from WMCore.FwkJobReport.ReportFormat import loadReportData
 from datetime import datetime
 from datetime import timedelta
 from random import randint
@@ -163,12 +164,12 @@ class MockPlugin(BasePlugin):
 
         #for each job we will need to modify the default Report (the output of each job).
         with open(self.fakeReport) as f:
-            report = pickle.load(f)
+            report = loadReportData(f)
 
         lcreport = getattr(self.config.BossAir.MockPlugin, 'lcFakeReport', None)
         if lcreport != None:
             with open(lcreport) as f:
-                lcreport = pickle.load(f)
+                lcreport = loadReportData(f)
 
         for jj in jobs:
             if jj['id'] not in self.jobsScheduledEnd:
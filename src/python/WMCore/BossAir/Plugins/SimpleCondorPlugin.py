@@ -128,6 +128,15 @@ class SimpleCondorPlugin(BasePlugin):
         self.acctGroup = getattr(config.BossAir, 'acctGroup', "production")
         self.acctGroupUser = getattr(config.BossAir, 'acctGroupUser', "cmsdataops")
  
+        # incremental tracking only queries the jobs which changed status since the
+        # previous cycle, with a full query of the schedd every fullTrackCount cycles
+        self.incrementalTrack = getattr(config.BossAir, 'incrementalTrack', False)
+        self.fullTrackCount = getattr(config.BossAir, 'fullTrackCount', 10)
+        self.trackTimeMargin = getattr(config.BossAir, 'trackTimeMargin', 60)
+        self.trackCount = 0
+        self.lastTrackTime = None
+        self.jobInfoCache = {}
+
         if hasattr(config.BossAir, 'condorRequirementsString'):
             self.reqStr = config.BossAir.condorRequirementsString
         else:
@@ -198,8 +207,11 @@ class SimpleCondorPlugin(BasePlugin):
         First, the total number of jobs still running
         Second, the jobs that need to be changed
         Third, the jobs that need to be completed
+
+        In incremental mode, only the jobs which changed status since the
+        previous cycle are retrieved from the schedd, the status of the others
+        comes from the previous cycles.
         """
-        jobInfo = {}
         changeList = []
         completeList = []
         runningList = []
@@ -209,32 +221,51 @@ class SimpleCondorPlugin(BasePlugin):
 
         schedd = htcondor.Schedd()
 
-        logging.debug("Start: Retrieving classAds using Condor Python XQuery")
+        fullQuery = not self.incrementalTrack or self.lastTrackTime is None
+        if self.fullTrackCount > 0 and self.trackCount % self.fullTrackCount == 0:
+            fullQuery = True
+        queryTime = int(time.time())
+
         try:
-            itobj = schedd.xquery("WMAgent_AgentName == %s" % classad.quote(self.agent),
-                                  ['ClusterId', 'ProcId', 'JobStatus', 'MachineAttrGLIDEIN_CMSSite0'])
-            for jobAd in itobj:
-                gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
-                jobStatus = SimpleCondorPlugin.exitCodeMap().get(jobAd.get('JobStatus'), 'Unknown')
-                location = jobAd.get('MachineAttrGLIDEIN_CMSSite0', None)
-                jobInfo[gridId] = (jobStatus, location)
+            if fullQuery:
+                logging.debug("Start: Retrieving classAds using Condor Python XQuery")
+                jobInfo = self.getJobInfo(schedd)
+            else:
+                since = self.lastTrackTime - self.trackTimeMargin
+                logging.debug("Start: Retrieving classAds of jobs changed since %d", since)
+                jobInfo = self.getChangedJobInfo(schedd, since)
         except Exception as ex:
             logging.error("Query to condor schedd failed in SimpleCondorPlugin.")
             logging.error("Returning empty lists for all job types...")
             logging.exception(ex)
+            # the next cycle makes a full query, so a schedd failing the incremental
+            # queries can't keep it from happening
+            self.lastTrackTime = None
             return runningList, changeList, completeList
 
         logging.debug("Finished retrieving %d classAds from Condor", len(jobInfo))
 
+        if self.incrementalTrack:
+            if fullQuery:
+                self.jobInfoCache = jobInfo
+            else:
+                self.jobInfoCache.update(jobInfo)
+                jobInfo = self.jobInfoCache
+            self.lastTrackTime = queryTime
+            self.trackCount += 1
+
         # now go over the jobs and see what we have
         for job in jobs:
 
-            # if the schedd doesn't know a job, consider it complete
-            # doing any further checks is not cost effective
-            if job['gridid'] not in jobInfo:
+            if job['gridid'] in jobInfo:
+                (newStatus, location) = jobInfo[job['gridid']]
+            elif fullQuery:
+                # if the schedd doesn't know a job, consider it complete
+                # doing any further checks is not cost effective
                 (newStatus, location) = ('Completed', None)
             else:
-                (newStatus, location) = jobInfo[job['gridid']]
+                # the job didn't change since the last full query
+                (newStatus, location) = (job['status'], None)
 
             # check for status changes
             if newStatus != job['status']:
@@ -257,6 +288,7 @@ class SimpleCondorPlugin(BasePlugin):
             # stop tracking finished jobs
             if job['globalState'] in ['Complete', 'Error']:
                 completeList.append(job)
+                self.jobInfoCache.pop(job['gridid'], None)
             else:
                 runningList.append(job)
 
@@ -265,6 +297,58 @@ class SimpleCondorPlugin(BasePlugin):
 
         return runningList, changeList, completeList
 
+    def getJobInfo(self, schedd):
+        """
+        _getJobInfo_
+
+        Query the schedd for all the jobs of this agent.
+        Return a dict of gridid -> (job status, location)
+        """
+        constraint = "WMAgent_AgentName == %s" % classad.quote(self.agent)
+        return self._readJobAds(schedd.xquery(constraint, self.trackAttrs()))
+
+    def getChangedJobInfo(self, schedd, since):
+        """
+        _getChangedJobInfo_
+
+        Query the schedd only for the jobs of this agent which entered their
+        current status after the since timestamp, including the ones which
+        already left the queue for the schedd history.
+        Return a dict of gridid -> (job status, location)
+        """
+        constraint = "WMAgent_AgentName == %s && EnteredCurrentStatus >= %d" % (classad.quote(self.agent), since)
+
+        # the history is read from the most recent job, stop at the first
+        # one which left the queue before the since timestamp
+        jobInfo = self._readJobAds(schedd.history(constraint, self.trackAttrs(), match=-1,
+                                                  since="EnteredCurrentStatus < %d" % since))
+        jobInfo.update(self._readJobAds(schedd.xquery(constraint, self.trackAttrs())))
+        return jobInfo
+
+    @staticmethod
+    def trackAttrs():
+        """
+        _trackAttrs_
+
+        List of the job classAd attributes needed to track the jobs
+        """
+        return ['ClusterId', 'ProcId', 'JobStatus', 'MachineAttrGLIDEIN_CMSSite0']
+
+    @staticmethod
+    def _readJobAds(jobAds):
+        """
+        _readJobAds_
+
+        Map the gridid of the job classAds to their (job status, location)
+        """
+        jobInfo = {}
+        for jobAd in jobAds:
+            gridId = "%s.%s" % (jobAd['ClusterId'], jobAd['ProcId'])
+            jobStatus = SimpleCondorPlugin.exitCodeMap().get(jobAd.get('JobStatus'), 'Unknown')
+            location = jobAd.get('MachineAttrGLIDEIN_CMSSite0', None)
+            jobInfo[gridId] = (jobStatus, location)
+        return jobInfo
+
     def complete(self, jobs):
         """
         Do any completion work required
@@ -13,13 +13,14 @@ This code began life in COMP/CRAB/python/LumiList.py
 """
 
 
-import copy
 import itertools
 import json
 import re
 import urllib2
 from contextlib import closing
 
+from WMCore.DataStructs.LumiRangeSet import mergeRanges, orRanges, andRanges, subRanges, rangeIndex
+
 class LumiList(object):
     """
     Deal with lists of lumis in several different forms:
@@ -135,90 +136,28 @@ class LumiList(object):
                     self.compactList[str(run)].append([int(beginLumi), int(endLumi)])
 
         # Compact each run and make it unique
-
         for run in self.compactList.keys():
-            newLumis = []
-            for lumi in sorted(self.compactList[run]):
-                # If the next lumi starts inside or just after the last just change the endpoint of the first
-                if newLumis and newLumis[-1][0] <= lumi[0] <= newLumis[-1][1] + 1:
-                    newLumis[-1][1] = max(newLumis[-1][1], lumi[1])
-                else:
-                    newLumis.append(lumi)
-            self.compactList[run] = newLumis
+            self.compactList[run] = mergeRanges(self.compactList[run])
 
+    # Set operations work on the sorted, disjoint ranges of each run, in linear time
     def __sub__(self, other): # Things from self not in other
         result = {}
-        for run in sorted(self.compactList.keys()):
-            alumis = sorted(self.compactList[run])
-            blumis = sorted(other.compactList.get(run, []))
-            alist = []                    # verified part
-            for alumi in alumis:
-                tmplist = [alumi[0], alumi[1]] # may be part
-                for blumi in blumis:
-                    if blumi[0] <= tmplist[0] and blumi[1] >= tmplist[1]: # blumi has all of alumi
-                        tmplist = []
-                        break # blumi is has all of alumi
-                    if blumi[0] > tmplist[0] and blumi[1] < tmplist[1]: # blumi is part of alumi
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] <= tmplist[0] and blumi[1] < tmplist[1] and blumi[1]>=tmplist[0]: # overlaps start
-                        tmplist = [blumi[1]+1, tmplist[1]]
-                    elif blumi[0] > tmplist[0] and blumi[1] >= tmplist[1] and blumi[0]<=tmplist[1]: # overlaps end
-                        alist.append([tmplist[0], blumi[0]-1])
-                        tmplist = []
-                        break
-                if tmplist:
-                    alist.append(tmplist)
-            result[run] = alist
-
+        for run in self.compactList:
+            result[run] = subRanges(self.compactList[run], other.compactList.get(run, []))
         return LumiList(compactList = result)
 
 
     def __and__(self, other): # Things in both
         result = {}
-        aruns = set(self.compactList.keys())
-        bruns = set(other.compactList.keys())
-        for run in aruns & bruns:
-            lumiList = []                    # List for this run
-            unique = []                    # List for this run
-            for alumi in self.compactList[run]:
-                for blumi in other.compactList[run]:
-                    if blumi[0] <= alumi[0] and blumi[1] >= alumi[1]: # blumi has all of alumi
-                        lumiList.append(alumi)
-                    if blumi[0] > alumi[0] and blumi[1] < alumi[1]: # blumi is part of alumi
-                        lumiList.append(blumi)
-                    elif blumi[0] <= alumi[0] and blumi[1] < alumi[1] and blumi[1] >= alumi[0]: # overlaps start
-                        lumiList.append([alumi[0], blumi[1]])
-                    elif blumi[0] > alumi[0] and blumi[1] >= alumi[1] and blumi[0] <= alumi[1]: # overlaps end
-                        lumiList.append([blumi[0], alumi[1]])
-
-
-            if lumiList:
-                unique = [lumiList[0]]
-            for pair in lumiList[1:]:
-                if pair[0] == unique[-1][1]+1:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                else:
-                    unique.append(copy.deepcopy(pair))
-
-            result[run] = unique
+        for run in set(self.compactList) & set(other.compactList):
+            result[run] = andRanges(self.compactList[run], other.compactList[run])
         return LumiList(compactList = result)
 
 
     def __or__(self, other):
         result = {}
-        aruns = self.compactList.keys()
-        bruns = other.compactList.keys()
-        runs = set(aruns + bruns)
-        for run in runs:
-            overlap = sorted(self.compactList.get(run, []) + other.compactList.get(run, []))
-            unique = [overlap[0]]
-            for pair in overlap[1:]:
-                if pair[0] >= unique[-1][0] and pair[0] <= unique[-1][1]+1 and pair[1] > unique[-1][1]:
-                    unique[-1][1] = copy.deepcopy(pair[1])
-                elif pair[0] > unique[-1][1]:
-                    unique.append(copy.deepcopy(pair))
-            result[run] = unique
+        for run in set(self.compactList) | set(other.compactList):
+            result[run] = orRanges(self.compactList.get(run, []), other.compactList.get(run, []))
         return LumiList(compactList = result)
 
 
@@ -237,12 +176,14 @@ class LumiList(object):
         [(run1,lumi1),(run1,lumi2),(run2,lumi1)]
         """
         filteredList = []
+        firstsByRun = {}
         for (run, lumi) in lumiList:
-            runsInLumi = self.compactList.get(str(run), [[0, -1]])
-            for (first, last) in runsInLumi:
-                if lumi >= first and lumi <= last:
-                    filteredList.append((run, lumi))
-                    break
+            runsInLumi = self.compactList.get(str(run), [])
+            if str(run) not in firstsByRun:
+                firstsByRun[str(run)] = [x[0] for x in runsInLumi]
+            idx = rangeIndex(firstsByRun[str(run)], lumi)
+            if idx >= 0 and lumi <= runsInLumi[idx][1]:
+                filteredList.append((run, lumi))
         return filteredList
 
 
@@ -0,0 +1,380 @@
+#!/usr/bin/env python
+"""
+_LumiRangeSet_
+
+Compact set of run/lumi sections, stored as sorted, disjoint and
+non-adjacent lumi ranges per run.
+
+Each run keeps two parallel arrays with the first and the last lumi of its
+ranges, which costs 16 bytes per range instead of a list of lists, and
+individual lumis are never expanded. Set operations merge the sorted ranges
+in linear time, building a set sorts its ranges once, O(n log n), and
+membership is a bisection over the range starts.
+
+The module level functions work on any sequence of sorted, disjoint
+[first, last] lumi ranges, such as the ones of LumiList.getCompactList(),
+so that LumiList and Mask share the same algorithms.
+"""
+
+from __future__ import division
+
+from array import array
+from bisect import bisect_right
+
+# 64 bits unsigned integers
+_TYPECODE = 'L' if array('L').itemsize == 8 else 'Q'
+
+
+def mergeRanges(ranges):
+    """
+    _mergeRanges_
+
+    Sort [first, last] ranges and merge the overlapping or adjacent ones.
+    Return a list of [first, last] lists.
+    """
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1][1] = last
+        else:
+            merged.append([first, last])
+    return merged
+
+
+def lumisToRanges(lumis):
+    """
+    _lumisToRanges_
+
+    Turn any iterable of lumi numbers into a list of [first, last] ranges.
+    """
+    ranges = []
+    for lumi in sorted(set(int(x) for x in lumis)):
+        if ranges and lumi == ranges[-1][1] + 1:
+            ranges[-1][1] = lumi
+        else:
+            ranges.append([lumi, lumi])
+    return ranges
+
+
+def orRanges(aRanges, bRanges):
+    """
+    _orRanges_
+
+    Union of two lists of sorted and disjoint ranges, in linear time.
+    """
+    result = []
+    aIdx, bIdx = 0, 0
+    while aIdx < len(aRanges) or bIdx < len(bRanges):
+        if bIdx >= len(bRanges) or (aIdx < len(aRanges) and aRanges[aIdx][0] <= bRanges[bIdx][0]):
+            first, last = aRanges[aIdx]
+            aIdx += 1
+        else:
+            first, last = bRanges[bIdx]
+            bIdx += 1
+        if result and first <= result[-1][1] + 1:
+            if last > result[-1][1]:
+                result[-1][1] = last
+        else:
+            result.append([first, last])
+    return result
+
+
+def andRanges(aRanges, bRanges):
+    """
+    _andRanges_
+
+    Intersection of two lists of sorted and disjoint ranges, in linear time.
+    """
+    result = []
+    aIdx, bIdx = 0, 0
+    while aIdx < len(aRanges) and bIdx < len(bRanges):
+        first = max(aRanges[aIdx][0], bRanges[bIdx][0])
+        last = min(aRanges[aIdx][1], bRanges[bIdx][1])
+        if first <= last:
+            result.append([first, last])
+        # drop the range ending first, the other one may overlap the next range
+        if aRanges[aIdx][1] < bRanges[bIdx][1]:
+            aIdx += 1
+        else:
+            bIdx += 1
+    return result
+
+
+def subRanges(aRanges, bRanges):
+    """
+    _subRanges_
+
+    Lumis of aRanges not in bRanges, both sorted and disjoint, in linear time.
+    """
+    result = []
+    bIdx = 0
+    for first, last in aRanges:
+        # skip the ranges of b ending before this one
+        while bIdx < len(bRanges) and bRanges[bIdx][1] < first:
+            bIdx += 1
+        idx = bIdx
+        while idx < len(bRanges) and bRanges[idx][0] <= last:
+            if bRanges[idx][0] > first:
+                result.append([first, bRanges[idx][0] - 1])
+            first = bRanges[idx][1] + 1
+            if first > last:
+                break
+            idx += 1
+        if first <= last:
+            result.append([first, last])
+    return result
+
+
+def rangeIndex(firsts, lumi):
+    """
+    _rangeIndex_
+
+    Index of the range holding lumi given the sorted starts of the disjoint
+    ranges, -1 if none could hold it. The caller still needs to check that
+    lumi is not after the end of that range.
+    """
+    return bisect_right(firsts, lumi) - 1
+
+
+def filterLumisInRanges(lumis, ranges):
+    """
+    _filterLumisInRanges_
+
+    Return the lumis which fall in any of the sorted and disjoint ranges,
+    in the same order, without expanding the ranges.
+    """
+    firsts = [x[0] for x in ranges]
+    filtered = []
+    for lumi in lumis:
+        idx = rangeIndex(firsts, lumi)
+        if idx >= 0 and lumi <= ranges[idx][1]:
+            filtered.append(lumi)
+    return filtered
+
+
+class LumiRangeSet(object):
+    """
+    _LumiRangeSet_
+
+    Set of run/lumi sections kept as compact lumi ranges per run. Run numbers
+    are integers, the conversion to the LumiList formats (string run numbers)
+    is lossless in both directions.
+    """
+
+    __slots__ = ('runs',)
+
+    def __init__(self, compactList=None):
+        """
+        compactList is a {run: [[firstLumi, lastLumi], ...]} dictionary, as
+        returned by LumiList.getCompactList(); ranges don't need to be sorted.
+        """
+        self.runs = {}
+        for run, ranges in (compactList or {}).items():
+            self._setRanges(int(run), mergeRanges(ranges))
+
+    @classmethod
+    def fromRunsAndLumis(cls, runsAndLumis):
+        """
+        _fromRunsAndLumis_
+
+        Build the set out of a {run: [lumi1, lumi2, ...]} dictionary.
+        """
+        lumiSet = cls()
+        for run, lumis in runsAndLumis.items():
+            lumiSet._setRanges(int(run), lumisToRanges(lumis))
+        return lumiSet
+
+    @classmethod
+    def fromLumis(cls, lumis):
+        """
+        _fromLumis_
+
+        Build the set out of an iterable of (run, lumi) pairs.
+        """
+        runsAndLumis = {}
+        for run, lumi in lumis:
+            runsAndLumis.setdefault(run, []).append(lumi)
+        return cls.fromRunsAndLumis(runsAndLumis)
+
+    @classmethod
+    def fromCMSSWString(cls, cmsswString):
+        """
+        _fromCMSSWString_
+
+        Build the set out of a 'R1:L1,R2:L2-R2:L3' string, as used in the
+        CMSSW lumisToProcess parameter. Ranges spanning runs are not supported.
+        """
+        compactList = {}
+        for part in cmsswString.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if '-' in part:
+                start, end = part.split('-')
+            else:
+                start = end = part
+            run, first = start.split(':')
+            endRun, last = end.split(':')
+            if run != endRun:
+                raise ValueError("Lumi range %s spans more than one run" % part)
+            compactList.setdefault(int(run), []).append([int(first), int(last)])
+        return cls(compactList)
+
+    @classmethod
+    def fromLumiList(cls, lumiList):
+        """
+        _fromLumiList_
+
+        Build the set out of a LumiList object.
+        """
+        return cls(lumiList.getCompactList())
+
+    def _setRanges(self, run, ranges):
+        """
+        _setRanges_
+
+        Store the sorted and disjoint ranges of a run, dropping empty runs.
+        """
+        if not ranges:
+            self.runs.pop(run, None)
+            return
+        self.runs[run] = (array(_TYPECODE, [x[0] for x in ranges]),
+                          array(_TYPECODE, [x[1] for x in ranges]))
+
+    def getRanges(self, run):
+        """
+        _getRanges_
+
+        List of [first, last] lumi ranges of a run.
+        """
+        if int(run) not in self.runs:
+            return []
+        firsts, lasts = self.runs[int(run)]
+        return [[first, last] for first, last in zip(firsts, lasts)]
+
+    def getRuns(self):
+        """
+        _getRuns_
+
+        Sorted list of run numbers.
+        """
+        return sorted(self.runs)
+
+    def getCompactList(self):
+        """
+        _getCompactList_
+
+        Return the {'run': [[firstLumi, lastLumi], ...]} representation used
+        by LumiList.
+        """
+        return dict((str(run), self.getRanges(run)) for run in self.runs)
+
+    def getCMSSWString(self):
+        """
+        _getCMSSWString_
+
+        Return the 'R1:L1,R2:L2-R2:L3' representation used by CMSSW.
+        """
+        parts = []
+        for run in self.getRuns():
+            for first, last in zip(*self.runs[run]):
+                if first == last:
+                    parts.append("%s:%s" % (run, first))
+                else:
+                    parts.append("%s:%s-%s:%s" % (run, first, run, last))
+        return ','.join(parts)
+
+    def getLumis(self):
+        """
+        _getLumis_
+
+        Expand the set into the sorted list of (run, lumi) pairs.
+        """
+        lumis = []
+        for run in self.getRuns():
+            for first, last in zip(*self.runs[run]):
+                lumis.extend((run, lumi) for lumi in range(first, last + 1))
+        return lumis
+
+    def toLumiList(self):
+        """
+        _toLumiList_
+
+        Return the set as a LumiList object.
+        """
+        from WMCore.DataStructs.LumiList import LumiList
+        return LumiList(compactList=self.getCompactList())
+
+    def lumiCount(self):
+        """
+        _lumiCount_
+
+        Number of lumi sections in the set, counted without expanding it.
+        """
+        return sum(sum(lasts) - sum(firsts) + len(firsts) for firsts, lasts in self.runs.values())
+
+    def contains(self, run, lumi):
+        """
+        _contains_
+
+        Check whether a lumi section of a run is in the set, O(log ranges).
+        """
+        if int(run) not in self.runs:
+            return False
+        firsts, lasts = self.runs[int(run)]
+        idx = rangeIndex(firsts, lumi)
+        return idx >= 0 and lumi <= lasts[idx]
+
+    def __contains__(self, runLumi):
+        return self.contains(runLumi[0], runLumi[1])
+
+    def filterLumis(self, lumis):
+        """
+        _filterLumis_
+
+        Return the (run, lumi) pairs which are in the set, in the same order.
+        """
+        return [(run, lumi) for run, lumi in lumis if self.contains(run, lumi)]
+
+    def _combine(self, other, rangesFunc, runs):
+        """
+        _combine_
+
+        Apply a two lists of ranges function to each of the given runs.
+        """
+        result = LumiRangeSet()
+        for run in runs:
+            result._setRanges(run, rangesFunc(self.getRanges(run), other.getRanges(run)))
+        return result
+
+    def __or__(self, other):
+        return self._combine(other, orRanges, set(self.runs) | set(other.runs))
+
+    def __and__(self, other):
+        return self._combine(other, andRanges, set(self.runs) & set(other.runs))
+
+    def __sub__(self, other):
+        return self._combine(other, subRanges, self.runs)
+
+    def __add__(self, other):
+        # + is the same as |
+        return self.__or__(other)
+
+    def __eq__(self, other):
+        if not isinstance(other, LumiRangeSet):
+            return NotImplemented
+        return self.runs == other.runs
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __len__(self):
+        """
+        Number of runs in the set, as for LumiList
+        """
+        return len(self.runs)
+
+    def __str__(self):
+        return self.getCMSSWString()
@@ -10,6 +10,7 @@ job in two ways:
 
 """
 
+from WMCore.DataStructs.LumiRangeSet import filterLumisInRanges, mergeRanges
 from WMCore.DataStructs.Run import Run
 
 
@@ -203,14 +204,9 @@ class Mask(dict):
 
         newRuns = set()
         for runNumber in filteredRuns:
-            maskLumis = set()
-            for pair in self["runAndLumis"][runNumber]:
-                if pair[0] == pair[1]:
-                    maskLumis.add(pair[0])
-                else:
-                    maskLumis = maskLumis.union(range(pair[0], pair[1] + 1))
-
-            filteredLumis = set(runDict[runNumber].lumis).intersection(maskLumis)
+            # check the lumis against the mask ranges, without expanding them
+            maskRanges = mergeRanges(self["runAndLumis"][runNumber])
+            filteredLumis = filterLumisInRanges(set(runDict[runNumber].lumis), maskRanges)
             if len(filteredLumis) > 0:
                 filteredLumiEvents = [(lumi, runDict[runNumber].getEventsByLumi(lumi)) for lumi in filteredLumis]
                 newRuns.add(Run(runNumber, *filteredLumiEvents))
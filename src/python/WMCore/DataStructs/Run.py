@@ -8,6 +8,8 @@ container representing a run, and its constituent lumi sections and event counts
 
 from __future__ import print_function
 
+from bisect import bisect_left, insort
+
 from WMCore.DataStructs.WMObject import WMObject
 
 
@@ -16,14 +18,85 @@ class Run(WMObject):
     _Run_
 
     Run container, is a list of lumi sections with associate event counts
+
+    Besides the lumi to events dictionary, the sorted list of lumis is kept
+    and updated as lumis are added or removed, so that positional access
+    doesn't need to sort the lumis every time. Lumis are usually added in
+    increasing order, which only appends to that list. The lumis have to be
+    added or removed with the Run methods, or by replacing eventsPerLumi,
+    not by modifying the eventsPerLumi dictionary in place.
     """
 
     def __init__(self, runNumber=None, *newLumis):
         WMObject.__init__(self)
         self.run = runNumber
-        self.eventsPerLumi = {}
+        self._eventsPerLumi = {}
+        self._sortedLumis = []
         self.extendLumis(newLumis)
 
+    def __getstate__(self):
+        """
+        The sorted lumis are not pickled, they are rebuilt when needed
+        """
+        return {'config': self.config, 'run': self.run, 'eventsPerLumi': self._eventsPerLumi}
+
+    def __setstate__(self, state):
+        self.config = state.get('config', {})
+        self.run = state['run']
+        self.eventsPerLumi = state['eventsPerLumi']
+
+    @property
+    def eventsPerLumi(self):
+        """
+        The lumi to events dictionary
+        """
+        return self._eventsPerLumi
+
+    @eventsPerLumi.setter
+    def eventsPerLumi(self, eventsPerLumi):
+        """
+        Replace the lumi to events dictionary, the sorted lumis are rebuilt when needed
+        """
+        self._eventsPerLumi = eventsPerLumi
+        self._sortedLumis = None
+
+    def _getSortedLumis(self):
+        """
+        _getSortedLumis_
+
+        Return the sorted list of lumis, rebuilding it if it was invalidated.
+        """
+        if self._sortedLumis is None:
+            self._sortedLumis = sorted(self._eventsPerLumi)
+        return self._sortedLumis
+
+    def _setEvents(self, lumi, events):
+        """
+        _setEvents_
+
+        Set the events of a lumi, adding it to the sorted lumis if it's new.
+        """
+        if lumi not in self._eventsPerLumi and self._sortedLumis is not None:
+            if not self._sortedLumis or lumi > self._sortedLumis[-1]:
+                self._sortedLumis.append(lumi)
+            else:
+                insort(self._sortedLumis, lumi)
+        self._eventsPerLumi[lumi] = events
+
+    def _removeLumi(self, lumi):
+        """
+        _removeLumi_
+
+        Remove a lumi from the dictionary and from the sorted lumis.
+        """
+        del self._eventsPerLumi[lumi]
+        if self._sortedLumis is not None:
+            idx = bisect_left(self._sortedLumis, lumi)
+            if idx < len(self._sortedLumis) and self._sortedLumis[idx] == lumi:
+                del self._sortedLumis[idx]
+            else:
+                self._sortedLumis = None
+
     def __str__(self):
         return "Run%s:%s" % (self.run, self.eventsPerLumi)
 
@@ -33,8 +106,8 @@ class Run(WMObject):
         """
         if self.run != rhs.run:
             return self.run < rhs.run
-        if sorted(self.eventsPerLumi.keys()) != sorted(rhs.eventsPerLumi.keys()):
-            return sorted(self.eventsPerLumi.keys()) < sorted(rhs.eventsPerLumi.keys())
+        if self._getSortedLumis() != rhs._getSortedLumis():
+            return self._getSortedLumis() < rhs._getSortedLumis()
         return self.eventsPerLumi < rhs.eventsPerLumi
 
     def __gt__(self, rhs):
@@ -43,8 +116,8 @@ class Run(WMObject):
         """
         if self.run != rhs.run:
             return self.run > rhs.run
-        if sorted(self.eventsPerLumi.keys()) != sorted(rhs.eventsPerLumi.keys()):
-            return sorted(self.eventsPerLumi.keys()) > sorted(rhs.eventsPerLumi.keys())
+        if self._getSortedLumis() != rhs._getSortedLumis():
+            return self._getSortedLumis() > rhs._getSortedLumis()
         return self.eventsPerLumi > rhs.eventsPerLumi
 
     def extend(self, items):
@@ -68,7 +141,7 @@ class Run(WMObject):
 
         for lumi, events in rhs.eventsPerLumi.iteritems():
             if lumi not in self.eventsPerLumi or not self.eventsPerLumi[lumi]:  # Either doesn't exist, 0, or None
-                self.eventsPerLumi[lumi] = events
+                self._setEvents(lumi, events)
             else:
                 self.eventsPerLumi[lumi] += events
         return self
@@ -92,23 +165,23 @@ class Run(WMObject):
         """
         Get the nth lumi from the list (no event count)
         """
-        return sorted(self.eventsPerLumi.keys()).__getitem__(key)
+        return self._getSortedLumis().__getitem__(key)
 
     def __setitem__(self, key, lumi):
         """
         Replace the nth lumi from the list (no event count)
         """
         try:
-            oldLumi = sorted(self.eventsPerLumi.keys())[key]  # Extract the lumi from the sorted list
-            del self.eventsPerLumi[oldLumi]  # Delete it and add the new one
+            oldLumi = self._getSortedLumis()[key]  # Extract the lumi from the sorted list
+            self._removeLumi(oldLumi)  # Delete it and add the new one
         except IndexError:
             pass
         self.appendLumi(lumi)
 
     def __delitem__(self, key):
         try:
-            oldLumi = sorted(self.eventsPerLumi.keys())[key]  # Extract the lumi from the sorted list
-            del self.eventsPerLumi[oldLumi]  # Delete it
+            oldLumi = self._getSortedLumis()[key]  # Extract the lumi from the sorted list
+            self._removeLumi(oldLumi)  # Delete it
         except IndexError:
             pass
 
@@ -138,19 +211,20 @@ class Run(WMObject):
         """
         Property that makes existing uses of myRun.lumis function by returning a list
         """
-        return sorted(self.eventsPerLumi.keys())
+        return list(self._getSortedLumis())
 
     @lumis.setter
     def lumis(self, lumiList):
         """
         Setter to allow for replacement of the lumis with a list or list of tuples
         """
-        self.eventsPerLumi = {}  # Remove existing dictionary
+        eventsPerLumi = {}  # Remove existing dictionary
         for lumi in lumiList:
             if isinstance(lumi, (list, tuple)):
-                self.eventsPerLumi[lumi[0]] = lumi[1]
+                eventsPerLumi[lumi[0]] = lumi[1]
             else:
-                self.eventsPerLumi[lumi] = None
+                eventsPerLumi[lumi] = None
+        self.eventsPerLumi = eventsPerLumi
 
     def extendLumis(self, lumiList):
         """
@@ -158,11 +232,11 @@ class Run(WMObject):
         """
         for lumi in lumiList:
             if not isinstance(lumi, (list, tuple)):  # comma separated lumi numbers
-                self.eventsPerLumi[lumi] = None
+                self._setEvents(lumi, None)
             else:
                 if isinstance(lumi, list) and not isinstance(lumi[0], tuple):  # then it's a plain list
                     for l in lumi:
-                        self.eventsPerLumi[l] = None
+                        self._setEvents(l, None)
                 else:
                     if isinstance(lumi, tuple):  # it's an unpacked list of tuples
                         lumi = [(lumi)]
@@ -171,19 +245,19 @@ class Run(WMObject):
                         if tp[0] in self.eventsPerLumi and self.eventsPerLumi[tp[0]]:
                             self.eventsPerLumi[tp[0]] += tp[1]  # Already exists, add events
                         else:  # Doesn't exist or is 0 or None
-                            self.eventsPerLumi[tp[0]] = tp[1]
+                            self._setEvents(tp[0], tp[1])
 
     def appendLumi(self, lumi):
         """
         Method to replace myRun.lumis.append() which does not work with the property
         """
-        if isinstance(lumi, (list, tuple)) and self.eventsPerLumi[lumi[0]]:  # Already exists, add events
+        if isinstance(lumi, (list, tuple)) and self.eventsPerLumi.get(lumi[0]):  # Already exists, add events
             self.eventsPerLumi[lumi[0]] += lumi[1]
         elif isinstance(lumi, (list, tuple)):  # Doesn't exist or is 0 or None
-            self.eventsPerLumi[lumi[0]] = lumi[1]
+            self._setEvents(lumi[0], lumi[1])
         else:  # Just given lumis, not events
             if lumi not in self.eventsPerLumi:  # Don't overwrite existing events
-                self.eventsPerLumi[lumi] = None
+                self._setEvents(lumi, None)
 
     def getEventsByLumi(self, lumi):
         """
@@ -216,9 +290,11 @@ class Run(WMObject):
 
         Convert JSON data back into a Run object with integer lumi numbers
         """
+        WMObject.__init__(self)
         self.run = jsondata["Run"]
-        self.eventsPerLumi = {}
+        eventsPerLumi = {}
         for lumi, events in jsondata["Lumis"].iteritems():
-            self.eventsPerLumi[int(lumi)] = events  # Make the keys integers again
+            eventsPerLumi[int(lumi)] = events  # Make the keys integers again
+        self.eventsPerLumi = eventsPerLumi
 
         return self
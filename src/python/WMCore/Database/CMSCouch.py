@@ -14,14 +14,21 @@ import base64
 import hashlib
 import logging
 import re
+import threading
 import time
 import traceback
 import urllib
 from datetime import datetime
 from httplib import HTTPException
+from json import JSONDecoder
 
 from Utils.IteratorTools import grouper, nestedDictUpdate
 from WMCore.Services.Requests import JSONRequests
+from WMCore.Wrappers.JsonWrapper.JSONThunker import JSONThunker
+
+# start of the rows array of a view response, and the separators between rows
+ROWS_START = re.compile(r'"rows"\s*:\s*\[')
+ROWS_SEPARATOR = re.compile(r'[\s,]*')
 
 
 def check_name(dbname):
@@ -84,12 +91,15 @@ class CouchDBRequests(JSONRequests):
     completeness, and talks to the CouchDB port
     """
 
-    def __init__(self, url='http://localhost:5984', usePYCurl=True, ckey=None, cert=None, capath=None):
+    def __init__(self, url='http://localhost:5984', usePYCurl=True, ckey=None, cert=None, capath=None,
+                 jsonBackend=None):
         """
-        Initialise requests
+        Initialise requests, encoding and decoding the documents with the
+        jsonBackend JSON backend, by default the one of the process
         """
         JSONRequests.__init__(self, url,
-                              {"cachepath": None, "pycurl": usePYCurl, "key": ckey, "cert": cert, "capath": capath})
+                              {"cachepath": None, "pycurl": usePYCurl, "key": ckey, "cert": cert, "capath": capath,
+                               "json_backend": jsonBackend})
         self.accept_type = "application/json"
         self["timeout"] = 600
 
@@ -166,7 +176,8 @@ class Database(CouchDBRequests):
     TODO: remove leading whitespace when committing a view
     """
 
-    def __init__(self, dbname='database', url='http://localhost:5984', size=1000, ckey=None, cert=None):
+    def __init__(self, dbname='database', url='http://localhost:5984', size=1000, ckey=None, cert=None,
+                 jsonBackend=None):
         """
         A set of queries against a CouchDB database
         """
@@ -174,7 +185,7 @@ class Database(CouchDBRequests):
 
         self.name = urllib.quote_plus(dbname)
 
-        CouchDBRequests.__init__(self, url=url, ckey=ckey, cert=cert)
+        CouchDBRequests.__init__(self, url=url, ckey=ckey, cert=cert, jsonBackend=jsonBackend)
         self._reset_queue()
 
         self._queue_size = size
@@ -392,6 +403,40 @@ class Database(CouchDBRequests):
                                                        maxConflictLimit=maxConflictLimit - 1)
         return []
 
+    def updateBulkDocumentsWithFunc(self, docUpdates, updateFunc, updateLimits=1000):
+        """
+        Bulk replacement for calling a couchapp update handler once per document.
+        The current documents are fetched with _all_docs, updateFunc is applied to
+        them in python and the result is written back with a single _bulk_docs call.
+
+        param: docUpdates: dictionary of couch doc id to the list of update arguments
+        param: updateFunc: function called as updateFunc(doc, doc_id, updateArgs) for
+               each update argument, doc is None if it does not exist in couch yet.
+               It must return the updated document (like the couchapp update handler)
+        param: updateLimits: number of documents in one commit
+        return: list of _bulk_docs result rows for the documents that failed to be
+                updated, e.g. {'id': 'a', 'error': 'conflict', 'reason': '...'}
+        """
+        uri = '/%s/_bulk_docs/' % self.name
+        failedDocs = []
+        for ids in grouper(docUpdates, updateLimits):
+            rows = self.allDocs(options={"include_docs": True}, keys=ids)['rows']
+            data = {'docs': []}
+            for row in rows:
+                # rows for non existent documents only carry 'key' and 'error'
+                doc = row.get('doc')
+                for updateArgs in docUpdates[row['key']]:
+                    doc = updateFunc(doc, row['key'], updateArgs)
+                data['docs'].append(doc)
+
+            if data['docs']:
+                retval = self.post(uri, data)
+                for result in retval:
+                    if 'error' in result:
+                        failedDocs.append(result)
+
+        return failedDocs
+
     def putDocument(self, doc_id, fields):
         """
         Call the update function update_func defined in the design document
@@ -466,14 +511,18 @@ class Database(CouchDBRequests):
                 time.sleep(blocking_poll)
         return response
 
-    def changes(self, since=-1):
+    def changes(self, since=-1, include_docs=False):
         """
         Get the changes since sequence number. Store the last sequence value to
         self.last_seq. If the since is negative use self.last_seq.
+        With include_docs, the changed documents are returned in the results.
         """
         if since < 0:
             since = self.last_seq
-        data = self.get('/%s/_changes/?since=%s' % (self.name, since))
+        url = '/%s/_changes/?since=%s' % (self.name, since)
+        if include_docs:
+            url += '&include_docs=true'
+        data = self.get(url)
         self.last_seq = data['last_seq']
         return data
 
@@ -517,16 +566,8 @@ class Database(CouchDBRequests):
 
         more info: http://wiki.apache.org/couchdb/HTTP_view_API
         """
-        options = options or {}
         keys = keys or []
-        encodedOptions = {}
-        for k, v in options.iteritems():
-            # We can't encode the stale option, as it will be converted to '"ok"'
-            # which couch barfs on.
-            if k == "stale":
-                encodedOptions[k] = v
-            else:
-                encodedOptions[k] = self.encode(v)
+        encodedOptions = self._encodeViewOptions(options)
 
         if keys:
             if encodedOptions:
@@ -545,6 +586,180 @@ class Database(CouchDBRequests):
         else:
             return retval
 
+    def _encodeViewOptions(self, options):
+        """
+        JSON encode the view query arguments
+        """
+        encodedOptions = {}
+        for k, v in (options or {}).iteritems():
+            # We can't encode the stale option, as it will be converted to '"ok"'
+            # which couch barfs on.
+            if k == "stale":
+                encodedOptions[k] = v
+            else:
+                encodedOptions[k] = self.encode(v)
+        return encodedOptions
+
+    def iterView(self, design, view, options=None, keys=None, pageSize=1000, prefetch=False):
+        """
+        Iterate over the rows of a view, like loadView does but fetching at
+        most pageSize rows per request. Pages are chained using the startkey
+        and startkey_docid of the first row of the next page, so the memory
+        used doesn't depend on the size of the view. With keys, the keys are
+        queried pageSize at a time instead.
+
+        Rows are decoded one at a time from the response. With prefetch, the
+        next page is fetched in a background thread while the rows of the
+        current one are processed (only with pycurl, whose handles are thread
+        safe).
+        """
+        uri = '/%s/_design/%s/_view/%s' % (self.name, design, view)
+        return self._iterRows(uri, options, keys, pageSize, prefetch)
+
+    def iterAllDocs(self, options=None, keys=None, pageSize=1000, prefetch=False):
+        """
+        Iterate over the rows of _all_docs, fetching at most pageSize rows
+        per request. See iterView.
+        """
+        return self._iterRows('/%s/_all_docs' % self.name, options, keys, pageSize, prefetch)
+
+    def _iterRows(self, uri, options, keys, pageSize, prefetch):
+        """
+        Generator of the rows of a view queried page by page
+        """
+        options = dict(options or {})
+        limit = options.pop('limit', None)
+        if 'key' in options:
+            # a single key query can span several pages too
+            options['startkey'] = options['endkey'] = options.pop('key')
+        prefetch = prefetch and self.pycurl
+        keyGroups = grouper(keys, pageSize) if keys else None
+
+        def nextRequest(lastRow=None):
+            """
+            Query arguments and keys of the next page, None if it was the last one
+            """
+            pageOptions = dict(options)
+            pageKeys = None
+            if keyGroups is not None:
+                pageKeys = next(keyGroups, None)
+                if pageKeys is None:
+                    return None
+            elif lastRow is not None:
+                pageOptions.pop('skip', None)
+                pageOptions['startkey'] = lastRow['key']
+                if 'id' in lastRow:
+                    pageOptions['startkey_docid'] = lastRow['id']
+            if limit is not None:
+                if limit - nRows <= 0:
+                    return None
+                pageOptions['limit'] = limit - nRows
+            if pageKeys is None:
+                # one more row, the first one of the next page
+                pageOptions['limit'] = min(pageSize, pageOptions.get('limit', pageSize)) + 1
+            return pageOptions, pageKeys
+
+        def nextPage(pageKeys, nextRow):
+            """
+            Request the next page, if there is one
+            """
+            if pageKeys is None and nextRow is None:
+                return None, None
+            request = nextRequest(nextRow)
+            return request, self._requestPage(uri, request, prefetch)
+
+        nRows = 0
+        request = nextRequest()
+        page = self._requestPage(uri, request, prefetch)
+        while page is not None:
+            pageOptions, pageKeys = request
+            rows = page()
+            nextRow = None
+            if prefetch:
+                # get the next page while the rows of this one are processed
+                rows = list(rows)
+                if pageKeys is None and len(rows) == pageOptions['limit']:
+                    nextRow = rows.pop()
+                nRows += len(rows)
+                request, page = nextPage(pageKeys, nextRow)
+                for row in rows:
+                    yield row
+            else:
+                for idx, row in enumerate(rows):
+                    if pageKeys is None and idx == pageOptions['limit'] - 1:
+                        nextRow = row
+                        break
+                    nRows += 1
+                    yield row
+                request, page = nextPage(pageKeys, nextRow)
+
+    def _requestPage(self, uri, request, prefetch):
+        """
+        Start fetching a page of view rows, and return a callable returning
+        the iterator of its rows. The page is fetched when called unless
+        prefetch is set, in which case it is fetched in a background thread.
+        """
+        if request is None:
+            return None
+        options, keys = request
+        if not prefetch:
+            return lambda: self._decodeRows(self._loadPage(uri, options, keys))
+
+        result = {}
+
+        def fetch():
+            "fetch the page data"
+            try:
+                result['data'] = self._loadPage(uri, options, keys)
+            except Exception as ex:
+                result['error'] = ex
+
+        thread = threading.Thread(target=fetch)
+        thread.daemon = True
+        thread.start()
+
+        def wait():
+            "wait for the page data and decode it"
+            thread.join()
+            if 'error' in result:
+                raise result['error']
+            return self._decodeRows(result.pop('data'))
+
+        return wait
+
+    def _loadPage(self, uri, options, keys=None):
+        """
+        Query a page of view rows, returning the raw response
+        """
+        encodedOptions = self._encodeViewOptions(options)
+        if keys:
+            if encodedOptions:
+                uri = '%s?%s' % (uri, urllib.urlencode(encodedOptions))
+            return self.post(uri, {'keys': keys}, decode=False)
+        return self.get(uri, encodedOptions, decode=False)
+
+    def _decodeRows(self, data):
+        """
+        Generator of the rows of a raw view response, decoding one row at a
+        time instead of the whole response.
+        """
+        match = ROWS_START.search(data)
+        if match is None:
+            retval = self.decode(data)
+            if 'error' in retval:
+                raise RuntimeError("Error in CouchDB: viewError '%s' reason '%s'" % \
+                                   (retval['error'], retval['reason']))
+            return
+        decoder = JSONDecoder()
+        thunker = JSONThunker()
+        pos = match.end()
+        while True:
+            pos = ROWS_SEPARATOR.match(data, pos).end()
+            if data[pos] == ']':
+                return
+            row, pos = decoder.raw_decode(data, pos)
+            yield thunker.unthunk(row)
+
     def loadList(self, design, list, view, options=None, keys=None):
         """
         Load data from a list function. This returns data that hasn't been
@@ -933,12 +1148,14 @@ class CouchServer(CouchDBRequests):
     More info http://wiki.apache.org/couchdb/HTTP_database_API
     """
 
-    def __init__(self, dburl='http://localhost:5984', usePYCurl=True, ckey=None, cert=None, capath=None):
+    def __init__(self, dburl='http://localhost:5984', usePYCurl=True, ckey=None, cert=None, capath=None,
+                 jsonBackend=None):
         """
         Set up a connection to the CouchDB server
         """
         check_server_url(dburl)
-        CouchDBRequests.__init__(self, url=dburl, usePYCurl=usePYCurl, ckey=ckey, cert=cert, capath=capath)
+        CouchDBRequests.__init__(self, url=dburl, usePYCurl=usePYCurl, ckey=ckey, cert=cert, capath=capath,
+                                 jsonBackend=jsonBackend)
         self.url = dburl
         self.ckey = ckey
         self.cert = cert
@@ -958,7 +1175,8 @@ class CouchServer(CouchDBRequests):
         self.put("/%s" % urllib.quote_plus(dbname))
         # Pass the Database constructor the unquoted name - the constructor will
         # quote it for us.
-        return Database(dbname=dbname, url=self.url, size=size, ckey=self.ckey, cert=self.cert)
+        return Database(dbname=dbname, url=self.url, size=size, ckey=self.ckey, cert=self.cert,
+                        jsonBackend=self.jsonBackend)
 
     def deleteDatabase(self, dbname):
         "Delete a database from the server"
@@ -974,7 +1192,8 @@ class CouchServer(CouchDBRequests):
         check_name(dbname)
         if create and dbname not in self.listDatabases():
             return self.createDatabase(dbname)
-        return Database(dbname=dbname, url=self.url, size=size, ckey=self.ckey, cert=self.cert)
+        return Database(dbname=dbname, url=self.url, size=size, ckey=self.ckey, cert=self.cert,
+                        jsonBackend=self.jsonBackend)
 
     def replicate(self, source, destination, continuous=False,
                   create_target=False, cancel=False, doc_ids=False,
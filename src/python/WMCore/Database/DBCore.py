@@ -6,12 +6,161 @@ Core Database APIs
 
 
 """
+import re
+import time
 from copy import copy
+from operator import itemgetter
 
 from Utils.IteratorTools import grouper
 import WMCore.WMLogging
 from WMCore.DataStructs.WMObject import WMObject
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, ColumnResultSet
+
+# SQL constructs for which running a select once with an IN list does not
+# return the same rows as running it once per bind (aggregates, row limits...)
+_NOT_BATCHABLE_SQL = re.compile(r"\b(GROUP\s+BY|ORDER\s+BY|HAVING|DISTINCT|UNIQUE|UNION|INTERSECT|MINUS|EXCEPT|"
+                                r"ROWNUM|LIMIT|FETCH|FOR\s+UPDATE|CONNECT\s+BY|COUNT|SUM|MIN|MAX|AVG)\b",
+                                re.IGNORECASE)
+
+# bind variables of a statement, and the table of an insert statement
+_BIND_VARIABLE = re.compile(r":(\w+)")
+_INSERT_TABLE = re.compile(r"^\s*INSERT\s+(?:/\*.*?\*/\s*)?(?:IGNORE\s+)?(?:INTO\s+)?(\w+)",
+                           re.IGNORECASE | re.DOTALL)
+
+
+def _topLevelWhere(sql):
+    """
+    _topLevelWhere_
+
+    Return the position right after the WHERE keyword of the outer select and
+    a copy of the sql where everything inside parenthesis and quotes has been
+    blanked out, so that only the top level of the statement can be matched.
+    The position is None if the outer select has no WHERE clause.
+    """
+    depth = 0
+    quoted = False
+    topLevel = []
+    for char in sql:
+        if quoted:
+            quoted = char != "'"
+            topLevel.append(" ")
+        elif char == "'":
+            quoted = True
+            topLevel.append(" ")
+        elif char == "(":
+            depth += 1
+            topLevel.append(" ")
+        elif char == ")":
+            depth -= 1
+            topLevel.append(" ")
+        else:
+            topLevel.append(char if depth == 0 else " ")
+    topLevel = "".join(topLevel)
+
+    where = None
+    for match in re.finditer(r"\bWHERE\b", topLevel, re.IGNORECASE):
+        where = match.end()
+    return where, topLevel
+
+
+def buildInListSelect(sql, binds):
+    """
+    _buildInListSelect_
+
+    Rewrite a select statement that would be run once per bind dictionary
+    into a single select using an IN list, e.g.:
+
+    SELECT id FROM wmbs_job WHERE state = :state
+    [{'state': 1}, {'state': 2}]
+
+    becomes:
+
+    SELECT id FROM wmbs_job WHERE state IN (:state_b0, :state_b1)
+      ORDER BY CASE state WHEN :state_b0 THEN 0 WHEN :state_b1 THEN 1 END
+    {'state_b0': 1, 'state_b1': 2}
+
+    The rows are ordered by bind, so they come back grouped in the same order
+    as with the per bind execution. Only statements returning exactly the same rows as the per bind execution
+    are rewritten: a single distinct bind variable, used once in an equality
+    of the outer WHERE clause, ANDed with the other conditions and distinct
+    bind values, compared to a plain column. Returns a tuple with the new statement and bind dictionary,
+    or None if the statement can't be batched.
+    """
+    if len(binds) < 2 or not all(isinstance(bind, dict) for bind in binds):
+        return None
+    bindNames = set(binds[0])
+    if len(bindNames) != 1 or any(set(bind) != bindNames for bind in binds):
+        return None
+    bindName = bindNames.pop()
+
+    values = [bind[bindName] for bind in binds]
+    try:
+        if len(set(values)) != len(values):
+            return None
+    except TypeError:
+        return None
+
+    if _NOT_BATCHABLE_SQL.search(sql):
+        return None
+    bindRegex = re.compile(r":%s\b" % re.escape(bindName), re.IGNORECASE)
+    if len(bindRegex.findall(sql)) != 1:
+        return None
+
+    where, topLevel = _topLevelWhere(sql)
+    if where is None or re.search(r"\bOR\b", topLevel[where:], re.IGNORECASE):
+        return None
+    match = re.compile(r"(?<![<>!])=\s*:%s\b" % re.escape(bindName), re.IGNORECASE).search(topLevel, where)
+    if match is None:
+        return None
+    column = re.search(r"([\w.]+)\s*$", sql[where:match.start()])
+    if column is None:
+        return None
+
+    newNames = ["%s_b%d" % (bindName, idx) for idx in range(len(values))]
+    inList = "IN (%s)" % ", ".join(":%s" % name for name in newNames)
+    orderBy = " ".join("WHEN :%s THEN %d" % (name, idx) for idx, name in enumerate(newNames))
+    newSQL = "%s%s%s ORDER BY CASE %s %s END" % (sql[:match.start()], inList, sql[match.end():].rstrip(),
+                                                 column.group(1), orderBy)
+    return newSQL, dict(zip(newNames, values))
+
+
+def buildPositionalInsert(sql, columns, rows, placeholder):
+    """
+    _buildPositionalInsert_
+
+    Replace the bind variables of a statement by positional placeholders,
+    placeholder(n) being the n-th one, and arrange the rows of values given
+    in the order of the bind variable names in columns to match them, e.g.:
+
+    INSERT INTO wmbs_file_runlumi_map (fileid, run, lumi) VALUES (:fileid, :run, :lumi)
+    ("run", "lumi", "fileid"), [(1, 2, 3)]
+
+    becomes, with Oracle placeholders:
+
+    INSERT INTO wmbs_file_runlumi_map (fileid, run, lumi) VALUES (:1, :2, :3)
+    [(3, 1, 2)]
+
+    Rows already in the order of the placeholders are returned as they are.
+    Raises a ValueError for a bind variable which is not in columns.
+    """
+    columnIndex = dict((column.lower(), idx) for idx, column in enumerate(columns))
+    positions = []
+
+    def replace(match):
+        name = match.group(1).lower()
+        if name not in columnIndex:
+            raise ValueError("Bind variable %s of the insert is not in the columns %s" % (name, columns))
+        positions.append(columnIndex[name])
+        return placeholder(len(positions))
+
+    sql = _BIND_VARIABLE.sub(replace, sql)
+    if positions == list(range(len(columns))):
+        return sql, rows
+    if len(positions) == 1:
+        return sql, [(row[positions[0]],) for row in rows]
+    getter = itemgetter(*positions)
+    return sql, [getter(row) for row in rows]
+
 
 class DBInterface(WMObject):
     """
@@ -36,6 +185,12 @@ class DBInterface(WMObject):
         self.logger.info ("Instantiating base WM DBInterface")
         self.engine = engine
         self.maxBindsPerQuery = 500
+        # rows sent at once by insertRows
+        self.maxRowsPerInsert = 10000
+        # rows inserted by insertRows and the time spent, per table
+        self.insertMetrics = {}
+        # run selects with many binds as a single IN list select when possible
+        self.batchSelects = True
 
     def buildbinds(self, sequence, thename, therest=[{}]):
         """
@@ -52,11 +207,12 @@ class DBInterface(WMObject):
         return binds
 
     def executebinds(self, s=None, b=None, connection=None,
-                     returnCursor=False):
+                     returnCursor=False, columnar=False):
         """
         _executebinds_
 
         returns a list of sqlalchemy.engine.base.ResultProxy objects
+        set columnar = True to get a ColumnResultSet instead of a ResultSet
         """
         if b == None:
             resultProxy = connection.execute(s)
@@ -66,13 +222,13 @@ class DBInterface(WMObject):
         if returnCursor:
             return resultProxy
 
-        result = ResultSet()
+        result = ColumnResultSet() if columnar else ResultSet()
         result.add(resultProxy)
         resultProxy.close()
         return result
 
     def executemanybinds(self, s=None, b=None, connection=None,
-                         returnCursor=False):
+                         returnCursor=False, columnar=False):
         """
         _executemanybinds_
         b is a list of dictionaries for the binds, e.g.:
@@ -94,12 +250,16 @@ class DBInterface(WMObject):
             """
             Trying to select many
             """
+            result = self.executebatchselect(s, b, connection, returnCursor, columnar)
+            if result is not None:
+                return self.makelist(result)
+
             if returnCursor:
                 result = []
                 for bind in b:
                     result.append(connection.execute(s, bind))
             else:
-                result = ResultSet()
+                result = ColumnResultSet() if columnar else ResultSet()
                 for bind in b:
                     resultproxy = connection.execute(s, bind)
                     result.add(resultproxy)
@@ -113,6 +273,92 @@ class DBInterface(WMObject):
         result = connection.execute(s, b)
         return self.makelist(result)
 
+    def executebatchselect(self, s=None, b=None, connection=None,
+                           returnCursor=False, columnar=False):
+        """
+        _executebatchselect_
+
+        Try to run a select with a list of binds as a single IN list select,
+        see buildInListSelect. Returns a ResultSet with the rows for all the
+        binds, or None if the statement can't be batched and has to be run
+        once per bind.
+        """
+        if returnCursor or not self.batchSelects:
+            return None
+
+        batched = buildInListSelect(s, b)
+        if batched is None:
+            return None
+
+        return self.executebinds(batched[0], batched[1], connection=connection,
+                                 columnar=columnar)
+
+    def positionalInsert(self, sqlstmt, columns, rows):
+        """
+        _positionalInsert_
+
+        Turn an insert with named bind variables into a positional one,
+        see buildPositionalInsert. Oracle binds by position every occurrence
+        of a bind variable.
+        """
+        return buildPositionalInsert(sqlstmt, columns, rows, lambda position: ":%d" % position)
+
+    def executeinsert(self, s, rows, connection):
+        """
+        _executeinsert_
+
+        Insert rows of positional binds with a single executemany(), which
+        cx_Oracle sends as array DML.
+        """
+        connection.execute(s, rows)
+
+    def insertRows(self, sqlstmt, columns, rows, conn=None, transaction=False):
+        """
+        _insertRows_
+
+        Run an insert statement for rows of values packed as tuples, in the
+        order of the bind variable names given in columns, without building
+        a bind dictionary per row. Rows are sent maxRowsPerInsert at a time
+        in the fastest way the database supports. Returns the number of rows.
+        """
+        if not rows:
+            return 0
+
+        startTime = time.time()
+        sqlstmt, rows = self.positionalInsert(sqlstmt, columns, rows)
+        connection = None
+        try:
+            if not conn:
+                connection = self.connection()
+            else:
+                connection = conn
+
+            if not transaction:
+                trans = connection.begin()
+            for subRows in grouper(rows, self.maxRowsPerInsert):
+                self.executeinsert(sqlstmt, subRows, connection)
+            if not transaction:
+                trans.commit()
+        finally:
+            if not conn and connection != None:
+                connection.close()  # Return connection to the pool
+
+        match = _INSERT_TABLE.match(sqlstmt)
+        metrics = self.insertMetrics.setdefault(match.group(1).lower() if match else "unknown", [0, 0.0])
+        metrics[0] += len(rows)
+        metrics[1] += time.time() - startTime
+        return len(rows)
+
+    def popInsertMetrics(self):
+        """
+        _popInsertMetrics_
+
+        Return the number of rows inserted by insertRows and the time spent,
+        per table, since the last call.
+        """
+        metrics, self.insertMetrics = self.insertMetrics, {}
+        return metrics
+
     def connection(self):
         """
         Return a connection to the engine (from the connection pool)
@@ -121,10 +367,12 @@ class DBInterface(WMObject):
 
 
     def processData(self, sqlstmt, binds={}, conn=None,
-                    transaction=False, returnCursor=False):
+                    transaction=False, returnCursor=False, columnar=False):
         """
         set conn if you already have an active connection to reuse
         set transaction = True if you already have an active transaction
+        set columnar = True to get the results in ColumnResultSets, which
+        use much less memory for large selects
 
         """
         connection = None
@@ -146,7 +394,7 @@ class DBInterface(WMObject):
 
                 for i in sqlstmt:
                     r = self.executebinds(i, connection=connection,
-                                          returnCursor=returnCursor)
+                                          returnCursor=returnCursor, columnar=columnar)
                     result.append(r)
 
                 if not transaction:
@@ -157,7 +405,8 @@ class DBInterface(WMObject):
                     trans = connection.begin()
                 for subBinds in grouper(binds, self.maxBindsPerQuery):
                     result.extend(self.executemanybinds(sqlstmt[0], subBinds,
-                                                        connection=connection, returnCursor=returnCursor))
+                                                        connection=connection, returnCursor=returnCursor,
+                                                        columnar=columnar))
 
                 if not transaction:
                     trans.commit()
@@ -170,7 +419,7 @@ class DBInterface(WMObject):
                     b = binds[i]
 
                     r = self.executebinds(s, b, connection=connection,
-                                          returnCursor=returnCursor)
+                                          returnCursor=returnCursor, columnar=columnar)
                     result.append(r)
 
                 if not transaction:
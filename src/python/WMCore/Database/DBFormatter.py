@@ -11,9 +11,14 @@ import time
 import types
 
 from WMCore.DataStructs.WMObject import WMObject
+from WMCore.Database.ResultSet import ColumnResultSet
 
 
 class DBFormatter(WMObject):
+    # set to True in DAOs returning a large number of rows, so that the results
+    # are stored in (and formatted from) the compact ColumnResultSet
+    columnar = False
+
     def __init__(self, logger, dbinterface):
         """
         The class holds a connection to the database in self.dbi. This is a
@@ -68,6 +73,9 @@ class DBFormatter(WMObject):
         """
         dictOut = []
         for r in result:
+            if isinstance(r, ColumnResultSet):
+                dictOut.extend(self.formatColumnsDict(r))
+                continue
             descriptions = r.keys
             for i in r.fetchall():
                 # WARNING: this can generate errors for some stupid reason
@@ -93,6 +101,14 @@ class DBFormatter(WMObject):
         """
         listOut = []
         for r in result:
+            if isinstance(r, ColumnResultSet):
+                columns = self.stringColumns(r)
+                if len(columns) == 1:
+                    listOut.extend(columns[0])
+                else:
+                    for row in zip(*columns):
+                        listOut.extend(row)
+                continue
             descriptions = r.keys
             for i in r.fetchall():
                 for index in xrange(0, len(descriptions)):
@@ -112,11 +128,34 @@ class DBFormatter(WMObject):
 
         r = result[0]
         description = [str(x).lower() for x in r.keys]
-        if len(r.data) < 1:
+        if isinstance(r, ColumnResultSet):
+            if r.rowcount < 1:
+                return {}
+        elif len(r.data) < 1:
             return {}
 
         return dict(list(zip(description, r.fetchone())))
 
+    def stringColumns(self, result):
+        """
+        Return the columns of a ColumnResultSet, converting the values of
+        the unicode columns to str like the other format methods do
+        """
+        columns = []
+        for column in result.columns:
+            if any(isinstance(value, unicode) for value in column):
+                column = [str(value) if isinstance(value, unicode) else value for value in column]
+            columns.append(column)
+        return columns
+
+    def formatColumnsDict(self, result):
+        """
+        Fast path of formatDict for a ColumnResultSet, builds the row
+        dictionaries straight from the columns
+        """
+        descriptions = [str(x.lower()) for x in result.keys]
+        return [dict(zip(descriptions, row)) for row in zip(*self.stringColumns(result))]
+
     def formatCursor(self, cursor, size=10):
         """
         Fetch the driver cursor directly.
@@ -156,7 +195,7 @@ class DBFormatter(WMObject):
         """
         result = self.dbi.processData(self.sql, self.getBinds(),
                                       conn=conn, transaction=transaction,
-                                      returnCursor=returnCursor)
+                                      returnCursor=returnCursor, columnar=self.columnar)
         return self.format(result)
 
     def executeOne(self, conn=None, transaction=False, returnCursor=False):
@@ -165,5 +204,5 @@ class DBFormatter(WMObject):
         """
         result = self.dbi.processData(self.sql, self.getBinds(),
                                       conn=conn, transaction=transaction,
-                                      returnCursor=returnCursor)
+                                      returnCursor=returnCursor, columnar=self.columnar)
         return self.formatOne(result)
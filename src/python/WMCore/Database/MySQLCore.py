@@ -6,10 +6,15 @@ Handle bind variable parsing for MySQL.
 """
 
 import copy
+import re
+from itertools import chain
 
-from WMCore.Database.DBCore import DBInterface
+from WMCore.Database.DBCore import DBInterface, buildPositionalInsert
 from WMCore.Database.ResultSet import ResultSet
 
+# insert statements with a single VALUES row, which can take many rows at once
+_VALUES_INSERT = re.compile(r"^(.*\bVALUES\s*)(\(.*\))\s*$", re.IGNORECASE | re.DOTALL)
+
 def bindVarCompare(a, b):
     """
     _bindVarCompare_
@@ -39,6 +44,12 @@ def stringLengthCompare(a, b):
         return 1
 
 class MySQLInterface(DBInterface):
+
+    def __init__(self, logger, engine):
+        DBInterface.__init__(self, logger, engine)
+        # rows of a multiple rows insert, bound by max_allowed_packet
+        self.maxRowsPerInsert = 1000
+
     def substitute(self, origSQL, origBindsList):
         """
         _substitute_
@@ -116,7 +127,7 @@ class MySQLInterface(DBInterface):
         return (updatedSQL, mySQLBindVarsList)
 
     def executebinds(self, s = None, b = None, connection = None,
-                     returnCursor = False):
+                     returnCursor = False, columnar = False):
         """
         _executebinds_
 
@@ -124,17 +135,48 @@ class MySQLInterface(DBInterface):
         Transform the bind variables into the format that MySQL expects.
         """
         s, b = self.substitute(s, b)
-        return DBInterface.executebinds(self, s, b, connection, returnCursor)
+        return DBInterface.executebinds(self, s, b, connection, returnCursor,
+                                        columnar)
 
     def executemanybinds(self, s = None, b = None, connection = None,
-                         returnCursor = False):
+                         returnCursor = False, columnar = False):
         """
         _executemanybinds_
 
         Execute a SQL statement that has multiple sets of bind variables.
         Transform the bind variables into the format that MySQL expects.
         """
+        s = s.strip()
+        if s.lower().endswith('select', 0, 6):
+            result = self.executebatchselect(s, b, connection, returnCursor, columnar)
+            if result is not None:
+                return self.makelist(result)
+
         newsql, binds = self.substitute(s, b)
 
         return DBInterface.executemanybinds(self, newsql, binds, connection,
-                                            returnCursor)
+                                            returnCursor, columnar)
+
+    def positionalInsert(self, sqlstmt, columns, rows):
+        """
+        _positionalInsert_
+
+        Turn an insert with named bind variables into one with the %s
+        placeholders of MySQLdb.
+        """
+        return buildPositionalInsert(sqlstmt, columns, rows, lambda position: "%s")
+
+    def executeinsert(self, s, rows, connection):
+        """
+        _executeinsert_
+
+        Insert all the rows with a single multiple rows VALUES statement
+        when the statement has a VALUES clause. executemany() runs the other
+        ones, like INSERT ... SELECT, once per row.
+        """
+        match = _VALUES_INSERT.match(s)
+        if match is None or len(rows) == 1:
+            return DBInterface.executeinsert(self, s, rows, connection)
+
+        valuesSQL = match.group(1) + ", ".join([match.group(2)] * len(rows))
+        connection.execute(valuesSQL, tuple(chain.from_iterable(rows)))
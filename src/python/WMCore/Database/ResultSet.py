@@ -41,3 +41,54 @@ class ResultSet:
                 self.data.append(r)
 
         return
+
+
+class ColumnResultSet(object):
+    """
+    _ColumnResultSet_
+
+    ResultSet variant that stores the results column-wise, one list of values
+    per column, instead of keeping one SQLAlchemy row object per row. This
+    considerably reduces the memory footprint of selects returning a large
+    number of rows. Rows are only built when requested.
+    """
+    def __init__(self):
+        self.keys = []
+        self.columns = []
+        self.rowcount = 0
+
+    @property
+    def data(self):
+        return self.fetchall()
+
+    def close(self):
+        return
+
+    def fetchone(self):
+        if self.rowcount > 0:
+            return tuple(column[0] for column in self.columns)
+        else:
+            return []
+
+    def fetchall(self):
+        return list(zip(*self.columns))
+
+    def add(self, resultproxy, chunkSize=1000):
+
+        if resultproxy.closed:
+            return
+        elif resultproxy.returns_rows:
+            if len(self.keys) == 0:
+                self.keys.extend(resultproxy.keys())
+                self.columns = [[] for _ in self.keys]
+            appenders = [column.append for column in self.columns]
+            while True:
+                rows = resultproxy.fetchmany(chunkSize)
+                if not rows:
+                    break
+                for r in rows:
+                    for append, value in zip(appenders, r):
+                        append(value)
+                self.rowcount += len(rows)
+
+        return
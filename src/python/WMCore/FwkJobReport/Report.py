@@ -18,6 +18,7 @@ from WMCore.Configuration import ConfigSection
 from WMCore.DataStructs.File import File
 from WMCore.DataStructs.Run import Run
 from WMCore.FwkJobReport.FileInfo import FileInfo
+from WMCore.FwkJobReport.ReportFormat import ReportFormatError, dumpReportData, loadReportData
 from WMCore.WMException import WMException
 from WMCore.WMExceptions import WM_JOB_ERROR_CODES
 
@@ -373,10 +374,15 @@ class Report(object):
         """
         _persist_
 
-        Pickle this object and save it to disk.
+        Save this object to disk, in the compact report format, or pickled
+        if the report contains values that format doesn't support.
         """
         with open(filename, 'w') as handle:
-            pickle.dump(self.data, handle)
+            try:
+                dumpReportData(self.data, handle)
+            except ReportFormatError as ex:
+                logging.warning("Pickling the job report: %s", str(ex))
+                pickle.dump(self.data, handle)
 
         return
 
@@ -384,10 +390,11 @@ class Report(object):
         """
         _unpersist_
 
-        Load a pickled FWJR from disk.
+        Load a FWJR from disk, either in the compact report format or pickled.
+        Sections of the compact format are only decoded when accessed.
         """
         with open(filename, 'r') as handle:
-            self.data = pickle.load(handle)
+            self.data = loadReportData(handle)
 
         # old self.report (if it existed) became unattached
         if reportname:
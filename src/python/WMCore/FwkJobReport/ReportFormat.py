@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+"""
+_ReportFormat_
+
+Compact, versioned on disk format for the FWJR ConfigSection tree, used by
+Report.persist/unpersist instead of pickling the whole tree.
+
+The file is made of JSON lines:
+  * a header line: {"format": "WMCore.FWJR", "version": 1, "root": N}
+  * one line per step, and one line per output module and input source
+    of each step, referenced by line number from their parent section
+  * the root section line N, the last one
+
+A section is encoded as {"n": name, "p": {parameter: value}, "c": {child
+section name: section or line number}}. JSON values are written as they
+are, the other ones are tagged as {"__t": type, "v": value}: tuples, dicts
+with non string keys and the run lumi -> events dictionaries, which are
+stored as ranges of consecutive lumis plus their event counts.
+
+Sections written on their own line are only decoded when first accessed,
+so reading the errors of a report or the files of one step doesn't decode
+the rest of it. Files which are not in this format are unpickled, which
+keeps the reports persisted by previous versions readable.
+"""
+from __future__ import division, print_function
+
+import json
+import sys
+
+from WMCore.Configuration import ConfigSection
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+PY3 = sys.version_info[0] == 3
+if PY3:
+    unicode = str
+    long = int
+
+FORMAT_NAME = "WMCore.FWJR"
+FORMAT_VERSION = 1
+HEADER_PREFIX = '{"format": "%s"' % FORMAT_NAME
+
+
+class ReportFormatError(Exception):
+    """
+    _ReportFormatError_
+
+    A report can't be written or read in the compact format
+    """
+    pass
+
+
+class LazyConfigSection(ConfigSection):
+    """
+    _LazyConfigSection_
+
+    ConfigSection whose child sections stored on their own line are only
+    decoded when accessed.
+    """
+
+    def __init__(self, name=None, lines=None):
+        ConfigSection.__init__(self, name)
+        self._internal_lines = lines
+        self._internal_lazy = {}
+
+    def __getattr__(self, name):
+        # only called for the attributes not set yet
+        lazy = self.__dict__.get('_internal_lazy')
+        if not lazy or name not in lazy:
+            raise AttributeError("'%s' section has no attribute '%s'" % (self.__dict__.get('_internal_name'), name))
+        section = self.decodeChild_(lazy.pop(name))
+        section._internal_parent_ref = self
+        object.__setattr__(self, name, section)
+        return section
+
+    def __setattr__(self, name, value):
+        if not name.startswith("_internal_"):
+            self.__dict__.get('_internal_lazy', {}).pop(name, None)
+        ConfigSection.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if name in self.__dict__.get('_internal_lazy', {}):
+            del self._internal_lazy[name]
+            self._internal_children.discard(name)
+            self._internal_settings.discard(name)
+            return
+        ConfigSection.__delattr__(self, name)
+
+    def __getstate__(self):
+        self.decodeAll_()
+        state = dict(self.__dict__)
+        state['_internal_lines'] = None
+        return state
+
+    def decodeChild_(self, line):
+        """
+        _decodeChild_
+
+        Decode the child section written on this line
+        """
+        return decodeSection(json.loads(self._internal_lines[line]), self._internal_lines)
+
+    def section_(self, sectionName):
+        if sectionName in self._internal_lazy:
+            return getattr(self, sectionName)
+        return ConfigSection.section_(self, sectionName)
+
+    def decodeAll_(self):
+        """
+        _decodeAll_
+
+        Decode all the child sections not decoded yet, in the whole tree.
+        """
+        for name in list(self._internal_lazy):
+            getattr(self, name)
+        for name in self._internal_children:
+            child = getattr(self, name)
+            if isinstance(child, LazyConfigSection):
+                child.decodeAll_()
+
+
+def _lumiRanges(lumis):
+    """
+    _lumiRanges_
+
+    Encode a lumi -> events dictionary as the list of [first, last] ranges
+    of consecutive lumis and the list of the events of the sorted lumis,
+    None when no lumi has events.
+    """
+    ranges = []
+    sortedLumis = sorted(lumis)
+    for lumi in sortedLumis:
+        if ranges and ranges[-1][1] == lumi - 1:
+            ranges[-1][1] = lumi
+        else:
+            ranges.append([lumi, lumi])
+    events = [lumis[lumi] for lumi in sortedLumis]
+    if not any(nEvents is not None for nEvents in events):
+        events = None
+    return {"__t": "lumis", "v": ranges, "e": events}
+
+
+def encodeValue(value):
+    """
+    _encodeValue_
+
+    Encode a ConfigSection parameter value as a JSON value
+    """
+    if value is None or isinstance(value, (bool, int, long, float, str, unicode)):
+        return value
+    if isinstance(value, list):
+        return [encodeValue(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__t": "tuple", "v": [encodeValue(item) for item in value]}
+    if isinstance(value, dict):
+        if value and all(isinstance(key, (int, long)) and not isinstance(key, bool) for key in value) and \
+                all(nEvents is None or isinstance(nEvents, (int, long)) for nEvents in value.values()):
+            return _lumiRanges(value)
+        if all(isinstance(key, (str, unicode)) for key in value) and "__t" not in value:
+            return dict((key, encodeValue(item)) for key, item in value.items())
+        return {"__t": "dict", "v": [[encodeValue(key), encodeValue(item)] for key, item in value.items()]}
+    raise ReportFormatError("Can't encode %s value in the report: %r" % (type(value).__name__, value))
+
+
+def decodeValue(value):
+    """
+    _decodeValue_
+
+    Decode a JSON value written by encodeValue
+    """
+    if isinstance(value, unicode):
+        return value if PY3 else value.encode('utf-8')
+    if isinstance(value, list):
+        return [decodeValue(item) for item in value]
+    if isinstance(value, dict):
+        valueType = value.get("__t")
+        if valueType is None:
+            return dict((decodeValue(key), decodeValue(item)) for key, item in value.items())
+        if valueType == "lumis":
+            lumis = []
+            for first, last in value["v"]:
+                lumis.extend(range(first, last + 1))
+            if value["e"] is None:
+                return dict.fromkeys(lumis)
+            return dict(zip(lumis, value["e"]))
+        if valueType == "tuple":
+            return tuple(decodeValue(item) for item in value["v"])
+        if valueType == "dict":
+            return dict((decodeValue(key), decodeValue(item)) for key, item in value["v"])
+        raise ReportFormatError("Unknown value type in the report: %s" % valueType)
+    return value
+
+
+def _hasLazyChildren(path):
+    """
+    _hasLazyChildren_
+
+    Whether the child sections of the section at this path, from the root,
+    are written on their own line: the steps, and the output modules and
+    input sources of the steps.
+    """
+    return len(path) == 0 or (len(path) == 2 and path[1] in ("output", "input"))
+
+
+def encodeSection(section, lines, path=()):
+    """
+    _encodeSection_
+
+    Encode a ConfigSection tree as a JSON dictionary, appending the child
+    sections written on their own line to lines.
+    """
+    params = {}
+    children = {}
+    for name in section._internal_settings:
+        value = getattr(section, name)
+        if name in section._internal_children:
+            childSection = encodeSection(value, lines, path + (name,))
+            if _hasLazyChildren(path):
+                lines.append(json.dumps(childSection))
+                children[name] = len(lines) - 1
+            else:
+                children[name] = childSection
+        else:
+            params[name] = encodeValue(value)
+
+    encoded = {"n": section._internal_name, "p": params, "c": children}
+    if section._internal_documentation:
+        encoded["d"] = section._internal_documentation
+    if section._internal_docstrings:
+        encoded["ds"] = section._internal_docstrings
+    return encoded
+
+
+def decodeSection(encoded, lines):
+    """
+    _decodeSection_
+
+    Build a LazyConfigSection from its JSON dictionary, without decoding
+    its child sections written on their own line.
+    """
+    section = LazyConfigSection(decodeValue(encoded["n"]), lines)
+    # parameters written by encodeSection already passed the ConfigSection
+    # type checks, they are set directly
+    sectionDict = section.__dict__
+    for name, value in encoded["p"].items():
+        name = decodeValue(name)
+        sectionDict[name] = decodeValue(value)
+        section._internal_settings.add(name)
+    for name, child in encoded["c"].items():
+        name = decodeValue(name)
+        section._internal_settings.add(name)
+        section._internal_children.add(name)
+        if isinstance(child, int):
+            section._internal_lazy[name] = child
+        else:
+            childSection = decodeSection(child, lines)
+            childSection._internal_parent_ref = section
+            sectionDict[name] = childSection
+    if "d" in encoded:
+        section._internal_documentation = decodeValue(encoded["d"])
+    if "ds" in encoded:
+        section._internal_docstrings = decodeValue(encoded["ds"])
+    return section
+
+
+def dumpReportData(data, handle):
+    """
+    _dumpReportData_
+
+    Write the FWJR ConfigSection tree to a file handle in the compact format.
+    Raise a ReportFormatError, before writing anything, if the tree can't be
+    encoded.
+    """
+    lines = [None]
+    try:
+        lines.append(json.dumps(encodeSection(data, lines)))
+    except (TypeError, ValueError) as ex:
+        raise ReportFormatError("Can't encode the report: %s" % str(ex))
+    lines[0] = json.dumps({"format": FORMAT_NAME, "version": FORMAT_VERSION, "root": len(lines) - 1},
+                          sort_keys=True)
+    handle.write("\n".join(lines))
+    handle.write("\n")
+
+
+def loadReportData(handle):
+    """
+    _loadReportData_
+
+    Read the FWJR ConfigSection tree from a file handle, either in the
+    compact format or pickled.
+    """
+    header = handle.readline()
+    if not header.startswith(HEADER_PREFIX):
+        handle.seek(0)
+        return pickle.load(handle)
+
+    header = json.loads(header)
+    if header["version"] > FORMAT_VERSION:
+        raise ReportFormatError("Unsupported report format version %s" % header["version"])
+    lines = [None] + handle.read().split("\n")
+    return decodeSection(json.loads(lines[header["root"]]), lines)
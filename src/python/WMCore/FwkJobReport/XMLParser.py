@@ -3,210 +3,174 @@
 _XMLParser_
 
 Read the raw XML output from the cmsRun executable.
+
+The XML is read with iterparse, without building any intermediate node
+structure. The run and lumi sections of the input and output files, which
+make most of the large reports, are consumed as they are read: the lumis
+of each run go straight into the lumi -> events dictionary stored in the
+file section, and their XML elements are dropped.
 """
 from __future__ import division, print_function
 
 import logging
 import re
+import xml.etree.cElementTree as ET
 
-from WMCore.Algorithms.ParseXMLFile import coroutine, xmlFileToNode
-from WMCore.DataStructs.Run import Run
 from WMCore.FwkJobReport import Report
 
 
-def reportBuilder(nodeStruct, report, target):
+def nodeText(node):
     """
-    _reportBuilder_
+    _nodeText_
 
-    Driver for coroutine pipe for building reports from the Node
-    structure.
+    Text of a node with the surrounding whitespace stripped, only the text
+    after the last child for a node with children.
     """
-    for node in nodeStruct.children:
-        target.send((report, node))
+    if len(node):
+        text = node[-1].tail
+    else:
+        text = node.text
+    return text.strip() if text else ""
 
 
-@coroutine
-def reportDispatcher(targets):
+def fileHandler(report, node, runs):
     """
-    _reportDispatcher_
+    _fileHandler_
 
-    Top level routine for dispatching the parts of the job report to the
-    handlers.
+    Add an output file to the report, with its input files and runs.
     """
-    while True:
-        report, node = (yield)
-        if node.name != "FrameworkJobReport":
-            print("Not Handling: ", node.name)
-            # TODO: throw
-            continue
+    fileAttrs = {}
+    inputs = []
+    for subnode in node:
+        if subnode.tag == "Inputs":
+            inputs.append(subnode)
+        elif subnode.tag not in ("Runs", "Branches"):
+            fileAttrs[subnode.tag] = nodeText(subnode)
+
+    fileRef = report.addOutputFile(fileAttrs["ModuleLabel"])
+    for subnode in inputs:
+        inputAssocHandler(fileRef, subnode)
+    runHandler(fileRef, runs)
+
+    Report.addAttributesToFile(fileRef, lfn=fileAttrs["LFN"],
+                               pfn=fileAttrs["PFN"], catalog=fileAttrs["Catalog"],
+                               module_label=fileAttrs["ModuleLabel"],
+                               guid=fileAttrs["GUID"],
+                               output_module_class=fileAttrs["OutputModuleClass"],
+                               events=int(fileAttrs["TotalEvents"]),
+                               branch_hash=fileAttrs["BranchHash"])
+
+
+def inputFileHandler(report, node, runs):
+    """
+    _inputFileHandler_
 
-        for subnode in node.children:
-            if subnode.name == "File":
-                targets['File'].send((report, subnode))
-            elif subnode.name == "InputFile":
-                targets['InputFile'].send((report, subnode))
-            elif subnode.name == "AnalysisFile":
-                targets['AnalysisFile'].send((report, subnode))
-            elif subnode.name == "PerformanceReport":
-                targets['PerformanceReport'].send((report, subnode))
-            elif subnode.name == "FrameworkError":
-                targets['FrameworkError'].send((report, subnode))
-            elif subnode.name == "SkippedFile":
-                targets['SkippedFile'].send((report, subnode))
-            elif subnode.name == "FallbackAttempt":
-                targets['FallbackAttempt'].send((report, subnode))
-            elif subnode.name == "SkippedEvent":
-                targets['SkippedEvent'].send((report, subnode))
-            else:
-                setattr(report.report.parameters, subnode.name, subnode.text)
+    Add an input file to the report, with its runs.
+    """
+    fileAttrs = {}
+    for subnode in node:
+        if subnode.tag not in ("Runs", "Branches"):
+            fileAttrs[subnode.tag] = nodeText(subnode)
 
+    fileRef = report.addInputFile(fileAttrs["ModuleLabel"])
+    runHandler(fileRef, runs)
 
-@coroutine
-def fileHandler(targets):
+    Report.addAttributesToFile(fileRef, lfn=fileAttrs["LFN"],
+                               pfn=fileAttrs["PFN"], catalog=fileAttrs["Catalog"],
+                               module_label=fileAttrs["ModuleLabel"],
+                               guid=fileAttrs["GUID"], input_type=fileAttrs["InputType"],
+                               input_source_class=fileAttrs["InputSourceClass"],
+                               events=int(fileAttrs["EventsRead"]))
+
+
+def analysisFileHandler(report, node, runs):
     """
-    _fileHandler_
+    _analysisFileHandler_
 
-    coroutine to create files and handle sub data in the appropriate
-    dispatchers
+    handle analysis file entries in the report
 
     """
-    while True:
-        report, node = (yield)
-        moduleName = None
-        moduleNode = [x for x in node.children if x.name == "ModuleLabel"][0]
-        moduleName = moduleNode.text
-
-        fileRef = report.addOutputFile(moduleName)
-        fileAttrs = {}
-        for subnode in node.children:
-            if subnode.name == "Inputs":
-                targets['Inputs'].send((fileRef, subnode))
-            elif subnode.name == "Runs":
-                targets['Runs'].send((fileRef, subnode))
-            elif subnode.name == "Branches":
-                targets['Branches'].send((fileRef, subnode))
-            else:
-                fileAttrs[subnode.name] = subnode.text
+    filename = None
+    attrs = {}
+    for subnode in node:
+        if subnode.tag == "FileName":
+            filename = nodeText(subnode)
+        else:
+            attrs[subnode.tag] = subnode.get('Value', None)
 
-        Report.addAttributesToFile(fileRef, lfn=fileAttrs["LFN"],
-                                   pfn=fileAttrs["PFN"], catalog=fileAttrs["Catalog"],
-                                   module_label=fileAttrs["ModuleLabel"],
-                                   guid=fileAttrs["GUID"],
-                                   output_module_class=fileAttrs["OutputModuleClass"],
-                                   events=int(fileAttrs["TotalEvents"]),
-                                   branch_hash=fileAttrs["BranchHash"])
+    report.addAnalysisFile(filename, **attrs)
 
 
-@coroutine
-def inputFileHandler(targets):
+def errorHandler(report, node, runs):
     """
-    _inputFileHandler_
-
-    coroutine to create input files in the report and dispatch
-    sub data down the pipeline
+    _errorHandler_
 
+    Handle FrameworkError reports.
     """
-    while True:
-        report, node = (yield)
-        moduleName = None
-        moduleNode = [x for x in node.children if x.name == "ModuleLabel"][0]
-        moduleName = moduleNode.text
-
-        fileRef = report.addInputFile(moduleName)
-        fileAttrs = {}
-        for subnode in node.children:
-            if subnode.name == "Runs":
-                targets['Runs'].send((fileRef, subnode))
-            elif subnode.name == "Branches":
-                targets['Branches'].send((fileRef, subnode))
-            else:
-                fileAttrs[subnode.name] = subnode.text
+    excepcode = node.get("ExitStatus", 8001)
+    exceptype = node.get("Type", "CMSException")
 
-        Report.addAttributesToFile(fileRef, lfn=fileAttrs["LFN"],
-                                   pfn=fileAttrs["PFN"], catalog=fileAttrs["Catalog"],
-                                   module_label=fileAttrs["ModuleLabel"],
-                                   guid=fileAttrs["GUID"], input_type=fileAttrs["InputType"],
-                                   input_source_class=fileAttrs["InputSourceClass"],
-                                   events=int(fileAttrs["EventsRead"]))
+    # There should be atmost one step in the report at this point in time.
+    if len(report.listSteps()) == 0:
+        report.addError("unknownStep", excepcode, exceptype, nodeText(node))
+    else:
+        report.addError(report.listSteps()[0], excepcode, exceptype, nodeText(node))
 
 
-@coroutine
-def analysisFileHandler(targets):
-    """
-    _analysisFileHandler_
+def skippedFileHandler(report, node, runs):
+    lfn = node.get("Lfn", None)
+    pfn = node.get("Pfn", None)
+    report.addSkippedFile(lfn, pfn)
 
-    handle analysis file entries in the report
 
-    """
-    while True:
-        report, node = (yield)
-        filename = None
-        attrs = {}
-        for subnode in node.children:
-            if subnode.name == "FileName":
-                filename = subnode.text
-            else:
-                attrs[subnode.name] = subnode.attrs.get('Value', None)
+def fallbackAttemptHandler(report, node, runs):
+    lfn = node.get("Lfn", None)
+    pfn = node.get("Pfn", None)
+    report.addFallbackFile(lfn, pfn)
 
-        report.addAnalysisFile(filename, **attrs)
 
+def skippedEventHandler(report, node, runs):
+    run = node.get("Run", None)
+    event = node.get("Event", None)
+    if run is None:
+        return
+    if event is None:
+        return
+    report.addSkippedEvent(run, event)
 
-@coroutine
-def errorHandler():
+
+def addLumi(lumis, node):
     """
-    _errorHandler_
+    _addLumi_
 
-    Handle FrameworkError reports.
+    Add a lumi section to the lumi -> events dictionary of its run.  Given
+    the following XML:
+        <LumiSection NEvents="100" ID="215"/>
+    the events of a lumi seen twice are added up.
     """
-    while True:
-        report, node = (yield)
-        excepcode = node.attrs.get("ExitStatus", 8001)
-        exceptype = node.attrs.get("Type", "CMSException")
-
-        # There should be atmost one step in the report at this point in time.
-        if len(report.listSteps()) == 0:
-            report.addError("unknownStep", excepcode, exceptype, node.text)
-        else:
-            report.addError(report.listSteps()[0], excepcode, exceptype, node.text)
-
-
-@coroutine
-def skippedFileHandler():
-    while True:
-        report, node = (yield)
-        lfn = node.attrs.get("Lfn", None)
-        pfn = node.attrs.get("Pfn", None)
-        report.addSkippedFile(lfn, pfn)
-
-
-@coroutine
-def fallbackAttemptHandler():
-    while True:
-        report, node = (yield)
-        lfn = node.attrs.get("Lfn", None)
-        pfn = node.attrs.get("Pfn", None)
-        report.addFallbackFile(lfn, pfn)
-
-
-@coroutine
-def skippedEventHandler():
-    while True:
-        report, node = (yield)
-        run = node.attrs.get("Run", None)
-        event = node.attrs.get("Event", None)
-        if run is None:
-            continue
-        if event is None:
-            continue
-        report.addSkippedEvent(run, event)
+    lumiId = node.get("ID")
+    if lumiId is None:
+        return
+    lumiNumber = int(lumiId)
+    nEvents = node.get("NEvents")
+    if nEvents is not None:
+        try:
+            nEvents = int(nEvents)
+        except ValueError:
+            nEvents = None
+
+    if lumis.get(lumiNumber):
+        if nEvents:
+            lumis[lumiNumber] += nEvents
+    else:
+        lumis[lumiNumber] = nEvents
 
 
-@coroutine
-def runHandler():
+def runHandler(fileSection, runs):
     """
     _runHandler_
 
-    Sink to add run information to a file.  Given the following XML:
+    Add the runs of a file to its section.  Given the following XML:
       <Runs>
       <Run ID="122023">
         <LumiSection NEvents="100" ID="215"/>
@@ -218,65 +182,20 @@ def runHandler():
       </Run>
       </Runs>
 
-    Create a WMCore.DataStructs.Run object for each run and call the
-    addRunInfoToFile() function to add the run information to the file
-    section.
-    """
-    while True:
-        fileSection, node = (yield)
-        for subnode in node.children:
-            if subnode.name == "Run":
-                runId = subnode.attrs.get("ID", None)
-                if runId is None:
-                    continue
-
-                lumis = []
-                for lumi in subnode.children:
-                    if "ID" in lumi.attrs:
-                        lumiNumber = int(lumi.attrs['ID'])
-                        nEvents = lumi.attrs.get("NEvents", None)
-                        if nEvents is not None:
-                            try:
-                                nEvents = int(nEvents)
-                            except ValueError:
-                                nEvents = None
-                        lumis.append((lumiNumber, nEvents))
-                runInfo = Run(runNumber=runId)
-                runInfo.extendLumis(lumis)
-
-                Report.addRunInfoToFile(fileSection, runInfo)
-
-@coroutine
-def branchHandler():
+    runs is the list of (run number, {lumi: events}) built while parsing
+    it, which end up as:
+      fileSection.runs.RUNNUMBER = {LUMI1: EVENTS1, LUMI2: EVENTS2...}
+    as Report.addRunInfoToFile would store the equivalent Run objects.
     """
-    _branchHandler_
+    for runId, lumis in runs:
+        setattr(fileSection.runs, runId, lumis)
 
-    Sink to pack branch information into a file.  Given the following XML:
-      <Branches>
-        <Branch>Branch Name 1</Branch>
-        <Branch>Branch Name 2</Branch>
-      </Branches>
 
-    Create a list containing all the branch names as use the
-    addBranchNamesToFile method to add them to the fileSection.
-
-    Nulled out, we dont need these anyways...
-
-    """
-    while True:
-        fileSection, node = (yield)
-        pass
-        # branches = [ subnode.text for subnode in node.children
-        #             if subnode.name == "Branch" ]
-        # Report.addBranchNamesToFile(fileSection, branches)
-
-
-@coroutine
-def inputAssocHandler():
+def inputAssocHandler(fileSection, node):
     """
     _inputAssocHandler_
 
-    Sink to handle output:input association information.  Given the following
+    Handle output:input association information.  Given the following
     XML:
       <Input>
         <LFN>/path/to/some/lfn.root</LFN>
@@ -286,82 +205,68 @@ def inputAssocHandler():
     Extract the LFN and call the addInputToFile() function to associate input to
     output in the FWJR.
     """
-    while True:
-        fileSection, node = (yield)
-        for inputnode in node.children:
-            data = {}
-            for subnode in inputnode.children:
-                data.__setitem__(subnode.name, subnode.text)
-            Report.addInputToFile(fileSection, data["LFN"], data['PFN'])
+    for inputnode in node:
+        data = {}
+        for subnode in inputnode:
+            data[subnode.tag] = nodeText(subnode)
+        Report.addInputToFile(fileSection, data["LFN"], data['PFN'])
 
 
-@coroutine
-def perfRepHandler(targets):
+def perfRepHandler(report, node, runs):
     """
     _perfRepHandler_
 
     handle performance report subsections
 
     """
-    while True:
-        report, node = (yield)
-        perfRep = report.report.performance
-        perfRep.section_("summaries")
-        perfRep.section_("cpu")
-        perfRep.section_("memory")
-        perfRep.section_("storage")
-        for subnode in node.children:
-            metric = subnode.attrs.get('Metric', None)
-            if metric == "Timing":
-                targets['CPU'].send((perfRep.cpu, subnode))
-            elif metric == "SystemMemory" or metric == "ApplicationMemory":
-                targets['Memory'].send((perfRep.memory, subnode))
-            elif metric == "StorageStatistics":
-                targets['Storage'].send((perfRep.storage, subnode))
-            else:
-                targets['PerformanceSummary'].send((perfRep.summaries,
-                                                    subnode))
+    perfRep = report.report.performance
+    perfRep.section_("summaries")
+    perfRep.section_("cpu")
+    perfRep.section_("memory")
+    perfRep.section_("storage")
+    for subnode in node:
+        metric = subnode.get('Metric', None)
+        if metric == "Timing":
+            perfCPUHandler(perfRep.cpu, subnode)
+        elif metric == "SystemMemory" or metric == "ApplicationMemory":
+            perfMemHandler(perfRep.memory, subnode)
+        elif metric == "StorageStatistics":
+            perfStoreHandler(perfRep.storage, subnode)
+        else:
+            perfSummaryHandler(perfRep.summaries, subnode)
 
 
-@coroutine
-def perfSummaryHandler():
+def perfSummaryHandler(report, node):
     """
     _perfSummaryHandler_
 
-    Sink to handle performance summaries
+    Handle performance summaries
 
     """
-    while True:
-        report, node = (yield)
-        summary = node.attrs.get('Metric', None)
-        if summary is None:
-            continue
-        # Add performance section if it doesn't exist
-        if not hasattr(report, summary):
-            report.section_(summary)
-        summRep = getattr(report, summary)
+    summary = node.get('Metric', None)
+    if summary is None:
+        return
+    # Add performance section if it doesn't exist
+    if not hasattr(report, summary):
+        report.section_(summary)
+    summRep = getattr(report, summary)
 
-        for subnode in node.children:
-            setattr(summRep, subnode.attrs['Name'],
-                    subnode.attrs['Value'])
+    for subnode in node:
+        setattr(summRep, subnode.get('Name'), subnode.get('Value'))
 
 
-@coroutine
-def perfCPUHandler():
+def perfCPUHandler(report, node):
     """
     _perfCPUHandler_
 
-    sink that packs CPU reports into the job report
+    Pack CPU reports into the job report
 
     """
-    while True:
-        report, node = (yield)
-        for subnode in node.children:
-            setattr(report, subnode.attrs['Name'], subnode.attrs['Value'])
+    for subnode in node:
+        setattr(report, subnode.get('Name'), subnode.get('Value'))
 
 
-@coroutine
-def perfMemHandler():
+def perfMemHandler(report, node):
     """
     _perfMemHandler_
 
@@ -370,15 +275,13 @@ def perfMemHandler():
     # Make a list of performance info we actually want
     goodStatistics = ['PeakValueRss', 'PeakValueVsize', 'LargestRssEvent-h-PSS']
 
-    while True:
-        report, node = (yield)
-        for prop in node.children:
-            if prop.attrs['Name'] in goodStatistics:
-                if prop.attrs['Name'] == 'LargestRssEvent-h-PSS':
-                    # need to remove - chars from name as it buggers up downtstream code
-                    setattr(report, 'PeakValuePss', prop.attrs['Value'])
-                else:
-                    setattr(report, prop.attrs['Name'], prop.attrs['Value'])
+    for prop in node:
+        if prop.get('Name') in goodStatistics:
+            if prop.get('Name') == 'LargestRssEvent-h-PSS':
+                # need to remove - chars from name as it buggers up downtstream code
+                setattr(report, 'PeakValuePss', prop.get('Value'))
+            else:
+                setattr(report, prop.get('Name'), prop.get('Value'))
 
 
 def checkRegEx(regexp, candidate):
@@ -387,8 +290,7 @@ def checkRegEx(regexp, candidate):
     return True
 
 
-@coroutine
-def perfStoreHandler():
+def perfStoreHandler(report, node):
     """
     _perfStoreHandler_
 
@@ -410,81 +312,91 @@ def perfStoreHandler():
                       'Timing-tstoragefile-write-totalMsecs',
                       ]
 
-    while True:
-        report, node = (yield)
-        logging.debug("Preparing to parse storage statistics")
-        storageValues = {}
-        for prop in node.children:
-            name = prop.attrs['Name']
-            for statName in goodStatistics:
-                if checkRegEx(statName, name):
-                    storageValues[name] = float(prop.attrs['Value'])
-                    # setattr(report, name, prop.attrs['Value'])
-
-        writeMethod = None
-        readMethod = None
-        # Figure out read method
-        for key in storageValues.keys():
-            if checkRegEx('Timing-([a-z]{4})-read(v?)-numOperations', key):
-                if storageValues[key] != 0.0:
-                    # This is the reader
-                    readMethod = key.split('-')[1]
-                    break
-        # Figure out the write method
-        for key in storageValues.keys():
-            if checkRegEx('Timing-([a-z]{4})-write(v?)-numOperations', key):
-                if storageValues[key] != 0.0:
-                    # This is the reader
-                    writeMethod = key.split('-')[1]
-                    break
-
-        # Then assemble the information
-        # Calculate the values
-        logging.debug("ReadMethod: %s", readMethod)
-        logging.debug("WriteMethod: %s", writeMethod)
-        try:
-            readTotalMB = storageValues.get("Timing-%s-read-totalMegabytes" % readMethod, 0) \
-                          + storageValues.get("Timing-%s-readv-totalMegabytes" % readMethod, 0)
-            readMSecs = storageValues.get("Timing-%s-read-totalMsecs" % readMethod, 0) \
-                        + storageValues.get("Timing-%s-readv-totalMsecs" % readMethod, 0)
-            totalReads = storageValues.get("Timing-%s-read-numOperations" % readMethod, 0) \
-                         + storageValues.get("Timing-%s-readv-numOperations" % readMethod, 0)
-            readMaxMSec = max(storageValues.get("Timing-%s-read-maxMsecs" % readMethod, 0),
-                              storageValues.get("Timing-%s-readv-maxMsecs" % readMethod, 0))
-            readPercOps = storageValues.get("Timing-tstoragefile-readActual-numOperations", 0) / \
-                          storageValues.get("Timing-tstoragefile-read-numOperations", 0)
-            readCachOps = storageValues.get("Timing-tstoragefile-readViaCache-numSuccessfulOperations", 0) / \
-                          storageValues.get("Timing-tstoragefile-read-numOperations", 0)
-            readTotalT = storageValues.get("Timing-tstoragefile-read-totalMSecs", 0) / 1000
-            readNOps = storageValues.get("Timing-tstoragefile-read-numOperations", 0)
-            writeTime = storageValues.get("Timing-tstoragefile-write-totalMsecs", 0) / 1000
-            writeTotMB = storageValues.get("Timing-%s-write-totalMegabytes" % writeMethod, 0) \
-                         + storageValues.get("Timing-%s-writev-totalMegabytes" % writeMethod, 0)
-
-            if readMSecs > 0:
-                readMBSec = readTotalMB / readMSecs * 1000
-            else:
-                readMBSec = 0
-            if totalReads > 0:
-                readAveragekB = 1024 * readTotalMB / totalReads
-            else:
-                readAveragekB = 0
-
-            # Attach them to the report
-            setattr(report, 'readTotalMB', readTotalMB)
-            setattr(report, 'readMBSec', readMBSec)
-            setattr(report, 'readAveragekB', readAveragekB)
-            setattr(report, 'readMaxMSec', readMaxMSec)
-            setattr(report, 'readPercentageOps', readPercOps)
-            setattr(report, 'readTotalSecs', readTotalT)
-            setattr(report, 'readNumOps', readNOps)
-            setattr(report, 'writeTotalSecs', writeTime)
-            setattr(report, 'writeTotalMB', writeTotMB)
-            setattr(report, 'readCachePercentageOps', readCachOps)
-        except ZeroDivisionError:
-            logging.error("Tried to divide by zero doing storage statistics report parsing.")
-            logging.error("Either you aren't reading and writing data, or you aren't reporting it.")
-            logging.error("Not adding any storage performance info to report.")
+    logging.debug("Preparing to parse storage statistics")
+    storageValues = {}
+    for prop in node:
+        name = prop.get('Name')
+        for statName in goodStatistics:
+            if checkRegEx(statName, name):
+                storageValues[name] = float(prop.get('Value'))
+                # setattr(report, name, prop.attrs['Value'])
+
+    writeMethod = None
+    readMethod = None
+    # Figure out read method
+    for key in storageValues.keys():
+        if checkRegEx('Timing-([a-z]{4})-read(v?)-numOperations', key):
+            if storageValues[key] != 0.0:
+                # This is the reader
+                readMethod = key.split('-')[1]
+                break
+    # Figure out the write method
+    for key in storageValues.keys():
+        if checkRegEx('Timing-([a-z]{4})-write(v?)-numOperations', key):
+            if storageValues[key] != 0.0:
+                # This is the reader
+                writeMethod = key.split('-')[1]
+                break
+
+    # Then assemble the information
+    # Calculate the values
+    logging.debug("ReadMethod: %s", readMethod)
+    logging.debug("WriteMethod: %s", writeMethod)
+    try:
+        readTotalMB = storageValues.get("Timing-%s-read-totalMegabytes" % readMethod, 0) \
+                      + storageValues.get("Timing-%s-readv-totalMegabytes" % readMethod, 0)
+        readMSecs = storageValues.get("Timing-%s-read-totalMsecs" % readMethod, 0) \
+                    + storageValues.get("Timing-%s-readv-totalMsecs" % readMethod, 0)
+        totalReads = storageValues.get("Timing-%s-read-numOperations" % readMethod, 0) \
+                     + storageValues.get("Timing-%s-readv-numOperations" % readMethod, 0)
+        readMaxMSec = max(storageValues.get("Timing-%s-read-maxMsecs" % readMethod, 0),
+                          storageValues.get("Timing-%s-readv-maxMsecs" % readMethod, 0))
+        readPercOps = storageValues.get("Timing-tstoragefile-readActual-numOperations", 0) / \
+                      storageValues.get("Timing-tstoragefile-read-numOperations", 0)
+        readCachOps = storageValues.get("Timing-tstoragefile-readViaCache-numSuccessfulOperations", 0) / \
+                      storageValues.get("Timing-tstoragefile-read-numOperations", 0)
+        readTotalT = storageValues.get("Timing-tstoragefile-read-totalMSecs", 0) / 1000
+        readNOps = storageValues.get("Timing-tstoragefile-read-numOperations", 0)
+        writeTime = storageValues.get("Timing-tstoragefile-write-totalMsecs", 0) / 1000
+        writeTotMB = storageValues.get("Timing-%s-write-totalMegabytes" % writeMethod, 0) \
+                     + storageValues.get("Timing-%s-writev-totalMegabytes" % writeMethod, 0)
+
+        if readMSecs > 0:
+            readMBSec = readTotalMB / readMSecs * 1000
+        else:
+            readMBSec = 0
+        if totalReads > 0:
+            readAveragekB = 1024 * readTotalMB / totalReads
+        else:
+            readAveragekB = 0
+
+        # Attach them to the report
+        setattr(report, 'readTotalMB', readTotalMB)
+        setattr(report, 'readMBSec', readMBSec)
+        setattr(report, 'readAveragekB', readAveragekB)
+        setattr(report, 'readMaxMSec', readMaxMSec)
+        setattr(report, 'readPercentageOps', readPercOps)
+        setattr(report, 'readTotalSecs', readTotalT)
+        setattr(report, 'readNumOps', readNOps)
+        setattr(report, 'writeTotalSecs', writeTime)
+        setattr(report, 'writeTotalMB', writeTotMB)
+        setattr(report, 'readCachePercentageOps', readCachOps)
+    except ZeroDivisionError:
+        logging.error("Tried to divide by zero doing storage statistics report parsing.")
+        logging.error("Either you aren't reading and writing data, or you aren't reporting it.")
+        logging.error("Not adding any storage performance info to report.")
+
+
+reportHandlers = {
+    "File": fileHandler,
+    "InputFile": inputFileHandler,
+    "AnalysisFile": analysisFileHandler,
+    "PerformanceReport": perfRepHandler,
+    "FrameworkError": errorHandler,
+    "SkippedFile": skippedFileHandler,
+    "FallbackAttempt": fallbackAttemptHandler,
+    "SkippedEvent": skippedEventHandler,
+}
 
 
 def xmlToJobReport(reportInstance, xmlFile):
@@ -495,45 +407,43 @@ def xmlToJobReport(reportInstance, xmlFile):
     Report instance provided
 
     """
-    # read XML, build node structure
-    node = xmlFileToNode(xmlFile)
-
-    #  //
-    # // Set up coroutine pipeline
-    # //
-    fileDispatchers = {
-        "Runs": runHandler(),
-        "Branches": branchHandler(),
-        "Inputs": inputAssocHandler(),
-    }
-
-    perfRepDispatchers = {
-        "PerformanceSummary": perfSummaryHandler(),
-        "CPU": perfCPUHandler(),
-        "Memory": perfMemHandler(),
-        "Storage": perfStoreHandler(),
-    }
-
-    dispatchers = {
-        "File": fileHandler(fileDispatchers),
-        "InputFile": inputFileHandler(fileDispatchers),
-        "PerformanceReport": perfRepHandler(perfRepDispatchers),
-        "AnalysisFile": analysisFileHandler(fileDispatchers),
-        "FrameworkError": errorHandler(),
-        "SkippedFile": skippedFileHandler(),
-        "FallbackAttempt": fallbackAttemptHandler(),
-        "SkippedEvent": skippedEventHandler(),
-    }
-
-    #  //
-    # // Feed pipeline with node structure and report result instance
-    # //
-    reportBuilder(
-        node, reportInstance,
-        reportDispatcher(dispatchers)
-    )
-
-    return
+    # stack of the nodes being read, from the report root
+    nodeStack = []
+    # runs of the input or output file being read
+    runs = []
+    lumis = {}
+    # top level nodes with their runs, only added to the report once the
+    # whole file is read, to leave the report untouched for a malformed file
+    reportNodes = []
+
+    for event, node in ET.iterparse(xmlFile, events=("start", "end")):
+        if event == "start":
+            nodeStack.append(node)
+            continue
 
+        nodeStack.pop()
+        depth = len(nodeStack)
+        if depth == 4 and nodeStack[2].tag == "Runs" and nodeStack[1].tag in ("File", "InputFile"):
+            # a lumi section, drop it once read
+            addLumi(lumis, node)
+            nodeStack[3].remove(node)
+        elif depth == 3 and nodeStack[2].tag == "Runs" and nodeStack[1].tag in ("File", "InputFile"):
+            runId = node.get("ID", None)
+            if runId is not None:
+                runs.append((runId, lumis))
+            lumis = {}
+            nodeStack[2].remove(node)
+        elif depth == 1:
+            reportNodes.append((node, runs))
+            runs = []
+        elif depth == 0 and node.tag != "FrameworkJobReport":
+            logging.warning("Not Handling: %s", node.tag)
+            return
+
+    for node, runs in reportNodes:
+        if node.tag in reportHandlers:
+            reportHandlers[node.tag](reportInstance, node, runs)
+        else:
+            setattr(reportInstance.report.parameters, node.tag, nodeText(node))
 
-childrenMatching = lambda node, nname: [x for x in node.children if x.name == nname]
+    return
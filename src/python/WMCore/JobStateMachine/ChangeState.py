@@ -18,7 +18,7 @@ from WMCore.JobStateMachine.Transitions import Transitions
 from WMCore.Lexicon import sanitizeURL
 from WMCore.Services.Dashboard.DashboardReporter import DashboardReporter
 from WMCore.WMConnectionBase import WMConnectionBase
-from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
+from WMCore.WMSpec.SpecMetadataCache import getSpecMetadataCache
 
 CMSSTEP = re.compile(r'^cmsRun[0-9]+$')
 
@@ -60,14 +60,35 @@ def discardConflictingDocument(couchDbInstance, data, result):
         return result
 
 
-def getDataFromSpecFile(specFile):
-    workload = WMWorkloadHelper()
-    workload.load(specFile)
-    campaign = workload.getCampaign()
-    result = {"Campaign": campaign}
-    for task in workload.taskIterator():
-        result[task.getPathName()] = task.getPrepID()
-    return result
+def jobStateTransitionUpdate(doc, docId, transition):
+    """
+    _jobStateTransitionUpdate_
+
+    Python version of the JobDump stateTransition update handler, to be
+    used with Database.updateBulkDocumentsWithFunc.
+    """
+    if doc is None:
+        doc = {"_id": docId, "states": {}}
+
+    maxKey = max([int(key) for key in doc["states"]] or [0])
+    doc["states"][str(maxKey + 1)] = transition
+    return doc
+
+
+def jobSummaryTransitionUpdate(doc, docId, transition):
+    """
+    _jobSummaryTransitionUpdate_
+
+    Python version of the WMStatsAgent jobSummaryState and jobStateTransition
+    update handlers, to be used with Database.updateBulkDocumentsWithFunc.
+    """
+    if doc is None:
+        doc = {"_id": docId}
+
+    doc["state"] = transition["newstate"]
+    doc["timestamp"] = transition["timestamp"]
+    doc.setdefault("state_history", []).append(transition)
+    return doc
 
 
 class ChangeState(WMObject, WMConnectionBase):
@@ -107,7 +128,12 @@ class ChangeState(WMObject, WMConnectionBase):
         self.getWorkflowSpecDAO = self.daofactory("Workflow.GetSpecAndNameFromTask")
 
         self.maxUploadedInputFiles = getattr(self.config.JobStateMachine, 'maxFWJRInputFiles', 1000)
-        self.workloadCache = {}
+        # apply the state transitions of existing couch documents with _bulk_docs
+        # instead of one update handler request per job
+        self.bulkTransitions = getattr(self.config.JobStateMachine, 'bulkTransitions', False)
+        # spec metadata shared with the other components, and the spec path of each task
+        self.specCache = getSpecMetadataCache(self.config)
+        self.taskSpecs = {}
         return
 
     def _connectDatabases(self):
@@ -221,19 +247,16 @@ class ChangeState(WMObject, WMConnectionBase):
         timestamp = int(time.time())
         couchRecordsToUpdate = []
 
+        if self.bulkTransitions:
+            self.recordTransitionsInBulk(jobs, newstate, oldstate, timestamp, updatesummary)
+
         for job in jobs:
             couchDocID = job.get("couch_record", None)
 
             if newstate == "new":
                 oldstate = "none"
 
-            if job.get("site_cms_name", None):
-                if newstate == "executing":
-                    jobLocation = job["site_cms_name"]
-                else:
-                    jobLocation = "Agent"
-            else:
-                jobLocation = "Agent"
+            jobLocation = self.getTransitionLocation(job, newstate)
 
             if couchDocID is None:
                 jobDocument = {}
@@ -283,7 +306,7 @@ class ChangeState(WMObject, WMConnectionBase):
                 couchRecordsToUpdate.append({"jobid": job["id"],
                                              "couchid": jobDocument["_id"]})
                 self.jobsdatabase.queue(jobDocument, callback=discardConflictingDocument)
-            else:
+            elif not self.bulkTransitions:
                 # We send a PUT request to the stateTransition update handler.
                 # Couch expects the parameters to be passed as arguments to in
                 # the URI while the Requests class will only encode arguments
@@ -299,7 +322,7 @@ class ChangeState(WMObject, WMConnectionBase):
 
             # updating the status of the summary doc only when it is explicitely requested
             # doc is already in couch
-            if updatesummary:
+            if updatesummary and not self.bulkTransitions:
                 jobSummaryId = job["name"]
                 updateUri = "/" + self.jsumdatabase.name + "/_design/WMStatsAgent/_update/jobSummaryState/" + jobSummaryId
                 # map retrydone state to jobfailed state for monitoring
@@ -321,12 +344,11 @@ class ChangeState(WMObject, WMConnectionBase):
 
             if job.get("fwjr", None):
 
-                cachedByWorkflow = self.workloadCache.setdefault(job['workflow'],
-                                                                 getDataFromSpecFile(
-                                                                     self.getWorkflowSpecDAO.execute(job['task'])[
-                                                                         job['task']]['spec']))
-                job['fwjr'].setCampaign(cachedByWorkflow.get('Campaign', ''))
-                job['fwjr'].setPrepID(cachedByWorkflow.get(job['task'], ''))
+                if job['task'] not in self.taskSpecs:
+                    self.taskSpecs[job['task']] = self.getWorkflowSpecDAO.execute(job['task'])[job['task']]['spec']
+                specMetadata = self.specCache.getSpecMetadata(self.taskSpecs[job['task']]) or {}
+                job['fwjr'].setCampaign(specMetadata.get('campaign', ''))
+                job['fwjr'].setPrepID(specMetadata.get('tasks', {}).get(job['task'], {}).get('prepID', ''))
                 # If there are too many input files, strip them out
                 # of the FWJR, as they should already
                 # be in the database
@@ -473,6 +495,79 @@ class ChangeState(WMObject, WMConnectionBase):
         self.jsumdatabase.commit()
         return
 
+    def getTransitionLocation(self, job, newstate):
+        """
+        _getTransitionLocation_
+
+        Return the location to be recorded in the job state transition.
+        """
+        if job.get("site_cms_name", None) and newstate == "executing":
+            return job["site_cms_name"]
+        return "Agent"
+
+    def recordTransitionsInBulk(self, jobs, newstate, oldstate, timestamp, updatesummary=False):
+        """
+        _recordTransitionsInBulk_
+
+        Record the state transition of all the jobs that already have a couch
+        document (and their job summary state, when requested) using a single
+        _bulk_docs request per database, instead of calling the update handlers
+        once per job. Documents that could not be updated (e.g. conflicts) are
+        logged and retried one by one through the update handlers.
+
+        Return a dictionary with the list of doc ids which failed the bulk
+        update, keyed by the database name.
+        """
+        if newstate == "new":
+            oldstate = "none"
+        # map retrydone state to jobfailed state for monitoring
+        if newstate == "retrydone":
+            monitorState = "jobfailed"
+        else:
+            monitorState = newstate
+
+        jobTransitions = {}
+        summaryTransitions = {}
+        for job in jobs:
+            couchDocID = job.get("couch_record", None)
+            if couchDocID is not None:
+                transition = {"oldstate": oldstate,
+                              "newstate": newstate,
+                              "location": self.getTransitionLocation(job, newstate),
+                              "timestamp": timestamp}
+                jobTransitions.setdefault(couchDocID, []).append(transition)
+            if updatesummary:
+                transition = {"oldstate": oldstate,
+                              "newstate": monitorState,
+                              "location": job["location"],
+                              "timestamp": timestamp}
+                summaryTransitions.setdefault(job["name"], []).append(transition)
+
+        conflicts = {}
+        if jobTransitions:
+            failedDocs = self.jobsdatabase.updateBulkDocumentsWithFunc(jobTransitions, jobStateTransitionUpdate)
+            conflicts[self.jobsdatabase.name] = [doc["id"] for doc in failedDocs]
+            for doc in failedDocs:
+                logging.warning("Bulk state transition failed for job doc %s: %s. Retrying it.",
+                                doc["id"], doc.get("reason", doc["error"]))
+                for transition in jobTransitions[doc["id"]]:
+                    self.jobsdatabase.updateDocument(doc["id"], "JobDump", "stateTransition", fields=transition)
+
+        if summaryTransitions:
+            failedDocs = self.jsumdatabase.updateBulkDocumentsWithFunc(summaryTransitions, jobSummaryTransitionUpdate)
+            conflicts[self.jsumdatabase.name] = [doc["id"] for doc in failedDocs]
+            for doc in failedDocs:
+                logging.warning("Bulk state transition failed for job summary doc %s: %s. Retrying it.",
+                                doc["id"], doc.get("reason", doc["error"]))
+                for transition in summaryTransitions[doc["id"]]:
+                    self.jsumdatabase.updateDocument(doc["id"], "WMStatsAgent", "jobSummaryState",
+                                                     fields={"newstate": transition["newstate"],
+                                                             "timestamp": transition["timestamp"]})
+                    self.jsumdatabase.updateDocument(doc["id"], "WMStatsAgent", "jobStateTransition",
+                                                     fields=transition)
+
+        return conflicts
+
     def persist(self, jobs, newstate, oldstate):
         """
         _persist_
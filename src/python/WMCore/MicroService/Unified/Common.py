@@ -63,16 +63,16 @@ def dbsInfo(datasets, dbsUrl):
     if not datasets:
         return datasetBlocks, datasetSizes, datasetTransfers
 
-    urls = ['%s/blocks?detail=True&dataset=%s' % (dbsUrl, d) for d in datasets]
+    urls = [{'url': '%s/blocks' % dbsUrl, 'params': {'detail': True, 'dataset': d}} for d in datasets]
     logging.info("Executing %d requests against DBS 'blocks' API, with details", len(urls))
-    data = multi_getdata(urls, ckey(), cert())
+    data = multi_getdata(urls, ckey(), cert(), retries=2, decode=True)
 
     for row in data:
-        dataset = row['url'].split('=')[-1]
+        dataset = row['request']['params']['dataset']
         if row['data'] is None:
             print("FAILURE: dbsInfo for %s. Error: %s %s" % (dataset, row.get('code'), row.get('error')))
             continue
-        rows = json.loads(row['data'])
+        rows = row['data']
         blocks = []
         size = 0
         datasetTransfers.setdefault(dataset, {})  # flat dict in the format of blockName: blockSize
@@ -261,22 +261,21 @@ def getFileLumisInBlock(blocks, dbsUrl, validFileOnly=1):
     :return: a dict of blocks with list of file/run/lumi info
     """
     runLumisByBlock = {}
-    urls = ['%s/filelumis?validFileOnly=%d&block_name=%s' % (dbsUrl, validFileOnly, quote(b)) for b in blocks]
+    urls = [{'url': '%s/filelumis' % dbsUrl, 'params': {'validFileOnly': validFileOnly, 'block_name': b}}
+            for b in blocks]
     # limit it to 10 concurrent calls not to overload DBS
     logging.info("Executing %d requests against DBS 'filelumis' API, concurrency limited to 10", len(urls))
-    data = multi_getdata(urls, ckey(), cert(), num_conn=10)
+    data = multi_getdata(urls, ckey(), cert(), host_conn=10, retries=2, decode=True)
 
     for row in data:
-        blockName = unquote(row['url'].rsplit('=')[-1])
+        blockName = row['request']['params']['block_name']
         if row['data'] is None:
             msg = "Failure in getFileLumisInBlock for block %s. Error: %s %s" % (blockName,
                                                                                  row.get('code'),
                                                                                  row.get('error'))
             raise RuntimeError(msg)
-        rows = json.loads(row['data'])
         runLumisByBlock.setdefault(blockName, [])
-        for item in rows:
-            runLumisByBlock[blockName].append(item)
+        runLumisByBlock[blockName].extend(row['data'])
     return runLumisByBlock
 
 
@@ -289,11 +288,11 @@ def findBlockParents(blocks, dbsUrl):
     NOTE: Value `None` is returned in case the data-service failed to serve a given request.
     """
     parentsByBlock = {}
-    urls = ['%s/blockparents?block_name=%s' % (dbsUrl, quote(b)) for b in blocks]
+    urls = [{'url': '%s/blockparents' % dbsUrl, 'params': {'block_name': b}} for b in blocks]
     logging.info("Executing %d requests against DBS 'blockparents' API", len(urls))
-    data = multi_getdata(urls, ckey(), cert())
+    data = multi_getdata(urls, ckey(), cert(), retries=2, decode=True)
     for row in data:
-        blockName = unquote(row['url'].rsplit('=')[-1])
+        blockName = row['request']['params']['block_name']
         dataset = blockName.split("#")[0]
         if row['data'] is None:
             print("Failure in findBlockParents for block %s. Error: %s %s" % (blockName,
@@ -301,7 +300,7 @@ def findBlockParents(blocks, dbsUrl):
                                                                               row.get('error')))
             parentsByBlock.setdefault(dataset, None)
             continue
-        rows = json.loads(row['data'])
+        rows = row['data']
         try:
             if dataset in parentsByBlock and parentsByBlock[dataset] is None:
                 # then one of the block calls has failed, keep it failed!
@@ -1,15 +1,19 @@
 from __future__ import print_function
 
 import hashlib
+import itertools
 import json
+import threading
 import types
 import xml.sax.saxutils
 import zlib
+from collections import OrderedDict
 from traceback import format_exc
 
 import cherrypy
 
 from WMCore.REST.Error import RESTError, ExecutionError, report_rest_error
+from WMCore.Wrappers.JsonWrapper import getBackend
 
 try:
     from cherrypy.lib import httputil
@@ -197,7 +201,9 @@ class JSONFormat(RESTFormat):
     must inspect the X-REST-Status trailer header to find out if it got the
     complete output. No ETag header is generated in case of an exception.
 
-    The ETag generation is deterministic only if `cjson.encode()` output is
+    The objects are encoded with the `backend` JSON encoder, by default
+    the one of the process (cf. :mod:`WMCore.Wrappers.JsonWrapper`). The
+    ETag generation is deterministic only if the encoder output is
     deterministic for the input. Beware in particular the key order for a
     dict is arbitrary and may differ for two semantically identical dicts.
 
@@ -225,9 +231,13 @@ class JSONFormat(RESTFormat):
     to read and parse the stream incrementally one line at a time,
     facilitating maximum throughput processing of the response."""
 
+    def __init__(self, backend=None):
+        self.backend = backend
+
     def stream_chunked(self, stream, etag, preamble, trailer):
         """Generator for actually producing the output."""
         comma = " "
+        dumps = getBackend(self.backend).dumps
 
         try:
             if preamble:
@@ -236,7 +246,7 @@ class JSONFormat(RESTFormat):
 
             try:
                 for obj in stream:
-                    chunk = comma + json.dumps(obj) + "\n"
+                    chunk = comma + dumps(obj) + "\n"
                     etag.update(chunk)
                     yield chunk
                     comma = ","
@@ -245,7 +255,7 @@ class JSONFormat(RESTFormat):
                 trailer = None
                 raise
             except Exception as exp:
-                print("ERROR, json.dumps failed to serialize %s, type %s\nException: %s" \
+                print("ERROR, JSON encoder failed to serialize %s, type %s\nException: %s" \
                         % (obj, type(obj), str(exp)))
                 raise
             finally:
@@ -279,6 +289,7 @@ class PrettyJSONFormat(JSONFormat):
     def stream_chunked(self, stream, etag, preamble, trailer):
         """Generator for actually producing the output."""
         comma = " "
+        dumps = getBackend(self.backend).dumps
 
         try:
             if preamble:
@@ -287,7 +298,7 @@ class PrettyJSONFormat(JSONFormat):
 
             try:
                 for obj in stream:
-                    chunk = comma + json.dumps(obj, indent=2)
+                    chunk = comma + dumps(obj, indent=2)
                     etag.update(chunk)
                     yield chunk
                     comma = ","
@@ -488,22 +499,29 @@ def stream_compress(reply, available, compress_level, max_chunk):
     compression entirely."""
 
     global _stream_compressor
-    for enc in cherrypy.request.headers.elements('Accept-Encoding'):
-        if enc.value not in available:
-            continue
-
-        elif enc.value in _stream_compressor and compress_level > 0:
-            # Add 'Vary' header for 'Accept-Encoding'.
-            vary_by('Accept-Encoding')
+    encoding = _accepted_encoding(available, compress_level)
+    if encoding:
+        # Add 'Vary' header for 'Accept-Encoding'.
+        vary_by('Accept-Encoding')
 
-            # Compress contents at original chunk boundaries.
-            if 'Content-Length' in cherrypy.response.headers:
-                del cherrypy.response.headers['Content-Length']
-            cherrypy.response.headers['Content-Encoding'] = enc.value
-            return _stream_compressor[enc.value](reply, compress_level, max_chunk)
+        # Compress contents at original chunk boundaries.
+        if 'Content-Length' in cherrypy.response.headers:
+            del cherrypy.response.headers['Content-Length']
+        cherrypy.response.headers['Content-Encoding'] = encoding
+        return _stream_compressor[encoding](reply, compress_level, max_chunk)
 
     return reply
 
+def _accepted_encoding(available, compress_level):
+    """Return the first compression method of the Accept-Encoding request
+    header which is granted in `available` methods, None if there is none
+    or the `compress_level` disables compression."""
+    for enc in cherrypy.request.headers.elements('Accept-Encoding'):
+        if enc.value in available and enc.value in _stream_compressor \
+                and compress_level > 0:
+            return enc.value
+    return None
+
 def _etag_match(status, etagval, match, nomatch):
     """Match ETag value against any If-Match / If-None-Match headers."""
     # Execute conditions only for status 2xx. We only handle GET/HEAD
@@ -602,3 +620,173 @@ def stream_maybe_etag(size_limit, etag, reply):
     result = "".join(result)
     assert len(result) == size
     return result
+
+def _cache_key_value(value):
+    """Convert validated argument `value` to a hashable value for use in
+    a :class:`ResponseCache` key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _cache_key_value(v)) for k, v in value.items()))
+    elif isinstance(value, (set, frozenset)):
+        return tuple(sorted(_cache_key_value(v) for v in value))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_cache_key_value(v) for v in value)
+    return value
+
+def _compress_body(body, encoding, compress_level):
+    """Compress a whole response `body` with `encoding` method."""
+    if encoding == 'deflate':
+        z = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS,
+                             zlib.DEF_MEM_LEVEL, 0)
+        return z.compress(body) + z.flush()
+    return body
+
+class CachedResponse(object):
+    """A formatted response kept in :class:`ResponseCache`: the body output
+    by the formatter, its ETag value and the body compressed with each of
+    the encodings it was requested with, for the data `generation` it was
+    produced for."""
+
+    def __init__(self, key, generation, body, etag):
+        self.key = key
+        self.generation = generation
+        self.body = body
+        self.etag = etag
+        self.encoded = {'identity': body}
+
+    def size(self):
+        """Return the amount of memory used by the bodies of this response."""
+        return sum(len(body) for body in self.encoded.values())
+
+class ResponseCache(object):
+    """Cache of formatted and compressed responses of the API methods which
+    set ``response_cache`` keyword argument to :func:`restcall`, so repeated
+    requests for the same data are replied without calling the API method,
+    formatting nor compressing its output again.
+
+    Responses are keyed by API name, output format and validated arguments,
+    and are valid for the data generation returned by the API object
+    ``cache_generation`` callable, if any. A response is produced again when
+    the generation changes, or after it was removed with :meth:`invalidate`.
+    Least recently used responses are evicted to keep the total size of the
+    bodies below `max_size` bytes; responses bigger than `max_entry_size`
+    are not cached at all.
+
+    Only API methods whose output depends on nothing else than their
+    arguments and the data generation should use the cache: the response
+    headers set by the API method are not cached."""
+
+    def __init__(self, max_size=64 * 1024 * 1024, max_entry_size=None):
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size or max_size // 4
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(api, format, args, kwargs):
+        """Return the cache key for `api` output in `format` for the
+        validated `args` and `kwargs`."""
+        return (api, format, _cache_key_value(args), _cache_key_value(kwargs))
+
+    def get(self, key, generation=None):
+        """Return the cached response for `key` and data `generation`, None
+        if it is not cached. Responses cached for another generation are
+        removed."""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            if entry.generation != generation:
+                self.size -= entry.size()
+                return None
+            self.entries[key] = entry
+            return entry
+
+    def put(self, key, generation, body, etag):
+        """Cache the formatted response `body` with `etag` value for `key`
+        and data `generation`. Returns the cached response, or None if the
+        body is too big to be cached."""
+        if len(body) > self.max_entry_size:
+            return None
+        entry = CachedResponse(key, generation, body, etag)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size()
+            self.entries[key] = entry
+            self.size += entry.size()
+            self._evict()
+        return entry
+
+    def encode(self, entry, encoding, compress_level):
+        """Return the body of the cached response `entry` compressed with
+        `encoding`, compressing it only the first time it is requested."""
+        body = entry.encoded.get(encoding)
+        if body is None:
+            body = _compress_body(entry.body, encoding, compress_level)
+            with self.lock:
+                if encoding not in entry.encoded:
+                    entry.encoded[encoding] = body
+                    if self.entries.get(entry.key) is entry:
+                        self.size += len(body)
+                        self._evict()
+        return body
+
+    def invalidate(self, api=None):
+        """Remove the cached responses of `api`, or all of them if `api` is
+        None. Call this whenever data served by a cached API changes other
+        than through its ``cache_generation``."""
+        with self.lock:
+            for key in list(self.entries):
+                if api is None or key[0] == api:
+                    self.size -= self.entries.pop(key).size()
+
+    def _evict(self):
+        """Remove least recently used responses until the cache fits into
+        its maximum size. Must be called with the lock held."""
+        while self.size > self.max_size and self.entries:
+            dummyKey, entry = self.entries.popitem(last=False)
+            self.size -= entry.size()
+
+def cache_response(cache, key, generation, reply, etag):
+    """Buffer the formatted `reply` and store it with the `etag` value in
+    `cache` for `key` and data `generation`. Returns a tuple of the cached
+    response and None, or None and a generator over the whole `reply` if
+    it could not be cached: it is too big, the API method set the ETag
+    itself, or producing the reply failed. In the latter case the reply
+    should be output as if it had not been buffered here."""
+    size = 0
+    result = []
+    for chunk in reply:
+        result.append(chunk)
+        size += len(chunk)
+        if size > cache.max_entry_size:
+            return None, itertools.chain(result, reply)
+
+    res = cherrypy.response
+    etagval = etag.value()
+    if not etagval or 'ETag' in res.headers or res.headers.get('X-Error-HTTP', None):
+        return None, iter(result)
+
+    return cache.put(key, generation, "".join(result), etagval), None
+
+def reply_cached(cache, entry, available, compress_level):
+    """Respond with the cached response `entry`, compressed if requested
+    via Accept-Encoding request header and granted via `available` methods.
+    Sets the ETag header and handles If-Match and If-None-Match request
+    headers the same way as :func:`stream_maybe_etag`."""
+    req = cherrypy.request
+    res = cherrypy.response
+    encoding = _accepted_encoding(available, compress_level)
+    if encoding:
+        vary_by('Accept-Encoding')
+        res.headers['Content-Encoding'] = encoding
+
+    match = [str(x) for x in (req.headers.elements('If-Match') or [])]
+    nomatch = [str(x) for x in (req.headers.elements('If-None-Match') or [])]
+    res.headers['ETag'] = entry.etag
+    _etag_match(res.status or 200, entry.etag, match, nomatch)
+
+    body = cache.encode(entry, encoding or 'identity', compress_level)
+    res.headers['Content-Length'] = len(body)
+    return body
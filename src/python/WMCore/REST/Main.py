@@ -33,6 +33,7 @@ from cherrypy.lib import profiler
 ### Tools is needed for CRABServer startup: it sets up the tools attributes
 import WMCore.REST.Tools
 from WMCore.Configuration import ConfigSection, loadConfigurationFile
+from WMCore.Wrappers.JsonWrapper import setDefaultBackend
 from Utils.Utilities import lowerCmsHeaders
 
 #: Terminal controls to switch to "OK" status message colour.
@@ -186,7 +187,11 @@ class RESTMain(object):
         python's ``sys.setcheckinterval``; the default is to increase this
         to avoid unnecessarily frequent checks for python's GIL, global
         interpreter lock. In general we want each thread to complete as
-        quickly as possible without making unnecessary checks."""
+        quickly as possible without making unnecessary checks.
+
+        The pseudo-parameter ``json_backend`` (default: ``auto``) selects
+        the JSON encoder and decoder of the server process, as described
+        in :mod:`WMCore.Wrappers.JsonWrapper`."""
         cpconfig = cherrypy.config
 
         # Determine server local base.
@@ -213,6 +218,7 @@ class RESTMain(object):
         thread.stack_size(getattr(self.srvconfig, 'thread_stack_size', 128 * 1024))
         sys.setcheckinterval(getattr(self.srvconfig, 'sys_check_interval', 10000))
         self.silent = getattr(self.srvconfig, 'silent', False)
+        setDefaultBackend(getattr(self.srvconfig, 'json_backend', 'auto'))
 
         # Apply any override options from app config file.
         for section in ('engine', 'hooks', 'log', 'request', 'response',
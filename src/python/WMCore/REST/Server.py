@@ -508,6 +508,17 @@ class MiniRESTApi:
     These can be tuned per API with ``cherrypy.tools.expires(secs=n)``, or
     ``expires`` and ``expires_opts`` :func:`restcall` keyword arguments.
 
+    API methods serving the same large, slowly changing data to many clients
+    can set the ``response_cache`` :func:`restcall` keyword argument to keep
+    their formatted and compressed GET/HEAD responses in :attr:`response_cache`,
+    keyed by API, output format and validated arguments. Repeated requests
+    are then replied from memory without calling the API method at all. An
+    optional ``cache_generation`` callable returns the generation of the data
+    the API serves, responses cached for another generation are produced
+    again. PUT, POST and DELETE requests to an API invalidate its cached
+    responses; data changed by other means needs an explicit call to
+    :meth:`~.ResponseCache.invalidate` or a ``cache_generation``.
+
     .. rubric:: Notes
 
     .. note:: Only GET and HEAD requests are allowed to have a query string.
@@ -617,6 +628,13 @@ class MiniRESTApi:
        The API can override this value with ``compression_chunk`` keyword
        argument to :func:`restcall`.
 
+    .. attribute:: response_cache
+
+       The :class:`~.ResponseCache` of the API methods declared with the
+       ``response_cache`` keyword argument to :func:`restcall`. The default
+       holds up to 64 MB of responses; derived classes can replace it with
+       one of a different size.
+
     .. attribute:: default_expires
 
        Number, default expire time for GET / HEAD responses in seconds. The
@@ -648,6 +666,7 @@ class MiniRESTApi:
         self.formats = [('application/json', JSONFormat()),
                         ('application/xml', XMLFormat(self.app.appname))]
         self.methods = {}
+        self.response_cache = ResponseCache()
         self.default_expires = 3600
         self.default_expires_opts = []
 
@@ -800,8 +819,19 @@ class MiniRESTApi:
             v(apiobj, request.method, api, param, safe)
         validate_no_more_input(param)
 
-        # Invoke the method.
-        obj = apiobj['call'](*safe.args, **safe.kwargs)
+        # Invoke the method, unless its response is already cached. Requests
+        # which may modify the data invalidate the cached responses of the API.
+        cache_key = cached = generation = None
+        if apiobj.get('response_cache'):
+            if request.method == 'GET' or request.method == 'HEAD':
+                cache_key = self.response_cache.key(api, format, safe.args, safe.kwargs)
+                generation = apiobj.get('cache_generation', None)
+                generation = generation and generation()
+                cached = self.response_cache.get(cache_key, generation)
+            else:
+                self.response_cache.invalidate(api)
+        if not cached:
+            obj = apiobj['call'](*safe.args, **safe.kwargs)
 
         # Add Vary: Accept header.
         vary_by('Accept')
@@ -832,9 +862,16 @@ class MiniRESTApi:
         response.headers['X-REST-Status'] = 100
         response.headers['Content-Type'] = format
         etagger = apiobj.get('etagger', None) or SHA1ETag()
-        reply = stream_compress(fmthandler(obj, etagger),
-                                apiobj.get('compression', self.compression),
-                                apiobj.get('compression_level', self.compression_level),
+        compression = apiobj.get('compression', self.compression)
+        compression_level = apiobj.get('compression_level', self.compression_level)
+        reply = None
+        if cache_key and not cached:
+            cached, reply = cache_response(self.response_cache, cache_key, generation,
+                                           fmthandler(obj, etagger), etagger)
+        if cached:
+            return reply_cached(self.response_cache, cached, compression, compression_level)
+
+        reply = stream_compress(reply or fmthandler(obj, etagger), compression, compression_level,
                                 apiobj.get('compression_chunk', self.compression_chunk))
         return stream_maybe_etag(apiobj.get('etag_limit', self.etag_limit), etagger, reply)
 
@@ -2356,6 +2393,8 @@ def restcall(func=None, args=None, generate="result", **kwargs):
     compression         "Accept-Encoding" methods, empty disables compression.
     compression_level   ZLIB compression level for output (0 .. 9).
     compression_chunk   Approximate amount of output to compress at once.
+    response_cache      Keep the formatted GET/HEAD responses in memory.
+    cache_generation    Callable returning the generation of cached data.
     =================== ======================================================
 
     :returns: The original function suitably enriched with attributes if
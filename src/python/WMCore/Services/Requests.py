@@ -33,12 +33,12 @@ except ImportError:
     from urllib.parse import urlparse
 from io import BytesIO
 from httplib import HTTPException
-from json import JSONEncoder, JSONDecoder
 
 from Utils.CertTools import getKeyCertFromEnv, getCAPathFromEnv
 from WMCore.Algorithms import Permissions
 from WMCore.Lexicon import sanitizeURL
 from WMCore.WMException import WMException
+from WMCore.Wrappers.JsonWrapper import getBackend
 from WMCore.Wrappers.JsonWrapper.JSONThunker import JSONThunker
 
 try:
@@ -83,7 +83,8 @@ class Requests(dict):
         self.pycurl = idict.get('pycurl', True)
         self.capath = idict.get('capath', None)
         if self.pycurl:
-            self.reqmgr = RequestHandler()
+            # keep-alive connections are shared by all the instances of the process
+            self.reqmgr = RequestHandler(config={'reuseConnections': idict.get('reuse_connections', True)})
 
         # set up defaults
         self.setdefault("accept_type", 'text/html')
@@ -541,31 +542,32 @@ class Requests(dict):
 
 class JSONRequests(Requests):
     """
-    Example implementation of Requests that encodes data to/from JSON.
+    Example implementation of Requests that encodes data to/from JSON, with
+    the JSON backend named by the json_backend key of idict, by default the
+    one of the process.
     """
 
     def __init__(self, url='http://localhost:8080', idict={}):
         Requests.__init__(self, url, idict)
         self['accept_type'] = "application/json"
         self['content_type'] = "application/json"
+        self.jsonBackend = (idict or {}).get('json_backend')
 
     def encode(self, data):
         """
         encode data as json
         """
-        encoder = JSONEncoder()
         thunker = JSONThunker()
         thunked = thunker.thunk(data)
-        return encoder.encode(thunked)
+        return getBackend(self.jsonBackend).dumps(thunked)
 
     def decode(self, data):
         """
         decode the data to python from json
         """
         if data:
-            decoder = JSONDecoder()
             thunker = JSONThunker()
-            data = decoder.decode(data)
+            data = getBackend(self.jsonBackend).loads(data)
             unthunked = thunker.unthunk(data)
             return unthunked
         return {}
@@ -297,6 +297,48 @@ class WMStatsReader(object):
     def getActiveData(self, listStatuses, jobInfoFlag=False):
         return self.getRequestByStatus(listStatuses, jobInfoFlag)
 
+    def getUpdateSequences(self):
+        """
+        Return the current update sequences of the request and wmstats
+        databases, to follow their changes from this point
+        """
+        return (self.reqDB.getDBInstance().info()['update_seq'],
+                self.couchDB.info()['update_seq'])
+
+    def getRequestChanges(self, since):
+        """
+        Return the request documents changed since the update sequence of the
+        request database, by request name, None for deleted requests, and
+        the last sequence of the changes
+        """
+        data = self.reqDB.getDBInstance().changes(since=since, include_docs=True)
+        requestChanges = {}
+        for row in data['results']:
+            if row['id'].startswith("_design/"):
+                continue
+            if row.get('deleted'):
+                requestChanges[row['id']] = None
+            else:
+                self.reqDB._filterCouchInfo(row['doc'])
+                requestChanges[row['doc'].get('RequestName', row['id'])] = row['doc']
+        return requestChanges, data['last_seq']
+
+    def getJobInfoChanges(self, since):
+        """
+        Return the agent_request documents changed since the update sequence
+        of the wmstats database, the ids of the deleted documents and the
+        last sequence of the changes
+        """
+        data = self.couchDB.changes(since=since, include_docs=True)
+        jobInfoDocs = []
+        deletedIDs = set()
+        for row in data['results']:
+            if row.get('deleted'):
+                deletedIDs.add(row['id'])
+            elif row['doc'].get('type') == "agent_request":
+                jobInfoDocs.append(row['doc'])
+        return jobInfoDocs, deletedIDs, data['last_seq']
+
     def getT0ActiveData(self, jobInfoFlag=False):
 
         return self.getRequestByStatus(T0_ACTIVE_STATUS, jobInfoFlag)
@@ -35,11 +35,16 @@ urls = [url1, url2, url3]
 data = getdata(urls, ckey, cert, cookie=cookie)
 for row in data:
     print(row)
+
+# RequestHandler reuses curl handles, and their open connections, through
+# a process wide pool; the pool statistics can be inspected with
+print(getHandlePool().stats())
 """
 from __future__ import print_function
 
 
 # system modules
+import heapq
 import httplib
 import json
 import logging
@@ -47,13 +52,18 @@ import os
 import re
 import subprocess
 import sys
+import threading
+import time
 import pycurl
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from io import BytesIO
 try:
     from urllib import urlencode
+    from urlparse import urlparse
 except ImportError:
     # PY3
-    from urllib.parse import urlencode
+    from urllib.parse import urlencode, urlparse
 
 
 class ResponseHeader(object):
@@ -91,6 +101,172 @@ class ResponseHeader(object):
                 pass
 
 
+class CurlHandlePool(object):
+    """
+    Thread safe pool of reusable pycurl handles.
+
+    Handles are kept per endpoint (scheme, host, port) and credentials, so
+    that a handle coming back from the pool still holds an open (keep-alive)
+    connection to the server and a request doesn't pay the TCP and TLS setup
+    again. The handles of an endpoint also share their DNS and TLS session
+    caches, and HTTP/2 is negotiated over https when libcurl supports it.
+    At most maxHandles requests run at the same time against an endpoint,
+    further requests wait for a free handle.
+    """
+
+    def __init__(self, maxHandles=10, http2=True):
+        self.maxHandles = maxHandles
+        self.http2 = http2 and httpVersion2() is not None
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+        self._shares = {}
+        self._stats = {'hits': 0, 'misses': 0, 'reconnects': 0, 'inFlight': 0}
+
+    @staticmethod
+    def poolKey(url, ckey=None, cert=None, capath=None, cookie=None):
+        """
+        Key of the handles able to serve a request: the endpoint and the
+        credentials and cookie file used to contact it.
+        """
+        parsed = urlparse(url)
+        return (parsed.scheme, parsed.hostname, parsed.port, ckey, cert, capath, cookie)
+
+    def _newHandle(self, key):
+        """
+        Create a new handle for an endpoint, sharing its DNS and TLS caches
+        """
+        if key not in self._shares:
+            share = pycurl.CurlShare()
+            share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+            share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+            self._shares[key] = share
+        curl = pycurl.Curl()
+        # the share is kept by reset()
+        curl.setopt(pycurl.SHARE, self._shares[key])
+        return curl
+
+    def acquire(self, key):
+        """
+        Get a handle for the given pool key, waiting for one of the
+        endpoint handles to be released if all of them are in use.
+        """
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self.maxHandles)
+                self._idle[key] = []
+            slots = self._slots[key]
+        slots.acquire()
+        with self._lock:
+            try:
+                if self._idle[key]:
+                    curl = self._idle[key].pop()
+                    curl.reused = True
+                else:
+                    curl = self._newHandle(key)
+                    curl.reused = False
+            except:
+                slots.release()
+                raise
+            self._stats['inFlight'] += 1
+            self._stats['hits' if curl.reused else 'misses'] += 1
+        # options are reset, the connection cache of the handle is kept
+        curl.reset()
+        if self.http2:
+            curl.setopt(pycurl.HTTP_VERSION, httpVersion2())
+        return curl
+
+    def release(self, key, curl, reuse=True):
+        """
+        Give a handle back to the pool, closing it if it must not be reused,
+        e.g. after a transfer error.
+        """
+        reconnected = False
+        if reuse and curl.reused:
+            try:
+                # a reused handle had to open a new connection, the server
+                # closed the previous one
+                reconnected = curl.getinfo(pycurl.NUM_CONNECTS) > 0
+            except pycurl.error:
+                pass
+        with self._lock:
+            self._stats['inFlight'] -= 1
+            if reconnected:
+                self._stats['reconnects'] += 1
+            if reuse:
+                self._idle[key].append(curl)
+        if not reuse:
+            curl.close()
+        self._slots[key].release()
+
+    @contextmanager
+    def handle(self, key):
+        """
+        Context manager acquiring and releasing a handle, which is discarded
+        if the block raises a pycurl error.
+        """
+        curl = self.acquire(key)
+        try:
+            yield curl
+        except pycurl.error:
+            self.release(key, curl, reuse=False)
+            raise
+        except:
+            self.release(key, curl)
+            raise
+        else:
+            self.release(key, curl)
+
+    def stats(self):
+        """
+        Return the pool statistics: handles reused (hits) or created
+        (misses), reused handles which had to reconnect, requests in flight
+        and idle handles.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = sum(len(handles) for handles in self._idle.values())
+            stats['endpoints'] = len(self._slots)
+        return stats
+
+    def clear(self):
+        """
+        Close all the idle handles and their connections.
+        """
+        with self._lock:
+            for key, handles in self._idle.items():
+                for curl in handles:
+                    curl.close()
+                self._idle[key] = []
+
+
+_HANDLE_POOL = None
+_HANDLE_POOL_LOCK = threading.Lock()
+
+
+def getHandlePool():
+    """
+    Return the process wide pool of curl handles. A forked process gets its
+    own pool, connections must not be shared with the parent process.
+    """
+    global _HANDLE_POOL
+    with _HANDLE_POOL_LOCK:
+        if _HANDLE_POOL is None or _HANDLE_POOL.pid != os.getpid():
+            _HANDLE_POOL = CurlHandlePool()
+        return _HANDLE_POOL
+
+
+def httpVersion2():
+    """
+    Return the libcurl HTTP version option asking for HTTP/2 over TLS
+    (with HTTP/1.1 fallback), None if libcurl doesn't support HTTP/2.
+    """
+    if not pycurl.version_info()[4] & getattr(pycurl, 'VERSION_HTTP2', 0):
+        return None
+    return getattr(pycurl, 'CURL_HTTP_VERSION_2TLS', None)
+
+
 class RequestHandler(object):
     """
     RequestHandler provides APIs to fetch single/multiple
@@ -107,6 +283,7 @@ class RequestHandler(object):
         self.connecttimeout = config.get('connecttimeout', defaultOpts['CONNECTTIMEOUT'])
         self.followlocation = config.get('followlocation', defaultOpts['FOLLOWLOCATION'])
         self.maxredirs = config.get('maxredirs', defaultOpts['MAXREDIRS'])
+        self.reuseConnections = config.get('reuseConnections', True)
         self.logger = logger if logger else logging.getLogger()
 
     def encode_params(self, params, verb, doseq, encode):
@@ -246,7 +423,23 @@ class RequestHandler(object):
                 verbose=0, ckey=None, cert=None, capath=None,
                 doseq=True, encode=False, decode=False, cainfo=None, cookie=None):
         """Fetch data for given set of parameters"""
-        curl = pycurl.Curl()
+        if not self.reuseConnections:
+            curl = pycurl.Curl()
+            try:
+                return self._request(curl, url, params, headers, verb, verbose, ckey, cert,
+                                     capath, doseq, encode, decode, cainfo, cookie)
+            finally:
+                curl.close()
+
+        pool = getHandlePool()
+        key = pool.poolKey(url, ckey, cert, capath, cookie.get(url) if cookie else None)
+        with pool.handle(key) as curl:
+            return self._request(curl, url, params, headers, verb, verbose, ckey, cert,
+                                 capath, doseq, encode, decode, cainfo, cookie)
+
+    def _request(self, curl, url, params, headers, verb, verbose, ckey, cert,
+                 capath, doseq, encode, decode, cainfo, cookie):
+        """Perform the request with the given curl handle"""
         bbuf, hbuf = self.set_opts(curl, url, params, headers, ckey, cert, capath,
                                    verbose, verb, doseq, encode, cainfo, cookie)
         curl.perform()
@@ -339,6 +532,10 @@ HTTP_PAT = re.compile( \
     "(https|http)://[-A-Za-z0-9_+&@#/%?=~_|!:,.;]*[-A-Za-z0-9+&@#/%=~_|]")
 
 
+# HTTP statuses worth retrying a request for
+RETRY_CODES = (429, 500, 502, 503, 504)
+
+
 def validate_url(url):
     "Validate URL"
     if HTTP_PAT.match(url):
@@ -368,20 +565,42 @@ def cern_sso_cookie(url, fname, cert, ckey):
     proc.wait()
 
 
-def getdata(urls, ckey, cert, headers=None, options=None, num_conn=50, cookie=None):
+def getdata(urls, ckey, cert, headers=None, options=None, num_conn=50, cookie=None,
+            verb='GET', host_conn=None, retries=0, backoff=1, decode=False, capath=None):
     """
     Get data for given list of urls, using provided number of connections
-    and user credentials
+    and user credentials.
+
+    Each item of urls is either an url or a dictionary describing the request,
+    {'url': url, 'verb': verb, 'params': params, 'headers': headers}, where
+    params are url encoded for GET requests and JSON encoded for POST and PUT.
+    At most host_conn requests run at the same time against the same host.
+    Requests failing with a transfer error or a RETRY_CODES status are retried
+    up to retries times, waiting backoff, 2*backoff, 4*backoff... seconds.
+
+    Results are yielded as soon as each transfer completes, as a dictionary
+    with the 'url', the response 'data', 'headers' and 'status', and the
+    'request' dictionary. Failed requests have None data, an 'error' message
+    and an error 'code' (the curl error code or, when decoding, the HTTP status).
+    With decode=True the data of each response is decoded from JSON once it
+    completes, JSON streams (one document per line) are decoded into a list.
     """
-
     if not options:
         options = pycurl_options()
-
-    # Make a queue with urls
-    queue = [u for u in urls if validate_url(u)]
-
-    # Check args
-    num_urls = len(queue)
+    config = dict((key.lower(), val) for key, val in options.items())
+    mgr = RequestHandler(config=config)
+    headers = headers or {}
+    host_conn = host_conn or num_conn
+
+    # Make queues of requests per host
+    queues = OrderedDict()
+    num_urls = 0
+    for item in urls:
+        request = item if isinstance(item, dict) else {'url': item}
+        if not validate_url(request['url']):
+            continue
+        queues.setdefault(urlparse(request['url']).netloc, deque()).append((request, 0))
+        num_urls += 1
     num_conn = min(num_conn, num_urls)
 
     # Pre-allocate a list of curl objects
@@ -389,85 +608,112 @@ def getdata(urls, ckey, cert, headers=None, options=None, num_conn=50, cookie=No
     mcurl.handles = []
     for _ in range(num_conn):
         curl = pycurl.Curl()
-        curl.fp = None
-        for key, val in options.items():
-            curl.setopt(getattr(pycurl, key), val)
-        curl.setopt(pycurl.SSLKEY, ckey)
-        curl.setopt(pycurl.SSLCERT, cert)
+        curl.hbuf = None
+        curl.bbuf = None
         mcurl.handles.append(curl)
-        if headers:
-            curl.setopt(pycurl.HTTPHEADER, \
-                        ["%s: %s" % (k, v) for k, v in headers.items()])
 
     # Main loop
     freelist = mcurl.handles[:]
-    num_processed = 0
-    while num_processed < num_urls:
-        # If there is an url to process and a free curl object,
-        # add to multi-stack
-        while queue and freelist:
-            url = queue.pop(0)
-            curl = freelist.pop()
-            curl.setopt(pycurl.URL, url.encode('ascii', 'ignore'))
-            if cookie and url in cookie:
-                curl.setopt(pycurl.COOKIEFILE, cookie[url])
-                curl.setopt(pycurl.COOKIEJAR, cookie[url])
-            bbuf = BytesIO()
-            hbuf = BytesIO()
-            curl.setopt(pycurl.WRITEFUNCTION, bbuf.write)
-            curl.setopt(pycurl.HEADERFUNCTION, hbuf.write)
-            mcurl.add_handle(curl)
-            # store some info
-            curl.hbuf = hbuf
-            curl.bbuf = bbuf
-            curl.url = url
-        # Run the internal curl state machine for the multi stack
-        while True:
-            ret, _ = mcurl.perform()
-            if ret != pycurl.E_CALL_MULTI_PERFORM:
-                break
-        # Check for curl objects which have terminated, and add them to the
-        # freelist
-        while True:
-            num_q, ok_list, err_list = mcurl.info_read()
-            for curl in ok_list:
-                if sys.version.startswith('3.'):
-                    hdrs = curl.hbuf.getvalue().decode('utf-8')
-                    data = curl.bbuf.getvalue().decode('utf-8')
-                else:
+    delayed = []  # heap of (time, sequence, request, attempt) waiting to be retried
+    active = {}  # number of requests running per host
+    sequence = 0
+    try:
+        while queues or delayed or len(freelist) < num_conn:
+            now = time.time()
+            while delayed and delayed[0][0] <= now:
+                _, _, request, attempt = heapq.heappop(delayed)
+                queues.setdefault(urlparse(request['url']).netloc, deque()).append((request, attempt))
+            # Add requests to the multi-stack while there are free curl
+            # objects, in turn for the hosts below their concurrency limit
+            for host in list(queues):
+                queue = queues[host]
+                while queue and freelist and active.get(host, 0) < host_conn:
+                    request, attempt = queue.popleft()
+                    curl = freelist.pop()
+                    # keep the connection cache of the handle, but reset its options
+                    curl.reset()
+                    reqHeaders = dict(headers)
+                    reqHeaders.update(request.get('headers', {}))
+                    curl.bbuf, curl.hbuf = mgr.set_opts(curl, request['url'], request.get('params'), reqHeaders,
+                                                        ckey=ckey, cert=cert, capath=capath,
+                                                        verbose=options.get('VERBOSE'),
+                                                        verb=request.get('verb', verb), encode=True,
+                                                        cookie=cookie)
+                    curl.request = request
+                    curl.attempt = attempt
+                    curl.host = host
+                    active[host] = active.get(host, 0) + 1
+                    mcurl.add_handle(curl)
+                if not queue:
+                    del queues[host]
+            # Run the internal curl state machine for the multi stack
+            while True:
+                ret, _ = mcurl.perform()
+                if ret != pycurl.E_CALL_MULTI_PERFORM:
+                    break
+            # Check for curl objects which have terminated, and add them to the
+            # freelist
+            while True:
+                num_q, ok_list, err_list = mcurl.info_read()
+                done = [(curl, None, None) for curl in ok_list] + err_list
+                for curl, errno, errmsg in done:
                     hdrs = curl.hbuf.getvalue()
                     data = curl.bbuf.getvalue()
-                url = curl.url
-                curl.bbuf.flush()
-                curl.bbuf.close()
-                curl.hbuf.close()
-                curl.hbuf = None
-                curl.bbuf = None
-                mcurl.remove_handle(curl)
-                freelist.append(curl)
-                yield {'url': url, 'data': data, 'headers': hdrs}
-            for curl, errno, errmsg in err_list:
-                hdrs = curl.hbuf.getvalue()
-                data = curl.bbuf.getvalue()
-                url = curl.url
-                curl.bbuf.flush()
-                curl.bbuf.close()
-                curl.hbuf.close()
-                curl.hbuf = None
-                curl.bbuf = None
-                mcurl.remove_handle(curl)
-                freelist.append(curl)
-                yield {'url': url, 'data': None, 'headers': hdrs, \
-                       'error': errmsg, 'code': errno}
-            num_processed = num_processed + len(ok_list) + len(err_list)
-            if num_q == 0:
-                break
-        # Currently no more I/O is pending, could do something in the meantime
-        # (display a progress bar, etc.).
-        # We just call select() to sleep until some more data is available.
-        mcurl.select(1.0)
-
-    cleanup(mcurl)
+                    if sys.version.startswith('3.'):
+                        hdrs = hdrs.decode('utf-8')
+                        data = data.decode('utf-8')
+                    status = curl.getinfo(pycurl.RESPONSE_CODE) if errno is None else None
+                    request, attempt = curl.request, curl.attempt
+                    curl.bbuf.close()
+                    curl.hbuf.close()
+                    curl.hbuf = None
+                    curl.bbuf = None
+                    curl.request = None
+                    mcurl.remove_handle(curl)
+                    freelist.append(curl)
+                    active[curl.host] -= 1
+                    if (errno is not None or status in RETRY_CODES) and attempt < retries:
+                        sequence += 1
+                        heapq.heappush(delayed, (time.time() + backoff * 2 ** attempt, sequence, request, attempt + 1))
+                        continue
+                    row = {'url': request['url'], 'data': data, 'headers': hdrs,
+                           'status': status, 'request': request}
+                    if errno is not None:
+                        row.update({'data': None, 'error': errmsg, 'code': errno})
+                    elif decode:
+                        decode_row(row)
+                    yield row
+                if num_q == 0:
+                    break
+            # Currently no more I/O is pending, wait for some more data to be
+            # available, or for the next request to retry
+            timeout = 1.0
+            if delayed:
+                timeout = max(0.0, min(timeout, delayed[0][0] - time.time()))
+            if len(freelist) < num_conn:
+                mcurl.select(timeout)
+            elif not queues and delayed:
+                time.sleep(timeout)
+    finally:
+        cleanup(mcurl)
+
+
+def decode_row(row):
+    """
+    Decode the JSON data of a getdata result in place, turning HTTP errors
+    and undecodable data into failures
+    """
+    header = ResponseHeader(row['headers'])
+    if row['status'] >= 400:
+        row.update({'data': None, 'error': header.reason or 'HTTP error', 'code': row['status']})
+        return
+    try:
+        if 'x-json-stream' in header.header.get('Content-Type', ''):
+            row['data'] = [json.loads(line) for line in row['data'].splitlines() if line.strip()]
+        else:
+            row['data'] = json.loads(row['data'])
+    except ValueError as exc:
+        row.update({'data': None, 'error': 'Unable to load JSON data, %s' % str(exc), 'code': None})
 
 
 def cleanup(mcurl):
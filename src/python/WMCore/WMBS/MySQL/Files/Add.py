@@ -10,6 +10,9 @@ class Add(DBFormatter):
              VALUES (:lfn, :filesize, :events, :first_event,
                      :merged)"""
 
+    # order of the values in the rows inserted for a list of files
+    columns = ("lfn", "filesize", "events", "first_event", "merged")
+
     def getBinds(self, files=None, size=0, events=0, cksum=0,
                  first_event=0, merged=False):
         # Can't use self.dbi.buildbinds here...
@@ -32,11 +35,25 @@ class Add(DBFormatter):
                               })
         return binds
 
+    def getRows(self, files):
+        """
+        _getRows_
+
+        Pack the values of a list of tuples containing lfn, size, events,
+        cksum, first event and merged flag in the order of columns
+        """
+        return [(f[0], f[1], f[2], f[4], int(f[5])) for f in files]
+
     def execute(self, files=None, size=0, events=0, cksum=0,
                 first_event=0, merged=False, conn=None,
                 transaction=False):
+        if isinstance(files, (list, set)):
+            self.dbi.insertRows(self.sql, self.columns, self.getRows(files),
+                                conn=conn, transaction=transaction)
+            return
+
         binds = self.getBinds(files, size, events, cksum, first_event,
                               merged)
-        result = self.dbi.processData(self.sql, binds,
-                                      conn=conn, transaction=transaction)
+        self.dbi.processData(self.sql, binds,
+                             conn=conn, transaction=transaction)
         return
@@ -5,49 +5,84 @@ _AddRunLumi_
 MySQL implementation of AddRunLumi
 """
 
-from Utils.IteratorTools import grouper
 from WMCore.Database.DBFormatter import DBFormatter
 
 
 class AddRunLumi(DBFormatter):
-    sql = """INSERT IGNORE wmbs_file_runlumi_map (fileid, run, lumi, num_events)
-            select id, :run, :lumi, :num_events from wmbs_file_details
-            where lfn = :lfn"""
+    """
+    _AddRunLumi_
 
-    def getBinds(self, filename=None, runs=None):
+    Add the runs and lumis of files, looking up the ids of the files once
+    and inserting the lumis as rows of packed values.
+    """
+    fileIDSQL = "SELECT id, lfn FROM wmbs_file_details WHERE lfn = :lfn"
 
-        binds = []
+    sql = """INSERT IGNORE INTO wmbs_file_runlumi_map (fileid, run, lumi, num_events)
+               VALUES (:fileid, :run, :lumi, :num_events)"""
 
+    # order of the values in the inserted rows
+    columns = ("fileid", "run", "lumi", "num_events")
+
+    def getFileRuns(self, filename=None, runs=None):
+        """
+        _getFileRuns_
+
+        Return a list of (lfn, runs) for a single file or a list of
+        {'lfn': lfn, 'runs': runs} dictionaries
+        """
         if isinstance(filename, list):
+            fileRuns = []
             for entry in filename:
-                binds.extend(self.getBinds(filename=entry['lfn'], runs=entry['runs']))
-            return binds
+                fileRuns.extend(self.getFileRuns(filename=entry['lfn'], runs=entry['runs']))
+            return fileRuns
 
         if isinstance(filename, basestring):
             lfn = filename
         elif isinstance(filename, dict):
-            lfn = filename('lfn')
+            lfn = filename['lfn']
         else:
             raise Exception("Type of filename argument is not allowed: %s" \
                             % type(filename))
 
-        if isinstance(runs, set):
-            for run in runs:
-                for lumi in run:
-                    binds.append({'lfn': lfn,
-                                  'run': run.run,
-                                  'lumi': lumi,
-                                  'num_events': run.getEventsByLumi(lumi)})
-        else:
+        if not isinstance(runs, set):
             raise Exception("Type of runs argument is not allowed: %s" \
                             % type(runs))
-        return binds
+        return [(lfn, runs)]
 
-    def format(self, result):
-        return True
+    def getFileIDs(self, lfns, conn=None, transaction=False):
+        """
+        _getFileIDs_
+
+        Return the ids of the files, by lfn, with a single batched select
+        """
+        if not lfns:
+            return {}
+        binds = [{'lfn': lfn} for lfn in lfns]
+        results = self.dbi.processData(self.fileIDSQL, binds, conn=conn,
+                                       transaction=transaction)
+        return dict((result['lfn'], result['id']) for result in self.formatDict(results))
+
+    def getRows(self, fileRuns, fileIDs):
+        """
+        _getRows_
+
+        Build the rows of values of all the lumis in a single pass. Files
+        which don't exist are skipped, as the insert ... select did.
+        """
+        rows = []
+        for lfn, runs in fileRuns:
+            fileID = fileIDs.get(lfn)
+            if fileID is None:
+                continue
+            for run in runs:
+                runNumber = run.run
+                rows.extend([(fileID, runNumber, lumi, events) for lumi, events in run.eventsPerLumi.items()])
+        return rows
 
     def execute(self, file=None, runs=None, conn=None, transaction=False):
-        for sliceBinds in grouper(self.getBinds(file, runs), 10000):
-            result = self.dbi.processData(self.sql, sliceBinds, conn=conn,
-                                          transaction=transaction)
-        return self.format(result)
+        fileRuns = self.getFileRuns(file, runs)
+        fileIDs = self.getFileIDs(set([lfn for lfn, _ in fileRuns]), conn=conn,
+                                  transaction=transaction)
+        self.dbi.insertRows(self.sql, self.columns, self.getRows(fileRuns, fileIDs),
+                            conn=conn, transaction=transaction)
+        return True
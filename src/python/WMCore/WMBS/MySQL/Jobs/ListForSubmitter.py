@@ -30,7 +30,11 @@ class ListForSubmitter(DBFormatter):
                  wmbs_job.state = wmbs_job_state.id
                INNER JOIN wmbs_workflow ON
                  wmbs_subscription.workflow = wmbs_workflow.id
-             WHERE wmbs_job_state.name = 'created'
+             WHERE wmbs_job_state.name = 'created'"""
+
+    min_state_time_sql = " AND wmbs_job.state_time >= :minstatetime"
+
+    order_sql = """
              ORDER BY
                wmbs_sub_types.priority DESC,
                wmbs_workflow.priority DESC,
@@ -38,12 +42,22 @@ class ListForSubmitter(DBFormatter):
 
     limit_sql = " limit %d"
 
-    def execute(self, conn=None, transaction=False, limitRows=None):
+    columnar = True
+
+    def execute(self, conn=None, transaction=False, limitRows=None, minStateTime=None):
+        """
+        List the jobs in created state, only the ones which entered it at
+        or after minStateTime if it's provided.
+        """
+        sql = self.sql
+        binds = {}
+        if minStateTime is not None:
+            sql += self.min_state_time_sql
+            binds['minstatetime'] = minStateTime
+        sql += self.order_sql
         if limitRows:
-            extraSql = self.limit_sql % limitRows
-        else:
-            extraSql = ""
+            sql += self.limit_sql % limitRows
 
-        result = self.dbi.processData(self.sql + extraSql, conn=conn,
-                                      transaction=transaction)
+        result = self.dbi.processData(sql, binds, conn=conn,
+                                      transaction=transaction, columnar=self.columnar)
         return self.formatDict(result)
@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+"""
+_ListLeftState_
+
+MySQL implementation of Jobs.ListLeftState
+"""
+
+from WMCore.Database.DBFormatter import DBFormatter
+
+
+class ListLeftState(DBFormatter):
+    """
+    DAO to list the ids of the jobs which are not in a given state and
+    changed state at or after a given time, e.g. to find the jobs which
+    left that state since then.
+    """
+    sql = """SELECT wmbs_job.id FROM wmbs_job
+               INNER JOIN wmbs_job_state ON
+                 wmbs_job.state = wmbs_job_state.id
+             WHERE wmbs_job.state_time >= :minstatetime AND
+                   wmbs_job_state.name != :state"""
+
+    def execute(self, state, minStateTime, conn=None, transaction=False):
+        result = self.dbi.processData(self.sql, {'state': state, 'minstatetime': minStateTime},
+                                      conn=conn, transaction=transaction)
+        return self.formatList(result)
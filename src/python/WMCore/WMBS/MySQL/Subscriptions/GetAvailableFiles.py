@@ -9,6 +9,7 @@ Available means not acquired, complete or failed.
 """
 
 from WMCore.Database.DBFormatter import DBFormatter
+from WMCore.Database.ResultSet import ColumnResultSet
 
 
 class GetAvailableFiles(DBFormatter):
@@ -17,37 +18,48 @@ class GetAvailableFiles(DBFormatter):
                INNER JOIN wmbs_pnns wpnn ON wpnn.id = wfl.pnn
              WHERE wsfa.subscription = :subscription"""
 
+    columnar = True
+
     def formatDict(self, results):
         """
         _formatDict_
 
-        Cast the file column to an integer as the DBFormatter's formatDict()
-        method turns everything into strings.  Also, fixup the results of the
-        Oracle query by renaming 'fileid' to file.
+        Group the locations by file, reading the file and pnn columns straight
+        from the result sets instead of building a dictionary for every row.
+        The file column may be named either 'file' or 'fileid', and queries
+        without a pnn column return no locations.
         """
-        formattedResults = DBFormatter.formatDict(self, results)
-
-        for formattedResult in formattedResults:
-            if "file" in formattedResult.keys():
-                formattedResult["file"] = int(formattedResult["file"])
+        fileIDs = []
+        locations = {}
+        for result in results:
+            # the keys of a row based result set come from its first row
+            if not result.keys:
+                result.close()
+                continue
+            keys = [str(key).lower() for key in result.keys]
+            if isinstance(result, ColumnResultSet):
+                columns = result.columns
             else:
-                formattedResult["file"] = int(formattedResult["fileid"])
-
-        # Now the tricky part
-        tempResults = {}
-        for formattedResult in formattedResults:
-            fileID = formattedResult['file']
-            if fileID not in tempResults.keys():
-                tempResults[fileID] = []
-            if "pnn" in formattedResult.keys():
-                if not formattedResult['pnn'] in tempResults[fileID]:
-                    tempResults[fileID].append(formattedResult["pnn"])
+                columns = list(zip(*result.fetchall())) or [[] for _ in keys]
+                result.close()
+
+            fileColumn = columns[keys.index("file") if "file" in keys else keys.index("fileid")]
+            pnnColumn = columns[keys.index("pnn")] if "pnn" in keys else None
+            for rowIndex, fileID in enumerate(fileColumn):
+                fileID = int(fileID)
+                if fileID not in locations:
+                    fileIDs.append(fileID)
+                    locations[fileID] = []
+                if pnnColumn is not None:
+                    pnn = str(pnnColumn[rowIndex])
+                    if pnn not in locations[fileID]:
+                        locations[fileID].append(pnn)
 
         finalResults = []
-        for key in tempResults.keys():
-            tmpDict = {"file": key}
-            if not tempResults[key] == []:
-                tmpDict['locations'] = tempResults[key]
+        for fileID in fileIDs:
+            tmpDict = {"file": fileID}
+            if locations[fileID]:
+                tmpDict['locations'] = locations[fileID]
             finalResults.append(tmpDict)
 
         return finalResults
@@ -59,5 +71,6 @@ class GetAvailableFiles(DBFormatter):
                                         returnCursor=returnCursor)
 
         results = self.dbi.processData(self.sql, {"subscription": subscription},
-                                       conn=conn, transaction=transaction)
+                                       conn=conn, transaction=transaction,
+                                       columnar=self.columnar)
         return self.formatDict(results)
@@ -0,0 +1,12 @@
+#!/usr/bin/env python
+"""
+_ListLeftState_
+
+Oracle implementation of Jobs.ListLeftState
+"""
+
+from WMCore.WMBS.MySQL.Jobs.ListLeftState import ListLeftState as MySQLListLeftState
+
+
+class ListLeftState(MySQLListLeftState):
+    pass
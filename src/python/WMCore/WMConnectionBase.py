@@ -119,12 +119,13 @@ class WMConnectionBase:
         __getstate__
 
         The database connection information isn't pickleable, so we to kill that
-        before we attempt to pickle.
+        before we attempt to pickle. The object itself keeps it.
         """
-        self.dbi = None
-        self.logger = None
-        self.daofactory = None
-        return self.__dict__
+        state = self.__dict__.copy()
+        state['dbi'] = None
+        state['logger'] = None
+        state['daofactory'] = None
+        return state
 
 
     def transactionContext(self):
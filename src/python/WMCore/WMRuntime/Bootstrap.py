@@ -9,7 +9,6 @@ import inspect
 import logging
 import os
 import os.path
-import pickle
 import socket
 import sys
 import threading
@@ -22,6 +21,7 @@ from WMCore.WMException import WMException
 from WMCore.WMRuntime import StepSpace
 from WMCore.WMRuntime import TaskSpace
 from WMCore.WMRuntime.Watchdog import Watchdog
+from WMCore.WMSpec.SpecFormat import loadSpecFile
 from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
 
 
@@ -168,10 +168,7 @@ def loadWorkload():
     """
     sandboxLoc = locateWMSandbox()
     workloadPcl = "%s/WMWorkload.pkl" % sandboxLoc
-    with open(workloadPcl, 'r') as handle:
-        wmWorkload = pickle.load(handle)
-
-    return WMWorkloadHelper(wmWorkload)
+    return WMWorkloadHelper(loadSpecFile(workloadPcl))
 
 
 def loadTask(job):
@@ -11,8 +11,8 @@ Runtime utils for a Task
 import os
 import sys
 import inspect
-import pickle
 
+from WMCore.WMSpec.SpecFormat import loadSpecFile
 from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
 
 
@@ -72,9 +72,7 @@ class TaskSpace:
         wmsandboxLoc = inspect.getsourcefile(WMSandbox)
         workloadPcl = wmsandboxLoc.replace("__init__.py","WMWorkload.pkl")
 
-        with open(workloadPcl, 'r') as handle:
-            wmWorkload = pickle.load(handle)
-        self.workload = WMWorkloadHelper(wmWorkload)
+        self.workload = WMWorkloadHelper(loadSpecFile(workloadPcl))
         return
 
     @preloadWorkload
@@ -218,7 +218,7 @@ def firstGenNodeChildIterator(node):
     Iterator over all the first generation child nodes.
     """
     for i in listFirstGenChildNodes(node):
-        yield getNode(node, i)
+        yield getattr(node.tree.children, i, None)
 
 def format(value):
     """
@@ -359,8 +359,7 @@ class TreeHelper:
 
         Iterate over all the first generation child nodes.
         """
-        for i in listFirstGenChildNodes(self.data):
-            yield getNode(self.data, i)
+        return firstGenNodeChildIterator(self.data)
 
     def pythoniseDict(self, **options):
         """
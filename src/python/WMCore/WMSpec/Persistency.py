@@ -10,6 +10,8 @@ Placeholder for ideas at present....
 """
 from __future__ import print_function
 
+import logging
+import os
 from urllib2 import urlopen, Request
 
 try:
@@ -27,7 +29,7 @@ class PersistencyHelper:
     """
     _PersistencyHelper_
 
-    Save a WMSpec object to a file using pickle
+    Save a WMSpec object to a file in the compact spec format, or using pickle
 
     Future ideas:
     - pickle mode: read/write using pickle
@@ -42,42 +44,47 @@ class PersistencyHelper:
         """
         _save_
 
-        Save data to a file
-        Saved format is defined depending on the extension
+        Save data to a file, in the compact spec format, or pickled if the
+        spec contains values that format doesn't support. The file is
+        replaced rather than rewritten, since loaded specs keep it mapped.
         """
-        with open(filename, 'w') as handle:
-            # TODO: use different encoding scheme for different extension
-            # extension = filename.split(".")[-1].lower()
-            pickle.dump(self.data, handle)
+        from WMCore.WMSpec.SpecFormat import SpecFormatError, dumpSpecData
+        tempName = "%s.%s.tmp" % (filename, os.getpid())
+        with open(tempName, 'w') as handle:
+            try:
+                dumpSpecData(self.data, handle)
+            except SpecFormatError as ex:
+                logging.warning("Pickling the workload spec: %s", str(ex))
+                pickle.dump(self.data, handle)
+        os.rename(tempName, filename)
         return
 
     def load(self, filename):
         """
         _load_
 
-        Unpickle data from file
-
+        Load data from a file or url, either in the compact spec format or
+        pickled. Sections of a local file in the compact format are only
+        decoded when accessed.
         """
+        from WMCore.WMSpec.SpecFormat import loadSpecFile, loadSpecString
 
         # TODO: currently support both loading from file path or url
         # if there are more things to filter may be separate the load function
 
         # urllib2 needs a scheme - assume local file if none given
         if not urlparse(filename)[0]:
-            filename = 'file:' + filename
-            handle = urlopen(Request(filename, headers={"Accept": "*/*"}))
-            self.data = pickle.load(handle)
-            handle.close()
+            self.data = loadSpecFile(filename)
         elif filename.startswith('file:'):
             handle = urlopen(Request(filename, headers={"Accept": "*/*"}))
-            self.data = pickle.load(handle)
+            self.data = loadSpecString(handle.read())
             handle.close()
         else:
             # use own request class so we get authentication if needed
             from WMCore.Services.Requests import Requests
             request = Requests(filename)
             data = request.makeRequest('', incoming_headers={"Accept": "*/*"})
-            self.data = pickle.loads(data[0])
+            self.data = loadSpecString(data[0])
 
         # TODO: use different encoding scheme for different extension
         # extension = filename.split(".")[-1].lower()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+"""
+_SpecFormat_
+
+Compact, versioned on disk format for the WMWorkload ConfigSection tree,
+used by PersistencyHelper.save/load instead of pickling the whole tree.
+
+The file is made of JSON lines:
+  * a header line: {"format": "WMCore.WMSpec", "version": 1, "root": N}
+  * one record line per task and per step, referenced by record number
+    from the section holding it
+  * the workload record N, with all the other sections
+  * the index line, the [offset, length] in the file of each record
+
+Sections are encoded as in the compact FWJR format, plus the class of the
+WMWorkload, WMTask and WMStep sections and their tree top flag, so that
+the helpers work on the loaded tree as on an unpickled one.
+
+Files are memory mapped and only the index and the workload record are
+decoded on load, each task or step is decoded when first accessed. Asking
+for the splitting parameters of one task doesn't decode the other tasks,
+nor the steps of that task. Files which are not in this format are
+unpickled, which keeps the specs saved by previous versions readable.
+"""
+from __future__ import division, print_function
+
+import json
+import mmap
+
+from WMCore.Configuration import ConfigSection
+from WMCore.FwkJobReport.ReportFormat import LazyConfigSection, ReportFormatError, decodeValue, encodeValue
+from WMCore.WMSpec.ConfigSectionTree import ConfigSectionTree
+from WMCore.WMSpec.WMStep import WMStep
+from WMCore.WMSpec.WMTask import WMTask
+from WMCore.WMSpec.WMWorkload import WMWorkload
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import copy_reg as copyreg
+except ImportError:
+    # PY3
+    import copyreg
+
+FORMAT_NAME = "WMCore.WMSpec"
+FORMAT_VERSION = 1
+HEADER_PREFIX = b'{"format": "WMCore.WMSpec"'
+
+# ConfigSection classes of the spec tree, by the name stored in the file
+SECTION_CLASSES = dict((sectionClass.__name__, sectionClass)
+                       for sectionClass in [WMWorkload, WMTask, WMStep, ConfigSectionTree])
+# sections written on their own record
+RECORD_CLASSES = (WMTask, WMStep)
+# ConfigSection flags which are not settings
+INTERNAL_FLAGS = ["treetop", "skipChecks"]
+
+
+class SpecFormatError(Exception):
+    """
+    _SpecFormatError_
+
+    A spec can't be written or read in the compact format
+    """
+    pass
+
+
+class SpecRecords(object):
+    """
+    _SpecRecords_
+
+    The records of a spec, read from a memory mapped file or a string
+    through their index. The buffer is released, and the file unmapped,
+    once none of the records is waiting to be decoded.
+    """
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.pending = set()
+
+    def __getitem__(self, record):
+        start, length = self.offsets[record]
+        return self.buffer[start:start + length]
+
+    def add(self, record):
+        """
+        _add_
+
+        Mark a record as waiting to be decoded
+        """
+        self.pending.add(record)
+
+    def release(self, record):
+        """
+        _release_
+
+        Mark a record as decoded, or dropped, releasing the buffer if it
+        was the last one waiting
+        """
+        self.pending.discard(record)
+        if not self.pending and self.buffer is not None:
+            if isinstance(self.buffer, mmap.mmap):
+                self.buffer.close()
+            self.buffer = None
+
+
+class LazySpecSection(LazyConfigSection):
+    """
+    _LazySpecSection_
+
+    ConfigSection holding tasks or steps, which are decoded when accessed.
+    """
+
+    def decodeChild_(self, record):
+        """
+        _decodeChild_
+
+        Decode the task or step written on this record
+        """
+        section = decodeSpecSection(json.loads(self._internal_lines[record]), self._internal_lines)
+        self._internal_lines.release(record)
+        return section
+
+    def __setattr__(self, name, value):
+        record = self.__dict__.get('_internal_lazy', {}).get(name)
+        LazyConfigSection.__setattr__(self, name, value)
+        if record is not None and not name.startswith("_internal_"):
+            self._internal_lines.release(record)
+
+    def __delattr__(self, name):
+        record = self.__dict__.get('_internal_lazy', {}).get(name)
+        LazyConfigSection.__delattr__(self, name)
+        if record is not None:
+            self._internal_lines.release(record)
+
+    def __reduce_ex__(self, protocol):
+        # pickled, and deep copied, as a plain ConfigSection: pickled specs
+        # don't depend on this format nor keep a reference to its file
+        self.decodeAll_()
+        state = dict(self.__dict__)
+        del state['_internal_lines']
+        del state['_internal_lazy']
+        return copyreg._reconstructor, (ConfigSection, object, None), state
+
+
+def _isPlainSection(section):
+    """
+    _isPlainSection_
+
+    Whether a section is a plain ConfigSection, as opposed to a node of the spec tree
+    """
+    return type(section) in (ConfigSection, LazySpecSection)
+
+
+def encodeSpecSection(section, records):
+    """
+    _encodeSpecSection_
+
+    Encode a spec ConfigSection tree as a JSON dictionary, appending the
+    tasks and steps held by plain sections to records.
+    """
+    params = {}
+    children = {}
+    for name in section._internal_settings:
+        value = getattr(section, name)
+        if name in section._internal_children:
+            childSection = encodeSpecSection(value, records)
+            if isinstance(value, RECORD_CLASSES) and _isPlainSection(section):
+                records.append(json.dumps(childSection))
+                children[name] = len(records) - 1
+            else:
+                children[name] = childSection
+        else:
+            params[name] = encodeValue(value)
+
+    encoded = {"n": section._internal_name, "p": params, "c": children}
+    if not _isPlainSection(section):
+        sectionClass = type(section).__name__
+        if SECTION_CLASSES.get(sectionClass) is not type(section):
+            raise SpecFormatError("Can't encode %s section %s in the spec" % (sectionClass, section._internal_name))
+        encoded["t"] = sectionClass
+    flags = dict((flag, section.__dict__["_internal_%s" % flag]) for flag in INTERNAL_FLAGS
+                 if section.__dict__.get("_internal_%s" % flag))
+    if flags:
+        encoded["i"] = flags
+    if section._internal_documentation:
+        encoded["d"] = section._internal_documentation
+    if section._internal_docstrings:
+        encoded["ds"] = section._internal_docstrings
+    return encoded
+
+
+def decodeSpecSection(encoded, records):
+    """
+    _decodeSpecSection_
+
+    Build a spec ConfigSection from its JSON dictionary, without decoding
+    the tasks and steps written on their own record.
+    """
+    sectionClass = SECTION_CLASSES.get(encoded.get("t"))
+    if sectionClass is None:
+        section = LazySpecSection(decodeValue(encoded["n"]), records)
+    else:
+        # the tree sections are all decoded, ConfigSectionTree.__init__ isn't needed
+        section = sectionClass.__new__(sectionClass)
+        ConfigSection.__init__(section, decodeValue(encoded["n"]))
+        section._internal_treetop = False
+
+    # parameters written by encodeSpecSection already passed the ConfigSection
+    # type checks, they are set directly
+    sectionDict = section.__dict__
+    for name, value in encoded["p"].items():
+        name = decodeValue(name)
+        sectionDict[name] = decodeValue(value)
+        section._internal_settings.add(name)
+    for name, child in encoded["c"].items():
+        name = decodeValue(name)
+        section._internal_settings.add(name)
+        section._internal_children.add(name)
+        if isinstance(child, int):
+            section._internal_lazy[name] = child
+            records.add(child)
+        else:
+            childSection = decodeSpecSection(child, records)
+            childSection._internal_parent_ref = section
+            sectionDict[name] = childSection
+    for flag, value in encoded.get("i", {}).items():
+        sectionDict["_internal_%s" % decodeValue(flag)] = value
+    if "d" in encoded:
+        section._internal_documentation = decodeValue(encoded["d"])
+    if "ds" in encoded:
+        section._internal_docstrings = decodeValue(encoded["ds"])
+    return section
+
+
+def dumpSpecData(data, handle):
+    """
+    _dumpSpecData_
+
+    Write the WMWorkload ConfigSection tree to a file handle in the compact
+    format. Raise a SpecFormatError, before writing anything, if the tree
+    can't be encoded.
+    """
+    records = []
+    try:
+        records.append(json.dumps(encodeSpecSection(data, records)))
+    except (ReportFormatError, TypeError, ValueError) as ex:
+        raise SpecFormatError("Can't encode the spec: %s" % str(ex))
+
+    # JSON is written as ASCII, string lengths are byte lengths
+    header = json.dumps({"format": FORMAT_NAME, "version": FORMAT_VERSION, "root": len(records) - 1},
+                        sort_keys=True)
+    offsets = []
+    position = len(header) + 1
+    for record in records:
+        offsets.append([position, len(record)])
+        position += len(record) + 1
+
+    handle.write(header)
+    handle.write("\n")
+    for record in records:
+        handle.write(record)
+        handle.write("\n")
+    handle.write(json.dumps(offsets))
+    handle.write("\n")
+
+
+def _decodeSpec(header, buffer):
+    """
+    _decodeSpec_
+
+    Decode the workload record of a spec in the compact format
+    """
+    header = json.loads(header)
+    if header["version"] > FORMAT_VERSION:
+        raise SpecFormatError("Unsupported spec format version %s" % header["version"])
+    indexStart = buffer.rfind(b"\n", 0, len(buffer) - 1) + 1
+    records = SpecRecords(buffer, json.loads(buffer[indexStart:]))
+    data = decodeSpecSection(json.loads(records[header["root"]]), records)
+    records.release(header["root"])
+    return data
+
+
+def loadSpecFile(filename):
+    """
+    _loadSpecFile_
+
+    Read the WMWorkload ConfigSection tree from a file, either in the compact
+    format or pickled. A file in the compact format stays memory mapped until
+    all the sections of the tree are decoded, it must be replaced rather than
+    written in place.
+    """
+    with open(filename, 'rb') as handle:
+        header = handle.readline()
+        if not header.startswith(HEADER_PREFIX):
+            handle.seek(0)
+            return pickle.load(handle)
+        buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    return _decodeSpec(header, buffer)
+
+
+def loadSpecString(data):
+    """
+    _loadSpecString_
+
+    Read the WMWorkload ConfigSection tree from a string, either in the
+    compact format or pickled.
+    """
+    if not data.startswith(HEADER_PREFIX):
+        return pickle.loads(data)
+    return _decodeSpec(data[:data.index(b"\n")], data)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""
+_SpecMetadataCache_
+
+Agent wide cache of the metadata extracted from the workload specs, for
+the components which only need a few fields of a spec: the campaign,
+request type, datasets, CMSSW versions and sandbox of the workload, and
+the prep ID, type and splitting parameters of each task.
+
+Entries are keyed by the spec path and only used while the spec file keeps
+the same modification time and size. Each process keeps the entries it
+used last in memory, and all the entries are written to an index directory
+shared by the agent components, one pickle file per spec, so that a spec
+is unpickled once per agent rather than once per component.
+"""
+from __future__ import division, print_function
+
+import collections
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper
+
+
+def extractSpecMetadata(workload):
+    """
+    _extractSpecMetadata_
+
+    Extract the metadata cached for a WMWorkloadHelper
+    """
+    topLevelTasks = workload.getTopLevelTask()
+    sandbox = None
+    if topLevelTasks:
+        sandbox = getattr(topLevelTasks[0].data.input, 'sandbox', None)
+
+    metadata = {"name": workload.name(),
+                "campaign": workload.getCampaign(),
+                "requestType": workload.getRequestType(),
+                "inputDatasets": workload.listInputDatasets(),
+                "outputDatasets": workload.listOutputDatasets(),
+                "cmsswVersions": workload.getCMSSWVersions(),
+                "sandbox": sandbox,
+                "tasks": {}}
+
+    for topLevelTask in workload.taskIterator():
+        for task in topLevelTask.taskIterator():
+            metadata["tasks"][task.getPathName()] = {"prepID": task.getPrepID(),
+                                                     "taskType": task.taskType(),
+                                                     "splitting": task.jobSplittingParameters(),
+                                                     "generators": hasattr(task.data, 'generators')}
+    return metadata
+
+
+class SpecMetadataCache(object):
+    """
+    _SpecMetadataCache_
+
+    LRU cache of spec metadata, backed by an optional index directory
+    """
+
+    def __init__(self, cacheDir=None, maxSize=1000):
+        self.cacheDir = cacheDir
+        self.maxSize = maxSize
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+        if self.cacheDir and not os.path.isdir(self.cacheDir):
+            try:
+                os.makedirs(self.cacheDir)
+            except OSError:
+                # another component may have just created it
+                if not os.path.isdir(self.cacheDir):
+                    raise
+
+    def indexPath(self, specPath):
+        """
+        _indexPath_
+
+        Path of the index file of a spec
+        """
+        return os.path.join(self.cacheDir, "%s.pkl" % hashlib.sha1(specPath.encode('utf-8')).hexdigest())
+
+    def getSpecMetadata(self, specPath):
+        """
+        _getSpecMetadata_
+
+        Return the metadata of a spec, loading the spec only if it changed
+        since it was last cached. Return None if the spec file doesn't exist.
+        """
+        try:
+            specStat = os.stat(specPath)
+        except OSError:
+            logging.error("Workload spec %s doesn't exist", specPath)
+            return None
+        specVersion = (specStat.st_mtime, specStat.st_size)
+
+        with self.lock:
+            entry = self.cache.pop(specPath, None)
+        if entry is None or entry['version'] != specVersion:
+            entry = self.readIndex(specPath, specVersion) or self.loadSpec(specPath, specVersion)
+
+        with self.lock:
+            self.cache[specPath] = entry
+            while len(self.cache) > self.maxSize:
+                self.cache.popitem(last=False)
+        return entry['metadata']
+
+    def readIndex(self, specPath, specVersion):
+        """
+        _readIndex_
+
+        Read the entry of a spec from the index directory, return None if
+        there is none for this version of the spec.
+        """
+        if not self.cacheDir:
+            return None
+        try:
+            with open(self.indexPath(specPath), 'rb') as handle:
+                entry = pickle.load(handle)
+        except IOError:
+            return None
+        except Exception as ex:
+            logging.warning("Failed to read the spec cache entry of %s: %s", specPath, str(ex))
+            return None
+
+        if entry.get('specPath') != specPath or entry.get('version') != specVersion:
+            return None
+        return entry
+
+    def loadSpec(self, specPath, specVersion):
+        """
+        _loadSpec_
+
+        Load a spec and cache its metadata
+        """
+        logging.debug("Loading workload spec %s to cache its metadata", specPath)
+        workload = WMWorkloadHelper(WMWorkload("workload"))
+        workload.load(specPath)
+        entry = {'specPath': specPath, 'version': specVersion, 'metadata': extractSpecMetadata(workload)}
+        self.writeIndex(entry)
+        return entry
+
+    def writeIndex(self, entry):
+        """
+        _writeIndex_
+
+        Write the entry of a spec to the index directory, replacing the
+        previous one at once so other processes never read a partial file.
+        """
+        if not self.cacheDir:
+            return
+        try:
+            fileDesc, tempPath = tempfile.mkstemp(dir=self.cacheDir, suffix=".tmp")
+            with os.fdopen(fileDesc, 'wb') as handle:
+                pickle.dump(entry, handle, pickle.HIGHEST_PROTOCOL)
+            os.rename(tempPath, self.indexPath(entry['specPath']))
+        except Exception as ex:
+            logging.warning("Failed to write the spec cache entry of %s: %s", entry['specPath'], str(ex))
+        return
+
+    def removeSpec(self, specPath):
+        """
+        _removeSpec_
+
+        Forget a spec, for instance once its workflow is deleted
+        """
+        with self.lock:
+            self.cache.pop(specPath, None)
+        if self.cacheDir:
+            try:
+                os.remove(self.indexPath(specPath))
+            except OSError:
+                pass
+        return
+
+
+_specMetadataCaches = {}
+_specMetadataCachesLock = threading.Lock()
+
+
+def getSpecMetadataCache(config):
+    """
+    _getSpecMetadataCache_
+
+    Return the SpecMetadataCache shared by all the users of this process,
+    configured by JobStateMachine.specCacheDir and specCacheSize.
+    """
+    jsmConfig = getattr(config, 'JobStateMachine', None)
+    cacheDir = getattr(jsmConfig, 'specCacheDir', None)
+    maxSize = getattr(jsmConfig, 'specCacheSize', 1000)
+
+    with _specMetadataCachesLock:
+        if cacheDir not in _specMetadataCaches:
+            _specMetadataCaches[cacheDir] = SpecMetadataCache(cacheDir, maxSize)
+        return _specMetadataCaches[cacheDir]
@@ -501,11 +501,6 @@ class WMWorkloadHelper(PersistencyHelper):
         Get a task instance based on the path name
 
         """
-        mapping = {}
-        for t in self.taskIterator():
-            for x in t.taskIterator():
-                mapping.__setitem__(x.getPathName, x.name())
-
         taskList = parseTaskPath(taskPath)
 
         if taskList[0] != self.name():  # should always be workload name first
@@ -524,6 +519,17 @@ class WMWorkloadHelper(PersistencyHelper):
             msg = "Task /%s/%s Not Found in Workload" % (taskList[0],
                                                          taskList[1])
             raise RuntimeError(msg)
+
+        # follow the path down the tree, so that only the tasks on the path
+        # and their siblings are looked at
+        task = topTask
+        for taskName in taskList[2:]:
+            task = next((x for x in task.childTaskIterator() if x.name() == taskName), None)
+            if task is None:
+                break
+        if task is not None and task.getPathName() == taskPath:
+            return task
+
         for x in topTask.taskIterator():
             if x.getPathName() == taskPath:
                 return x
@@ -1,5 +1,7 @@
 from __future__ import (division, print_function)
 
+import fcntl
+import os
 import time
 from WMCore.REST.CherryPyPeriodicTask import CherryPyPeriodicTask
 from WMCore.WMStats.DataStructs.DataCache import DataCache
@@ -10,25 +12,64 @@ class DataCacheUpdate(CherryPyPeriodicTask):
 
     def __init__(self, rest, config):
         self.getJobInfo = getattr(config, "getJobInfo", False)
+        # follow the changes feeds between full updates of the cache
+        self.incrementalUpdate = getattr(config, "incrementalUpdate", False)
+        self.fullUpdateInterval = getattr(config, "fullUpdateInterval", 3600)
+        # update sequences of the ReqMgr and WMStats databases the cache is at
+        self.requestSeq = None
+        self.jobInfoSeq = None
+        self.lastFullUpdate = 0
+        # share the cache with the other server processes through snapshots,
+        # written by the process holding the update lock
+        self.snapshotDir = getattr(config, "snapshotDir", None)
+        self.lockHandle = None
+        DataCache.setSnapshotDir(self.snapshotDir)
 
         super(DataCacheUpdate, self).__init__(config)
 
+    def isSnapshotWriter(self):
+        """
+        Whether this process updates the cache and writes its snapshots.
+        The update lock is kept until the process exits, another process
+        takes over on its next run.
+        """
+        if self.lockHandle is None:
+            lockHandle = open(os.path.join(self.snapshotDir, "update.lock"), 'a')
+            try:
+                fcntl.flock(lockHandle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                lockHandle.close()
+                return False
+            self.lockHandle = lockHandle
+            self.logger.info("This process now writes the DataCache snapshots in %s", self.snapshotDir)
+        return True
+
     def setConcurrentTasks(self, config):
         """
         sets the list of functions which
         """
-        self.concurrentTasks = [{'func': self.gatherActiveDataStats, 'duration': 300}]
+        duration = getattr(config, "changesDuration", 60) if self.incrementalUpdate else 300
+        self.concurrentTasks = [{'func': self.gatherActiveDataStats, 'duration': duration}]
 
     def gatherActiveDataStats(self, config):
         """
         gather active data statistics
         """
         self.logger.info("Starting gatherActiveDataStats with jobInfo set to: %s", self.getJobInfo)
+        if self.snapshotDir and not self.isSnapshotWriter():
+            self.logger.info("DataCache is read from the snapshots of another process")
+            return
         try:
             tStart = time.time()
-            if DataCache.islatestJobDataExpired():
+            if self.incrementalUpdate and self.requestSeq is not None and \
+                    (tStart - self.lastFullUpdate) < self.fullUpdateInterval:
+                self.applyChanges(config)
+            elif self.incrementalUpdate or DataCache.islatestJobDataExpired():
                 wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
                                           reqdbCouchApp="ReqMgr", logger=self.logger)
+                if self.incrementalUpdate:
+                    # changes made while the data is read are applied again afterwards
+                    requestSeq, jobInfoSeq = wmstatsDB.getUpdateSequences()
                 self.logger.info("Getting active data with job info for statuses: %s", WMSTATS_JOB_INFO)
                 jobData = wmstatsDB.getActiveData(WMSTATS_JOB_INFO, jobInfoFlag=self.getJobInfo)
                 self.logger.info("Getting active data with NO job info for statuses: %s", WMSTATS_NO_JOB_INFO)
@@ -37,7 +78,93 @@ class DataCacheUpdate(CherryPyPeriodicTask):
                 self.logger.info("Running setlatestJobData...")
                 DataCache.setlatestJobData(jobData)
                 self.logger.info("DataCache is up-to-date with %d requests data", len(jobData))
+                if self.incrementalUpdate:
+                    self.requestSeq, self.jobInfoSeq = requestSeq, jobInfoSeq
+                    self.lastFullUpdate = tStart
+                if self.snapshotDir:
+                    DataCache.saveSnapshot()
         except Exception as ex:
             self.logger.exception("Exception updating DataCache. Error: %s", str(ex))
         self.logger.info("Total time loading data from ReqMgr2 and WMStats: %s", time.time() - tStart)
         return
+
+    def applyChanges(self, config):
+        """
+        Apply to the cache the request and job info documents changed since
+        the last update, as the full update would have cached them
+        """
+        wmstatsDB = WMStatsReader(config.wmstats_url, reqdbURL=config.reqmgrdb_url,
+                                  reqdbCouchApp="ReqMgr", logger=self.logger)
+        requestChanges, requestSeq = wmstatsDB.getRequestChanges(self.requestSeq)
+        jobInfoDocs, deletedIDs, jobInfoSeq = wmstatsDB.getJobInfoChanges(self.jobInfoSeq)
+
+        reqData = DataCache.getlatestJobData()
+        updatedRequests, removedRequests, newJobInfoRequests = updateActiveRequests(reqData, requestChanges,
+                                                                                    self.getJobInfo)
+        if newJobInfoRequests:
+            wmstatsDB._updateRequestInfoWithJobInfo(dict((reqName, updatedRequests[reqName])
+                                                         for reqName in newJobInfoRequests))
+        if self.getJobInfo:
+            updateAgentJobInfo(reqData, updatedRequests, jobInfoDocs, deletedIDs)
+
+        DataCache.updateRequests(updatedRequests, removedRequests)
+        if self.snapshotDir:
+            DataCache.saveSnapshot()
+        self.requestSeq, self.jobInfoSeq = requestSeq, jobInfoSeq
+        self.logger.info("DataCache is updated with %d changed and %d removed requests",
+                         len(updatedRequests), len(removedRequests))
+        return
+
+
+def updateActiveRequests(reqData, requestChanges, getJobInfo):
+    """
+    Return the requests to update in the cached reqData for the changed
+    request documents, the requests to remove because they were deleted or
+    aren't active anymore, and the new requests whose job info is needed.
+    Changed requests keep their cached job info while they have a status
+    with job info.
+    """
+    updatedRequests = {}
+    removedRequests = []
+    newJobInfoRequests = []
+    for reqName, reqDoc in requestChanges.iteritems():
+        status = reqDoc.get('RequestStatus') if reqDoc else None
+        if status in WMSTATS_JOB_INFO and getJobInfo:
+            if 'AgentJobInfo' in reqData.get(reqName, {}):
+                reqDoc['AgentJobInfo'] = reqData[reqName]['AgentJobInfo']
+            elif reqName not in reqData:
+                newJobInfoRequests.append(reqName)
+            updatedRequests[reqName] = reqDoc
+        elif status in WMSTATS_JOB_INFO or status in WMSTATS_NO_JOB_INFO:
+            updatedRequests[reqName] = reqDoc
+        elif reqName in reqData:
+            removedRequests.append(reqName)
+    return updatedRequests, removedRequests, newJobInfoRequests
+
+
+def updateAgentJobInfo(reqData, updatedRequests, jobInfoDocs, deletedIDs):
+    """
+    Set the changed agent_request documents in the AgentJobInfo of their
+    cached request, and remove the deleted ones. The cached requests are
+    copied, not modified, since the cache is read at the same time.
+    """
+    def getUpdatedRequest(reqName):
+        if reqName not in updatedRequests:
+            updatedRequests[reqName] = dict(reqData[reqName])
+        reqDoc = updatedRequests[reqName]
+        reqDoc['AgentJobInfo'] = dict(reqDoc.get('AgentJobInfo', {}))
+        return reqDoc
+
+    for jobInfoDoc in jobInfoDocs:
+        reqName = jobInfoDoc['workflow']
+        reqDoc = updatedRequests.get(reqName, reqData.get(reqName))
+        if reqDoc is not None and reqDoc.get('RequestStatus') in WMSTATS_JOB_INFO:
+            getUpdatedRequest(reqName)['AgentJobInfo'][jobInfoDoc['agent_url']] = jobInfoDoc
+
+    if deletedIDs:
+        for reqName, reqDoc in reqData.iteritems():
+            reqDoc = updatedRequests.get(reqName, reqDoc)
+            for agentURL, jobInfoDoc in reqDoc.get('AgentJobInfo', {}).items():
+                if jobInfoDoc.get('_id') in deletedIDs:
+                    del getUpdatedRequest(reqName)['AgentJobInfo'][agentURL]
+    return
@@ -1,12 +1,186 @@
+import threading
 import time
 from WMCore.ReqMgr.DataStructs.Request import RequestInfo, protectedLFNs
+from WMCore.WMStats.DataStructs.DataCacheSnapshot import DataCacheSnapshot
+
+# request properties indexed as soon as the cache is updated, the other
+# ones are indexed the first time they are filtered on
+INDEXED_PROPERTIES = ["RequestStatus", "RequestType", "Campaign", "Team", "Teams",
+                      "SiteWhitelist", "InputDataset", "PrepID"]
+
+
+def getRequestProperty(reqDict, prop, default=None):
+    """
+    _getRequestProperty_
+
+    Same as RequestInfo(reqDict).get(prop, default), without wrapping the
+    requests which are not TaskChain or StepChain ones
+    """
+    if "TaskChain" in reqDict or "StepChain" in reqDict:
+        return RequestInfo(reqDict).get(prop, default)
+    return reqDict.get(prop, default)
+
+
+def _filterValues(value):
+    """
+    _filterValues_
+
+    List of the values a filter accepts, as RequestInfo.andFilterCheck
+    interprets them
+    """
+    if value in ["false", "False", "FALSE"]:
+        value = False
+    elif value in ["true", "True", "TRUE"]:
+        value = True
+    if not isinstance(value, list):
+        value = [value]
+    return value
+
+
+def _indexValues(reqDict, prop):
+    """
+    _indexValues_
+
+    Values a request is indexed under for a property: each element of a list
+    value, without None and the dictionaries and lists which never match
+    a filter
+    """
+    reqValue = getRequestProperty(reqDict, prop)
+    if not isinstance(reqValue, list):
+        reqValue = [reqValue]
+    for value in reqValue:
+        if value is None:
+            continue
+        try:
+            hash(value)
+        except TypeError:
+            continue
+        yield value
+
+
+class RequestIndex(object):
+    """
+    _RequestIndex_
+
+    Secondary indexes of the cached requests: for each property, the names
+    of the requests by value of the property. A request with a list value
+    is indexed under each element of the list.
+    """
+
+    def __init__(self, reqData, properties=None):
+        self.data = reqData
+        self.indexes = {}
+        # held to add indexes, which can happen while others are read
+        self._lock = threading.Lock()
+        for prop in properties or []:
+            self.getIndex(prop)
+
+    def getIndex(self, prop):
+        """
+        _getIndex_
+
+        Return the index of a property, building it if needed
+        """
+        index = self.indexes.get(prop)
+        if index is None:
+            with self._lock:
+                index = self.indexes.get(prop)
+                if index is None:
+                    index = {}
+                    for name, reqDict in self.data.iteritems():
+                        for value in _indexValues(reqDict, prop):
+                            index.setdefault(value, set()).add(name)
+                    self.indexes[prop] = index
+        return index
+
+    def getIndexes(self):
+        """
+        _getIndexes_
+
+        Return a copy of the dictionary of the indexes built so far
+        """
+        with self._lock:
+            return dict(self.indexes)
+
+    def update(self, reqData, reqNames):
+        """
+        _update_
+
+        Return the index of reqData, the indexed data where the requests in
+        reqNames were added, replaced or removed. Only the entries of these
+        requests are updated, on copies: this index is left unchanged for
+        the readers still using it.
+        """
+        newIndex = RequestIndex(reqData)
+        for prop, index in self.getIndexes().iteritems():
+            newPropIndex = dict(index)
+            copiedValues = set()
+            for reqName in reqNames:
+                for reqDict, add in [(self.data.get(reqName), False), (reqData.get(reqName), True)]:
+                    if reqDict is None:
+                        continue
+                    for value in _indexValues(reqDict, prop):
+                        if value not in copiedValues:
+                            newPropIndex[value] = set(newPropIndex.get(value, ()))
+                            copiedValues.add(value)
+                        if add:
+                            newPropIndex[value].add(reqName)
+                        else:
+                            newPropIndex[value].discard(reqName)
+            for value in copiedValues:
+                if not newPropIndex[value]:
+                    del newPropIndex[value]
+            newIndex.indexes[prop] = newPropIndex
+        return newIndex
+
+    def filterRequests(self, filterDict):
+        """
+        _filterRequests_
+
+        Return the names of the requests which pass the filter, with the
+        same semantics as RequestInfo.andFilterCheck, intersecting the
+        requests found in the indexes of each filtered property.
+        """
+        candidates = None
+        checkFilter = {}
+        for prop, value in filterDict.iteritems():
+            if value == "CLEANED" and prop == "AgentJobInfo":
+                checkFilter[prop] = value
+                continue
+            if isinstance(value, dict):
+                continue
+
+            index = self.getIndex(prop)
+            try:
+                names = [index.get(filterValue, ()) for filterValue in _filterValues(value)]
+            except TypeError:
+                checkFilter[prop] = value
+                continue
+            names = set(names[0]) if len(names) == 1 else set().union(*names)
+            candidates = names if candidates is None else candidates & names
+            if not candidates:
+                return []
+
+        if candidates is None:
+            candidates = self.data.iterkeys()
+        if checkFilter:
+            return [name for name in candidates if RequestInfo(self.data[name]).andFilterCheck(checkFilter)]
+        return list(candidates)
+
 
 class DataCache(object):
-    # TODO: need to change to  store in  db instead of storing in the memory
-    # When mulitple server run for load balancing it could have different result
-    # from each server.
+    # The cache is held in memory by each process, unless a snapshot directory
+    # is set: the processes of a server then share the snapshot written by the
+    # one updating the cache.
     _duration = 300  # 5 minitues
     _lastedActiveDataFromAgent = {}
+    _requestIndex = RequestIndex({})
+    # held to replace the data and its index together
+    _lock = threading.Lock()
+    _snapshot = None
+    # incremented each time the data is replaced, to tell cached responses
+    # built from older data
+    _generation = 0
 
     @staticmethod
     def getDuration():
@@ -16,8 +190,46 @@ class DataCache(object):
     def setDuration(sec):
         DataCache._duration = sec
 
+    @staticmethod
+    def setSnapshotDir(snapshotDir):
+        """
+        Share the cache through the snapshots of snapshotDir, None to keep
+        it in this process only
+        """
+        DataCache._snapshot = DataCacheSnapshot(snapshotDir) if snapshotDir else None
+
+    @staticmethod
+    def saveSnapshot():
+        """
+        Write a snapshot of the cache for the other processes
+        """
+        reqIndex = DataCache.getRequestIndex()
+        DataCache._snapshot.write(reqIndex.data, reqIndex.getIndexes(),
+                                  DataCache._lastedActiveDataFromAgent.get("time"))
+
+    @staticmethod
+    def loadSnapshot():
+        """
+        Use the current snapshot if another process wrote a new one since
+        it was last loaded
+        """
+        snapshot = DataCache._snapshot
+        if snapshot is None:
+            return
+        loaded = snapshot.loadIfChanged()
+        if loaded is None:
+            return
+        cacheTime, reqData, indexes = loaded
+        reqIndex = RequestIndex(reqData)
+        reqIndex.indexes = indexes
+        with DataCache._lock:
+            DataCache._requestIndex = reqIndex
+            DataCache._lastedActiveDataFromAgent = {"time": cacheTime, "data": reqData}
+            DataCache._generation += 1
+
     @staticmethod
     def getlatestJobData():
+        DataCache.loadSnapshot()
         if (DataCache._lastedActiveDataFromAgent):
             return DataCache._lastedActiveDataFromAgent["data"]
         else:
@@ -26,12 +238,62 @@ class DataCache(object):
     @staticmethod
     def isEmpty():
         # simple check to see if the data cache is populated
+        DataCache.loadSnapshot()
         return not DataCache._lastedActiveDataFromAgent.get("data")
 
     @staticmethod
     def setlatestJobData(jobData):
-        DataCache._lastedActiveDataFromAgent["time"] = int(time.time())
-        DataCache._lastedActiveDataFromAgent["data"] = jobData
+        # index the new data before it replaces the old one
+        reqIndex = RequestIndex(jobData, INDEXED_PROPERTIES) if isinstance(jobData, dict) else None
+        with DataCache._lock:
+            if reqIndex is not None:
+                DataCache._requestIndex = reqIndex
+            DataCache._lastedActiveDataFromAgent["time"] = int(time.time())
+            DataCache._lastedActiveDataFromAgent["data"] = jobData
+            DataCache._generation += 1
+
+    @staticmethod
+    def updateRequests(updatedRequests, removedRequests=None):
+        """
+        Replace or add the requests of the updatedRequests dictionary and
+        remove the removedRequests names from the cache, without changing
+        the data and index used by the current readers
+        """
+        removedRequests = removedRequests or []
+        reqIndex = DataCache.getRequestIndex()
+        reqData = dict(reqIndex.data)
+        reqData.update(updatedRequests)
+        for reqName in removedRequests:
+            reqData.pop(reqName, None)
+        newIndex = reqIndex.update(reqData, set(updatedRequests).union(removedRequests))
+
+        with DataCache._lock:
+            DataCache._requestIndex = newIndex
+            DataCache._lastedActiveDataFromAgent["time"] = int(time.time())
+            DataCache._lastedActiveDataFromAgent["data"] = reqData
+            DataCache._generation += 1
+
+    @staticmethod
+    def getRequestIndex():
+        """
+        Return the index of the cached data, indexing it again if the data
+        was replaced without setlatestJobData
+        """
+        DataCache.loadSnapshot()
+        with DataCache._lock:
+            reqData = DataCache._lastedActiveDataFromAgent.get("data", {})
+            if DataCache._requestIndex.data is not reqData:
+                DataCache._requestIndex = RequestIndex(reqData)
+            return DataCache._requestIndex
+
+    @staticmethod
+    def getGeneration():
+        """
+        Return the generation of the cached data, which changes each time
+        the data is updated
+        """
+        DataCache.loadSnapshot()
+        return DataCache._generation
 
     @staticmethod
     def islatestJobDataExpired():
@@ -44,23 +306,24 @@ class DataCache(object):
 
     @staticmethod
     def filterData(filterDict, maskList):
-        reqData = DataCache.getlatestJobData()
+        reqIndex = DataCache.getRequestIndex()
+        reqData = reqIndex.data
 
-        for _, reqInfo in reqData.iteritems():
-            reqData = RequestInfo(reqInfo)
-            if reqData.andFilterCheck(filterDict):
-                for prop in maskList:
-                    result = reqData.get(prop, [])
+        for reqName in reqIndex.filterRequests(filterDict):
+            reqDict = reqData[reqName]
+            for prop in maskList:
+                result = getRequestProperty(reqDict, prop, [])
 
-                    if isinstance(result, list):
-                        for value in result:
-                            yield value
-                    elif result is not None and result != "":
-                        yield result
+                if isinstance(result, list):
+                    for value in result:
+                        yield value
+                elif result is not None and result != "":
+                    yield result
 
     @staticmethod
     def filterDataByRequest(filterDict, maskList=None):
-        reqData = DataCache.getlatestJobData()
+        reqIndex = DataCache.getRequestIndex()
+        reqData = reqIndex.data
 
         if maskList is not None:
             if isinstance(maskList, basestring):
@@ -68,17 +331,15 @@ class DataCache(object):
             if "RequestName" not in maskList:
                 maskList.append("RequestName")
 
-        for _, reqDict in reqData.iteritems():
-            reqInfo = RequestInfo(reqDict)
-            if reqInfo.andFilterCheck(filterDict):
-
-                if maskList is None:
-                    yield reqDict
-                else:
-                    resultItem = {}
-                    for prop in maskList:
-                        resultItem[prop] = reqInfo.get(prop, None)
-                    yield resultItem
+        for reqName in reqIndex.filterRequests(filterDict):
+            reqDict = reqData[reqName]
+            if maskList is None:
+                yield reqDict
+            else:
+                resultItem = {}
+                for prop in maskList:
+                    resultItem[prop] = getRequestProperty(reqDict, prop)
+                yield resultItem
 
     @staticmethod
     def getProtectedLFNs():
@@ -86,4 +347,4 @@ class DataCache(object):
 
         for _, reqInfo in reqData.iteritems():
             for dirPath in protectedLFNs(reqInfo):
-                yield dirPath
\ No newline at end of file
+                yield dirPath
@@ -0,0 +1,195 @@
+"""
+_DataCacheSnapshot_
+
+Snapshots of the WMStats DataCache shared by the processes of a server:
+one process updates the cache and writes a snapshot of it, the other ones
+memory map the snapshot instead of each loading and holding its own copy
+of the cache.
+
+A snapshot is a file made of JSON lines:
+  * a header line: {"format": "WMStats.DataCache", "version": 1, "time": T}
+  * one line per request document
+  * the index line, with the [offset, length] of each request by name and
+    the RequestIndex indexes, values being JSON encoded as keys
+
+Each snapshot is a new generation file, written aside then renamed, and
+the CURRENT file naming the current generation is replaced with a rename
+too: readers never see a partially written snapshot. Request documents are
+decoded from the mapped file when accessed.
+"""
+from __future__ import division, print_function
+
+import collections
+import json
+import mmap
+import os
+import time
+
+from WMCore.Wrappers.JsonWrapper import getBackend
+
+FORMAT_NAME = "WMStats.DataCache"
+FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+# generations kept on disk, the previous one may still be opened by readers
+KEEP_GENERATIONS = 2
+
+
+class SnapshotRequests(collections.Mapping):
+    """
+    _SnapshotRequests_
+
+    Read only dictionary of the request documents of a snapshot, decoded
+    from the mapped file when accessed
+    """
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    def __getitem__(self, reqName):
+        start, length = self.offsets[reqName]
+        return getBackend().loads(self.buffer[start:start + length])
+
+    def __contains__(self, reqName):
+        return reqName in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+class DataCacheSnapshot(object):
+    """
+    _DataCacheSnapshot_
+
+    Write and read the snapshots of the DataCache of a directory
+    """
+
+    def __init__(self, snapshotDir):
+        self.snapshotDir = snapshotDir
+        # generation last written or loaded by this process
+        self.generation = None
+        self.currentStat = None
+
+        if not os.path.isdir(self.snapshotDir):
+            try:
+                os.makedirs(self.snapshotDir)
+            except OSError:
+                # another process may have just created it
+                if not os.path.isdir(self.snapshotDir):
+                    raise
+
+    def snapshotPath(self, generation):
+        return os.path.join(self.snapshotDir, "DataCache.%d.json" % generation)
+
+    def readCurrent(self):
+        """
+        _readCurrent_
+
+        Return the current generation, None if there is no snapshot yet
+        """
+        try:
+            with open(os.path.join(self.snapshotDir, CURRENT_FILE)) as handle:
+                return int(handle.read())
+        except (IOError, ValueError):
+            return None
+
+    def write(self, reqData, indexes, cacheTime=None):
+        """
+        _write_
+
+        Write a new generation of the snapshot with the request data and the
+        indexes of its RequestIndex, and make it the current one
+        """
+        generation = max(int(time.time() * 1000), (self.readCurrent() or 0) + 1)
+        header = json.dumps({"format": FORMAT_NAME, "version": FORMAT_VERSION,
+                             "time": cacheTime or int(time.time())}, sort_keys=True)
+        offsets = {}
+        tempPath = "%s.%d.tmp" % (self.snapshotPath(generation), os.getpid())
+        with open(tempPath, 'wb') as handle:
+            handle.write(header)
+            handle.write("\n")
+            position = len(header) + 1
+            for reqName, reqDict in reqData.iteritems():
+                # JSON is written as ASCII, string lengths are byte lengths
+                record = json.dumps(reqDict)
+                offsets[reqName] = [position, len(record)]
+                handle.write(record)
+                handle.write("\n")
+                position += len(record) + 1
+            encodedIndexes = dict((prop, dict((json.dumps(value), list(reqNames))
+                                              for value, reqNames in index.iteritems()))
+                                  for prop, index in indexes.iteritems())
+            json.dump({"offsets": offsets, "indexes": encodedIndexes}, handle)
+            handle.write("\n")
+        os.rename(tempPath, self.snapshotPath(generation))
+
+        currentPath = os.path.join(self.snapshotDir, CURRENT_FILE)
+        with open("%s.%d.tmp" % (currentPath, os.getpid()), 'w') as handle:
+            handle.write(str(generation))
+        os.rename("%s.%d.tmp" % (currentPath, os.getpid()), currentPath)
+        self.generation = generation
+        self.removeOldGenerations()
+        return generation
+
+    def removeOldGenerations(self):
+        """
+        _removeOldGenerations_
+
+        Remove the snapshots older than the last KEEP_GENERATIONS ones. The
+        files still mapped by readers stay readable until they are unmapped.
+        """
+        generations = []
+        for fileName in os.listdir(self.snapshotDir):
+            parts = fileName.split(".")
+            if len(parts) == 3 and parts[0] == "DataCache" and parts[1].isdigit():
+                generations.append(int(parts[1]))
+        for generation in sorted(generations)[:-KEEP_GENERATIONS]:
+            try:
+                os.remove(self.snapshotPath(generation))
+            except OSError:
+                pass
+
+    def loadIfChanged(self):
+        """
+        _loadIfChanged_
+
+        Return the cache time, request data and indexes of the current
+        snapshot if it is not the one last written or loaded by this
+        process, None otherwise.
+        """
+        try:
+            currentStat = os.stat(os.path.join(self.snapshotDir, CURRENT_FILE))
+        except OSError:
+            return None
+        currentStat = (currentStat.st_ino, currentStat.st_mtime)
+        if currentStat == self.currentStat:
+            return None
+
+        generation = self.readCurrent()
+        if generation is None or generation == self.generation:
+            self.currentStat = currentStat
+            return None
+        loaded = self.load(generation)
+        self.generation = generation
+        self.currentStat = currentStat
+        return loaded
+
+    def load(self, generation):
+        """
+        _load_
+
+        Map a snapshot and decode its header and index
+        """
+        with open(self.snapshotPath(generation), 'rb') as handle:
+            header = json.loads(handle.readline())
+            if header.get("format") != FORMAT_NAME or header["version"] > FORMAT_VERSION:
+                raise ValueError("Unsupported DataCache snapshot %s" % self.snapshotPath(generation))
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        indexStart = buffer.rfind(b"\n", 0, len(buffer) - 1) + 1
+        snapshotIndex = json.loads(buffer[indexStart:])
+        indexes = dict((prop, dict((json.loads(value), set(reqNames)) for value, reqNames in index.iteritems()))
+                       for prop, index in snapshotIndex["indexes"].iteritems())
+        return header["time"], SnapshotRequests(buffer, snapshotIndex["offsets"]), indexes
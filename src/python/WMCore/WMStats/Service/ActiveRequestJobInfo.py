@@ -1,6 +1,7 @@
 """
 Gets the cache data from server cache. This shouldn't update the server cache.
-Just wait for the server cache to be updated
+Just wait for the server cache to be updated. The responses are cached until
+the server cache is updated.
 """
 from __future__ import (division, print_function)
 from WMCore.REST.Server import RESTEntity, restcall, rows
@@ -23,12 +24,14 @@ class ActiveRequestJobInfo(RESTEntity):
     def validate(self, apiobj, method, api, param, safe):
         return
 
-    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())])
+    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())],
+              response_cache=True, cache_generation=DataCache.getGeneration)
     @tools.expires(secs=-1)
     def get(self):
         # This assumes DataCahe is periodically updated.
         # If data is not updated, need to check, dataCacheUpdate log
-        return rows([DataCache.getlatestJobData()])
+        # the data read from a shared snapshot is decoded here
+        return rows([dict(DataCache.getlatestJobData())])
 
 
 class FilteredActiveRequestJobInfo(RESTEntity):
@@ -50,7 +53,8 @@ class FilteredActiveRequestJobInfo(RESTEntity):
 
         return
 
-    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())])
+    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())],
+              response_cache=True, cache_generation=DataCache.getGeneration)
     @tools.expires(secs=-1)
     def get(self, mask=None, **input_condition):
         # This assumes DataCahe is periodically updated.
@@ -71,7 +75,8 @@ class ProtectedLFNList(RESTEntity):
     def validate(self, apiobj, method, api, param, safe):
         return
 
-    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())])
+    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())],
+              response_cache=True, cache_generation=DataCache.getGeneration)
     @tools.expires(secs=-1)
     def get(self):
         # This assumes DataCahe is periodically updated.
@@ -95,7 +100,8 @@ class ProtectedLFNListOnlyFinalOutput(RESTEntity):
     def validate(self, apiobj, method, api, param, safe):
         return
 
-    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())])
+    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())],
+              response_cache=True, cache_generation=DataCache.getGeneration)
     @tools.expires(secs=-1)
     def get(self):
         # This assumes DataCahe is periodically updated.
@@ -111,7 +117,8 @@ class GlobalLockList(RESTEntity):
     def validate(self, apiobj, method, api, param, safe):
         return
 
-    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())])
+    @restcall(formats=[('text/plain', PrettyJSONFormat()), ('application/json', JSONFormat())],
+              response_cache=True, cache_generation=DataCache.getGeneration)
     @tools.expires(secs=-1)
     def get(self):
         # This assumes DataCahe is periodically updated.
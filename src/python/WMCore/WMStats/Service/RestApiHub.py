@@ -8,7 +8,7 @@ import cherrypy
 
 from WMCore.Configuration import Configuration
 from WMCore.REST.Server import RESTApi
-from WMCore.REST.Format import JSONFormat
+from WMCore.REST.Format import JSONFormat, ResponseCache
 from WMCore.REST.Services import ProcessMatrix
 
 from WMCore.WMStats.Service.MetaDataInfo import ServerInfo
@@ -37,6 +37,8 @@ class RestApiHub(RESTApi):
         cherrypy.log("WMStats REST hub configuration subset:\n%s" % config)
         # only allows json format for return value
         self.formats = [('application/json', JSONFormat())]
+        # responses of the DataCache APIs, kept until the DataCache is updated
+        self.response_cache = ResponseCache(getattr(config, "responseCacheSize", 256 * 1024 * 1024))
         self._add({"info": ServerInfo(app, self, config, mount),
                    "teams": TeamInfo(app, self, config, mount),
                    "request": RequestInfo(app, self, config, mount),
@@ -0,0 +1,238 @@
+"""
+SiteMatcher
+
+Match workqueue elements against the site thresholds, keeping track of the
+jobs already assigned to each site by priority.
+
+Each site keeps its job counts in a Fenwick (binary indexed) tree over the
+sorted list of known priorities, so that the number of jobs at or above a
+given priority and the addition of new jobs both cost O(log priorities).
+The sites an element can run at are kept as a bitmask over the threshold
+sites, and the candidate sites are computed once for all the elements
+with the same site and data restrictions, since many elements share them.
+"""
+from __future__ import (print_function, division)
+
+import random
+from bisect import bisect_right
+
+from WMCore.WorkQueue.DataStructs.WorkQueueElement import possibleSites
+
+# element fields possibleSites depends on
+SITE_FIELDS = ['NoInputUpdate', 'NoPileupUpdate', 'SiteWhitelist', 'SiteBlacklist',
+               'Inputs', 'ParentFlag', 'ParentData', 'PileupData']
+
+
+def _hashableValue(value):
+    """
+    _hashableValue_
+
+    Turn an element field, possibly a list or a dictionary of lists of
+    sites, into a value usable as a dictionary key.
+    """
+    if isinstance(value, dict):
+        return frozenset((key, _hashableValue(val)) for key, val in value.items())
+    if isinstance(value, (list, set, tuple)):
+        return tuple(value)
+    return value
+
+
+class SiteJobCounter(object):
+    """
+    _SiteJobCounter_
+
+    Number of jobs per site and priority, answering how many jobs with a
+    priority greater or equal to a given one are there at a site.
+    """
+
+    def __init__(self, siteJobCounts, priorities=None):
+        """
+        siteJobCounts is a dictionary-of-dictionaries: {site: {priority: jobs}}
+        priorities is an optional list of the priorities jobs will be added
+        with later on, any other priority is inserted on demand.
+        """
+        allPrios = set(priorities or [])
+        for jobsByPrio in siteJobCounts.values():
+            allPrios.update(jobsByPrio)
+        self._buildIndex(allPrios)
+        self.trees = {}
+        for site, jobsByPrio in siteJobCounts.items():
+            for prio, jobs in jobsByPrio.items():
+                self.addJobs(site, prio, jobs)
+
+    def _buildIndex(self, priorities):
+        """
+        _buildIndex_
+
+        Sort the priorities in descending order, the tree prefix sums then
+        give the number of jobs at or above a priority.
+        """
+        self.priorities = sorted(priorities, reverse=True)
+        self.negPriorities = [-prio for prio in self.priorities]
+        self.position = dict((prio, idx + 1) for idx, prio in enumerate(self.priorities))
+
+    def _insertPriority(self, prio):
+        """
+        _insertPriority_
+
+        Add an unknown priority, rebuilding the trees of all sites.
+        """
+        counts = self.asDict()
+        self._buildIndex(set(self.priorities) | set([prio]))
+        self.trees = {}
+        for site, jobsByPrio in counts.items():
+            for sitePrio, jobs in jobsByPrio.items():
+                self.addJobs(site, sitePrio, jobs)
+
+    def addJobs(self, site, prio, jobs):
+        """
+        _addJobs_
+
+        Add jobs at a given priority to a site.
+        """
+        if prio not in self.position:
+            self._insertPriority(prio)
+        tree = self.trees.get(site)
+        if tree is None:
+            tree = self.trees[site] = [0] * (len(self.priorities) + 1)
+        idx = self.position[prio]
+        while idx < len(tree):
+            tree[idx] += jobs
+            idx += idx & -idx
+
+    def jobsAtOrAbove(self, site, prio):
+        """
+        _jobsAtOrAbove_
+
+        Number of jobs at a site with a priority greater or equal to prio.
+        """
+        tree = self.trees.get(site)
+        if tree is None:
+            return 0
+        # number of known priorities >= prio
+        idx = bisect_right(self.negPriorities, -prio)
+        total = 0
+        while idx > 0:
+            total += tree[idx]
+            idx -= idx & -idx
+        return total
+
+    def asDict(self):
+        """
+        _asDict_
+
+        Return the counts as a dictionary-of-dictionaries, {site: {priority: jobs}}
+        """
+        counts = {}
+        for site in self.trees:
+            for prio in self.priorities:
+                jobs = self.jobsAtOrAbove(site, prio) - self._jobsAbove(site, prio)
+                if jobs:
+                    counts.setdefault(site, {})[prio] = jobs
+        return counts
+
+    def _jobsAbove(self, site, prio):
+        """
+        _jobsAbove_
+
+        Number of jobs at a site with a priority strictly greater than prio.
+        """
+        tree = self.trees[site]
+        idx = self.position[prio] - 1
+        total = 0
+        while idx > 0:
+            total += tree[idx]
+            idx -= idx & -idx
+        return total
+
+
+class SiteMatcher(object):
+    """
+    _SiteMatcher_
+
+    Pick a site for workqueue elements according to the site thresholds and
+    the jobs already running (or assigned) at each site.
+    """
+
+    def __init__(self, thresholds, siteJobCounts, priorities=None, logger=None):
+        self.thresholds = thresholds
+        self.siteJobCounts = siteJobCounts
+        self.logger = logger
+        self.sites = list(thresholds)
+        self.siteBits = dict((site, 1 << idx) for idx, site in enumerate(self.sites))
+        self.counter = SiteJobCounter(siteJobCounts, priorities)
+        self._maskCache = {}
+        self._sitesCache = {}
+        self._elementCache = {}
+
+    def siteMask(self, sites):
+        """
+        _siteMask_
+
+        Bitmask of the threshold sites found in sites.
+        """
+        key = frozenset(sites)
+        mask = self._maskCache.get(key)
+        if mask is None:
+            mask = 0
+            for site in key:
+                mask |= self.siteBits.get(site, 0)
+            self._maskCache[key] = mask
+        return mask
+
+    def maskSites(self, mask):
+        """
+        _maskSites_
+
+        List of the threshold sites set in mask.
+        """
+        if mask not in self._sitesCache:
+            self._sitesCache[mask] = [site for site in self.sites if mask & self.siteBits[site]]
+        return list(self._sitesCache[mask])
+
+    def elementSites(self, element):
+        """
+        _elementSites_
+
+        Threshold sites an element can run at. They are computed once for
+        all the elements with the same site and data restrictions.
+        """
+        elem = element.get('WMCore.WorkQueue.DataStructs.WorkQueueElement.WorkQueueElement', element)
+        key = tuple(_hashableValue(elem.get(field)) for field in SITE_FIELDS)
+        sites = self._elementCache.get(key)
+        if sites is None:
+            sites = self._elementCache[key] = self.maskSites(self.siteMask(possibleSites(element)))
+        return sites
+
+    def matchElement(self, element):
+        """
+        _matchElement_
+
+        Return a site, randomly chosen among the element possible sites with
+        free slots for its priority, and account the element jobs to it.
+        Return None if no site can take the element.
+        """
+        prio = element['Priority']
+        candidates = list(self.elementSites(element))
+        random.shuffle(candidates)
+        for site in candidates:
+            # Count the number of jobs currently running of greater priority
+            curJobCount = self.counter.jobsAtOrAbove(site, prio)
+            if self.logger:
+                self.logger.debug("Job Count: %s, site: %s thresholds: %s", curJobCount, site, self.thresholds[site])
+            if curJobCount < self.thresholds[site]:
+                self.addElement(site, element)
+                return site
+        return None
+
+    def addElement(self, site, element):
+        """
+        _addElement_
+
+        Account the element jobs to a site.
+        """
+        prio = element['Priority']
+        jobs = element['Jobs'] * element.get('blowupFactor', 1.0)
+        self.counter.addJobs(site, prio, jobs)
+        self.siteJobCounts.setdefault(site, {})
+        self.siteJobCounts[site][prio] = self.siteJobCounts[site].setdefault(prio, 0) + jobs
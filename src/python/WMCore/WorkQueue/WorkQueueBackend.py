@@ -6,14 +6,13 @@ Interface to WorkQueue persistent storage
 """
 
 import json
-import random
 import time
 
 from WMCore.Database.CMSCouch import CouchServer, CouchNotFoundError, Document
 from WMCore.Lexicon import sanitizeURL
 from WMCore.WMSpec.WMWorkload import WMWorkloadHelper
 from WMCore.WorkQueue.DataStructs.CouchWorkQueueElement import CouchWorkQueueElement, fixElementConflicts
-from WMCore.WorkQueue.DataStructs.WorkQueueElement import possibleSites
+from WMCore.WorkQueue.DataStructs.SiteMatcher import SiteMatcher
 from WMCore.WorkQueue.WorkQueueExceptions import WorkQueueNoMatchingElements, WorkQueueError
 
 
@@ -397,30 +396,16 @@ class WorkQueueBackend(object):
         sortedElements.sort(key=lambda element: element['CreationTime'])
         sortedElements.sort(key=lambda x: x['Priority'], reverse=True)
 
-        sites = thresholds.keys()
         self.logger.info("Current siteJobCounts:")
         for site, jobsByPrio in siteJobCounts.items():
             self.logger.info("    %s : %s", site, jobsByPrio)
 
+        siteMatcher = SiteMatcher(thresholds, siteJobCounts,
+                                  priorities=set(x['Priority'] for x in sortedElements),
+                                  logger=self.logger)
         for element in sortedElements:
-            commonSites = possibleSites(element)
-            prio = element['Priority']
-            possibleSite = None
-            random.shuffle(sites)
-            for site in sites:
-                if site in commonSites:
-                    # Count the number of jobs currently running of greater priority
-                    curJobCount = sum([x[1] if x[0] >= prio else 0 for x in siteJobCounts.get(site, {}).items()])
-                    self.logger.debug("Job Count: %s, site: %s thresholds: %s" % (curJobCount, site, thresholds[site]))
-                    if curJobCount < thresholds[site]:
-                        possibleSite = site
-                        break
-
-            if possibleSite:
+            if siteMatcher.matchElement(element):
                 elements.append(element)
-                siteJobCounts.setdefault(possibleSite, {})
-                siteJobCounts[possibleSite][prio] = siteJobCounts[possibleSite].setdefault(prio, 0) + \
-                                                    element['Jobs'] * element.get('blowupFactor', 1.0)
             else:
                 self.logger.debug("No available resources for %s with doc id %s", element['RequestName'], element.id)
 
@@ -2,6 +2,174 @@
 # -*- coding: ISO-8859-1 -*-
 
 """
-We used to have a wrapper here to wrap different JSON implementations. No longer needed with python 2.7
+_JsonWrapper_
+
+Wrapper of the JSON encoder and decoder implementations. The standard
+library json module is always available; a faster implementation is used
+instead when it is installed, and the REST formatters and the JSON and
+CouchDB clients get their backend from here.
+
+Backends:
+  * json: the standard library module
+  * ujson: ujson >= 5.2, encoding exactly as the json module does with its
+    default options, except for the exponent of floats below 1e-4 written
+    without leading zero ("1e-7" instead of "1e-07")
+  * orjson: encodes compactly, without escaping non-ASCII characters and
+    with NaN and infinities written as null, so it is only used when
+    configured explicitly. What orjson can't decode, such as NaN, is
+    decoded with the json module.
+
+The "auto" backend is the first of AUTO_BACKENDS which can be imported.
+ujson >= 5.2 and orjson only exist for python 3, so with python 2 the
+"auto" backend, and thus the default one, is the json module.
+The default backend of the process is set with setDefaultBackend, e.g. from
+the configuration of a service, and callers can ask for a given backend
+with getBackend.
 """
 
+from __future__ import division, print_function
+
+import json
+import logging
+import sys
+
+AUTO_BACKENDS = ["ujson", "json"]
+
+# separators json.dumps uses by default, with and without indentation
+if sys.version_info[0] >= 3:
+    INDENT_SEPARATORS = (',', ': ')
+else:
+    INDENT_SEPARATORS = (', ', ': ')
+SEPARATORS = (', ', ': ')
+
+
+class JSONBackend(object):
+    """
+    _JSONBackend_
+
+    Encode and decode with the standard library json module
+    """
+    name = "json"
+
+    def dumps(self, obj, indent=None):
+        return json.dumps(obj, indent=indent)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class UJSONBackend(JSONBackend):
+    """
+    _UJSONBackend_
+
+    Encode and decode with ujson, with the json module separators
+    """
+    name = "ujson"
+
+    def __init__(self):
+        import ujson
+        # older versions can't use the json separators, and the ones for
+        # python 2 round floats to a given precision
+        if tuple(int(part) for part in ujson.__version__.split(".")[:2]) < (5, 2):
+            raise ImportError("ujson %s is older than 5.2" % ujson.__version__)
+        self.module = ujson
+
+    def dumps(self, obj, indent=None):
+        if indent is None:
+            return self.module.dumps(obj, ensure_ascii=True, escape_forward_slashes=False,
+                                     separators=SEPARATORS)
+        return self.module.dumps(obj, indent=indent, ensure_ascii=True, escape_forward_slashes=False,
+                                 separators=INDENT_SEPARATORS)
+
+    def loads(self, data):
+        return self.module.loads(data)
+
+
+class ORJSONBackend(JSONBackend):
+    """
+    _ORJSONBackend_
+
+    Encode and decode with orjson, which produces compact UTF-8 JSON
+    """
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self.module = orjson
+        self.options = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, indent=None):
+        if indent is None:
+            return self.module.dumps(obj, option=self.options).decode("utf-8")
+        # orjson only indents with 2 spaces
+        return json.dumps(obj, indent=indent)
+
+    def loads(self, data):
+        try:
+            return self.module.loads(data)
+        except self.module.JSONDecodeError:
+            # e.g. NaN and infinities, which the json module writes
+            return json.loads(data)
+
+
+BACKENDS = {"json": JSONBackend, "ujson": UJSONBackend, "orjson": ORJSONBackend}
+
+_backends = {}
+_defaultBackend = "auto"
+
+
+def getBackend(name=None):
+    """
+    _getBackend_
+
+    Return the JSON backend of a name, "auto" for the fastest one installed,
+    None for the default backend of the process. A backend which can't be
+    imported is replaced by the json module one.
+    """
+    name = name or _defaultBackend
+    backend = _backends.get(name)
+    if backend is None:
+        if name == "auto":
+            candidates = AUTO_BACKENDS
+        elif name in BACKENDS:
+            candidates = [name, "json"]
+        else:
+            raise ValueError("Unknown JSON backend %s, available ones: %s" % (name, sorted(BACKENDS)))
+        for candidate in candidates:
+            try:
+                backend = BACKENDS[candidate]()
+                break
+            except ImportError as ex:
+                if name != "auto":
+                    logging.warning("JSON backend %s is not available, using json instead: %s", name, str(ex))
+        _backends[name] = backend
+    return backend
+
+
+def setDefaultBackend(name):
+    """
+    _setDefaultBackend_
+
+    Set the JSON backend used by default in this process
+    """
+    global _defaultBackend
+    getBackend(name)
+    _defaultBackend = name
+
+
+def dumps(obj, indent=None):
+    """
+    _dumps_
+
+    Encode with the default backend
+    """
+    return getBackend().dumps(obj, indent=indent)
+
+
+def loads(data):
+    """
+    _loads_
+
+    Decode with the default backend
+    """
+    return getBackend().loads(data)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+"""
+_JobCacheStore_t_
+
+Unit tests for the packed job cache store
+"""
+
+from __future__ import print_function, division
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from nose.plugins.attrib import attr
+
+from WMComponent.JobCreator.JobCacheStore import (JobCacheStore, JobCacheReader, JobCacheStoreException,
+                                                  JobSubmitIndex, getStorePath, submitRecord,
+                                                  STORE_NAME, SUBMIT_INDEX_NAME)
+from WMCore.DataStructs.Job import Job
+
+
+class JobCacheStoreTest(unittest.TestCase):
+    """
+    _JobCacheStoreTest_
+
+    Test the JobCacheStore and the JobCacheReader
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.collectionDir = os.path.join(self.testDir, "JobCollection_1_0")
+        os.mkdir(self.collectionDir)
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+        return
+
+    def makeJob(self, jobID):
+        """
+        _makeJob_
+
+        Create a job and its cache directory.
+        """
+        job = Job(name="job_%i" % jobID)
+        job['id'] = jobID
+        job['cache_dir'] = os.path.join(self.collectionDir, "job_%i" % jobID)
+        job['possiblePSN'] = set(["T1_US_FNAL", "T2_CH_CERN"])
+        os.mkdir(job['cache_dir'])
+        return job
+
+    def testStore(self):
+        """
+        _testStore_
+
+        Save jobs in the store and read them back in random order.
+        """
+        jobs = [self.makeJob(jobID) for jobID in range(1, 101)]
+        storePath = getStorePath(jobs[0]['cache_dir'])
+        self.assertEqual(storePath, os.path.join(self.collectionDir, STORE_NAME))
+
+        with JobCacheStore(storePath) as store:
+            for job in jobs:
+                store.append(job)
+
+        store = JobCacheStore(storePath)
+        self.assertEqual(sorted(store.jobIDs()), list(range(1, 101)))
+        for job in reversed(jobs):
+            self.assertTrue(job['id'] in store)
+            loadedJob = store.loadJob(job['id'])
+            self.assertEqual(loadedJob['name'], job['name'])
+            self.assertEqual(loadedJob['possiblePSN'], job['possiblePSN'])
+        self.assertFalse(1000 in store)
+        self.assertRaises(KeyError, store.loadJob, 1000)
+
+        # appending to an existing store, the last record wins
+        jobs[0]['possiblePSN'] = set(["T2_US_MIT"])
+        extraJob = self.makeJob(101)
+        with JobCacheStore(storePath) as writer:
+            writer.append(jobs[0])
+            writer.append(extraJob)
+        self.assertEqual(store.loadJob(101)['name'], "job_101")
+        self.assertEqual(store.loadJob(1)['possiblePSN'], set(["T2_US_MIT"]))
+        self.assertEqual(len(store.jobIDs()), 101)
+        store.close()
+        return
+
+    def testTruncatedStore(self):
+        """
+        _testTruncatedStore_
+
+        An interrupted write must not prevent reading the other jobs.
+        """
+        storePath = os.path.join(self.collectionDir, STORE_NAME)
+        with JobCacheStore(storePath) as store:
+            store.append(self.makeJob(1))
+            store.append(self.makeJob(2))
+
+        with open(storePath, 'rb+') as storeFile:
+            storeFile.truncate(os.path.getsize(storePath) - 10)
+
+        with JobCacheStore(storePath) as store:
+            self.assertEqual(store.jobIDs(), [1])
+            self.assertEqual(store.loadJob(1)['id'], 1)
+
+        with open(storePath, 'wb') as storeFile:
+            storeFile.write(b"NOTAJOBCACHESTORE")
+        with JobCacheStore(storePath) as store:
+            self.assertRaises(JobCacheStoreException, store.jobIDs)
+        return
+
+    def testReader(self):
+        """
+        _testReader_
+
+        Read jobs from both the packed store and legacy job.pkl files.
+        """
+        packedJob = self.makeJob(1)
+        legacyJob = self.makeJob(2)
+        missingJob = self.makeJob(3)
+        with JobCacheStore(getStorePath(packedJob['cache_dir'])) as store:
+            store.append(packedJob)
+        with open(os.path.join(legacyJob['cache_dir'], 'job.pkl'), 'wb') as output:
+            pickle.dump(legacyJob, output, pickle.HIGHEST_PROTOCOL)
+
+        with JobCacheReader() as reader:
+            self.assertTrue(reader.hasJob(packedJob['cache_dir'], 1))
+            self.assertTrue(reader.hasJob(legacyJob['cache_dir'], 2))
+            self.assertFalse(reader.hasJob(missingJob['cache_dir'], 3))
+            self.assertEqual(reader.loadJob(packedJob['cache_dir'], 1)['name'], "job_1")
+            self.assertEqual(reader.loadJob(legacyJob['cache_dir'], 2)['name'], "job_2")
+            self.assertRaises(IOError, reader.loadJob, missingJob['cache_dir'], 3)
+        return
+
+    def testSubmitIndex(self):
+        """
+        _testSubmitIndex_
+
+        Read the submit records of indexed jobs, without unpickling them.
+        """
+        jobs = [self.makeJob(jobID) for jobID in range(1, 4)]
+        jobs[0]['sandbox'] = "/path/to/sandbox.tar.bz2"
+        jobs[0]['numberOfCores'] = 4
+        jobs[1].addBaggageParameter("numberOfCores", 8)
+        indexPath = getStorePath(jobs[0]['cache_dir'], SUBMIT_INDEX_NAME)
+        self.assertEqual(indexPath, os.path.join(self.collectionDir, SUBMIT_INDEX_NAME))
+        with JobSubmitIndex(indexPath) as jobIndex:
+            jobIndex.append(jobs[0])
+            jobIndex.append(jobs[1])
+
+        record = submitRecord(jobs[0])
+        self.assertEqual(record['possiblePSN'], ["T1_US_FNAL", "T2_CH_CERN"])
+        self.assertEqual(record['numberOfCores'], 4)
+        # the baggage overrides the number of cores
+        self.assertEqual(submitRecord(jobs[1])['numberOfCores'], 8)
+
+        with JobCacheReader() as reader:
+            self.assertEqual(reader.loadSubmitRecord(jobs[0]['cache_dir'], 1), record)
+            self.assertEqual(reader.loadSubmitRecord(jobs[1]['cache_dir'], 2)['numberOfCores'], 8)
+            self.assertEqual(reader.loadSubmitRecord(jobs[2]['cache_dir'], 3), None)
+
+        # a truncated record is ignored
+        with open(indexPath, 'a') as indexFile:
+            indexFile.write('{"id": 3, "possiblePSN"')
+        self.assertEqual(sorted(JobSubmitIndex(indexPath).load()), [1, 2])
+        return
+
+    @attr('performance', 'integration')
+    def testStorePerformance(self):
+        """
+        _testStorePerformance_
+
+        Compare writing and reading jobs with the packed store and with
+        one job.pkl file per job.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        nJobs = 1000
+        jobs = [self.makeJob(jobID) for jobID in range(nJobs)]
+
+        startTime = time.time()
+        for job in jobs:
+            with open(os.path.join(job['cache_dir'], 'job.pkl'), 'wb') as output:
+                pickle.dump(job, output, pickle.HIGHEST_PROTOCOL)
+        legacyWrite = time.time() - startTime
+
+        startTime = time.time()
+        with JobCacheStore(getStorePath(jobs[0]['cache_dir'])) as store:
+            for job in jobs:
+                store.append(job)
+        storeWrite = time.time() - startTime
+
+        startTime = time.time()
+        for job in jobs:
+            with open(os.path.join(job['cache_dir'], 'job.pkl'), 'rb') as jobHandle:
+                pickle.load(jobHandle)
+        legacyRead = time.time() - startTime
+
+        startTime = time.time()
+        with JobCacheStore(getStorePath(jobs[0]['cache_dir'])) as store:
+            for job in jobs:
+                store.loadJob(job['id'])
+        storeRead = time.time() - startTime
+
+        print("  job.pkl files: write %.0f jobs/sec, read %.0f jobs/sec" % (nJobs / legacyWrite, nJobs / legacyRead))
+        print("  packed store: write %.0f jobs/sec, read %.0f jobs/sec" % (nJobs / storeWrite, nJobs / storeRead))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -294,6 +294,50 @@ class JobCreatorTest(EmulatedUnitTestCase):
 
         return
 
+    def testProcessPool(self):
+        """
+        _testProcessPool_
+
+        Create the job groups in a pool of processes, WMBS being updated
+        by the poller itself.
+        """
+        config = self.getConfig()
+        config.JobCreator.nProcesses = 2
+
+        name = makeUUID()
+        nSubs = 5
+        nFiles = 10
+        workloadName = 'TestWorkload'
+
+        self.createWorkload(workloadName=workloadName)
+        workloadPath = os.path.join(self.testDir, 'workloadTest', 'TestWorkload', 'WMSandbox', 'WMWorkload.pkl')
+
+        self.createJobCollection(name=name, nSubs=nSubs, nFiles=nFiles, workflowURL=workloadPath)
+
+        testJobCreator = JobCreatorPoller(config=config)
+        self.assertEqual(len(testJobCreator.pool), 2)
+        try:
+            testJobCreator.algorithm()
+        finally:
+            testJobCreator.close()
+        self.assertEqual(testJobCreator.pool, [])
+
+        getJobsAction = self.daoFactory(classname="Jobs.GetAllJobs")
+        result = getJobsAction.execute(state='Created', jobType="Processing")
+        self.assertEqual(len(result), nSubs * nFiles)
+
+        # the cache directories set in WMBS hold the jobs saved by the pool processes
+        getCacheAction = self.daoFactory(classname="Jobs.GetCache")
+        for jobID in result:
+            cacheDir = getCacheAction.execute(jobID)
+            with open(os.path.join(cacheDir, 'job.pkl'), 'r') as jobFile:
+                job = pickle.load(jobFile)
+            self.assertEqual(job['id'], jobID)
+            self.assertEqual(job['workflow'], name)
+            self.assertEqual(os.path.basename(job['sandbox']), 'TestWorkload-Sandbox.tar.bz2')
+
+        return
+
     @attr('performance', 'integration')
     def testProfilePoller(self):
         """
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""
+_JobSubmitQueue_t_
+
+Unit tests for the JobSubmitter job priority queue and the job assignment
+to sites built on it.
+"""
+from __future__ import print_function, division
+
+import copy
+import logging
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMComponent.JobSubmitter.JobSubmitQueue import JobSubmitQueue
+from WMComponent.JobSubmitter.JobSubmitterPoller import JobSubmitterPoller
+
+TASK_TYPES = ["Processing", "Production", "Merge", "LogCollect"]
+
+
+def makeThresholds(sites, pendingSlots, runningSlots):
+    """
+    Resource control thresholds of empty sites, as listThresholdsForSubmit returns them
+    """
+    rcThresholds = {}
+    for site in sites:
+        rcThresholds[site] = {"total_pending_slots": pendingSlots, "total_running_slots": runningSlots,
+                              "total_pending_jobs": 0, "total_running_jobs": 0, "thresholds": {}}
+        for taskType in TASK_TYPES:
+            rcThresholds[site]["thresholds"][taskType] = {"pending_slots": pendingSlots // 2,
+                                                          "max_slots": runningSlots,
+                                                          "task_pending_jobs": 0, "task_running_jobs": 0,
+                                                          "wf_highest_priority": None}
+    return rcThresholds
+
+
+def makePoller(rcThresholds, maxJobs):
+    """
+    Create a JobSubmitterPoller with no job in its cache, without any database
+    """
+    poller = JobSubmitterPoller.__new__(JobSubmitterPoller)
+    poller.jobSubmitQueue = JobSubmitQueue()
+    poller.jobDataCache = {}
+    poller.currentRcThresholds = rcThresholds
+    poller.maxJobsThisCycle = maxJobs
+    poller.condorOverflowFraction = 0.2
+    poller.ioboundTypes = ('LogCollect', 'Merge', 'Cleanup', 'Harvesting')
+    poller.jobsToPackage = {}
+    # there is no job cache to package the jobs from
+    poller.packageJob = lambda cachedJob, jobCacheReader: cachedJob['packageDir']
+    return poller
+
+
+def fillPoller(poller, sites, nJobs, nPrios):
+    """
+    Add random jobs to the poller cache
+    """
+    # equal site sets must be the same object, to iterate over their sites in the same order
+    siteSets = sorted(set(frozenset(random.sample(sites, random.randint(1, 3))) for _ in range(50)), key=sorted)
+    for jobId in range(1, nJobs + 1):
+        jobPrio = random.randint(0, nPrios - 1) * 1e7 + random.choice([1000, 2000])
+        taskType = random.choice(TASK_TYPES)
+        possibleSites = random.choice(siteSets)
+        poller.jobDataCache[jobId] = {'id': jobId, 'task_type': taskType, 'possibleSites': possibleSites,
+                                      'packageDir': "/package/%d" % (jobId % 10), 'jobPrio': jobPrio}
+        poller.jobSubmitQueue.addJob(jobId, jobPrio, taskType, possibleSites)
+
+
+def naiveAssignment(poller):
+    """
+    Assign job locations by checking every cached job against every site,
+    as assignJobLocations used to. Return the list of (job id, site).
+    """
+    jobsByPrio = {}
+    for jobId, jobInfo in poller.jobDataCache.items():
+        jobsByPrio.setdefault(jobInfo['jobPrio'], set()).add(jobId)
+    assigned = []
+    for jobPrio in sorted(jobsByPrio, reverse=True):
+        for jobId in sorted(jobsByPrio[jobPrio]):
+            jobType = poller.jobDataCache[jobId]['task_type']
+            possibleSites = poller.checkZeroTaskThresholds(jobType, poller.jobDataCache[jobId]['possibleSites'])
+            for siteName in possibleSites:
+                if poller._getJobSubmitCondition(jobPrio, siteName, jobType) == "JobSubmitReady":
+                    poller.currentRcThresholds[siteName]["total_pending_jobs"] += 1
+                    poller.currentRcThresholds[siteName]['thresholds'][jobType]["task_pending_jobs"] += 1
+                    assigned.append((jobId, siteName))
+                    break
+            if len(assigned) >= poller.maxJobsThisCycle:
+                return assigned
+    return assigned
+
+
+def assignedJobs(jobsToSubmit):
+    """
+    List of (job id, site) of the jobs returned by assignJobLocations
+    """
+    assigned = []
+    for jobs in jobsToSubmit.values():
+        assigned.extend((job['id'], job['custom']['location']) for job in jobs)
+    return sorted(assigned)
+
+
+class JobSubmitQueueTest(unittest.TestCase):
+    """
+    Test the JobSubmitQueue and assignJobLocations
+    """
+
+    def setUp(self):
+        random.seed(12345)
+        logging.getLogger().setLevel(logging.INFO)
+        self.sites = ["T1_US_FNAL", "T1_UK_RAL", "T2_CH_CERN", "T2_US_Nebraska", "T2_DE_DESY"]
+
+    def testQueue(self):
+        """
+        Jobs are kept sorted per priority and bucket
+        """
+        queue = JobSubmitQueue()
+        sitesA = frozenset(["T1_US_FNAL"])
+        sitesB = frozenset(["T1_US_FNAL", "T2_CH_CERN"])
+        for jobId, jobPrio, sites in [(5, 10, sitesA), (2, 10, sitesB), (7, 20, sitesA),
+                                      (3, 10, sitesA), (9, 10, sitesB), (1, 5, sitesA)]:
+            queue.addJob(jobId, jobPrio, "Processing", sites)
+        self.assertEqual(len(queue), 6)
+        self.assertTrue(7 in queue)
+        self.assertEqual(queue.priorities(), [20, 10, 5])
+
+        jobs = [(jobId, sites) for jobId, _, sites, _ in queue.iterJobs(10, lambda *args: False)]
+        self.assertEqual(jobs, [(2, sitesB), (3, sitesA), (5, sitesA), (9, sitesB)])
+
+        # saturated buckets are skipped at once
+        jobs = list(queue.iterJobs(10, lambda taskType, sites: sites == sitesA))
+        self.assertEqual(jobs, [(2, "Processing", sitesB, 0), (None, "Processing", sitesA, 2),
+                                (9, "Processing", sitesB, 0)])
+
+        queue.removeJobs([3, 7, 42])
+        self.assertEqual(len(queue), 4)
+        self.assertEqual(queue.priorities(), [10, 5])
+        self.assertEqual([x[0] for x in queue.iterJobs(10, lambda *args: False)], [2, 5, 9])
+        queue.removeJobs(range(100))
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.priorities(), [])
+        self.assertEqual(list(queue.iterJobs(10, lambda *args: False)), [])
+
+    def testSameAssignment(self):
+        """
+        assignJobLocations submits the same jobs to the same sites as the naive assignment
+        """
+        for pendingSlots, maxJobs in [(50, 10000), (500, 10000), (50, 100)]:
+            rcThresholds = makeThresholds(self.sites, pendingSlots, 2 * pendingSlots)
+            poller = makePoller(copy.deepcopy(rcThresholds), maxJobs)
+            fillPoller(poller, self.sites, 5000, 10)
+
+            naivePoller = makePoller(copy.deepcopy(rcThresholds), maxJobs)
+            naivePoller.jobDataCache = dict(poller.jobDataCache)
+            expected = sorted(naiveAssignment(naivePoller))
+            self.assertTrue(expected)
+
+            assigned = assignedJobs(poller.assignJobLocations())
+            self.assertEqual(assigned, expected)
+            # the submitted jobs left the cache and the queue
+            self.assertEqual(len(poller.jobDataCache), 5000 - len(assigned))
+            self.assertEqual(len(poller.jobSubmitQueue), len(poller.jobDataCache))
+            for jobId, _ in assigned:
+                self.assertFalse(jobId in poller.jobSubmitQueue)
+
+    @attr('performance', 'integration')
+    def testAssignmentPerformance(self):
+        """
+        Time the job assignment over a synthetic 1M jobs cache.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        logging.getLogger().setLevel(logging.WARNING)
+        sites = ["T2_XX_Site%d" % i for i in range(50)]
+        rcThresholds = makeThresholds(sites, 100, 200)
+        poller = makePoller(copy.deepcopy(rcThresholds), 5000)
+        startTime = time.time()
+        fillPoller(poller, sites, 1000000, 100)
+        print("  filling the cache: %.2f secs" % (time.time() - startTime))
+
+        naivePoller = makePoller(copy.deepcopy(rcThresholds), 5000)
+        naivePoller.jobDataCache = poller.jobDataCache
+        startTime = time.time()
+        naiveAssignment(naivePoller)
+        print("  naive assignment: %.2f secs" % (time.time() - startTime))
+
+        startTime = time.time()
+        poller.assignJobLocations()
+        print("  assignJobLocations: %.2f secs" % (time.time() - startTime))
+
+
+if __name__ == '__main__':
+    unittest.main()
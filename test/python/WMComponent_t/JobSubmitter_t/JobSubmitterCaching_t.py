@@ -206,6 +206,49 @@ class JobSubmitterCachingTest(EmulatedUnitTestCase):
                          "Error: The job cache should be empty.  Contains: %i" % len(mySubmitterPoller.jobDataCache))
         return
 
+    def testIncrementalCaching(self):
+        """
+        _testIncrementalCaching_
+
+        Verify that only the jobs which entered the created state are looked
+        for between full cache refreshes, and that the jobs which left it are
+        dropped by every refresh.
+        """
+        config = self.createConfig()
+        config.JobSubmitter.fullRefreshCount = 3
+        mySubmitterPoller = JobSubmitterPoller(config)
+        mySubmitterPoller.getThresholds()
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 0)
+        self.assertNotEqual(mySubmitterPoller.stateTimeMark, None)
+
+        self.injectJobs()
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 20)
+        self.assertEqual(mySubmitterPoller.incrementalRefreshes, 1)
+
+        # jobs failing submission are dropped, and cached again once back in created state
+        stateChanger = ChangeState(config, "jobsubmittercaching_t")
+        jobs = []
+        for jobID, jobInfo in mySubmitterPoller.jobDataCache.items():
+            if jobInfo['request_name'] == "wf002":
+                job = Job(id=jobID)
+                job.load()
+                jobs.append(job)
+        stateChanger.propagate(jobs, "submitfailed", "created")
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 10)
+
+        stateChanger.propagate(jobs, "submitcooloff", "submitfailed")
+        stateChanger.propagate(jobs, "created", "submitcooloff")
+        killWorkflow("wf001", jobCouchConfig=config)
+        mySubmitterPoller.refreshCache()
+        self.assertEqual(mySubmitterPoller.incrementalRefreshes, 3)
+        self.assertEqual(len(mySubmitterPoller.jobDataCache), 10)
+        self.assertEqual(set(jobInfo['request_name'] for jobInfo in mySubmitterPoller.jobDataCache.values()),
+                         set(["wf002"]))
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
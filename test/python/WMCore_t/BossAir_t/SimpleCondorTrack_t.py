@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+_SimpleCondorTrack_t_
+
+Unit tests for the SimpleCondorPlugin job tracking, run against a fake
+schedd instead of a live HTCondor pool.
+"""
+from __future__ import division, print_function
+
+import unittest
+
+import classad
+from mock import mock
+
+from WMCore.BossAir.Plugins.SimpleCondorPlugin import SimpleCondorPlugin
+
+
+class FakeSchedd(object):
+    """
+    _FakeSchedd_
+
+    Keep job classAds in a queue and a history, and answer the xquery and
+    history calls evaluating their constraints with the classad bindings.
+    """
+
+    def __init__(self):
+        self.clock = 1000
+        self.queue = {}
+        self.historyAds = []
+        self.calls = []
+
+    @staticmethod
+    def matches(jobAd, expression):
+        """
+        Evaluate a constraint expression against a job classAd
+        """
+        ad = classad.ClassAd(dict(jobAd))
+        ad['FakeScheddMatch'] = classad.ExprTree(expression)
+        return ad.eval('FakeScheddMatch') is True
+
+    def submit(self, gridId, agent="testAgent"):
+        """
+        Queue an idle job
+        """
+        clusterId, procId = gridId.split('.')
+        self.queue[gridId] = {'ClusterId': int(clusterId), 'ProcId': int(procId), 'JobStatus': 1,
+                              'WMAgent_AgentName': agent, 'EnteredCurrentStatus': self.clock}
+
+    def setStatus(self, gridId, jobStatus, site=None):
+        """
+        Change the status of a queued job
+        """
+        self.queue[gridId]['JobStatus'] = jobStatus
+        self.queue[gridId]['EnteredCurrentStatus'] = self.clock
+        if site:
+            self.queue[gridId]['MachineAttrGLIDEIN_CMSSite0'] = site
+
+    def leaveQueue(self, gridId, jobStatus=4):
+        """
+        Complete or remove a job, moving it to the history
+        """
+        self.setStatus(gridId, jobStatus)
+        self.historyAds.append(self.queue.pop(gridId))
+
+    def project(self, jobAd, projection):
+        return dict((attr, jobAd[attr]) for attr in projection if attr in jobAd)
+
+    def xquery(self, constraint, projection):
+        self.calls.append(('xquery', constraint))
+        for jobAd in self.queue.values():
+            if self.matches(jobAd, constraint):
+                yield self.project(jobAd, projection)
+
+    def history(self, constraint, projection, match=-1, since=None):
+        self.calls.append(('history', constraint))
+        for jobAd in reversed(self.historyAds):
+            if since and self.matches(jobAd, since):
+                break
+            if self.matches(jobAd, constraint):
+                yield self.project(jobAd, projection)
+
+
+def makePlugin(incrementalTrack, fullTrackCount=10):
+    """
+    Create a SimpleCondorPlugin with only its tracking attributes, without any database
+    """
+    plugin = SimpleCondorPlugin.__new__(SimpleCondorPlugin)
+    plugin.agent = "testAgent"
+    plugin.incrementalTrack = incrementalTrack
+    plugin.fullTrackCount = fullTrackCount
+    plugin.trackTimeMargin = 0
+    plugin.trackCount = 0
+    plugin.lastTrackTime = None
+    plugin.jobInfoCache = {}
+    return plugin
+
+
+class SimpleCondorTrackTest(unittest.TestCase):
+    """
+    Test the full and incremental job tracking of SimpleCondorPlugin
+    """
+
+    def setUp(self):
+        self.schedd = FakeSchedd()
+        patcher = mock.patch('WMCore.BossAir.Plugins.SimpleCondorPlugin.htcondor.Schedd',
+                             return_value=self.schedd)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        timePatcher = mock.patch('WMCore.BossAir.Plugins.SimpleCondorPlugin.time.time',
+                                 side_effect=lambda: self.schedd.clock)
+        timePatcher.start()
+        self.addCleanup(timePatcher.stop)
+
+        self.jobs = []
+        for jobId in range(1, 6):
+            gridId = "100.%d" % jobId
+            self.schedd.submit(gridId)
+            self.jobs.append({'jobid': jobId, 'gridid': gridId, 'status': 'Idle', 'location': None})
+        # a job of another agent
+        self.schedd.submit("200.0", agent="otherAgent")
+
+    def track(self, plugin):
+        """
+        Track the jobs still running, advancing the schedd clock
+        """
+        self.schedd.calls = []
+        running, changed, completed = plugin.track(self.jobs)
+        self.jobs = running
+        self.schedd.clock += 100
+        return (sorted(job['gridid'] for job in running), sorted(job['gridid'] for job in changed),
+                sorted(job['gridid'] for job in completed))
+
+    def runScenario(self, plugin):
+        """
+        Run a few tracking cycles with job status changes in between.
+        Return the tracking results of each cycle.
+        """
+        results = [self.track(plugin)]
+
+        self.schedd.setStatus("100.1", 2, site="T2_CH_CERN")
+        self.schedd.setStatus("100.2", 2, site="T1_US_FNAL")
+        results.append(self.track(plugin))
+
+        self.schedd.leaveQueue("100.1")
+        self.schedd.setStatus("100.3", 5)
+        results.append(self.track(plugin))
+
+        self.schedd.leaveQueue("100.2", jobStatus=3)
+        self.schedd.submit("100.6")
+        self.jobs.append({'jobid': 6, 'gridid': "100.6", 'status': 'Idle', 'location': None})
+        results.append(self.track(plugin))
+
+        # a job vanishing from both the queue and the history is only noticed by a full query
+        del self.schedd.queue["100.4"]
+        results.append(self.track(plugin))
+        return results
+
+    def testFullTrack(self):
+        """
+        Every cycle queries all the agent jobs in the schedd
+        """
+        results = self.runScenario(makePlugin(incrementalTrack=False))
+        self.assertEqual(results[0], (["100.1", "100.2", "100.3", "100.4", "100.5"], [], []))
+        self.assertEqual(results[1], (["100.1", "100.2", "100.3", "100.4", "100.5"], ["100.1", "100.2"], []))
+        self.assertEqual(results[2], (["100.2", "100.4", "100.5"], ["100.1", "100.3"], ["100.1", "100.3"]))
+        self.assertEqual(results[3], (["100.4", "100.5", "100.6"], ["100.2"], ["100.2"]))
+        self.assertEqual(results[4], (["100.5", "100.6"], ["100.4"], ["100.4"]))
+        self.assertEqual(self.schedd.calls, [('xquery', 'WMAgent_AgentName == "testAgent"')])
+
+    def testIncrementalTrack(self):
+        """
+        Only the jobs which changed status are queried, with the same tracking results
+        """
+        plugin = makePlugin(incrementalTrack=True, fullTrackCount=5)
+        results = self.runScenario(plugin)
+        self.assertEqual(results[0], (["100.1", "100.2", "100.3", "100.4", "100.5"], [], []))
+        self.assertEqual(results[1], (["100.1", "100.2", "100.3", "100.4", "100.5"], ["100.1", "100.2"], []))
+        self.assertEqual(results[2], (["100.2", "100.4", "100.5"], ["100.1", "100.3"], ["100.1", "100.3"]))
+        self.assertEqual(results[3], (["100.4", "100.5", "100.6"], ["100.2"], ["100.2"]))
+        # the vanished job is still tracked until the next full query
+        self.assertEqual(results[4], (["100.4", "100.5", "100.6"], [], []))
+        self.assertEqual(len(self.schedd.calls), 2)
+        self.assertEqual(self.schedd.calls[1][1], 'WMAgent_AgentName == "testAgent" && EnteredCurrentStatus >= 1300')
+
+        self.assertEqual(self.track(plugin), (["100.5", "100.6"], ["100.4"], ["100.4"]))
+        self.assertEqual(self.schedd.calls, [('xquery', 'WMAgent_AgentName == "testAgent"')])
+
+        # the location is set on the Idle->Running transition
+        self.schedd.setStatus("100.5", 2, site="T2_US_Nebraska")
+        self.assertEqual(self.track(plugin), (["100.5", "100.6"], ["100.5"], []))
+        self.assertEqual(self.jobs[0]['location'], "T2_US_Nebraska")
+        self.assertEqual(self.track(plugin), (["100.5", "100.6"], [], []))
+        # the jobs which left the queue are not cached anymore
+        self.assertEqual(sorted(plugin.jobInfoCache), ["100.3", "100.5", "100.6"])
+
+    def testFailedQuery(self):
+        """
+        A failed incremental query is followed by a full query
+        """
+        plugin = makePlugin(incrementalTrack=True)
+        self.track(plugin)
+        self.schedd.setStatus("100.1", 2)
+        with mock.patch.object(self.schedd, 'xquery', side_effect=RuntimeError("schedd down")):
+            self.assertEqual(plugin.track(self.jobs), ([], [], []))
+        self.assertEqual(plugin.lastTrackTime, None)
+        self.schedd.clock += 100
+        self.assertEqual(self.track(plugin), (["100.1", "100.2", "100.3", "100.4", "100.5"], ["100.1"], []))
+        self.assertEqual(self.schedd.calls, [('xquery', 'WMAgent_AgentName == "testAgent"')])
+        self.assertEqual(plugin.trackCount, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
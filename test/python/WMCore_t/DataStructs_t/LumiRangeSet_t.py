@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+_LumiRangeSet_t_
+
+Unit tests and microbenchmarks for the compact lumi range set
+"""
+
+from __future__ import print_function, division
+
+import random
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.DataStructs.LumiList import LumiList
+from WMCore.DataStructs.LumiRangeSet import (LumiRangeSet, mergeRanges, orRanges, andRanges, subRanges,
+                                             lumisToRanges, filterLumisInRanges)
+
+
+def randomRanges(nRanges, maxLumi):
+    """
+    Random, possibly overlapping, lumi ranges
+    """
+    ranges = []
+    for _ in range(nRanges):
+        first = random.randint(1, maxLumi)
+        ranges.append([first, min(maxLumi, first + random.randint(0, 20))])
+    return ranges
+
+
+def expand(ranges):
+    """
+    Set of the lumis in the ranges
+    """
+    lumis = set()
+    for first, last in ranges:
+        lumis.update(range(first, last + 1))
+    return lumis
+
+
+def realisticCompactList(nRuns, nLumis, holeProbability):
+    """
+    Compact list of runs with nLumis lumis each, with random holes
+    as in a partially processed dataset
+    """
+    compactList = {}
+    for run in range(100000, 100000 + nRuns):
+        lumis = [lumi for lumi in range(1, nLumis + 1) if random.random() > holeProbability]
+        compactList[str(run)] = lumisToRanges(lumis)
+    return compactList
+
+
+class LumiRangeSetTest(unittest.TestCase):
+    """
+    _LumiRangeSetTest_
+
+    """
+
+    def setUp(self):
+        random.seed(1234)
+
+    def testRangeFunctions(self):
+        """
+        Compare the range algebra with the one of expanded sets
+        """
+        self.assertEqual(mergeRanges([[5, 10], [1, 3], [4, 4], [8, 12], [20, 20]]), [[1, 12], [20, 20]])
+        self.assertEqual(lumisToRanges([3, 1, 2, 2, 7, 5, 6, 10]), [[1, 3], [5, 7], [10, 10]])
+        for _ in range(200):
+            aRanges = mergeRanges(randomRanges(random.randint(0, 10), 100))
+            bRanges = mergeRanges(randomRanges(random.randint(0, 10), 100))
+            aLumis, bLumis = expand(aRanges), expand(bRanges)
+            self.assertEqual(orRanges(aRanges, bRanges), lumisToRanges(aLumis | bLumis))
+            self.assertEqual(andRanges(aRanges, bRanges), lumisToRanges(aLumis & bLumis))
+            self.assertEqual(subRanges(aRanges, bRanges), lumisToRanges(aLumis - bLumis))
+            lumis = list(range(0, 110))
+            self.assertEqual(filterLumisInRanges(lumis, aRanges), sorted(aLumis))
+
+    def testConversions(self):
+        """
+        Round trip through the LumiList formats
+        """
+        compactList = {'1': [[1, 33], [35, 35], [37, 47]], '2': [[49, 75], [77, 130], [133, 136]]}
+        cmsswString = "1:1-1:33,1:35,1:37-1:47,2:49-2:75,2:77-2:130,2:133-2:136"
+
+        lumiSet = LumiRangeSet(compactList)
+        self.assertEqual(lumiSet.getCompactList(), compactList)
+        self.assertEqual(lumiSet.getCMSSWString(), cmsswString)
+        self.assertEqual(LumiRangeSet.fromCMSSWString(cmsswString), lumiSet)
+        self.assertEqual(LumiRangeSet.fromLumiList(LumiList(compactList=compactList)), lumiSet)
+        self.assertEqual(lumiSet.toLumiList().getCMSSWString(), cmsswString)
+        self.assertEqual(LumiRangeSet.fromLumis(lumiSet.getLumis()), lumiSet)
+        self.assertEqual(LumiRangeSet.fromRunsAndLumis({1: list(range(1, 34)) + [35] + list(range(37, 48)),
+                                                        '2': list(range(49, 76)) + list(range(77, 131)) +
+                                                             list(range(133, 137))}),
+                         lumiSet)
+        self.assertEqual(lumiSet.getRuns(), [1, 2])
+        self.assertEqual(lumiSet.lumiCount(), len(lumiSet.getLumis()))
+        self.assertEqual(len(lumiSet), 2)
+
+        # unsorted and overlapping ranges are compacted
+        self.assertEqual(LumiRangeSet({1: [[10, 20], [1, 5], [6, 8], [15, 25]]}).getCompactList(),
+                         {'1': [[1, 8], [10, 25]]})
+        self.assertEqual(LumiRangeSet({1: []}).getCompactList(), {})
+        self.assertEqual(LumiRangeSet().getCMSSWString(), '')
+        self.assertRaises(ValueError, LumiRangeSet.fromCMSSWString, "1:1-2:10")
+
+        # full runs, as built by LumiList(runs=...)
+        fullRuns = LumiList(runs=[1, 2])
+        self.assertEqual(LumiRangeSet.fromLumiList(fullRuns).getCompactList(), fullRuns.getCompactList())
+
+    def testSetOperations(self):
+        """
+        The set operations give the same results as the LumiList ones
+        """
+        for _ in range(20):
+            aCompact = dict((str(run), randomRanges(10, 200)) for run in random.sample(range(1, 10), 5))
+            bCompact = dict((str(run), randomRanges(10, 200)) for run in random.sample(range(1, 10), 5))
+            aList, bList = LumiList(compactList=aCompact), LumiList(compactList=bCompact)
+            aSet, bSet = LumiRangeSet(aCompact), LumiRangeSet(bCompact)
+            aLumis, bLumis = set(aList.getLumis()), set(bList.getLumis())
+
+            self.assertEqual((aSet | bSet).getCompactList(), (aList | bList).getCompactList())
+            self.assertEqual((aSet + bSet).getCompactList(), (aList + bList).getCompactList())
+            self.assertEqual((aSet & bSet).getCompactList(), (aList & bList).getCompactList())
+            self.assertEqual((aSet - bSet).getCompactList(), (aList - bList).getCompactList())
+            self.assertEqual(set((aSet - bSet).getLumis()), aLumis - bLumis)
+            self.assertEqual(set((aSet & bSet).getLumis()), aLumis & bLumis)
+
+            pairs = [(run, lumi) for run in range(1, 10) for lumi in range(0, 210, 7)]
+            self.assertEqual(aSet.filterLumis(pairs), aList.filterLumis(pairs))
+            self.assertEqual([pair in aSet for pair in pairs], [aList.contains(pair) for pair in pairs])
+
+    @attr('performance', 'integration')
+    def testSetPerformance(self):
+        """
+        Time the construction, conversions and set operations of LumiList and
+        LumiRangeSet for realistic sizes: a dataset of many runs with a
+        few holes, masked by a certification JSON with long ranges.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        # the last case is a very fragmented dataset
+        for nRuns, nLumis, holes in [(100, 1000, 0.01), (1000, 1000, 0.01), (200, 10000, 0.01), (5, 100000, 0.3)]:
+            dataset = realisticCompactList(nRuns, nLumis, holes)
+            golden = realisticCompactList(nRuns, nLumis, 0.0005)
+            processed = realisticCompactList(nRuns, nLumis, 0.1)
+            totalLumis = LumiRangeSet(dataset).lumiCount()
+            print("\n  %d runs x %d lumis, %d lumis in %d ranges" %
+                  (nRuns, nLumis, totalLumis, sum(len(x) for x in dataset.values())))
+
+            for name, lumiClass in [("LumiList", LumiList), ("LumiRangeSet", LumiRangeSet)]:
+                startTime = time.time()
+                if lumiClass is LumiList:
+                    lumiSets = [LumiList(compactList=x) for x in (dataset, golden, processed)]
+                else:
+                    lumiSets = [LumiRangeSet(x) for x in (dataset, golden, processed)]
+                buildTime = time.time() - startTime
+
+                startTime = time.time()
+                toProcess = (lumiSets[0] & lumiSets[1]) - lumiSets[2]
+                merged = lumiSets[0] | lumiSets[2]
+                opsTime = time.time() - startTime
+
+                startTime = time.time()
+                cmsswString = toProcess.getCMSSWString()
+                toProcess.getCompactList()
+                merged.getCompactList()
+                convertTime = time.time() - startTime
+
+                print("  %-12s build %.3fs, and/sub/or %.3fs, conversions %.3fs, %d chars string" %
+                      (name, buildTime, opsTime, convertTime, len(cmsswString)))
+
+            lumis = [(int(run), lumi) for run in dataset for lumi in range(1, nLumis + 1, 10)]
+            startTime = time.time()
+            LumiRangeSet(golden).filterLumis(lumis)
+            print("  filtering %d lumis: %.3fs" % (len(lumis), time.time() - startTime))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,8 +6,16 @@ Unittest for the WMCore.DataStructs.Run class
 
 """
 
+from __future__ import print_function
+
+import copy
+import pickle
+import random
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.DataStructs.Run import Run
 
 
@@ -171,6 +179,85 @@ class RunTest(unittest.TestCase):
         s.add(run10)
         s.add(run11)
 
+    def testSortedLumis(self):
+        """
+        positional access follows lumi insertions and removals in any order
+        """
+        run = Run(1)
+        lumis = list(range(1, 200))
+        random.shuffle(lumis)
+        for lumi in lumis[:100]:
+            run.appendLumi(lumi)
+        run.extendLumis([(lumi, 10) for lumi in lumis[100:150]])
+        run.extendLumis([lumis[150:]])
+        run.extendLumis([(5, 1)])
+        self.assertEqual(run.lumis, list(range(1, 200)))
+        self.assertEqual([run[i] for i in range(len(run))], list(range(1, 200)))
+        self.assertEqual(run[-1], 199)
+        self.assertEqual(run[10:13], [11, 12, 13])
+
+        # the returned list is a copy
+        run.lumis.append(1000)
+        self.assertEqual(len(run), 199)
+
+        del run[0]
+        del run[-1]
+        run[0] = 500
+        self.assertEqual(run.lumis, list(range(3, 199)) + [500])
+        run.lumis = [(20, 1), (10, 2)]
+        self.assertEqual(run.lumis, [10, 20])
+        self.assertEqual(run.eventsPerLumi, {10: 2, 20: 1})
+
+        run2 = Run(1, (15, 3), (20, 1))
+        run + run2
+        self.assertEqual(run.lumis, [10, 15, 20])
+        self.assertEqual(run.eventsPerLumi, {10: 2, 15: 3, 20: 2})
+
+        # the dictionary can be replaced, even with one of the same length
+        run.eventsPerLumi = {1: None, 10: 2, 20: 2}
+        self.assertEqual(run[0], 1)
+        self.assertEqual(run.lumis, [1, 10, 20])
+        self.assertEqual(run.config, {})
+
+    def testPickle(self):
+        """
+        runs can be pickled and copied, including runs pickled with their sorted lumis
+        """
+        run = Run(10, (1, 5), (3, 7), (2, 6))
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            newRun = pickle.loads(pickle.dumps(run, protocol))
+            self.assertEqual(newRun, run)
+            self.assertEqual(newRun.lumis, [1, 2, 3])
+        self.assertEqual(copy.deepcopy(run).lumis, [1, 2, 3])
+
+        legacyRun = Run.__new__(Run)
+        legacyRun.__setstate__({'config': {}, 'run': 10, 'eventsPerLumi': {3: 7, 1: 5, 2: 6}})
+        self.assertEqual(legacyRun.config, {})
+        self.assertEqual(legacyRun, run)
+        self.assertEqual(legacyRun[2], 3)
+        legacyRun.appendLumi(4)
+        self.assertEqual(legacyRun.lumis, [1, 2, 3, 4])
+
+    @attr('performance', 'integration')
+    def testIndexPerformance(self):
+        """
+        time building and indexing a run with many lumis
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        nLumis = 20000
+        startTime = time.time()
+        run = Run(1)
+        for lumi in range(1, nLumis + 1):
+            run.appendLumi((lumi, 100))
+        buildTime = time.time() - startTime
+
+        startTime = time.time()
+        for idx in range(nLumis):
+            run[idx]
+        indexTime = time.time() - startTime
+
+        print("  %d lumis: appended in %.3fs, indexed in %.3fs" % (nLumis, buildTime, indexTime))
+
 
 if __name__ == '__main__':
     unittest.main()
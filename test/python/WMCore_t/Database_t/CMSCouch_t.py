@@ -370,6 +370,35 @@ class CMSCouchTest(unittest.TestCase):
         self.assertEqual(1, len(self.db.allDocs({'limit':1}, ["1", "3"])['rows']))
         self.assertTrue('error' in self.db.allDocs(keys = ["1", "4"])['rows'][1])
 
+    def testIterView(self):
+        """
+        Test the paged view and _all_docs iterators
+        """
+        ddoc = {'_id': '_design/foo',
+                'language': 'javascript',
+                'views': {'bykey': {'map': 'function(doc) {if (doc.key !== undefined) {emit(doc.key, doc.value)}}'}}}
+        self.db.queue(ddoc)
+        for i in range(25):
+            self.db.queue(Document(id="doc%02d" % i, inputDict={'key': i // 4, 'value': i}))
+        self.db.commit()
+
+        expected = self.db.loadView('foo', 'bykey')['rows']
+        self.assertEqual(25, len(expected))
+        for prefetch in (False, True):
+            self.assertEqual(expected, list(self.db.iterView('foo', 'bykey', pageSize=3, prefetch=prefetch)))
+            self.assertEqual(expected[:10],
+                             list(self.db.iterView('foo', 'bykey', {'limit': 10}, pageSize=3, prefetch=prefetch)))
+            # rows of the same key spread over several pages
+            self.assertEqual(expected[8:12],
+                             list(self.db.iterView('foo', 'bykey', {'key': 2}, pageSize=3, prefetch=prefetch)))
+            self.assertEqual(expected[4:12],
+                             list(self.db.iterView('foo', 'bykey', keys=[1, 2], pageSize=1, prefetch=prefetch)))
+
+        allDocs = self.db.allDocs()['rows']
+        self.assertEqual(allDocs, list(self.db.iterAllDocs(pageSize=4)))
+        self.assertEqual(allDocs[2:], list(self.db.iterAllDocs({'startkey': allDocs[2]['id']}, pageSize=4)))
+        self.assertRaises(CouchNotFoundError, list, self.db.iterView('foo', 'view_doesnt_exist'))
+
     def testUpdateBulkDocuments(self):
         """
         Test AllDocs with options
@@ -12,6 +12,7 @@ import unittest
 import logging
 import threading
 
+from WMCore.Database.DBCore import buildInListSelect, buildPositionalInsert
 from WMQuality.TestInit import TestInit
 
 class DBCoreTest(unittest.TestCase):
@@ -315,5 +316,191 @@ class DBCoreTest(unittest.TestCase):
 
         return
 
+    def testProcessDataInListSelect(self):
+        """
+        _testProcessDataInListSelect_
+
+        Verify that a select with a single bind variable and several binds
+        returns the same rows whether it is run with an IN list or once per bind.
+        """
+        binds = []
+        for i in range(1201):
+            binds.append({"one": i, "two": i % 3, "three": str(i)})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = "SELECT column1, column2, column3 FROM test_tablea WHERE column1 = :one"
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = binds)
+
+        selectBinds = [{"one": i} for i in range(0, 1300, 2)]
+        results = {}
+        for batchSelects in (True, False):
+            myThread.dbi.batchSelects = batchSelects
+            resultSets = myThread.dbi.processData(selectSQL, selectBinds)
+            results[batchSelects] = []
+            for resultSet in resultSets:
+                self.assertEqual([key.lower() for key in resultSet.keys],
+                                 ["column1", "column2", "column3"])
+                results[batchSelects].extend([tuple(row) for row in resultSet.fetchall()])
+        myThread.dbi.batchSelects = True
+
+        self.assertEqual(len(results[True]), 601)
+        self.assertEqual(results[True], results[False])
+        return
+
+    def testProcessDataInListSelectOrder(self):
+        """
+        _testProcessDataInListSelectOrder_
+
+        Verify that the rows of an IN list select come back grouped in the
+        order of the binds, as they do when the select is run once per bind.
+        """
+        binds = []
+        for i in range(300):
+            binds.append({"one": i, "two": i % 3, "three": str(i)})
+
+        insertSQL = "INSERT INTO test_tablea VALUES (:one, :two, :three)"
+        selectSQL = "SELECT column1, column2 FROM test_tablea WHERE column2 = :two"
+
+        myThread = threading.currentThread()
+        myThread.dbi.processData(insertSQL, binds = binds)
+
+        selectBinds = [{"two": 2}, {"two": 0}, {"two": 1}]
+        results = {}
+        for batchSelects in (True, False):
+            myThread.dbi.batchSelects = batchSelects
+            resultSets = myThread.dbi.processData(selectSQL, selectBinds)
+            results[batchSelects] = []
+            for resultSet in resultSets:
+                results[batchSelects].extend([tuple(row) for row in resultSet.fetchall()])
+        myThread.dbi.batchSelects = True
+
+        self.assertEqual([row[1] for row in results[True]], [2] * 100 + [0] * 100 + [1] * 100)
+        for bindValue in (0, 1, 2):
+            self.assertEqual(sorted(row for row in results[True] if row[1] == bindValue),
+                             sorted(row for row in results[False] if row[1] == bindValue))
+        return
+
+    def testInsertRows(self):
+        """
+        _testInsertRows_
+
+        Verify that rows of packed values are all inserted, in several
+        statements when there are more than maxRowsPerInsert, and counted.
+        """
+        rows = [(str(i * 3), i, i * 2) for i in range(2501)]
+        insertSQL = "INSERT INTO test_tablea (column1, column2, column3) VALUES (:one, :two, :three)"
+        selectSQL = "SELECT column1, column2, column3 FROM test_tablea"
+
+        myThread = threading.currentThread()
+        myThread.dbi.maxRowsPerInsert = 1000
+        self.assertEqual(myThread.dbi.insertRows(insertSQL, ("three", "one", "two"), rows), 2501)
+        self.assertEqual(myThread.dbi.insertRows(insertSQL, ("three", "one", "two"), []), 0)
+
+        results = []
+        for resultSet in myThread.dbi.processData(selectSQL):
+            results.extend([tuple(row) for row in resultSet.fetchall()])
+        self.assertEqual(sorted(results), [(i, i * 2, str(i * 3)) for i in range(2501)])
+
+        metrics = myThread.dbi.popInsertMetrics()
+        self.assertEqual(list(metrics), ["test_tablea"])
+        self.assertEqual(metrics["test_tablea"][0], 2501)
+        self.assertEqual(myThread.dbi.popInsertMetrics(), {})
+        return
+
+
+class BuildPositionalInsertTest(unittest.TestCase):
+    """
+    Unit tests for the insert rewriting done by DBCore.buildPositionalInsert
+    """
+
+    def testRewrite(self):
+        """
+        _testRewrite_
+
+        Verify that bind variables are replaced by placeholders and the rows
+        arranged to match them.
+        """
+        sql = "INSERT INTO wmbs_file_runlumi_map (fileid, run, lumi) VALUES (:fileid, :run, :lumi)"
+        rows = [(1, 2, 3), (4, 5, 6)]
+        newSQL, newRows = buildPositionalInsert(sql, ("fileid", "run", "lumi"), rows, lambda n: "%s")
+        self.assertEqual(newSQL, "INSERT INTO wmbs_file_runlumi_map (fileid, run, lumi) VALUES (%s, %s, %s)")
+        self.assertTrue(newRows is rows)
+
+        newSQL, newRows = buildPositionalInsert(sql, ("run", "lumi", "fileid"), rows, lambda n: ":%d" % n)
+        self.assertEqual(newSQL, "INSERT INTO wmbs_file_runlumi_map (fileid, run, lumi) VALUES (:1, :2, :3)")
+        self.assertEqual(newRows, [(3, 1, 2), (6, 4, 5)])
+
+        # bind variables used twice are bound twice
+        sql = """INSERT INTO wmbs_file_runlumi_map (fileid, run) SELECT :fileid, :run FROM dual
+                   WHERE NOT EXISTS (SELECT fileid FROM wmbs_file_runlumi_map WHERE fileid = :fileid)"""
+        newSQL, newRows = buildPositionalInsert(sql, ("fileid", "run"), rows, lambda n: ":%d" % n)
+        self.assertTrue(newSQL.endswith("SELECT :1, :2 FROM dual\n                   "
+                                        "WHERE NOT EXISTS (SELECT fileid FROM wmbs_file_runlumi_map WHERE fileid = :3)"))
+        self.assertEqual(newRows, [(1, 2, 1), (4, 5, 4)])
+
+        self.assertRaises(ValueError, buildPositionalInsert, sql, ("fileid",), rows, lambda n: "%s")
+        return
+
+
+class BuildInListSelectTest(unittest.TestCase):
+    """
+    Unit tests for the select rewriting done by DBCore.buildInListSelect
+    """
+
+    def testRewrite(self):
+        """
+        _testRewrite_
+
+        Verify that a simple select is turned into an IN list select.
+        """
+        sql = "SELECT id FROM wmbs_job WHERE state = :state AND outcome = 1"
+        newSQL, newBinds = buildInListSelect(sql, [{"state": 1}, {"state": 2}, {"state": 3}])
+        self.assertEqual(newSQL, "SELECT id FROM wmbs_job WHERE state IN (:state_b0, :state_b1, :state_b2) AND outcome = 1"
+                                 " ORDER BY CASE state WHEN :state_b0 THEN 0 WHEN :state_b1 THEN 1 WHEN :state_b2 THEN 2 END")
+        self.assertEqual(newBinds, {"state_b0": 1, "state_b1": 2, "state_b2": 3})
+
+        sql = """SELECT wmbs_job.id FROM wmbs_job
+                   INNER JOIN wmbs_jobgroup ON wmbs_jobgroup.id = wmbs_job.jobgroup
+                   WHERE wmbs_job.name = 'a(b' AND wmbs_jobgroup.subscription = :sub"""
+        newSQL, newBinds = buildInListSelect(sql, [{"sub": 1}, {"sub": 2}])
+        self.assertTrue(newSQL.endswith("wmbs_jobgroup.subscription IN (:sub_b0, :sub_b1)"
+                                        " ORDER BY CASE wmbs_jobgroup.subscription WHEN :sub_b0 THEN 0 WHEN :sub_b1 THEN 1 END"))
+        return
+
+    def testNoRewrite(self):
+        """
+        _testNoRewrite_
+
+        Verify that statements which would return different rows with an IN
+        list are left alone.
+        """
+        binds = [{"state": 1}, {"state": 2}]
+        # a single bind doesn't need to be batched
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE state = :state", binds[:1]), None)
+        # duplicate bind values would return duplicate rows
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE state = :state", binds * 2), None)
+        # more than one bind variable
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE state = :state AND id = :id",
+                                           [{"state": 1, "id": 1}, {"state": 2, "id": 2}]), None)
+        # aggregates, ordering and row limits
+        self.assertEqual(buildInListSelect("SELECT COUNT(*) FROM wmbs_job WHERE state = :state", binds), None)
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE state = :state ORDER BY id", binds), None)
+        self.assertEqual(buildInListSelect("SELECT DISTINCT id FROM wmbs_job WHERE state = :state", binds), None)
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE state = :state LIMIT 10", binds), None)
+        # bind inside a subquery, or ORed with other conditions
+        self.assertEqual(buildInListSelect("""SELECT id FROM wmbs_job WHERE jobgroup IN
+                                                (SELECT id FROM wmbs_jobgroup WHERE subscription = :state)""",
+                                           binds), None)
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE state = :state OR outcome = 1", binds), None)
+        # not an equality
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE state >= :state", binds), None)
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE state != :state", binds), None)
+        # not compared to a plain column, so the rows can't be ordered by bind
+        self.assertEqual(buildInListSelect("SELECT id FROM wmbs_job WHERE UPPER(name) = :state", binds), None)
+        return
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -91,6 +91,31 @@ insert into test (bind1, bind2) values (:bind1, :bind2) """
         output = dbformatter.formatOneDict(result)
         self.assertEqual(output, {'bind2': 'value2a', 'bind1': 'value1a'})
 
+    @attr("integration")
+    def testColumnarFormatting(self):
+        """
+        Test that the formats are the same when the results are stored
+        in a ColumnResultSet
+        """
+
+        myThread = threading.currentThread()
+        dbformatter = DBFormatter(myThread.logger, myThread.dbi)
+
+        for formatName in ("format", "formatOne", "formatDict", "formatList", "formatOneDict"):
+            formatMethod = getattr(dbformatter, formatName)
+            result = myThread.dbi.processData(myThread.select)
+            columnResult = myThread.dbi.processData(myThread.select, columnar=True)
+            self.assertEqual(formatMethod(columnResult), formatMethod(result))
+
+        result = myThread.dbi.processData(myThread.select, columnar=True)
+        output = dbformatter.formatList(result)
+        self.assertEqual(output, ['value1a', 'value2a', 'value1b', 'value2b', 'value1c', 'value2d'])
+
+        result = myThread.dbi.processData(myThread.select + " where bind1 = :bind1", {'bind1': 'none'},
+                                          columnar=True)
+        self.assertEqual(dbformatter.formatDict(result), [])
+        self.assertEqual(dbformatter.formatOneDict(result), {})
+
 
 if __name__ == "__main__":
     unittest.main()
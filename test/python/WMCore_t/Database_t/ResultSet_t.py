@@ -16,7 +16,7 @@ import threading
 import os
 
 from WMCore.WMFactory import WMFactory
-from WMCore.Database.ResultSet import ResultSet
+from WMCore.Database.ResultSet import ResultSet, ColumnResultSet
 from WMQuality.TestInit import TestInit
 
 
@@ -116,6 +116,29 @@ class ResultSetTest(unittest.TestCase):
 
         return
 
+    def testColumnResultSet(self):
+        """
+        Verify that a ColumnResultSet holds the same rows than a ResultSet
+        """
+        binds = [{'column1': 'value1%s' % i, 'column2': 'value2%s' % i} for i in range(2500)]
+        self.myThread.dbi.processData("insert into test_tablec (column1, column2) values (:column1, :column2)", binds)
+
+        sql = "select column1, column2 from test_tablec"
+        testSet = ResultSet()
+        testSet.add(self.myThread.dbi.connection().execute(sql))
+        columnSet = ColumnResultSet()
+        columnSet.add(self.myThread.dbi.connection().execute(sql))
+
+        self.assertEqual([key.lower() for key in columnSet.keys], ['column1', 'column2'])
+        self.assertEqual(columnSet.rowcount, 2500)
+        self.assertEqual(len(columnSet.columns), 2)
+        self.assertEqual(columnSet.fetchall(), [tuple(row) for row in testSet.fetchall()])
+        self.assertEqual(columnSet.fetchone(), tuple(testSet.fetchone()))
+        self.assertEqual(ColumnResultSet().fetchone(), [])
+        self.assertEqual(ColumnResultSet().fetchall(), [])
+
+        return
+
 
 
 if __name__ == "__main__":
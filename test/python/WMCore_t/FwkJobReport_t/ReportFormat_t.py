@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+_ReportFormat_t_
+
+Unit tests for the compact FWJR persistency format.
+"""
+from __future__ import division, print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.FwkJobReport.Report import Report
+from WMCore.FwkJobReport.ReportFormat import HEADER_PREFIX, LazyConfigSection, encodeValue, decodeValue
+from WMCore.WMBase import getTestBase
+from WMCore_t.FwkJobReport_t.XMLParser_t import BENCHMARK_CORPUS, writeReport
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+class ReportFormatTest(unittest.TestCase):
+    """
+    _ReportFormatTest_
+
+    Test writing and reading reports in the compact format
+    """
+
+    def setUp(self):
+        self.testData = os.path.join(getTestBase(), "WMCore_t/FwkJobReport_t")
+        self.testDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def makeReport(self, xmlName):
+        """
+        Build a two steps report from a CMSSW XML report
+        """
+        myReport = Report("cmsRun1")
+        myReport.parse(os.path.join(self.testData, xmlName))
+        myReport.setTaskName("/TestWF/Processing")
+        myReport.setStepStartTime("cmsRun1")
+        myReport.setStepStopTime("cmsRun1")
+        myReport.addStep("stageOut1")
+        myReport.addError("stageOut1", 60311, "StageOutFailure", "Stage out failed")
+        return myReport
+
+    def testValues(self):
+        """
+        _testValues_
+
+        Values round trip through their JSON encoding
+        """
+        for value in [None, True, 0, 12345678901234, 1.5, "text", [], [1, "a", None], (1, 2), {},
+                      {"a": [1, (2, 3)], "b": {"c": None}}, {1: None, 2: None, 3: None, 7: None},
+                      {5: 10, 6: None, 8: 3}, {(1, 2): "x", "y": 1}, {"__t": "user"}]:
+            self.assertEqual(decodeValue(encodeValue(value)), value)
+
+        # lumis are stored as ranges
+        encoded = encodeValue(dict.fromkeys(range(1, 100001)))
+        self.assertEqual(encoded, {"__t": "lumis", "v": [[1, 100000]], "e": None})
+        encoded = encodeValue({1: 5, 2: 6, 4: 7})
+        self.assertEqual(encoded, {"__t": "lumis", "v": [[1, 2], [4, 4]], "e": [5, 6, 7]})
+        return
+
+    def testRoundTrip(self):
+        """
+        _testRoundTrip_
+
+        Reports read back are the same as the ones persisted
+        """
+        for xmlName in ["CMSSWProcessingReport.xml", "CMSSWWithEventCounts.xml", "CMSSWFailReport.xml",
+                        "CMSSWInputFallback.xml", "CMSSWSkippedNonExistentFile.xml", "PerformanceReport.xml"]:
+            myReport = self.makeReport(xmlName)
+            reportPath = os.path.join(self.testDir, "Report.0.pkl")
+            myReport.persist(reportPath)
+            with open(reportPath) as handle:
+                self.assertTrue(handle.readline().startswith(HEADER_PREFIX))
+
+            newReport = Report()
+            newReport.unpersist(reportPath, "cmsRun1")
+            self.assertEqual(newReport.data.dictionary_whole_tree_(), myReport.data.dictionary_whole_tree_())
+            self.assertEqual(newReport.getAllFilesFromStep("cmsRun1"), myReport.getAllFilesFromStep("cmsRun1"))
+            self.assertEqual(newReport.getInputFilesFromStep("cmsRun1"),
+                             myReport.getInputFilesFromStep("cmsRun1"))
+            self.assertEqual(newReport.getExitCodes(), myReport.getExitCodes())
+            self.assertEqual(newReport.__to_json__(None), myReport.__to_json__(None))
+
+            # the report can still be modified and persisted again
+            newReport.report.status = 1
+            newReport.addOutputModule("extraModule")
+            newReport.persist(reportPath)
+            otherReport = Report()
+            otherReport.load(reportPath)
+            self.assertEqual(otherReport.data.dictionary_whole_tree_(), newReport.data.dictionary_whole_tree_())
+        return
+
+    def testLazyLoading(self):
+        """
+        _testLazyLoading_
+
+        Steps, output modules and input sources are decoded when accessed
+        """
+        myReport = self.makeReport("CMSSWTwoFileRemote.xml")
+        reportPath = os.path.join(self.testDir, "Report.0.pkl")
+        myReport.persist(reportPath)
+
+        newReport = Report()
+        newReport.load(reportPath)
+        self.assertTrue(isinstance(newReport.data, LazyConfigSection))
+        self.assertEqual(set(newReport.data._internal_lazy), set(["cmsRun1", "stageOut1"]))
+        self.assertEqual(newReport.listSteps(), ["cmsRun1", "stageOut1"])
+        self.assertEqual(newReport.getTaskName(), "/TestWF/Processing")
+
+        self.assertEqual(newReport.getStepExitCode("stageOut1"), 60311)
+        self.assertEqual(set(newReport.data._internal_lazy), set(["cmsRun1"]))
+
+        cmsRunStep = newReport.retrieveStep("cmsRun1")
+        self.assertEqual(set(cmsRunStep.output._internal_lazy), set(myReport.retrieveStep("cmsRun1").outputModules))
+        self.assertEqual(set(cmsRunStep.input._internal_lazy), set(["source"]))
+        self.assertEqual(len(newReport.getInputFilesFromStep("cmsRun1")), 2)
+        self.assertEqual(cmsRunStep.input._internal_lazy, {})
+        self.assertTrue(cmsRunStep.output._internal_lazy)
+
+        # a lazy report is pickled whole
+        pickledData = pickle.loads(pickle.dumps(newReport.data))
+        self.assertEqual(pickledData.dictionary_whole_tree_(), myReport.data.dictionary_whole_tree_())
+        return
+
+    def testLegacyPickle(self):
+        """
+        _testLegacyPickle_
+
+        Pickled reports are still read, and reports that the compact format
+        can't encode are still pickled
+        """
+        myReport = Report()
+        myReport.load(os.path.join(self.testData, "Report.0.pkl"))
+        self.assertTrue(myReport.listSteps())
+        self.assertFalse(isinstance(myReport.data, LazyConfigSection))
+
+        myReport = self.makeReport("CMSSWProcessingReport.xml")
+        reportPath = os.path.join(self.testDir, "Report.0.pkl")
+        with open(reportPath, 'w') as handle:
+            pickle.dump(myReport.data, handle)
+        newReport = Report()
+        newReport.load(reportPath)
+        self.assertEqual(newReport.data.dictionary_whole_tree_(), myReport.data.dictionary_whole_tree_())
+
+        myReport.data._internal_skipChecks = True
+        myReport.data.unsupported = set([1, 2])
+        myReport.persist(reportPath)
+        with open(reportPath) as handle:
+            self.assertFalse(handle.readline().startswith(HEADER_PREFIX))
+        newReport = Report()
+        newReport.load(reportPath)
+        self.assertEqual(newReport.data.unsupported, set([1, 2]))
+
+        # as are the reports with strings json can't decode
+        myReport = self.makeReport("CMSSWProcessingReport.xml")
+        myReport.data.cmsRun1.comment = b"caf\xe9"
+        myReport.persist(reportPath)
+        with open(reportPath) as handle:
+            self.assertFalse(handle.readline().startswith(HEADER_PREFIX))
+        newReport = Report()
+        newReport.load(reportPath)
+        self.assertEqual(newReport.data.cmsRun1.comment, b"caf\xe9")
+        return
+
+    @attr('performance', 'integration')
+    def testFormatPerformance(self):
+        """
+        _testFormatPerformance_
+
+        Compare the size and load time of pickled and compact reports of the
+        benchmark corpus, loading all the files as the JobAccountant does.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        for name, nInputFiles, nOutputModules, nRuns, nLumis, withEvents in BENCHMARK_CORPUS:
+            xmlPath = os.path.join(self.testDir, "%s.xml" % name)
+            writeReport(xmlPath, nInputFiles, nOutputModules, nRuns, nLumis, withEvents)
+            myReport = Report("cmsRun1")
+            myReport.parse(xmlPath)
+
+            picklePath = os.path.join(self.testDir, "%s.pkl" % name)
+            startTime = time.time()
+            with open(picklePath, 'w') as handle:
+                pickle.dump(myReport.data, handle)
+            pickleWrite = time.time() - startTime
+            compactPath = os.path.join(self.testDir, "%s.fwjr" % name)
+            startTime = time.time()
+            myReport.persist(compactPath)
+            compactWrite = time.time() - startTime
+
+            loadTimes = []
+            for reportPath in [picklePath, compactPath]:
+                startTime = time.time()
+                newReport = Report()
+                newReport.load(reportPath)
+                newReport.getAllFiles()
+                newReport.getInputFilesFromStep("cmsRun1")
+                loadTimes.append(time.time() - startTime)
+
+            print("  %s report: pickle %.1f MB, write %.2f secs, load %.2f secs;"
+                  " compact %.1f MB, write %.2f secs, load %.2f secs" %
+                  (name, os.path.getsize(picklePath) / 1024 ** 2, pickleWrite, loadTimes[0],
+                   os.path.getsize(compactPath) / 1024 ** 2, compactWrite, loadTimes[1]))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
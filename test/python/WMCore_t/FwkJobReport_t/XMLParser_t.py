@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+_XMLParser_t_
+
+Unit tests for the CMSSW XML job report parser, with a benchmark corpus of
+large generated job reports.
+"""
+from __future__ import division, print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.FwkJobReport.Report import Report, FwkJobReportException
+
+# (name, input files, output modules, runs, lumis per run, lumis with event counts)
+BENCHMARK_CORPUS = [("Processing", 1, 4, 1, 500, True),
+                    ("Merge", 40, 1, 4, 5000, True),
+                    ("MonteCarlo", 1, 2, 1, 100000, False),
+                    ("Harvesting", 200, 1, 20, 2000, True)]
+
+
+def writeLumis(handle, runs, lumisPerRun, lumiOffset, withEvents):
+    """
+    Write the Runs section of a file
+    """
+    handle.write("<Runs>\n")
+    for run in runs:
+        handle.write('<Run ID="%d">\n' % run)
+        for lumi in range(lumiOffset + 1, lumiOffset + lumisPerRun + 1):
+            if withEvents:
+                handle.write('   <LumiSection ID="%d" NEvents="%d"/>\n' % (lumi, lumi % 7 + 1))
+            else:
+                handle.write('   <LumiSection ID="%d"/>\n' % lumi)
+        handle.write("</Run>\n\n")
+    handle.write("</Runs>\n")
+
+
+def writeReport(fileName, nInputFiles, nOutputModules, nRuns, nLumis, withEvents):
+    """
+    _writeReport_
+
+    Write a CMSSW XML job report with input files splitting the lumis of
+    the runs between them, and output files with all the lumis.
+    """
+    runs = [200000 + i for i in range(nRuns)]
+    lumisPerFile = max(nLumis // nInputFiles, 1)
+    inputLFNs = ["/store/data/Run2018A/JetHT/RAW/v1/000/%d/%04d/input%d.root" % (runs[0], i, i)
+                 for i in range(nInputFiles)]
+
+    with open(fileName, 'w') as handle:
+        handle.write("<FrameworkJobReport>\n")
+        for i, lfn in enumerate(inputLFNs):
+            handle.write('<InputFile>\n<State  Value="closed"/>\n')
+            handle.write("<LFN>%s</LFN>\n<PFN>root://cmsxrootd.fnal.gov/%s</PFN>\n" % (lfn, lfn))
+            handle.write("<Catalog></Catalog>\n<ModuleLabel>source</ModuleLabel>\n")
+            handle.write("<GUID>GUID-INPUT-%d</GUID>\n" % i)
+            handle.write("<Branches>\n  <Branch>FEDRawDataCollection_rawDataCollector__LHC.</Branch>\n</Branches>\n")
+            handle.write("<InputType>primaryFiles</InputType>\n<InputSourceClass>PoolSource</InputSourceClass>\n")
+            handle.write("<EventsRead>%d</EventsRead>\n" % (4 * lumisPerFile * nRuns))
+            writeLumis(handle, runs, lumisPerFile, i * lumisPerFile, withEvents)
+            handle.write("</InputFile>\n\n")
+
+        for i in range(nOutputModules):
+            handle.write('<File>\n<State  Value="closed"/>\n')
+            handle.write("<LFN>/store/unmerged/Run2018A/JetHT/AOD/v1/0000/output%d.root</LFN>\n" % i)
+            handle.write("<PFN>output%d.root</PFN>\n<Catalog></Catalog>\n" % i)
+            handle.write("<ModuleLabel>outputModule%d</ModuleLabel>\n<GUID>GUID-OUTPUT-%d</GUID>\n" % (i, i))
+            handle.write("<Branches>\n  <Branch>recoTracks_generalTracks__RECO.</Branch>\n</Branches>\n")
+            handle.write("<OutputModuleClass>PoolOutputModule</OutputModuleClass>\n")
+            handle.write("<TotalEvents>%d</TotalEvents>\n<DataType>Data</DataType>\n" % (4 * nLumis * nRuns))
+            handle.write("<BranchHash>cf37adeb60b427f4ccd0e21b5771146b</BranchHash>\n")
+            writeLumis(handle, runs, lumisPerFile * nInputFiles, 0, withEvents)
+            handle.write("<Inputs>\n")
+            for lfn in inputLFNs:
+                handle.write("<Input>\n  <LFN>%s</LFN>\n  <PFN>root://cmsxrootd.fnal.gov/%s</PFN>\n" % (lfn, lfn))
+                handle.write("  <FastCopying>0</FastCopying>\n</Input>\n")
+            handle.write("</Inputs>\n</File>\n\n")
+
+        handle.write("<ReadBranches>\n</ReadBranches>\n")
+        handle.write('<PerformanceReport>\n  <PerformanceSummary Metric="Timing">\n')
+        handle.write('    <Metric Name="TotalJobCPU" Value="1234.5"/>\n')
+        handle.write('    <Metric Name="TotalJobTime" Value="2345.6"/>\n  </PerformanceSummary>\n')
+        handle.write('  <PerformanceSummary Metric="ApplicationMemory">\n')
+        handle.write('    <Metric Name="PeakValueRss" Value="2048.1"/>\n')
+        handle.write('    <Metric Name="PeakValueVsize" Value="3072.2"/>\n  </PerformanceSummary>\n')
+        handle.write("</PerformanceReport>\n")
+        handle.write("</FrameworkJobReport>\n")
+    return
+
+
+class XMLParserTest(unittest.TestCase):
+    """
+    _XMLParserTest_
+
+    Test parsing generated CMSSW XML job reports
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def testGeneratedReport(self):
+        """
+        _testGeneratedReport_
+
+        Check the files, runs and lumis read from a generated report
+        """
+        xmlPath = os.path.join(self.testDir, "Report.xml")
+        writeReport(xmlPath, nInputFiles=3, nOutputModules=2, nRuns=2, nLumis=30, withEvents=True)
+        myReport = Report("cmsRun1")
+        myReport.parse(xmlPath)
+
+        inputFiles = myReport.getInputFilesFromStep("cmsRun1")
+        self.assertEqual(len(inputFiles), 3)
+        self.assertEqual(inputFiles[1]["guid"], "GUID-INPUT-1")
+        self.assertEqual(inputFiles[1]["events"], 80)
+        runs = sorted(inputFiles[1]["runs"])
+        self.assertEqual([run.run for run in runs], [200000, 200001])
+        self.assertEqual(runs[0].lumis, list(range(11, 21)))
+
+        outputFiles = myReport.getAllFilesFromStep("cmsRun1")
+        self.assertEqual(sorted(f["module_label"] for f in outputFiles), ["outputModule0", "outputModule1"])
+        for outputFile in outputFiles:
+            self.assertEqual(len(outputFile["input"]), 3)
+            runs = sorted(outputFile["runs"])
+            self.assertEqual(len(runs), 2)
+            self.assertEqual(runs[1].lumis, list(range(1, 31)))
+            self.assertEqual(runs[1].eventsPerLumi[8], 2)
+
+        self.assertEqual(myReport.data.cmsRun1.performance.cpu.TotalJobCPU, "1234.5")
+        self.assertEqual(myReport.data.cmsRun1.performance.memory.PeakValueRss, "2048.1")
+        return
+
+    def testTruncatedReport(self):
+        """
+        _testTruncatedReport_
+
+        Nothing is added to the report from a truncated XML file
+        """
+        xmlPath = os.path.join(self.testDir, "Report.xml")
+        writeReport(xmlPath, nInputFiles=2, nOutputModules=1, nRuns=1, nLumis=100, withEvents=False)
+        with open(xmlPath) as handle:
+            content = handle.read()
+        with open(xmlPath, 'w') as handle:
+            handle.write(content[:len(content) // 2])
+
+        myReport = Report("cmsRun1")
+        self.assertRaises(FwkJobReportException, myReport.parse, xmlPath)
+        self.assertEqual(myReport.getInputFilesFromStep("cmsRun1"), [])
+        self.assertEqual(myReport.getAllFilesFromStep("cmsRun1"), [])
+        return
+
+    @attr('performance', 'integration')
+    def testParsingPerformance(self):
+        """
+        _testParsingPerformance_
+
+        Time the parsing of the benchmark corpus of large job reports.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        for name, nInputFiles, nOutputModules, nRuns, nLumis, withEvents in BENCHMARK_CORPUS:
+            xmlPath = os.path.join(self.testDir, "%s.xml" % name)
+            writeReport(xmlPath, nInputFiles, nOutputModules, nRuns, nLumis, withEvents)
+            startTime = time.time()
+            myReport = Report("cmsRun1")
+            myReport.parse(xmlPath)
+            print("  %s report (%.1f MB): %.2f secs" % (name, os.path.getsize(xmlPath) / 1024 ** 2,
+                                                       time.time() - startTime))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,16 +3,20 @@
 _ChangeState_t_
 
 """
+from __future__ import print_function
 
 import os
 import threading
+import time
 import unittest
 
+from nose.plugins.attrib import attr
+
 from WMCore.DAOFactory import DAOFactory
 from WMCore.Database.CMSCouch import CouchServer
 from WMCore.FwkJobReport.Report import Report
 from WMCore.JobSplitting.SplitterFactory import SplitterFactory
-from WMCore.JobStateMachine.ChangeState import ChangeState, Transitions
+from WMCore.JobStateMachine.ChangeState import ChangeState, Transitions, jobStateTransitionUpdate
 from WMCore.WMBS.File import File
 from WMCore.WMBS.Fileset import Fileset
 from WMCore.WMBS.Subscription import Subscription
@@ -859,6 +863,121 @@ class TestChangeState(unittest.TestCase):
 
         return
 
+    def createBulkJobs(self, nFiles):
+        """
+        _createBulkJobs_
+
+        Create a subscription with nFiles files and split it into one job per file.
+        """
+        locationAction = self.daoFactory(classname="Locations.New")
+        locationAction.execute("site1", pnn="T2_CH_CERN")
+
+        testWorkflow = Workflow(spec=self.specUrl, owner="Steve",
+                                name="wf001", task=self.taskName)
+        testWorkflow.create()
+        testFileset = Fileset(name="TestFileset")
+        testFileset.create()
+        testSubscription = Subscription(fileset=testFileset,
+                                        workflow=testWorkflow,
+                                        split_algo="FileBased")
+        testSubscription.create()
+
+        for i in range(nFiles):
+            testFile = File(lfn="SomeLFN%s" % i, events=1024, size=2048,
+                            locations=set(["T2_CH_CERN"]))
+            testFile.create()
+            testFileset.addFile(testFile)
+        testFileset.commit()
+
+        splitter = SplitterFactory()
+        jobFactory = splitter(package="WMCore.WMBS",
+                              subscription=testSubscription)
+        jobGroup = jobFactory(files_per_job=1)[0]
+        for job in jobGroup.jobs:
+            job["user"] = "sfoulkes"
+            job["group"] = "DMWM"
+            job["taskType"] = "Processing"
+            job["site_cms_name"] = "site1"
+        return jobGroup.jobs
+
+    def testStateTransitionUpdate(self):
+        """
+        _testStateTransitionUpdate_
+
+        Verify that the python state transition update function behaves like
+        the JobDump stateTransition update handler.
+        """
+        transition = {"oldstate": "new", "newstate": "created",
+                      "location": "Agent", "timestamp": 1}
+        doc = jobStateTransitionUpdate(None, "1", transition)
+        self.assertEqual(doc, {"_id": "1", "states": {"1": transition}})
+
+        doc = {"_id": "1", "_rev": "1-abc", "states": {"0": {}, "9": {}, "10": {}}}
+        doc = jobStateTransitionUpdate(doc, "1", transition)
+        self.assertEqual(doc["_rev"], "1-abc")
+        self.assertEqual(doc["states"]["11"], transition)
+        return
+
+    def testBulkRecordInCouch(self):
+        """
+        _testBulkRecordInCouch_
+
+        Verify that state transitions recorded in bulk mode end up in couch
+        exactly like the ones recorded through the update handler.
+        """
+        self.config.JobStateMachine.bulkTransitions = True
+        change = ChangeState(self.config, "changestate_t")
+        jobs = self.createBulkJobs(nFiles=10)
+
+        change.propagate(jobs, "new", "none")
+        change.propagate(jobs, "created", "new")
+        change.propagate(jobs, "executing", "created")
+
+        for job in jobs:
+            jobDoc = change.jobsdatabase.document(job["couch_record"])
+            self.assertEqual(sorted(jobDoc["states"].keys()), ["0", "1", "2"])
+            self.assertEqual(jobDoc["states"]["1"]["oldstate"], "new")
+            self.assertEqual(jobDoc["states"]["1"]["newstate"], "created")
+            self.assertEqual(jobDoc["states"]["1"]["location"], "Agent")
+            self.assertEqual(jobDoc["states"]["2"]["oldstate"], "created")
+            self.assertEqual(jobDoc["states"]["2"]["newstate"], "executing")
+            self.assertEqual(jobDoc["states"]["2"]["location"], "site1")
+
+        # a document which does not exist in couch yet gets created
+        jobs[0]["couch_record"] = "doesNotExist"
+        conflicts = change.recordTransitionsInBulk(jobs[:1], "complete", "executing", int(time.time()))
+        self.assertEqual(conflicts[change.jobsdatabase.name], [])
+        jobDoc = change.jobsdatabase.document("doesNotExist")
+        self.assertEqual(jobDoc["states"]["1"]["newstate"], "complete")
+        return
+
+    @attr('performance', 'integration')
+    def testBulkRecordInCouchPerformance(self):
+        """
+        _testBulkRecordInCouchPerformance_
+
+        Compare the time spent recording state transitions with one update
+        handler request per job against the bulk mode.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        nJobs = 1000
+        jobs = self.createBulkJobs(nFiles=nJobs)
+        change = ChangeState(self.config, "changestate_t")
+        change.propagate(jobs, "new", "none")
+
+        startTime = time.time()
+        change.propagate(jobs, "created", "new")
+        perJobTime = time.time() - startTime
+
+        change.bulkTransitions = True
+        startTime = time.time()
+        change.propagate(jobs, "executing", "created")
+        bulkTime = time.time() - startTime
+
+        print("  Per job transitions: %.2f jobs/sec" % (nJobs / perJobTime))
+        print("  Bulk transitions: %.2f jobs/sec" % (nJobs / bulkTime))
+        return
+
     def testUpdateLocation(self):
         """
         _testUpdateLocation_
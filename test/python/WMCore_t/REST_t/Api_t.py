@@ -65,12 +65,31 @@ class Image(RESTEntity):
     def get(self):
         return gif_bytes
 
+class Cached(RESTEntity):
+    def __init__(self, app, api, config, mount):
+        RESTEntity.__init__(self, app, api, config, mount)
+        self.calls = 0
+
+    def validate(self, apiobj, method, api, param, safe):
+        validate_num("n", param, safe, optional=True, minval=0, maxval=10)
+
+    @restcall(response_cache=True)
+    @tools.expires(secs=300)
+    def get(self, n):
+        self.calls += 1
+        return rows([["row", n, self.calls]])
+
+    @restcall
+    def put(self, n):
+        return rows(["ok"])
+
 class Root(RESTApi):
     def __init__(self, app, config, mount):
         RESTApi.__init__(self, app, config, mount)
         self._add({ "simple": Simple(app, self, config, mount),
                     "image":  Image(app, self, config, mount),
-                    "multi":  Multi(app, self, config, mount) })
+                    "multi":  Multi(app, self, config, mount),
+                    "cached": Cached(app, self, config, mount) })
 
 class Tester(webtest.WebCase):
 
@@ -244,6 +263,51 @@ class Tester(webtest.WebCase):
             assert b["result"][i][0] == "row"
             assert b["result"][i][1] == i
 
+    def test_cached(self):
+        h = self.h
+        h.append(("Accept", "application/json"))
+        self.getPage("/test/cached?n=1", headers = h)
+        self.assertStatus("200 OK")
+        body, etag = self.body, self.assertHeader("ETag")
+        assert json.loads(body)["result"] == [["row", 1, 1]]
+        self.getPage("/test/cached?n=1", headers = h)
+        self.assertStatus("200 OK")
+        self.assertHeader("ETag", etag)
+        self.assertHeader("Cache-Control", "max-age=300")
+        self.assertBody(body)
+        self.getPage("/test/cached?n=2", headers = h)
+        assert json.loads(self.body)["result"] == [["row", 2, 2]]
+
+    def test_cached_deflate(self):
+        h = self.h
+        h.append(("Accept", "application/json"))
+        self.getPage("/test/cached?n=1", headers = h)
+        body = self.body
+        for i in xrange(0, 2):
+            self.getPage("/test/cached?n=1", headers = h + [("Accept-Encoding", "deflate")])
+            self.assertStatus("200 OK")
+            self.assertHeader("Content-Encoding", "deflate")
+            self.assertHeader("Content-Length", str(len(self.body)))
+            assert zlib.decompress(self.body, -zlib.MAX_WBITS) == body
+
+    def test_cached_etag(self):
+        h = self.h
+        h.append(("Accept", "application/json"))
+        self.getPage("/test/cached?n=1", headers = h)
+        etag = self.assertHeader("ETag")
+        self.getPage("/test/cached?n=1", headers = h + [("If-None-Match", etag)])
+        self.assertStatus(304)
+
+    def test_cached_invalidate(self):
+        h = self.h
+        h.append(("Accept", "application/json"))
+        self.getPage("/test/cached?n=1", headers = h)
+        assert json.loads(self.body)["result"] == [["row", 1, 1]]
+        self.getPage("/test/cached", headers = h, method = "PUT")
+        self.assertStatus("200 OK")
+        self.getPage("/test/cached?n=1", headers = h)
+        assert json.loads(self.body)["result"] == [["row", 1, 2]]
+
 def setup_server():
     srcfile = __file__.split("/")[-1].split(".py")[0]
     setup_dummy_server(srcfile, "Root", authz_key_file=FAKE_FILE, port=PORT)
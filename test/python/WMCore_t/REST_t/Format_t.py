@@ -1,10 +1,18 @@
+import json
+import unittest
+import zlib
+
+import cherrypy
+
 from WMCore.REST.Format import RESTFormat
 from WMCore.REST.Format import XMLFormat
 from WMCore.REST.Format import JSONFormat
+from WMCore.REST.Format import PrettyJSONFormat
 from WMCore.REST.Format import RawFormat
 from WMCore.REST.Format import DigestETag
 from WMCore.REST.Format import MD5ETag
 from WMCore.REST.Format import SHA1ETag
+from WMCore.REST.Format import ResponseCache
 RESTFormat()
 XMLFormat("app")
 JSONFormat()
@@ -12,3 +20,72 @@ RawFormat()
 DigestETag('md5')
 MD5ETag()
 SHA1ETag()
+
+class JSONFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        cherrypy.request.rest_generate_data = "result"
+        cherrypy.request.rest_generate_preamble = None
+        self.rows = [{"RequestName": "TestWorkflow", "SiteWhitelist": ["T1_US_FNAL", "T2_CH_CERN"],
+                      "TimePerEvent": 12.5, "LFNBase": "/store/unmerged", "Team": u"caf\xe9"},
+                     ["row", 1, None, True]]
+
+    def test_json_backends(self):
+        expected = '{"result": [\n %s\n,%s\n]}\n' % tuple(json.dumps(row) for row in self.rows)
+        pretty = '{"result": [\n %s,%s]}\n' % tuple(json.dumps(row, indent=2) for row in self.rows)
+        for backend in [None, "json", "ujson"]:
+            assert "".join(JSONFormat(backend)(self.rows, SHA1ETag())) == expected
+            assert "".join(PrettyJSONFormat(backend)(self.rows, SHA1ETag())) == pretty
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_key(self):
+        key = ResponseCache.key("api", "application/json", [1], {"b": ["x", "y"], "a": 2})
+        assert key == ResponseCache.key("api", "application/json", [1], {"a": 2, "b": ["x", "y"]})
+        assert key != ResponseCache.key("api", "text/plain", [1], {"a": 2, "b": ["x", "y"]})
+        assert key != ResponseCache.key("api", "application/json", [1], {"a": 2, "b": ["y", "x"]})
+        assert key[0] == "api"
+        hash(key)
+
+    def test_generation(self):
+        cache = ResponseCache(1000)
+        entry = cache.put("k", 1, "body", '"etag"')
+        assert cache.get("k", 1) is entry
+        assert entry.etag == '"etag"'
+        assert cache.get("k", 2) is None
+        assert cache.get("k", 1) is None
+        assert cache.size == 0
+
+    def test_encode(self):
+        cache = ResponseCache(10000)
+        body = '{"result": [\n' + ",\n".join(['["row", %d]' % i for i in range(20)]) + "\n]}\n"
+        entry = cache.put("k", None, body, '"etag"')
+        assert cache.encode(entry, 'identity', 9) is body
+        deflated = cache.encode(entry, 'deflate', 9)
+        assert cache.encode(entry, 'deflate', 9) is deflated
+        assert zlib.decompress(deflated, -zlib.MAX_WBITS) == body
+        assert cache.size == len(body) + len(deflated)
+
+    def test_eviction(self):
+        cache = ResponseCache(100, max_entry_size=40)
+        assert cache.put("big", None, "x" * 41, '"etag"') is None
+        for i in range(4):
+            cache.put(i, None, "x" * 30, '"etag"')
+        assert list(cache.entries) == [1, 2, 3]
+        cache.get(1)
+        cache.put(4, None, "x" * 30, '"etag"')
+        assert list(cache.entries) == [3, 1, 4]
+        assert cache.size == 90
+
+    def test_invalidate(self):
+        cache = ResponseCache(1000)
+        cache.put(ResponseCache.key("a", "json", [], {}), None, "a", '"a"')
+        cache.put(ResponseCache.key("b", "json", [], {}), None, "b", '"b"')
+        cache.invalidate("a")
+        assert cache.get(ResponseCache.key("a", "json", [], {})) is None
+        assert cache.get(ResponseCache.key("b", "json", [], {})) is not None
+        cache.invalidate()
+        assert not cache.entries and cache.size == 0
+
+if __name__ == '__main__':
+    unittest.main()
@@ -241,6 +241,21 @@ class testJSONRequests(unittest.TestCase):
         myjob["mask"] = mymask
         self.roundTripLax(myjob)
 
+    def testJSONBackends(self):
+        """
+        The documents are encoded as the json module does with all the
+        backends but orjson, and decoded the same way
+        """
+        doc = {'_id': 'TestWorkflow', 'RequestStatus': 'running-open', 'Priority': 180000,
+               'SiteWhitelist': ['T1_US_FNAL', 'T2_CH_CERN'], 'LFNBase': '/store/unmerged',
+               'TimePerEvent': 12.5, 'Comments': 'a "quoted" /comment', 'Mask': None, 'Resubmission': False}
+        for backend in ["json", "ujson"]:
+            request = Requests.JSONRequests(idict={'req_cache_path': self.testInit.testDir,
+                                                   'json_backend': backend})
+            self.assertEqual(request.encode(doc), json.dumps(doc))
+            self.assertEqual(request.decode(json.dumps(doc)), self.request.decode(json.dumps(doc)))
+        self.assertEqual(self.request.encode(doc), json.dumps(doc))
+
     def testSpecialCharacterPasswords(self):
         url = 'http://username:p@ssw:rd@localhost:6666'
         req = JSONRequests(url)
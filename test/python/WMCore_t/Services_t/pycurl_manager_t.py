@@ -2,13 +2,100 @@
 Unit test for pycurl_manager module.
 """
 
-from __future__ import division
+from __future__ import division, print_function
 
+import json
 import os
 import tempfile
+import threading
+import time
 import unittest
 
-from WMCore.Services.pycurl_manager import RequestHandler, ResponseHeader, getdata, cern_sso_cookie
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    # PY3
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+
+from nose.plugins.attrib import attr
+
+from WMCore.Services.pycurl_manager import (RequestHandler, ResponseHeader, CurlHandlePool,
+                                            getHandlePool, getdata, cern_sso_cookie)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Keep-alive HTTP/1.1 handler answering with a small JSON document,
+    /close closes the connection after the response, /slow sleeps and
+    /flaky fails with a 503 the first time it is requested
+    """
+    protocol_version = "HTTP/1.1"
+    # send the response in one go, not one packet per header
+    wbufsize = -1
+
+    def do_GET(self):
+        "answer GET requests"
+        self.answer()
+
+    def do_POST(self):
+        "answer POST requests, sending back the request body"
+        self.answer(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def answer(self, payload=None):
+        "send the JSON document describing the request"
+        server = self.server
+        with server.lock:
+            server.running += 1
+            server.maxRunning = max(server.maxRunning, server.running)
+            status = 200
+            if self.path.startswith("/flaky") and self.path not in server.failed:
+                server.failed.add(self.path)
+                status = 503
+        if self.path.startswith("/slow"):
+            time.sleep(0.05)
+        doc = {"path": self.path, "verb": self.command}
+        if payload:
+            doc["payload"] = json.loads(payload.decode("utf-8"))
+        body = json.dumps(doc).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path.startswith("/close"):
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.running -= 1
+
+    def log_message(self, *args):
+        "be quiet"
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """
+    Local threaded HTTP server, counting the concurrent requests
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), StubHandler)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.maxRunning = 0
+        self.failed = set()
+        self.url = "http://127.0.0.1:%d" % self.server_address[1]
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        "shut the server down"
+        self.shutdown()
+        self.server_close()
 
 
 class PyCurlManager(unittest.TestCase):
@@ -136,5 +223,147 @@ class PyCurlManager(unittest.TestCase):
         return
 
 
+class CurlHandlePoolTest(unittest.TestCase):
+    """Test the reuse of curl handles against a local server"""
+
+    def setUp(self):
+        "start the local server"
+        self.server = StubServer()
+
+    def tearDown(self):
+        "stop the local server"
+        self.server.stop()
+        getHandlePool().clear()
+
+    def testReuse(self):
+        """
+        Test that requests reuse the pooled handles and connections
+        """
+        pool = getHandlePool()
+        self.assertTrue(getHandlePool() is pool)
+        before = pool.stats()
+        mgr = RequestHandler()
+        for idx in range(5):
+            header, data = mgr.request(self.server.url + "/data", {'idx': idx},
+                                       encode=True, decode=True)
+            self.assertEqual(header.status, 200)
+            self.assertEqual(data, {"path": "/data?idx=%d" % idx})
+        stats = pool.stats()
+        self.assertEqual(stats['misses'] - before['misses'], 1)
+        self.assertEqual(stats['hits'] - before['hits'], 4)
+        self.assertEqual(stats['reconnects'] - before['reconnects'], 0)
+        self.assertEqual(stats['inFlight'], 0)
+
+        # the server closing the connection is accounted as a reconnect
+        mgr.request(self.server.url + "/close", {})
+        mgr.request(self.server.url + "/data", {})
+        self.assertEqual(pool.stats()['reconnects'] - before['reconnects'], 1)
+
+        # other credentials don't get the same handles
+        self.assertNotEqual(pool.poolKey(self.server.url + "/data"),
+                            pool.poolKey(self.server.url + "/data", ckey="key.pem", cert="cert.pem"))
+        self.assertEqual(pool.poolKey(self.server.url + "/data"), pool.poolKey(self.server.url + "/close"))
+        return
+
+    def testErrors(self):
+        """
+        Test that failed requests give the handle back
+        """
+        pool = CurlHandlePool(maxHandles=1)
+        key = pool.poolKey("http://127.0.0.1:1/")
+        with pool.handle(key) as curl:
+            self.assertFalse(curl.reused)
+        with pool.handle(key) as curl:
+            self.assertTrue(curl.reused)
+
+        # a transfer error closes the handle, a block error doesn't
+        with self.assertRaises(Exception):
+            with pool.handle(key) as curl:
+                raise Exception("something went wrong")
+        self.assertEqual(pool.stats()['idle'], 1)
+        with self.assertRaises(Exception):
+            with pool.handle(key) as curl:
+                RequestHandler({'connecttimeout': 5})._request(curl, "http://127.0.0.1:1/", {}, {}, 'GET', 0,
+                                                               None, None, None, True, False, False, None, None)
+        stats = pool.stats()
+        self.assertEqual(stats['idle'], 0)
+        self.assertEqual(stats['inFlight'], 0)
+        # the endpoint slot was freed
+        with pool.handle(key) as curl:
+            self.assertFalse(curl.reused)
+        return
+
+    def testBoundedConcurrency(self):
+        """
+        Test that no more than maxHandles requests run against an endpoint
+        """
+        pool = CurlHandlePool(maxHandles=2)
+        key = pool.poolKey(self.server.url)
+        mgr = RequestHandler()
+
+        def worker():
+            "run a few slow requests with the pool"
+            for _ in range(3):
+                with pool.handle(key) as curl:
+                    mgr._request(curl, self.server.url + "/slow", {}, {}, 'GET', 0,
+                                 None, None, None, True, False, False, None, None)
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.maxRunning, 2)
+        stats = pool.stats()
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hits'], 16)
+        self.assertEqual(stats['idle'], 2)
+        return
+
+    def testFanOut(self):
+        """
+        Test the concurrent fetch of GET and POST requests with getdata
+        """
+        urls = [self.server.url + "/slow/%d" % idx for idx in range(8)]
+        urls.append({'url': self.server.url + "/post", 'verb': 'POST', 'params': {'idx': 8}})
+        urls.append({'url': self.server.url + "/flaky", 'params': {'idx': 9}})
+        rows = list(getdata(urls, None, None, host_conn=2, retries=1, backoff=0.1, decode=True))
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(self.server.maxRunning, 2)
+        for row in rows:
+            self.assertEqual(row['status'], 200)
+            self.assertEqual(row['data']['verb'], row['request'].get('verb', 'GET'))
+        post = [row for row in rows if row['url'].endswith("/post")][0]
+        self.assertEqual(post['data']['payload'], {'idx': 8})
+        flaky = [row for row in rows if row['url'].endswith("/flaky")][0]
+        self.assertEqual(flaky['data']['path'], "/flaky?idx=9")
+
+        # without retries the failure is reported
+        rows = list(getdata([self.server.url + "/flaky/again"], None, None, decode=True))
+        self.assertIsNone(rows[0]['data'])
+        self.assertEqual(rows[0]['code'], 503)
+        return
+
+    @attr('performance', 'integration')
+    def testPoolPerformance(self):
+        """
+        Compare the latency of requests made with a new handle per call
+        and with the pooled handles, against a local server.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        nCalls = 1000
+        url = self.server.url + "/data"
+        for name, config in [("new handle per call", {'reuseConnections': False}),
+                             ("pooled handles", {'reuseConnections': True})]:
+            mgr = RequestHandler(config)
+            startTime = time.time()
+            for _ in range(nCalls):
+                mgr.request(url, {})
+            elapsed = time.time() - startTime
+            print("  %s: %.3f ms/call" % (name, 1000 * elapsed / nCalls))
+        print("  pool statistics: %s" % getHandlePool().stats())
+        return
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -402,6 +402,30 @@ class SubscriptionTest(unittest.TestCase):
         testFileC.delete()
         return
 
+    def testFilesOfStatusEmpty(self):
+        """
+        _testFilesOfStatusEmpty_
+
+        Create a subscription with an empty fileset and verify that no file
+        is returned whatever the status.
+        """
+        testWorkflow = Workflow(spec="spec.xml", owner="Simon",
+                                name="wf001", task='Test')
+        testWorkflow.create()
+        testFileset = Fileset(name="TestFileset")
+        testFileset.create()
+        testSubscription = Subscription(fileset=testFileset,
+                                        workflow=testWorkflow)
+        testSubscription.create()
+
+        for status in ["Available", "Acquired", "Completed", "Failed"]:
+            self.assertEqual(testSubscription.filesOfStatus(status=status), set())
+
+        testSubscription.delete()
+        testWorkflow.delete()
+        testFileset.delete()
+        return
+
     def testCompleteFilesTransaction(self):
         """
         _testCompleteFilesTransaction_
@@ -7,7 +7,6 @@
 
 import os
 import os.path
-import pickle
 import shutil
 import subprocess
 import tarfile
@@ -18,6 +17,7 @@ import WMCore_t.WMSpec_t.TestWorkloads as TestWorkloads
 
 import WMCore.WMRuntime.SandboxCreator as SandboxCreator
 import WMCore.WMSpec.WMTask as WMTask
+from WMCore.WMSpec.SpecFormat import loadSpecFile
 
 
 class SandboxCreator_t(unittest.TestCase):
@@ -59,9 +59,8 @@ class SandboxCreator_t(unittest.TestCase):
                                          env={'PYTHONPATH': os.path.join(extractDir, 'WMCore.zip')})
         self.assertIn('ZIPIMPORTTESTOK', output)
 
-        # make sure the pickled file is the same
-        pickleHandle = open( extractDir + "/WMSandbox/WMWorkload.pkl")
-        pickledWorkload = pickle.load( pickleHandle )
+        # make sure the saved spec is the same
+        pickledWorkload = loadSpecFile( extractDir + "/WMSandbox/WMWorkload.pkl")
         self.assertEqual( workload.data, pickledWorkload )
         self.assertEqual( pickledWorkload.sandbox, boxpath )
 
@@ -71,8 +70,6 @@ class SandboxCreator_t(unittest.TestCase):
                 t = WMTask.WMTaskHelper(t)
                 self.assertEqual(t.data.input.sandbox, boxpath)
 
-        pickleHandle.close()
-
         pickledWorkload.section_("test_section")
         self.assertNotEqual( workload.data, pickledWorkload )
         shutil.rmtree( extractDir )
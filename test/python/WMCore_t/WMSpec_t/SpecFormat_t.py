@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+_SpecFormat_t_
+
+Unit tests for the compact workload spec persistency format.
+"""
+from __future__ import division, print_function
+
+import copy
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from nose.plugins.attrib import attr
+
+from WMCore.Configuration import ConfigSection
+from WMCore.WMSpec.SpecFormat import HEADER_PREFIX, LazySpecSection, loadSpecString
+from WMCore.WMSpec.WMStep import WMStep
+from WMCore.WMSpec.WMTask import WMTask
+from WMCore.WMSpec.WMWorkload import WMWorkload, WMWorkloadHelper, getWorkloadFromTask, newWorkload
+from WMCore_t.WMSpec_t.TestWorkloads import oneTaskFourStep, twoTaskTree
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+def makeChainWorkload(nTasks, nSteps):
+    """
+    _makeChainWorkload_
+
+    Build a workload with a chain of tasks, each one with a chain of
+    CMSSW and stage out steps, like a large TaskChain.
+    """
+    workload = newWorkload("ChainWorkload")
+    workload.setCampaign("TestCampaign")
+    task = workload.newTask("Task1")
+    for taskNumber in range(1, nTasks + 1):
+        if taskNumber > 1:
+            task = task.addTask("Task%d" % taskNumber)
+        task.setTaskType("Processing")
+        task.setSplittingAlgorithm("LumiBased", lumis_per_job=taskNumber)
+        step = task.makeStep("cmsRun1")
+        step.setStepType("CMSSW")
+        for stepNumber in range(1, nSteps + 1):
+            step = step.addStep("stageOut%d" % stepNumber)
+            step.setStepType("StageOut")
+            step.data.section_("parameters")
+            step.data.parameters.lfns = ["/store/unmerged/%d/%d/%d.root" % (taskNumber, stepNumber, i)
+                                         for i in range(50)]
+    return workload
+
+
+class SpecFormatTest(unittest.TestCase):
+    """
+    _SpecFormatTest_
+
+    Test saving and loading workloads in the compact format
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.specPath = os.path.join(self.testDir, "WMWorkload.pkl")
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def loadWorkload(self):
+        """
+        Load the saved workload
+        """
+        workload = WMWorkloadHelper()
+        workload.load(self.specPath)
+        return workload
+
+    def testRoundTrip(self):
+        """
+        _testRoundTrip_
+
+        Workloads loaded back are the same as the ones saved
+        """
+        for workload in [twoTaskTree(), oneTaskFourStep(), makeChainWorkload(3, 2)]:
+            workload.save(self.specPath)
+            with open(self.specPath, 'rb') as handle:
+                self.assertTrue(handle.readline().startswith(HEADER_PREFIX))
+
+            newWorkload = self.loadWorkload()
+            self.assertTrue(isinstance(newWorkload.data, WMWorkload))
+            self.assertEqual(newWorkload.data.dictionary_whole_tree_(), workload.data.dictionary_whole_tree_())
+            self.assertEqual(newWorkload.listAllTaskPathNames(), workload.listAllTaskPathNames())
+            for task, newTask in zip(workload.taskIterator(), newWorkload.taskIterator()):
+                self.assertEqual(newTask.listAllStepNames(), task.listAllStepNames())
+                self.assertTrue(newTask.isTopOfTree())
+                self.assertEqual(getWorkloadFromTask(newTask).name(), workload.name())
+
+            with open(self.specPath, 'rb') as handle:
+                stringWorkload = loadSpecString(handle.read())
+            self.assertEqual(stringWorkload.dictionary_whole_tree_(), workload.data.dictionary_whole_tree_())
+
+            # the workload can still be modified and saved again
+            newWorkload.setCampaign("OtherCampaign")
+            newWorkload.getTaskByPath(newWorkload.listAllTaskPathNames()[-1]).setPrepID("TestPrepID")
+            newWorkload.save(self.specPath)
+            otherWorkload = self.loadWorkload()
+            self.assertEqual(otherWorkload.data.dictionary_whole_tree_(), newWorkload.data.dictionary_whole_tree_())
+            self.assertEqual(os.listdir(self.testDir), ["WMWorkload.pkl"])
+        return
+
+    def testLazyLoading(self):
+        """
+        _testLazyLoading_
+
+        Tasks and steps are decoded when accessed
+        """
+        makeChainWorkload(3, 2).save(self.specPath)
+        workload = self.loadWorkload()
+        self.assertEqual(workload.getCampaign(), "TestCampaign")
+        self.assertTrue(isinstance(workload.data.tasks, LazySpecSection))
+        self.assertEqual(set(workload.data.tasks._internal_lazy), set(["Task1"]))
+
+        task = workload.getTaskByPath("/ChainWorkload/Task1/Task2")
+        self.assertTrue(isinstance(task.data, WMTask))
+        self.assertEqual(task.jobSplittingParameters()['lumis_per_job'], 2)
+        self.assertEqual(set(task.data.tree.children._internal_lazy), set(["Task3"]))
+        self.assertEqual(set(task.data.steps._internal_lazy), set(["cmsRun1"]))
+
+        step = task.getStep("stageOut2")
+        self.assertTrue(isinstance(step.data, WMStep))
+        self.assertEqual(step.stepType(), "StageOut")
+        self.assertEqual(task.data.steps._internal_lazy, {})
+        self.assertEqual(step.data.parameters.lfns[0], "/store/unmerged/2/2/0.root")
+
+        records = workload.data.tasks._internal_lines
+        self.assertTrue(records.pending)
+        self.assertTrue(records.buffer is not None)
+
+        # a lazy workload is pickled, and copied, whole and as plain sections
+        for newData in [pickle.loads(pickle.dumps(workload.data)), copy.deepcopy(workload.data)]:
+            self.assertEqual(newData.dictionary_whole_tree_(), makeChainWorkload(3, 2).data.dictionary_whole_tree_())
+            self.assertTrue(type(newData.tasks) is ConfigSection)
+            self.assertTrue(isinstance(newData.tasks.Task1, WMTask))
+
+        # which decodes it all, and the file is then unmapped
+        self.assertFalse(records.pending)
+        self.assertTrue(records.buffer is None)
+        return
+
+    def testLegacyPickle(self):
+        """
+        _testLegacyPickle_
+
+        Pickled workloads are still loaded, and workloads that the compact
+        format can't encode are still pickled
+        """
+        workload = twoTaskTree()
+        with open(self.specPath, 'wb') as handle:
+            pickle.dump(workload.data, handle)
+        newWorkload = self.loadWorkload()
+        self.assertEqual(newWorkload.data.dictionary_whole_tree_(), workload.data.dictionary_whole_tree_())
+
+        workload.data._internal_skipChecks = True
+        workload.data.unsupported = set([1, 2])
+        workload.save(self.specPath)
+        with open(self.specPath, 'rb') as handle:
+            self.assertFalse(handle.readline().startswith(HEADER_PREFIX))
+        newWorkload = self.loadWorkload()
+        self.assertEqual(newWorkload.data.unsupported, set([1, 2]))
+        return
+
+    @attr('performance', 'integration')
+    def testFormatPerformance(self):
+        """
+        _testFormatPerformance_
+
+        Compare the size and load time of pickled and compact workloads, to
+        read the splitting parameters of one task as the JobCreator does.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        for nTasks, nSteps in [(5, 3), (20, 5), (50, 10)]:
+            workload = makeChainWorkload(nTasks, nSteps)
+            taskPath = workload.listAllTaskPathNames()[nTasks // 2]
+            picklePath = os.path.join(self.testDir, "Pickled.pkl")
+            with open(picklePath, 'wb') as handle:
+                pickle.dump(workload.data, handle)
+            workload.save(self.specPath)
+
+            loadTimes = []
+            for specPath in [picklePath, self.specPath]:
+                startTime = time.time()
+                for _ in range(20):
+                    newWorkload = WMWorkloadHelper()
+                    newWorkload.load(specPath)
+                    newWorkload.getTaskByPath(taskPath).jobSplittingParameters()
+                loadTimes.append((time.time() - startTime) / 20)
+
+            print("  %d tasks, %d steps: pickle %.1f MB, %.3f secs; compact %.1f MB, %.3f secs" %
+                  (nTasks, nSteps, os.path.getsize(picklePath) / 1024 ** 2, loadTimes[0],
+                   os.path.getsize(self.specPath) / 1024 ** 2, loadTimes[1]))
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
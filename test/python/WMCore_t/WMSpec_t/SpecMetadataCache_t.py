@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+_SpecMetadataCache_t_
+
+Unit tests for the agent wide spec metadata cache.
+"""
+from __future__ import division, print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from WMCore.Configuration import Configuration
+from WMCore.WMSpec.SpecMetadataCache import SpecMetadataCache, getSpecMetadataCache
+from WMCore_t.WMSpec_t.TestWorkloads import twoTaskTree
+
+
+class SpecMetadataCacheTest(unittest.TestCase):
+    """
+    _SpecMetadataCacheTest_
+
+    Test caching the metadata of workload specs
+    """
+
+    def setUp(self):
+        self.testDir = tempfile.mkdtemp()
+        self.indexDir = os.path.join(self.testDir, "specCache")
+
+    def tearDown(self):
+        shutil.rmtree(self.testDir)
+
+    def saveSpec(self, name, campaign="TestCampaign"):
+        """
+        Save a two tasks workload and return its path
+        """
+        workload = twoTaskTree()
+        workload.setCampaign(campaign)
+        for task in workload.getAllTasks():
+            task.applyTemplates()
+        firstTask = workload.getTask("FirstTask")
+        firstTask.setPrepID("TestPrepID-00001")
+        firstTask.setTaskType("Processing")
+        firstTask.setSplittingAlgorithm("LumiBased", lumis_per_job=8)
+        specPath = os.path.join(self.testDir, "%s.pkl" % name)
+        workload.save(specPath)
+        return specPath
+
+    def testMetadata(self):
+        """
+        _testMetadata_
+
+        The metadata of all the tasks is extracted from the spec
+        """
+        specPath = self.saveSpec("TwoTaskTree")
+        metadata = SpecMetadataCache().getSpecMetadata(specPath)
+
+        self.assertEqual(metadata['name'], "TwoTaskTree")
+        self.assertEqual(metadata['campaign'], "TestCampaign")
+        self.assertEqual(sorted(metadata['tasks']), ["/TwoTaskTree/FirstTask", "/TwoTaskTree/FirstTask/SecondTask"])
+        firstTask = metadata['tasks']["/TwoTaskTree/FirstTask"]
+        self.assertEqual(firstTask['prepID'], "TestPrepID-00001")
+        self.assertEqual(firstTask['taskType'], "Processing")
+        self.assertEqual(firstTask['splitting']['algorithm'], "LumiBased")
+        self.assertEqual(firstTask['splitting']['lumis_per_job'], 8)
+        self.assertFalse(firstTask['generators'])
+
+        self.assertEqual(SpecMetadataCache().getSpecMetadata(os.path.join(self.testDir, "Missing.pkl")), None)
+        return
+
+    def testInvalidation(self):
+        """
+        _testInvalidation_
+
+        A spec is loaded again when it changes, and the least recently used
+        specs are evicted
+        """
+        specCache = SpecMetadataCache(maxSize=2)
+        specPath = self.saveSpec("TwoTaskTree")
+        self.assertEqual(specCache.getSpecMetadata(specPath)['campaign'], "TestCampaign")
+
+        self.saveSpec("TwoTaskTree", campaign="OtherCampaign")
+        specStat = os.stat(specPath)
+        os.utime(specPath, (specStat.st_atime, specStat.st_mtime + 10))
+        self.assertEqual(specCache.getSpecMetadata(specPath)['campaign'], "OtherCampaign")
+
+        otherPaths = [self.saveSpec("Other%d" % i) for i in range(2)]
+        for otherPath in otherPaths:
+            specCache.getSpecMetadata(otherPath)
+        self.assertEqual(list(specCache.cache), otherPaths)
+        return
+
+    def testSharedIndex(self):
+        """
+        _testSharedIndex_
+
+        A spec cached by a component is read from the index by the other ones
+        """
+        specPath = self.saveSpec("TwoTaskTree")
+        metadata = SpecMetadataCache(self.indexDir).getSpecMetadata(specPath)
+
+        otherCache = SpecMetadataCache(self.indexDir)
+        otherCache.loadSpec = None
+        self.assertEqual(otherCache.getSpecMetadata(specPath), metadata)
+
+        otherCache.removeSpec(specPath)
+        self.assertEqual(os.listdir(self.indexDir), [])
+
+        config = Configuration()
+        config.section_("JobStateMachine")
+        config.JobStateMachine.specCacheDir = self.indexDir
+        self.assertTrue(getSpecMetadataCache(config) is getSpecMetadataCache(config))
+        self.assertEqual(getSpecMetadataCache(config).cacheDir, self.indexDir)
+        return
+
+
+if __name__ == '__main__':
+    unittest.main()
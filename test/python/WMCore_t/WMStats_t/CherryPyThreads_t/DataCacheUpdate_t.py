@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+from __future__ import division, print_function
+
+import unittest
+
+from WMCore.WMStats.CherryPyThreads.DataCacheUpdate import updateActiveRequests, updateAgentJobInfo
+
+
+def makeJobInfo(reqName, agentURL):
+    """
+    Make an agent_request document of a request
+    """
+    return {"_id": "%s-%s" % (agentURL, reqName), "type": "agent_request",
+            "workflow": reqName, "agent_url": agentURL, "status": {"success": 1}}
+
+
+class DataCacheUpdateTests(unittest.TestCase):
+    """
+    Unit tests for the incremental updates of the WMStats DataCache
+    """
+
+    def setUp(self):
+        self.reqData = {"RunningReq": {"RequestName": "RunningReq", "RequestStatus": "running-open",
+                                       "AgentJobInfo": {"agent1": makeJobInfo("RunningReq", "agent1")}},
+                        "AssignedReq": {"RequestName": "AssignedReq", "RequestStatus": "assigned"},
+                        "CompletedReq": {"RequestName": "CompletedReq", "RequestStatus": "completed",
+                                         "AgentJobInfo": {"agent1": makeJobInfo("CompletedReq", "agent1"),
+                                                          "agent2": makeJobInfo("CompletedReq", "agent2")}}}
+
+    def testUpdateActiveRequests(self):
+        requestChanges = {"RunningReq": {"RequestName": "RunningReq", "RequestStatus": "running-closed"},
+                          "AssignedReq": {"RequestName": "AssignedReq", "RequestStatus": "normal-archived"},
+                          "CompletedReq": None,
+                          "NewReq": {"RequestName": "NewReq", "RequestStatus": "running-open"},
+                          "OtherReq": {"RequestName": "OtherReq", "RequestStatus": "rejected-archived"}}
+        updated, removed, newJobInfo = updateActiveRequests(self.reqData, requestChanges, True)
+        self.assertItemsEqual(updated.keys(), ["RunningReq", "NewReq"])
+        self.assertEqual(updated["RunningReq"]["RequestStatus"], "running-closed")
+        self.assertEqual(updated["RunningReq"]["AgentJobInfo"], self.reqData["RunningReq"]["AgentJobInfo"])
+        self.assertItemsEqual(removed, ["AssignedReq", "CompletedReq"])
+        self.assertEqual(newJobInfo, ["NewReq"])
+
+        # job info is only kept when requested
+        requestChanges = {"RunningReq": {"RequestName": "RunningReq", "RequestStatus": "running-closed"}}
+        updated, removed, newJobInfo = updateActiveRequests(self.reqData, requestChanges, False)
+        self.assertFalse("AgentJobInfo" in updated["RunningReq"])
+        self.assertEqual(newJobInfo, [])
+
+    def testUpdateAgentJobInfo(self):
+        updated = {}
+        jobInfoDocs = [makeJobInfo("RunningReq", "agent2"), makeJobInfo("AssignedReq", "agent1"),
+                       makeJobInfo("UnknownReq", "agent1")]
+        deletedIDs = set([makeJobInfo("CompletedReq", "agent1")["_id"]])
+        updateAgentJobInfo(self.reqData, updated, jobInfoDocs, deletedIDs)
+
+        self.assertItemsEqual(updated.keys(), ["RunningReq", "CompletedReq"])
+        self.assertItemsEqual(updated["RunningReq"]["AgentJobInfo"].keys(), ["agent1", "agent2"])
+        self.assertItemsEqual(updated["CompletedReq"]["AgentJobInfo"].keys(), ["agent2"])
+        # the cached requests are not modified
+        self.assertItemsEqual(self.reqData["RunningReq"]["AgentJobInfo"].keys(), ["agent1"])
+        self.assertItemsEqual(self.reqData["CompletedReq"]["AgentJobInfo"].keys(), ["agent1", "agent2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+from __future__ import division, print_function
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from WMCore.WMStats.DataStructs.DataCache import DataCache, INDEXED_PROPERTIES, RequestIndex
+from WMCore.WMStats.DataStructs.DataCacheSnapshot import DataCacheSnapshot, KEEP_GENERATIONS
+
+
+class DataCacheSnapshotTests(unittest.TestCase):
+    """
+    Unit tests for the DataCache snapshots shared between processes
+    """
+
+    def setUp(self):
+        self.snapshotDir = tempfile.mkdtemp()
+        with open(os.path.join(os.path.dirname(__file__), 'DataCache.json')) as jo:
+            self.reqData = json.load(jo)
+
+    def tearDown(self):
+        DataCache.setSnapshotDir(None)
+        shutil.rmtree(self.snapshotDir)
+
+    def testSnapshot(self):
+        writer = DataCacheSnapshot(self.snapshotDir)
+        reader = DataCacheSnapshot(self.snapshotDir)
+        self.assertEqual(reader.loadIfChanged(), None)
+
+        reqIndex = RequestIndex(self.reqData, INDEXED_PROPERTIES)
+        generation = writer.write(self.reqData, reqIndex.indexes, 1234)
+        cacheTime, reqData, indexes = reader.loadIfChanged()
+        self.assertEqual(reader.generation, generation)
+        self.assertEqual(cacheTime, 1234)
+        self.assertItemsEqual(reqData.keys(), self.reqData.keys())
+        for reqName, reqDict in self.reqData.iteritems():
+            self.assertEqual(reqData[reqName], reqDict)
+        self.assertEqual(indexes, reqIndex.indexes)
+
+        # a snapshot is loaded once, and the writer doesn't load its own
+        self.assertEqual(reader.loadIfChanged(), None)
+        self.assertEqual(writer.loadIfChanged(), None)
+
+        for _ in range(KEEP_GENERATIONS + 1):
+            generation = writer.write(self.reqData, {})
+        self.assertEqual(reader.loadIfChanged()[2], {})
+        self.assertEqual(reader.generation, generation)
+        self.assertEqual(len([fileName for fileName in os.listdir(self.snapshotDir)
+                              if fileName.startswith("DataCache.")]), KEEP_GENERATIONS)
+        # the data loaded before stays readable
+        self.assertEqual(len(reqData), 20)
+        self.assertEqual(reqData[list(self.reqData)[0]], self.reqData[list(self.reqData)[0]])
+
+    def testSharedDataCache(self):
+        DataCache.setSnapshotDir(self.snapshotDir)
+        DataCache.setlatestJobData(self.reqData)
+        DataCache.saveSnapshot()
+        filterDict = {'RequestType': 'TaskChain', 'IncludeParents': 'True'}
+        expected = list(DataCache.filterDataByRequest(filterDict, ['Campaign']))
+
+        # another process reads the data from the snapshot
+        DataCache.setSnapshotDir(self.snapshotDir)
+        DataCache.setlatestJobData({})
+        self.assertFalse(DataCache.isEmpty())
+        self.assertEqual(len(DataCache.getlatestJobData()), 20)
+        self.assertItemsEqual(DataCache.getRequestIndex().indexes.keys(), INDEXED_PROPERTIES)
+        self.assertItemsEqual(list(DataCache.filterDataByRequest(filterDict, ['Campaign'])), expected)
+        self.assertEqual(len(list(DataCache.filterData({'PrepID': 'NotAPrepID'}, ['RequestName']))), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,11 +2,35 @@
 
 from __future__ import division, print_function
 
+import copy
 import json
 import os
+import threading
+import time
 import unittest
 
-from WMCore.WMStats.DataStructs.DataCache import DataCache
+from nose.plugins.attrib import attr
+
+from WMCore.ReqMgr.DataStructs.Request import RequestInfo
+from WMCore.WMStats.DataStructs.DataCache import DataCache, INDEXED_PROPERTIES, RequestIndex
+
+
+def makeRequests(nRequests, templates):
+    """
+    Make a dictionary of nRequests requests, copies of the template
+    requests with varied status, campaign, team and sites
+    """
+    statuses = ["assigned", "acquired", "running-open", "running-closed", "completed", "closed-out"]
+    reqData = {}
+    for i in range(nRequests):
+        reqDict = copy.deepcopy(templates[i % len(templates)])
+        reqDict["RequestName"] = "%s_%d" % (reqDict["RequestName"], i)
+        reqDict["RequestStatus"] = statuses[i % len(statuses)]
+        reqDict["Campaign"] = "Campaign%d" % (i % 50)
+        reqDict["Team"] = "production" if i % 10 else "relval"
+        reqDict["SiteWhitelist"] = ["T1_US_FNAL", "T2_CH_CERN_%d" % (i % 20)]
+        reqData[reqDict["RequestName"]] = reqDict
+    return reqData
 
 
 class DataCacheTests(unittest.TestCase):
@@ -87,6 +111,127 @@ class DataCacheTests(unittest.TestCase):
         self.assertEqual("amaltaro_TaskChain_InclParents_HG1812_Validation_181203_121005_1483",
                          data[0]['RequestName'])
 
+    def testFilterIndexes(self):
+        """
+        Filtering with the indexes returns the same requests as checking
+        each one of them
+        """
+        reqData = DataCache.getlatestJobData()
+        self.assertItemsEqual(DataCache.getRequestIndex().indexes.keys(),
+                              ["RequestStatus", "RequestType", "Campaign", "Team", "Teams",
+                               "SiteWhitelist", "InputDataset", "PrepID"])
+        filters = [{'RequestStatus': ['acquired', 'running-open']},
+                   {'RequestStatus': 'acquired', 'SiteWhitelist': 'T2_CH_CERN'},
+                   {'RequestType': 'TaskChain', 'IncludeParents': 'true'},
+                   {'Campaign': 'CMSSW_9_4_0__test2inwf-1510737328'},
+                   {'SiteWhitelist': ['T1_US_FNAL', 'T1_IT_CNAF']},
+                   {'RequestStatus': 'announced', 'AgentJobInfo': 'CLEANED'},
+                   {'LumiList': {'1': [1, 2]}, 'RequestType': 'ReReco'},
+                   {'Team': 'NotATeam'}]
+        for filterDict in filters:
+            expected = [reqName for reqName, reqDict in reqData.iteritems()
+                        if RequestInfo(reqDict).andFilterCheck(filterDict)]
+            data = [item['RequestName'] for item in DataCache.filterDataByRequest(filterDict, ['RequestName'])]
+            self.assertItemsEqual(expected, data)
+
+        # data replaced without setlatestJobData is indexed again
+        DataCache._lastedActiveDataFromAgent["data"] = {}
+        self.assertEqual([], list(DataCache.filterData({'RequestStatus': 'acquired'}, ['RequestName'])))
+        self.assertEqual(DataCache.getRequestIndex().data, {})
+
+    def testUpdateRequests(self):
+        """
+        Updating some requests updates the indexes as indexing all of them
+        """
+        reqData = DataCache.getlatestJobData()
+        oldIndex = DataCache.getRequestIndex()
+        generation = DataCache.getGeneration()
+        reqNames = sorted(reqData)
+        updatedRequests = {}
+        for reqName in reqNames[:3]:
+            updatedRequests[reqName] = dict(reqData[reqName], RequestStatus="completed", Campaign="NewCampaign")
+        updatedRequests["NewRequest"] = {"RequestName": "NewRequest", "RequestStatus": "assigned",
+                                         "Campaign": "NewCampaign", "SiteWhitelist": ["T2_CH_CERN"]}
+        DataCache.updateRequests(updatedRequests, [reqNames[3], "UnknownRequest"])
+
+        newData = DataCache.getlatestJobData()
+        self.assertNotEqual(DataCache.getGeneration(), generation)
+        self.assertEqual(len(newData), 20)
+        self.assertFalse(reqNames[3] in newData)
+        self.assertEqual(newData["NewRequest"], updatedRequests["NewRequest"])
+        newIndex = DataCache.getRequestIndex()
+        self.assertTrue(newIndex.data is newData)
+        self.assertTrue(oldIndex.data is reqData)
+        self.assertItemsEqual(newIndex.indexes["Campaign"]["NewCampaign"], reqNames[:3] + ["NewRequest"])
+
+        DataCache.setlatestJobData(newData)
+        fullIndex = DataCache.getRequestIndex()
+        self.assertEqual(newIndex.indexes, fullIndex.indexes)
+        # the readers of the previous data are not affected
+        self.assertEqual(RequestIndex(reqData, INDEXED_PROPERTIES).indexes, oldIndex.indexes)
+
+    def testConcurrentIndexing(self):
+        """
+        Indexes built on demand by several threads are built once, while
+        the index is updated
+        """
+        reqData = makeRequests(2000, list(DataCache.getlatestJobData().values()))
+        reqIndex = RequestIndex(reqData)
+        properties = ["RequestStatus", "Campaign", "Team", "SiteWhitelist", "RequestType", "Group"]
+        indexes = []
+        updates = []
+
+        def buildIndexes():
+            for prop in properties:
+                indexes.append((prop, reqIndex.getIndex(prop)))
+
+        def updateIndex():
+            for _ in range(20):
+                updates.append(reqIndex.update(dict(reqData), set(list(reqData)[:10])))
+
+        threads = [threading.Thread(target=buildIndexes) for _ in range(4)]
+        threads.append(threading.Thread(target=updateIndex))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(updates), 20)
+        self.assertEqual(len(indexes), 4 * len(properties))
+        for prop, index in indexes:
+            self.assertTrue(index is reqIndex.indexes[prop])
+        self.assertEqual(reqIndex.indexes, RequestIndex(reqData, properties).indexes)
+
+    @attr('performance', 'integration')
+    def testFilterPerformance(self):
+        """
+        Time common filters on 20k cached requests, with the indexes and
+        with a check of every request as done before.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        reqData = makeRequests(20000, list(DataCache.getlatestJobData().values()))
+        startTime = time.time()
+        DataCache.setlatestJobData(reqData)
+        print("  indexing 20000 requests: %.3f secs" % (time.time() - startTime))
+
+        filters = [{'RequestStatus': ['running-open', 'running-closed']},
+                   {'RequestStatus': 'running-open', 'Campaign': 'Campaign10'},
+                   {'Team': 'relval', 'SiteWhitelist': 'T2_CH_CERN_10'},
+                   {'RequestType': 'TaskChain', 'IncludeParents': 'True'}]
+        for filterDict in filters:
+            startTime = time.time()
+            for _ in range(10):
+                indexed = list(DataCache.filterDataByRequest(filterDict, ['RequestType']))
+            indexTime = (time.time() - startTime) / 10
+            startTime = time.time()
+            for _ in range(10):
+                scanned = [reqDict for reqDict in reqData.itervalues()
+                           if RequestInfo(reqDict).andFilterCheck(filterDict)]
+            scanTime = (time.time() - startTime) / 10
+            self.assertEqual(len(indexed), len(scanned))
+            print("  %s: %d requests, indexed %.4f secs, scan %.4f secs" %
+                  (filterDict, len(indexed), indexTime, scanTime))
+
 
 if __name__ == '__main__':
     unittest.main()
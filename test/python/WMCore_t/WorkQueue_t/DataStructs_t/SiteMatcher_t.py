@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+    SiteMatcher unit tests
+"""
+from __future__ import (print_function, division)
+
+import random
+import time
+import unittest
+
+from mock import mock
+from nose.plugins.attrib import attr
+
+from WMCore.WorkQueue.DataStructs.SiteMatcher import SiteJobCounter, SiteMatcher
+from WMCore.WorkQueue.DataStructs.WorkQueueElement import WorkQueueElement, possibleSites
+
+
+def naiveJobCount(siteJobCounts, site, prio):
+    """
+    Number of jobs at or above prio, as availableWork used to count them
+    """
+    return sum([x[1] if x[0] >= prio else 0 for x in siteJobCounts.get(site, {}).items()])
+
+
+def makeElement(prio, jobs, sites):
+    """
+    Create an element with no input data which can run at sites
+    """
+    return WorkQueueElement(RequestName="Request_%s" % prio, Priority=prio, Jobs=jobs,
+                            SiteWhitelist=list(sites), SiteBlacklist=[])
+
+
+class SiteMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sites = ["T1_US_FNAL", "T2_CH_CERN", "T2_US_Nebraska", "T2_DE_DESY", "T3_US_Colorado"]
+        random.seed(12345)
+
+    def testJobCounter(self):
+        """Counts at or above a priority match the naive sum"""
+        siteJobCounts = {"T1_US_FNAL": {100: 10, 50: 5, 300: 1},
+                         "T2_CH_CERN": {50: 20}}
+        counter = SiteJobCounter(siteJobCounts)
+        for site in self.sites:
+            for prio in [0, 49, 50, 51, 99.5, 100, 200, 300, 301]:
+                self.assertEqual(counter.jobsAtOrAbove(site, prio), naiveJobCount(siteJobCounts, site, prio))
+        self.assertEqual(counter.asDict(), siteJobCounts)
+
+        # unknown priorities are inserted on demand
+        for site, prio, jobs in [("T1_US_FNAL", 75, 3), ("T2_DE_DESY", 1000, 2.5), ("T2_CH_CERN", 50, 1)]:
+            counter.addJobs(site, prio, jobs)
+            siteJobCounts.setdefault(site, {})
+            siteJobCounts[site][prio] = siteJobCounts[site].get(prio, 0) + jobs
+        for site in self.sites:
+            for prio in [0, 50, 74, 75, 76, 100, 999, 1000, 1001]:
+                self.assertEqual(counter.jobsAtOrAbove(site, prio), naiveJobCount(siteJobCounts, site, prio))
+        self.assertEqual(counter.asDict(), siteJobCounts)
+
+    def testSiteMask(self):
+        """Only threshold sites end up in the candidates"""
+        matcher = SiteMatcher(dict((site, 10) for site in self.sites), {})
+        mask = matcher.siteMask(["T1_US_FNAL", "T2_CH_CERN", "T2_IT_Bari"])
+        self.assertEqual(matcher.siteMask(["T2_CH_CERN", "T1_US_FNAL"]), mask)
+        self.assertEqual(sorted(matcher.maskSites(mask)), ["T1_US_FNAL", "T2_CH_CERN"])
+        self.assertEqual(matcher.maskSites(matcher.siteMask(["T2_IT_Bari"])), [])
+
+    def testElementSites(self):
+        """Candidate sites are computed once per distinct site and data restrictions"""
+        matcher = SiteMatcher(dict((site, 10) for site in self.sites), {})
+        elements = [makeElement(100, 1, ["T1_US_FNAL", "T2_CH_CERN"]) for _ in range(3)]
+        elements.append(makeElement(100, 1, ["T1_US_FNAL", "T2_CH_CERN"]))
+        elements[-1]['Inputs'] = {"/a/b/c#1": ["T2_CH_CERN"]}
+        with mock.patch("WMCore.WorkQueue.DataStructs.SiteMatcher.possibleSites",
+                        side_effect=possibleSites) as mockPossibleSites:
+            sites = [sorted(matcher.elementSites(element)) for element in elements]
+        self.assertEqual(sites, [["T1_US_FNAL", "T2_CH_CERN"]] * 3 + [["T2_CH_CERN"]])
+        self.assertEqual(mockPossibleSites.call_count, 2)
+
+    def testMatchElement(self):
+        """Elements are assigned while their priority has free slots"""
+        thresholds = {"T1_US_FNAL": 100, "T2_CH_CERN": 50}
+        siteJobCounts = {"T1_US_FNAL": {500: 90}}
+        matcher = SiteMatcher(thresholds, siteJobCounts)
+
+        # higher priority jobs are already filling T1_US_FNAL
+        self.assertEqual(matcher.matchElement(makeElement(400, 20, ["T1_US_FNAL"])), "T1_US_FNAL")
+        self.assertEqual(siteJobCounts["T1_US_FNAL"], {500: 90, 400: 20})
+        self.assertEqual(matcher.matchElement(makeElement(400, 20, ["T1_US_FNAL"])), None)
+        # but higher priority work still gets in
+        self.assertEqual(matcher.matchElement(makeElement(600, 20, ["T1_US_FNAL"])), "T1_US_FNAL")
+        # sites out of the thresholds are never used
+        self.assertEqual(matcher.matchElement(makeElement(400, 20, ["T2_IT_Bari"])), None)
+        self.assertEqual(matcher.matchElement(makeElement(400, 20, ["T1_US_FNAL", "T2_CH_CERN"])), "T2_CH_CERN")
+        self.assertEqual(siteJobCounts["T2_CH_CERN"], {400: 20})
+
+    def testRandomSiteChoice(self):
+        """Any site with free slots can be chosen"""
+        thresholds = dict((site, 10 ** 6) for site in self.sites)
+        matcher = SiteMatcher(thresholds, {})
+        chosen = set()
+        for _ in range(200):
+            chosen.add(matcher.matchElement(makeElement(100, 1, self.sites[:3])))
+        self.assertEqual(chosen, set(self.sites[:3]))
+
+    def testSameAssignment(self):
+        """Same elements pass as with the naive matching when there is a single candidate site"""
+        thresholds = dict((site, random.randint(0, 500)) for site in self.sites)
+        siteJobCounts = {}
+        for site in self.sites:
+            for prio in random.sample(range(0, 1000, 10), 5):
+                siteJobCounts.setdefault(site, {})[prio] = random.randint(0, 100)
+        elements = [makeElement(random.randrange(0, 1000, 5), random.randint(1, 50), [random.choice(self.sites)])
+                    for _ in range(500)]
+        elements.sort(key=lambda x: x['Priority'], reverse=True)
+
+        naiveCounts = dict((site, dict(counts)) for site, counts in siteJobCounts.items())
+        naivePassed = []
+        for element in elements:
+            site = list(possibleSites(element))[0]
+            if naiveJobCount(naiveCounts, site, element['Priority']) < thresholds[site]:
+                naivePassed.append(element)
+                naiveCounts[site][element['Priority']] = naiveCounts[site].get(element['Priority'], 0) + element['Jobs']
+
+        matcher = SiteMatcher(thresholds, siteJobCounts, priorities=set(x['Priority'] for x in elements))
+        passed = [element for element in elements if matcher.matchElement(element)]
+        self.assertEqual(passed, naivePassed)
+        self.assertEqual(siteJobCounts, naiveCounts)
+
+    @attr('performance', 'integration')
+    def testMatchPerformance(self):
+        """
+        Compare the naive matching with the SiteMatcher.
+        You shouldn't be running this normally because it doesn't test anything.
+        """
+        sites = ["T2_XX_Site%d" % i for i in range(200)]
+        thresholds = dict((site, random.randint(0, 1500)) for site in sites)
+        siteJobCounts = dict((site, dict((prio, 10) for prio in range(0, 100000, 1000))) for site in sites)
+        elements = [makeElement(random.randrange(0, 100000, 100), 10, random.sample(sites, 50))
+                    for _ in range(20000)]
+        elements.sort(key=lambda x: x['Priority'], reverse=True)
+
+        naiveCounts = dict((site, dict(counts)) for site, counts in siteJobCounts.items())
+        siteList = list(sites)
+        startTime = time.time()
+        for element in elements:
+            commonSites = possibleSites(element)
+            random.shuffle(siteList)
+            for site in siteList:
+                if site in commonSites and naiveJobCount(naiveCounts, site, element['Priority']) < thresholds[site]:
+                    naiveCounts[site][element['Priority']] = naiveCounts[site].get(element['Priority'], 0) + 10
+                    break
+        naiveTime = time.time() - startTime
+
+        startTime = time.time()
+        matcher = SiteMatcher(thresholds, siteJobCounts, priorities=set(x['Priority'] for x in elements))
+        for element in elements:
+            matcher.matchElement(element)
+        matcherTime = time.time() - startTime
+
+        print("  naive matching: %.0f elements/sec" % (len(elements) / naiveTime))
+        print("  SiteMatcher: %.0f elements/sec" % (len(elements) / matcherTime))
+
+
+if __name__ == '__main__':
+    unittest.main()
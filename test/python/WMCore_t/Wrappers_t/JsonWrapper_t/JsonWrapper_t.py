@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: ISO-8859-1 -*-
+"""
+_JsonWrapper_t_
+
+Unit tests for the JSON backends
+"""
+
+from __future__ import division, print_function
+
+import json
+import unittest
+
+import WMCore.Wrappers.JsonWrapper as JsonWrapper
+from WMCore.Wrappers.JsonWrapper import JSONBackend, getBackend, setDefaultBackend
+
+DOCUMENTS = [{'RequestName': 'TestWorkflow', 'RequestStatus': 'running-open', 'RequestPriority': 180000,
+              'SiteWhitelist': ['T1_US_FNAL', 'T2_CH_CERN'], 'UnmergedLFNBase': '/store/unmerged',
+              'TimePerEvent': 12.5, 'FilterEfficiency': 0.1, 'SizePerEvent': 1e+16, 'Comments': 'a "quoted"\ttext',
+              'Team': u'caf\xe9', 'LumiList': {'1': [[1, 10], [15, 20]]}, 'Mask': None, 'Resubmission': False,
+              'Events': 2 ** 40, 'AgentJobInfo': {}, 'OutputDatasets': []},
+             ["row", -1, -0.5, True, None, {1: "integer key"}],
+             "string",
+             3.141592653589793,
+             {True: "true key", None: "null key", False: 0, 1.5: "float key"}]
+
+# orjson writes NaN and infinities as null
+SPECIAL_FLOATS = [float("nan"), float("inf"), -float("inf")]
+
+
+class JsonWrapperTest(unittest.TestCase):
+    """
+    _JsonWrapperTest_
+
+    Test the JSON backends and the choice among them
+    """
+
+    def tearDown(self):
+        setDefaultBackend("auto")
+        JsonWrapper._backends.pop("missing", None)
+
+    def checkBackend(self, name):
+        """
+        Check that a backend encodes and decodes as the json module,
+        skipping the test if the backend isn't installed
+        """
+        backend = getBackend(name)
+        if backend.name != name:
+            raise unittest.SkipTest("JSON backend %s is not installed" % name)
+
+        for doc in DOCUMENTS:
+            encoded = backend.dumps(doc)
+            self.assertEqual(backend.loads(encoded), json.loads(json.dumps(doc)))
+            self.assertEqual(backend.loads(json.dumps(doc)), json.loads(json.dumps(doc)))
+            self.assertEqual(backend.dumps(doc, indent=2), json.dumps(doc, indent=2))
+            if name != "orjson":
+                self.assertEqual(encoded, json.dumps(doc))
+            self.assertFalse("\n" in encoded)
+
+        # NaN isn't equal to itself, compare the representations
+        encoded = json.dumps(SPECIAL_FLOATS)
+        self.assertEqual(repr(backend.loads(encoded)), repr(SPECIAL_FLOATS))
+        if name == "orjson":
+            self.assertEqual(backend.loads(backend.dumps(SPECIAL_FLOATS)), [None, None, None])
+        else:
+            self.assertEqual(backend.dumps(SPECIAL_FLOATS), encoded)
+        return
+
+    def testJSON(self):
+        """
+        _testJSON_
+
+        The json backend encodes and decodes as the json module
+        """
+        self.checkBackend("json")
+
+    def testUJSON(self):
+        """
+        _testUJSON_
+
+        The ujson backend encodes and decodes as the json module
+        """
+        self.checkBackend("ujson")
+
+    def testORJSON(self):
+        """
+        _testORJSON_
+
+        The orjson backend decodes as the json module, it encodes compactly
+        and writes NaN and infinities as null
+        """
+        self.checkBackend("orjson")
+
+    def testBackendChoice(self):
+        """
+        _testBackendChoice_
+
+        Unavailable backends are replaced by the json one, unknown ones
+        are refused, and the default backend is used without a name
+        """
+        class MissingBackend(JSONBackend):
+            def __init__(self):
+                raise ImportError("No module named missing")
+
+        JsonWrapper.BACKENDS["missing"] = MissingBackend
+        try:
+            self.assertEqual(getBackend("missing").name, "json")
+        finally:
+            del JsonWrapper.BACKENDS["missing"]
+        self.assertRaises(ValueError, getBackend, "unknown")
+        self.assertTrue(getBackend("auto").name in JsonWrapper.AUTO_BACKENDS)
+
+        setDefaultBackend("json")
+        self.assertTrue(getBackend() is getBackend("json"))
+        self.assertEqual(JsonWrapper.dumps(DOCUMENTS), json.dumps(DOCUMENTS))
+        self.assertEqual(JsonWrapper.loads(json.dumps(DOCUMENTS)), json.loads(json.dumps(DOCUMENTS)))
+        self.assertRaises(ValueError, setDefaultBackend, "unknown")
+        self.assertTrue(getBackend() is getBackend("json"))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()